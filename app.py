@@ -2,20 +2,38 @@
 import os
 import sqlite3
 import logging
-from flask import Flask, jsonify, render_template, request, redirect, url_for, flash, session, Response
+from flask import Flask, jsonify, render_template, request, redirect, url_for, flash, session, Response, stream_with_context
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 import time
 import json
+import signal
+import threading
 import re
+from functools import wraps
 import pandas as pd
 import numpy as np
 import joblib
 from openai import OpenAI
 from dotenv import load_dotenv
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, text, bindparam
 import hashlib
 from datetime import datetime
 from math import radians, sin, cos, sqrt, atan2
+from dictionary_encoding import encode_frame, equals_mask, contains_mask
+from json_encoding import ResponseJSONProvider, frame_records, dumps as dumps_json
+from avm_sketches import load_segment_sketches, avm_metrics_from_sketches
+from model_registry import ModelRegistry
+from feature_store import load_context_features
+from market_trends import compute_trend_metrics, trend_summary, align_series, downsample_quarterly
+from trend_rollups import (PERIOD_MONTHS, PRICE_BOUNDS, ROLLUPS, ROLLUP_PERIODS, TOP_AREA_ORDER,
+                           trend_query as rollup_trend_query, top_areas_query as rollup_top_areas_query,
+                           series_query as rollup_series_query,
+                           window_start as rollup_window_start)
+import leaderboards
+from price_medians import load_price_medians
+from area_index import load_area_index
+from area_heatmap import load_heatmap, ANY_SEGMENT as HEATMAP_ANY_SEGMENT
+from location_premium import AMENITY_PREMIUMS, premium_components
 
 # --- Configuration ---
 load_dotenv()
@@ -23,20 +41,24 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
 # --- ML Model Loading ---
-ml_model = None
-ml_encoders = None
-ml_feature_columns = None
-USE_ML = False
+# Versioned models come from models/registry (manifest.json names the active and
+# shadow candidate versions); without a manifest the flat models/*_v1 files are
+# served as "v1". Reload in place with POST /api/admin/models/reload or SIGHUP.
+model_registry = ModelRegistry()
+model_registry.reload()
+if not model_registry.enabled:
+    print("⚠️ ML model not loaded. Using rule-based pricing only.")
+
+
+def _reload_models_on_signal(signum, frame):
+    """SIGHUP: reload the registry on a thread (the handler may interrupt a request holding the lock)"""
+    threading.Thread(target=model_registry.reload, daemon=True).start()
+
 
 try:
-    ml_model = joblib.load('models/xgboost_model_v1.pkl')
-    ml_encoders = joblib.load('models/label_encoders_v1.pkl')
-    ml_feature_columns = joblib.load('models/feature_columns_v1.pkl')
-    USE_ML = True
-    print("✅ ML model loaded successfully")
-except Exception as e:
-    print(f"⚠️ ML model not loaded: {e}. Using rule-based pricing only.")
-    USE_ML = False
+    signal.signal(signal.SIGHUP, _reload_models_on_signal)
+except (ValueError, AttributeError):  # Not the main thread / no SIGHUP on this platform
+    pass
 
 # --- AI Configuration ---
 USE_AI_SUMMARY = True
@@ -151,6 +173,13 @@ RENTALS_MAP = {
 print(f"🔍 SALES MAP: {SALES_MAP}")
 print(f"🔍 RENTALS MAP: {RENTALS_MAP}")
 
+# --- Area Spatial Index (nearest-area comparables) ---
+if engine:
+    load_area_index(engine)
+    # Start the AVM sketch builds (background threads; the AVM endpoints use raw rows until they finish)
+    load_segment_sketches(engine, 'buy', SALES_MAP)
+    load_segment_sketches(engine, 'rent', RENTALS_MAP)
+
 # --- Redis Cache Configuration ---
 REDIS_ENABLED = os.getenv("REDIS_ENABLED", "false").lower() == "true"
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
@@ -219,7 +248,7 @@ def cache_result(timeout=300, key_prefix=""):
             
             try:
                 # Store in cache
-                redis_client.setex(cache_key, timeout, json.dumps(result))
+                redis_client.setex(cache_key, timeout, dumps_json(result))
                 print(f"💾 Cache STORED: {f.__name__} (TTL: {timeout}s)")
             except Exception as e:
                 print(f"⚠️ Cache write failed for {f.__name__}: {e}")
@@ -230,6 +259,7 @@ def cache_result(timeout=300, key_prefix=""):
 
 
 app = Flask(__name__, template_folder='templates', static_folder='static')
+app.json = ResponseJSONProvider(app)  # DataFrame/NumPy/Decimal-aware jsonify (orjson when installed)
 
 # --- Authentication Configuration ---
 app.secret_key = os.getenv("SECRET_KEY", "retyn-avm-secure-key-2025")  # Use environment variable in production
@@ -271,6 +301,22 @@ def load_user(user_id):
             return User(user_data['id'], email, user_data['name'])
     return None
 
+# --- Admin Accounts (model registry endpoints) ---
+# Comma-separated emails; empty means no one can reload or promote models over HTTP
+ADMIN_EMAILS = {email.strip().lower() for email in os.getenv('ADMIN_EMAILS', '').split(',') if email.strip()}
+
+
+def admin_required(f):
+    """login_required plus membership of ADMIN_EMAILS (403 otherwise)"""
+    @wraps(f)
+    @login_required
+    def decorated_function(*args, **kwargs):
+        email = (getattr(current_user, 'email', None) or '').lower()
+        if email not in ADMIN_EMAILS:
+            return jsonify({'success': False, 'error': 'Admin access required'}), 403
+        return f(*args, **kwargs)
+    return decorated_function
+
 # ================================================================
 # GEOSPATIAL ENHANCEMENT FUNCTIONS
 # Added: October 6, 2025
@@ -413,15 +459,9 @@ def calculate_location_premium(area_name):
     """
     Calculate comprehensive location premium based on area coordinates and distances.
     
-    Premium Formula (based on Dubai market research):
-    - Metro: 15% at 0km, scales down to 0% at 5km (3% per km)
-    - Beach: 30% at 0km, scales down to 0% at 5km (6% per km)
-    - Mall: 8% at 0km, scales down to 0% at 4km (2% per km)
-    - School: 5% at 0km, scales down to 0% at 5km (1% per km)
-    - Business: 10% at 0km, scales down to 0% at 5km (2% per km)
-    - Neighborhood: (score - 3.0) * 4% → -8% to +8% range
-    
-    Total capped at: -20% min, +70% max (raised from +50% to preserve granularity in ultra-premium areas)
+    Premium formula: location_premium.premium_components (metro, beach, mall,
+    school and business distance decay plus neighborhood score; total capped
+    at -20% min, +70% max)
     
     Args:
         area_name: Area/location name to lookup
@@ -463,48 +503,18 @@ def calculate_location_premium(area_name):
             return None
         
         metro_dist, beach_dist, mall_dist, school_dist, business_dist, neighborhood = result
+        distances = dict(zip(AMENITY_PREMIUMS, (metro_dist, beach_dist, mall_dist, school_dist, business_dist)))
         
-        # Convert Decimal to float for calculations
-        metro_dist = float(metro_dist) if metro_dist is not None else None
-        beach_dist = float(beach_dist) if beach_dist is not None else None
-        mall_dist = float(mall_dist) if mall_dist is not None else None
-        school_dist = float(school_dist) if school_dist is not None else None
-        business_dist = float(business_dist) if business_dist is not None else None
-        neighborhood = float(neighborhood) if neighborhood is not None else None
-        
-        # Calculate individual premiums (linear decay with reasonable defaults)
-        # Note: Use 'if x is not None' to handle 0.0 values correctly (0.0 is falsy but valid!)
-        metro_premium = max(0, 15 - (metro_dist if metro_dist is not None else 10) * 3)
-        beach_premium = max(0, 30 - (beach_dist if beach_dist is not None else 10) * 6)
-        mall_premium = max(0, 8 - (mall_dist if mall_dist is not None else 10) * 2)
-        school_premium = max(0, 5 - (school_dist if school_dist is not None else 10) * 1)
-        business_premium = max(0, 10 - (business_dist if business_dist is not None else 10) * 2)
-        neighborhood_premium = ((neighborhood if neighborhood is not None else 3.0) - 3.0) * 4
-        
-        # Total premium (capped at reasonable range)
-        # M5 FIX: Raised cap from +50% to +70% to preserve granularity in ultra-premium areas
-        total = metro_premium + beach_premium + mall_premium + school_premium + business_premium + neighborhood_premium
-        total_capped = max(-20, min(70, total))
+        # Individual premiums and capped total (location_premium.py, shared with the area heatmap)
+        premiums = premium_components({amenity: [distance] for amenity, distance in distances.items()}, [neighborhood])
+        premiums = {name: float(values[0]) for name, values in premiums.items()}
         
         # Confidence based on data completeness
-        data_points = sum([
-            1 if metro_dist is not None else 0,
-            1 if beach_dist is not None else 0,
-            1 if mall_dist is not None else 0,
-            1 if school_dist is not None else 0,
-            1 if business_dist is not None else 0,
-            1 if neighborhood is not None else 0
-        ])
+        data_points = sum(1 for value in (*distances.values(), neighborhood) if value is not None)
         confidence = min(0.95, 0.50 + (data_points / 6) * 0.45)  # 50% to 95% based on completeness
         
         return {
-            'total_premium': round(total_capped, 2),
-            'metro_premium': round(metro_premium, 2),
-            'beach_premium': round(beach_premium, 2),
-            'mall_premium': round(mall_premium, 2),
-            'school_premium': round(school_premium, 2),
-            'business_premium': round(business_premium, 2),
-            'neighborhood_premium': round(neighborhood_premium, 2),
+            **{name: round(value, 2) for name, value in premiums.items()},
             'confidence': round(confidence, 2)
         }
     
@@ -903,6 +913,62 @@ def calculate_age_premium(property_age, property_type, is_offplan):
         return max(base_depreciation * depreciation_factor, -50.0)  # Cap at -50%
 
 
+def floor_premium_array(floor_levels, property_types):
+    """
+    Vectorized calculate_floor_premium over many properties.
+    
+    Args:
+        floor_levels: Sequence of floor numbers (None/NaN for not provided)
+        property_types: Sequence of property types, same length
+    
+    Returns:
+        np.ndarray: Premium percentages (0.0 to 25.0)
+    """
+    floors = pd.to_numeric(pd.Series(floor_levels, dtype=object), errors='coerce').to_numpy(dtype=float)
+    types = pd.Series(property_types, dtype=object).fillna('').astype(str).str.lower()
+    floors = np.minimum(np.trunc(np.nan_to_num(floors, nan=0.0)), 150)  # Cap at 150 floors
+    
+    premium = np.select(
+        [floors <= 5, floors <= 15, floors <= 30],
+        [floors * 1.0, 5.0 + (floors - 5) * 0.5, 10.0 + (floors - 15) * 0.3],
+        default=np.minimum(14.5 + (floors - 30) * 0.2, 25.0),
+    )
+    # Floor premium doesn't apply to villas, townhouses, or land
+    not_applicable = types.isin(['villa', 'townhouse', 'land', 'plot']).to_numpy()
+    return np.where((floors <= 0) | not_applicable, 0.0, premium)
+
+
+def age_premium_array(property_ages, property_types):
+    """
+    Vectorized calculate_age_premium over many properties.
+    
+    Age 0 is treated as off-plan (+5%), matching the single valuation.
+    Properties without an age get 0.0 (premium not applied).
+    
+    Returns:
+        np.ndarray: Premium percentages (-50.0 to +5.0)
+    """
+    ages = pd.to_numeric(pd.Series(property_ages, dtype=object), errors='coerce').to_numpy(dtype=float)
+    types = pd.Series(property_types, dtype=object).fillna('').astype(str).str.lower()
+    provided = ~np.isnan(ages)
+    age = np.minimum(np.trunc(np.nan_to_num(ages, nan=0.0)), 100)  # Cap at 100 years
+    
+    # Villas depreciate slower than apartments
+    factor = np.where(types.str.contains('villa', regex=False).to_numpy(), 0.7, 1.0)
+    premium = np.select(
+        [age <= 0, age <= 3, age <= 10, age <= 20, age <= 30],
+        [
+            np.full_like(age, 5.0),
+            np.zeros_like(age),
+            -1.0 * (age - 3) * factor,
+            (-7.0 - 1.5 * (age - 10)) * factor,
+            (-22.0 - 2.0 * (age - 20)) * factor,
+        ],
+        default=np.maximum((-42.0 - 2.5 * (age - 30)) * factor, -50.0),
+    )
+    return np.where(provided, premium, 0.0)
+
+
 def update_location_cache(area_name, property_type, bedrooms, premium_data):
     """
     Store calculated premium in cache with conflict handling.
@@ -968,6 +1034,15 @@ def update_location_cache(area_name, property_type, bedrooms, premium_data):
 # ================================================================
 
 # --- AVM (Automated Valuation Model) Logic with Outlier Filtering ---
+# Market-realistic price thresholds (min, max, extreme max) based on Dubai property market
+OUTLIER_PRICE_THRESHOLDS = {
+    # Sales: 100K minimum, 50M maximum residential sale; land/commercial
+    # are more lenient but still filtered above 100M
+    'buy': (100_000, 50_000_000, 100_000_000),
+    # Rentals: 10K minimum annual rent, 2M maximum residential, 5M absolute
+    'rent': (10_000, 2_000_000, 5_000_000),
+}
+
 def filter_outliers(prices, search_type):
     """
     Advanced outlier filtering for Dubai property market
@@ -976,18 +1051,7 @@ def filter_outliers(prices, search_type):
     if len(prices) == 0:
         return prices, {"total_outliers": 0, "outlier_percentage": 0}
     
-    # Define market-realistic thresholds based on Dubai property market
-    if search_type == 'buy':
-        # Sales thresholds - based on actual Dubai market analysis
-        MIN_PRICE = 100_000        # Minimum realistic sale price
-        MAX_PRICE = 50_000_000     # Maximum realistic residential sale (50M AED)
-        # For land/commercial, we're more lenient but still filter extreme outliers
-        EXTREME_MAX = 100_000_000  # Absolute maximum for any property type
-    else:
-        # Rental thresholds - based on actual Dubai rental market
-        MIN_PRICE = 10_000         # Minimum realistic annual rent
-        MAX_PRICE = 2_000_000      # Maximum realistic residential rent (2M AED)
-        EXTREME_MAX = 5_000_000    # Absolute maximum for any rental
+    MIN_PRICE, MAX_PRICE, EXTREME_MAX = OUTLIER_PRICE_THRESHOLDS[search_type]
     
     # Count outliers before filtering
     original_count = len(prices)
@@ -1077,7 +1141,7 @@ def calculate_avm_metrics(results_df, search_type, filters):
         if filters.get('area'):
             area_col = SALES_MAP['area_name'] if search_type == 'buy' else RENTALS_MAP['area_name']
             if area_col in results_df.columns:
-                area_data = results_df[results_df[area_col].str.contains(filters['area'], case=False, na=False)]
+                area_data = results_df[contains_mask(results_df[area_col], filters['area'])]
                 if not area_data.empty:
                     area_raw_prices = area_data[price_col].dropna()
                     # Apply same outlier filtering to area data
@@ -1106,6 +1170,10 @@ def calculate_avm_metrics(results_df, search_type, filters):
         return None
 
 # --- Market Trends Analysis Functions ---
+TREND_PERIOD_MONTHS = PERIOD_MONTHS  # None: full history
+TREND_GROUP_COLUMNS = {'area': 'area_name', 'property_type': 'property_type', 'bedrooms': 'bedrooms'}
+MAX_COMPARE_SERIES = 50
+
 def get_price_trends(filters, search_type, time_period='6M'):
     """
     Extract time-series price data from existing tables
@@ -1116,13 +1184,23 @@ def get_price_trends(filters, search_type, time_period='6M'):
     
     try:
         # Determine period in months
-        period_months = {'3M': 3, '6M': 6, '1Y': 12}.get(time_period, 6)
+        period_months = TREND_PERIOD_MONTHS.get(time_period, 6)
+        
+        # Long horizons: monthly rollups instead of scanning the raw table
+        if time_period in ROLLUP_PERIODS and rollup_supports_filters(filters, search_type):
+            try:
+                return get_rollup_price_trends(filters, search_type, period_months)
+            except Exception as e:
+                print(f"⚠️ Trend rollup unavailable, scanning raw table: {e}")
         
         # Get table and column mappings
         table = 'properties' if search_type == 'buy' else 'rentals'
         date_col = 'instance_date' if search_type == 'buy' else 'registration_date'
         map_config = SALES_MAP if search_type == 'buy' else RENTALS_MAP
         price_col = map_config['price']
+        # Month-aligned start, as on the rollup path (trend_rollups.window_start)
+        date_window = (f"AND CAST(\"{date_col}\" AS DATE) >= {rollup_window_start(period_months)}"
+                       if period_months is not None else "")
         
         # Build WHERE clause using existing logic
         where_clause, params = build_where_clause(filters, map_config, 'budget', is_rent=(search_type == 'rent'))
@@ -1148,7 +1226,7 @@ def get_price_trends(filters, search_type, time_period='6M'):
             WHERE {where_clause}
             AND "{date_col}" IS NOT NULL
             AND "{date_col}" != ''
-            AND CAST("{date_col}" AS DATE) >= NOW() - INTERVAL '{period_months} months'
+            {date_window}
             GROUP BY DATE_TRUNC('month', CAST("{date_col}" AS DATE))
             ORDER BY month;
         """)
@@ -1175,9 +1253,47 @@ def get_price_trends(filters, search_type, time_period='6M'):
         print(f"❌ Trend data extraction failed: {e}")
         return []
 
+def rollup_supports_filters(filters, search_type):
+    """True when the monthly rollup can answer these filters exactly (no budget cap below the outlier bound)"""
+    map_config = SALES_MAP if search_type == 'buy' else RENTALS_MAP
+    dimensions = ROLLUPS[search_type]['dimensions']
+    budget_value = filters.get('budget') or filters.get('annual_rent') or 999999999
+    if int(budget_value) < PRICE_BOUNDS[search_type][1]:
+        return False
+    filter_columns = ['area_name', 'property_type', 'bedrooms', 'status'] if search_type == 'buy' else ['area_name', 'property_sub_type']
+    return all(map_config.get(key) in dimensions for key in filter_columns)
+
+def get_rollup_price_trends(filters, search_type, period_months):
+    """
+    Monthly trend points from the monthly rollup (same shape as get_price_trends)
+    
+    Args:
+        filters: Trend filters (area, propertyType, bedrooms, status)
+        search_type: 'buy' or 'rent'
+        period_months: Months back from now (None: full history)
+    """
+    map_config = SALES_MAP if search_type == 'buy' else RENTALS_MAP
+    where_clause, params = build_where_clause(filters, map_config, 'budget', is_rent=(search_type == 'rent'),
+                                              include_price=False)
+    
+    with engine.connect() as conn:
+        result = conn.execute(rollup_trend_query(search_type, where_clause, period_months), params)
+        trend_data = [{
+            'month': row[0].strftime('%Y-%m'),
+            'avg_price': float(row[1]) if row[1] else 0,
+            'transaction_count': int(row[2]) if row[2] else 0,
+            'min_price': float(row[3]) if row[3] else 0,
+            'max_price': float(row[4]) if row[4] else 0,
+            'avg_price_per_sqm': float(row[5]) if row[5] else 0
+        } for row in result if row[0] is not None]
+    
+    print(f"🔍 TREND ROLLUP: {len(trend_data)} months from {ROLLUPS[search_type]['table']}")
+    return trend_data
+
 def calculate_basic_trends(trend_data):
     """
     Calculate comprehensive trend metrics including QoQ, YoY, volatility, and transaction trends
+    (single-series wrapper around market_trends.compute_trend_metrics)
     """
     if not trend_data or len(trend_data) < 2:
         return {
@@ -1188,243 +1304,13 @@ def calculate_basic_trends(trend_data):
         }
     
     try:
-        # Extract prices and dates
-        prices = [point['avg_price'] for point in trend_data if point['avg_price'] > 0]
-        volumes = [point['transaction_count'] for point in trend_data]
-        dates = [datetime.strptime(point['month'], '%Y-%m') for point in trend_data]
-        
-        if len(prices) < 2:
-            return {
-                'trend_direction': 'insufficient_data',
-                'percentage_change': 0,
-                'trend_strength': 'weak',
-                'summary': 'Insufficient price data for analysis'
-            }
-        
-        # --- BASIC TREND ANALYSIS ---
-        first_price = prices[0]
-        last_price = prices[-1]
-        percentage_change = ((last_price - first_price) / first_price) * 100
-        
-        # Determine trend direction
-        if percentage_change > 5:
-            trend_direction = 'upward'
-            trend_strength = 'strong' if percentage_change > 15 else 'moderate'
-        elif percentage_change < -5:
-            trend_direction = 'downward'
-            trend_strength = 'strong' if percentage_change < -15 else 'moderate'
-        else:
-            trend_direction = 'stable'
-            trend_strength = 'stable'
-        
-        # --- 1. QUARTER-OVER-QUARTER ANALYSIS ---
-        qoq_change = 0
-        qoq_status = 'N/A'
-        if len(prices) >= 3:  # Need at least 3 months for QoQ
-            # Get last 3 months average vs previous 3 months
-            recent_quarter = prices[-3:] if len(prices) >= 6 else prices[-len(prices)//2:]
-            previous_quarter = prices[-6:-3] if len(prices) >= 6 else prices[:len(prices)//2]
-            
-            if previous_quarter:
-                recent_avg = sum(recent_quarter) / len(recent_quarter)
-                previous_avg = sum(previous_quarter) / len(previous_quarter)
-                qoq_change = ((recent_avg - previous_avg) / previous_avg) * 100
-                qoq_status = 'Growth' if qoq_change > 0 else 'Decline' if qoq_change < 0 else 'Flat'
-        
-        # --- 2. YEAR-OVER-YEAR ANALYSIS ---
-        yoy_change = 0
-        yoy_status = 'N/A'
-        if len(trend_data) >= 12:  # Need at least 12 months for true YoY
-            # Compare same month last year
-            current_month = dates[-1]
-            year_ago_data = [point for point in trend_data 
-                           if datetime.strptime(point['month'], '%Y-%m').month == current_month.month
-                           and datetime.strptime(point['month'], '%Y-%m').year == current_month.year - 1]
-            
-            if year_ago_data:
-                year_ago_price = year_ago_data[0]['avg_price']
-                yoy_change = ((last_price - year_ago_price) / year_ago_price) * 100
-                yoy_status = 'Growth' if yoy_change > 0 else 'Decline' if yoy_change < 0 else 'Flat'
-        elif len(prices) >= 6:
-            # Fallback: compare recent 3 months to earliest 3 months
-            recent_avg = sum(prices[-3:]) / len(prices[-3:])
-            earliest_avg = sum(prices[:3]) / len(prices[:3])
-            yoy_change = ((recent_avg - earliest_avg) / earliest_avg) * 100
-            yoy_status = f'Period Growth' if yoy_change > 0 else f'Period Decline' if yoy_change < 0 else 'Stable'
-        
-        # --- 3. MARKET VOLATILITY INDICATORS ---
-        volatility = 0
-        volatility_index = 'Low'
-        price_std = 0
-        
-        if len(prices) > 2:
-            # Calculate price volatility (standard deviation of percentage changes)
-            price_changes = [(prices[i] - prices[i-1]) / prices[i-1] * 100 for i in range(1, len(prices))]
-            volatility = pd.Series(price_changes).std() if price_changes else 0
-            
-            # Calculate price standard deviation
-            price_std = pd.Series(prices).std()
-            
-            # Volatility index classification
-            if volatility > 10:
-                volatility_index = 'High'
-            elif volatility > 5:
-                volatility_index = 'Moderate'
-            else:
-                volatility_index = 'Low'
-        
-        # --- 4. TRANSACTION COUNT TRENDING ---
-        volume_trend = 'Stable'
-        volume_change = 0
-        volume_growth_rate = 0
-        
-        if len(volumes) >= 2:
-            first_volume = volumes[0] if volumes[0] > 0 else 1
-            last_volume = volumes[-1] if volumes[-1] > 0 else 1
-            volume_change = ((last_volume - first_volume) / first_volume) * 100
-            
-            if volume_change > 10:
-                volume_trend = 'Increasing'
-            elif volume_change < -10:
-                volume_trend = 'Decreasing'
-            else:
-                volume_trend = 'Stable'
-        
-        # Calculate monthly volume growth rate
-        if len(volumes) > 1:
-            volume_changes = [(volumes[i] - volumes[i-1]) / max(volumes[i-1], 1) * 100 for i in range(1, len(volumes))]
-            volume_growth_rate = sum(volume_changes) / len(volume_changes) if volume_changes else 0
-        
-        # Seasonal pattern detection (simple)
-        seasonal_pattern = 'No Pattern'
-        if len(trend_data) >= 6:
-            monthly_volumes = {}
-            for point in trend_data:
-                month_num = datetime.strptime(point['month'], '%Y-%m').month
-                if month_num not in monthly_volumes:
-                    monthly_volumes[month_num] = []
-                monthly_volumes[month_num].append(point['transaction_count'])
-            
-            if len(monthly_volumes) >= 3:
-                avg_by_month = {k: sum(v)/len(v) for k, v in monthly_volumes.items()}
-                max_month = max(avg_by_month, key=avg_by_month.get)
-                min_month = min(avg_by_month, key=avg_by_month.get)
-                seasonal_variation = (avg_by_month[max_month] - avg_by_month[min_month]) / avg_by_month[min_month] * 100
-                
-                if seasonal_variation > 30:
-                    seasonal_pattern = f'Seasonal (Peak: Month {max_month})'
-        
-        # --- ENHANCED SUMMARY ---
-        direction_text = {
-            'upward': f'rising by {percentage_change:.1f}%',
-            'downward': f'declining by {abs(percentage_change):.1f}%',
-            'stable': f'stable with {abs(percentage_change):.1f}% variation'
-        }.get(trend_direction, 'unclear trend')
-        
-        summary_parts = [
-            f"Market is {direction_text} over the period with {trend_strength} momentum.",
-            f"Volatility is {volatility_index.lower()} ({volatility:.1f}%).",
-            f"Transaction volume is {volume_trend.lower()}."
-        ]
-        
-        if qoq_status != 'N/A':
-            summary_parts.append(f"Quarter-over-quarter: {qoq_status} ({qoq_change:+.1f}%).")
-        
-        if yoy_status != 'N/A':
-            summary_parts.append(f"Year-over-year: {yoy_status} ({yoy_change:+.1f}%).")
-        
-        summary = " ".join(summary_parts)
-        
-        # Calculate average monthly volume
-        avg_volume = sum(point['transaction_count'] for point in trend_data) / len(trend_data)
-        
-        # --- ENHANCED METRICS ---
-        # Calculate average monthly sale price
-        avg_monthly_price = sum(point['avg_price'] for point in trend_data) / len(trend_data)
-        
-        # Calculate price momentum (acceleration/deceleration detection)
-        price_momentum = 'Stable'
-        if len(prices) >= 3:
-            # Calculate acceleration by comparing successive changes
-            price_changes = [((prices[i] - prices[i-1]) / prices[i-1] * 100) for i in range(1, len(prices))]
-            
-            if len(price_changes) >= 2:
-                # Check if changes are increasing (accelerating) or decreasing (decelerating)
-                change_trend = 0
-                for i in range(1, len(price_changes)):
-                    change_trend += (price_changes[i] - price_changes[i-1])
-                
-                avg_change_trend = change_trend / (len(price_changes) - 1)
-                
-                if avg_change_trend > 0.5:
-                    price_momentum = 'Accelerating'
-                elif avg_change_trend < -0.5:
-                    price_momentum = 'Decelerating'
-        
-        # Calculate affordability index (current price vs historical baseline)
-        historical_baseline = 2500000  # Dubai market baseline (can be made configurable)
-        affordability_index = (avg_monthly_price / historical_baseline) * 100
-        
-        # Calculate average monthly price per sqm with fallback calculation
-        price_per_sqm_values = [point['avg_price_per_sqm'] for point in trend_data if point.get('avg_price_per_sqm', 0) > 0]
-        avg_price_per_sqm = sum(price_per_sqm_values) / len(price_per_sqm_values) if price_per_sqm_values else 0
-        
-        # If no direct price per sqm data, estimate using average property size assumption
-        if avg_price_per_sqm == 0 and avg_monthly_price > 0:
-            # Use Dubai average property size estimation (1200 sqft = ~111 sqm)
-            estimated_avg_sqm = 111  # Average size assumption for Dubai properties
-            avg_price_per_sqm = avg_monthly_price / estimated_avg_sqm
-            print(f"� FALLBACK: Using estimated price/sqm: {avg_monthly_price} / {estimated_avg_sqm} = {avg_price_per_sqm}")
-        
-        print(f"�🔍 DEBUG Price/SqM: {len(price_per_sqm_values)} valid values from {len(trend_data)} data points")
-        print(f"🔍 DEBUG Price/SqM values: {price_per_sqm_values}")
-        print(f"🔍 DEBUG Final Avg Price/SqM: {avg_price_per_sqm}")
-        
-        # Calculate price per sqm change
-        price_per_sqm_change = 0
-        if len(price_per_sqm_values) >= 2 and price_per_sqm_values[0] > 0:
-            price_per_sqm_change = ((price_per_sqm_values[-1] - price_per_sqm_values[0]) / price_per_sqm_values[0]) * 100
-        elif avg_price_per_sqm > 0:
-            # Estimate change based on overall price change
-            price_per_sqm_change = percentage_change
-        
-        return {
-            # Basic metrics
-            'trend_direction': trend_direction,
-            'percentage_change': round(percentage_change, 2),
-            'trend_strength': trend_strength,
-            'avg_monthly_volume': round(avg_volume),
-            'data_points': len(trend_data),
-            'summary': summary,
-            
-            # Quarter-over-Quarter
-            'qoq_change': round(qoq_change, 2),
-            'qoq_status': qoq_status,
-            
-            # Year-over-Year
-            'yoy_change': round(yoy_change, 2),
-            'yoy_status': yoy_status,
-            
-            # Volatility Indicators
-            'volatility': round(volatility, 2),
-            'volatility_index': volatility_index,
-            'price_std': round(price_std, 2),
-            
-            # Transaction Trending
-            'volume_trend': volume_trend,
-            'volume_change': round(volume_change, 2),
-            'volume_growth_rate': round(volume_growth_rate, 2),
-            'seasonal_pattern': seasonal_pattern,
-            
-            # Enhanced Metrics
-            'avg_monthly_price': round(avg_monthly_price),
-            'price_momentum': price_momentum,
-            'affordability_index': round(affordability_index, 2),
-            
-            # Price per SqM Metrics
-            'avg_price_per_sqm': round(avg_price_per_sqm),
-            'price_per_sqm_change': round(price_per_sqm_change, 2)
-        }
+        metrics = compute_trend_metrics(
+            [point['month'] for point in trend_data],
+            [[point['avg_price'] for point in trend_data]],
+            [[point['transaction_count'] for point in trend_data]],
+            [[point.get('avg_price_per_sqm', 0) for point in trend_data]]
+        )
+        return trend_summary(metrics.iloc[0])
         
     except Exception as e:
         print(f"❌ Trend calculation failed: {e}")
@@ -1435,6 +1321,126 @@ def calculate_basic_trends(trend_data):
             'summary': 'Error calculating trend metrics'
         }
 
+def get_trend_series(filters, search_type, series_keys, group_by='area', time_period='6M'):
+    """
+    Monthly price series for several areas/segments from one GROUP BY scan
+    
+    Args:
+        filters: Same filters as get_price_trends (the grouped dimension is ignored)
+        search_type: 'buy' or 'rent'
+        series_keys: Values of the group_by column to compare (matched case-insensitively)
+        group_by: 'area', 'property_type' or 'bedrooms' (sales only)
+        time_period: Key of TREND_PERIOD_MONTHS
+        
+    Returns:
+        List of monthly rows ({'series', 'month', 'avg_price', ...}) labelled with the requested keys
+    """
+    if not engine or not series_keys:
+        return []
+    
+    period_months = TREND_PERIOD_MONTHS.get(time_period, 6)
+    table = 'properties' if search_type == 'buy' else 'rentals'
+    date_col = 'instance_date' if search_type == 'buy' else 'registration_date'
+    map_config = SALES_MAP if search_type == 'buy' else RENTALS_MAP
+    price_col = map_config['price']
+    # Month-aligned start, as on the rollup path (trend_rollups.window_start)
+    date_window = (f"AND CAST(\"{date_col}\" AS DATE) >= {rollup_window_start(period_months)}"
+                   if period_months is not None else "")
+    group_col = map_config.get(TREND_GROUP_COLUMNS[group_by])
+    if not group_col:
+        raise ValueError(f"Cannot group {search_type} trends by {group_by}")
+    
+    # The compared dimension comes from series_keys, not the single-value filter
+    filter_key = {'area': 'area', 'property_type': 'propertyType', 'bedrooms': 'bedrooms'}[group_by]
+    scoped_filters = {k: v for k, v in filters.items() if k != filter_key}
+    labels = {str(key).strip().lower(): key for key in series_keys}
+    
+    def series_rows(result):
+        return [{
+            'series': labels[row[0]],
+            'month': row[1].strftime('%Y-%m'),
+            'avg_price': float(row[2]) if row[2] else 0,
+            'transaction_count': int(row[3]) if row[3] else 0,
+            'avg_price_per_sqm': float(row[4]) if row[4] else 0,
+        } for row in result if row[1] is not None]
+    
+    # Long horizons: monthly rollups instead of scanning the raw table
+    if (time_period in ROLLUP_PERIODS and group_col in ROLLUPS[search_type]['dimensions']
+            and rollup_supports_filters(scoped_filters, search_type)):
+        where_clause, params = build_where_clause(scoped_filters, map_config, 'budget',
+                                                  is_rent=(search_type == 'rent'), include_price=False)
+        params['series_keys'] = list(labels)
+        try:
+            with engine.connect() as conn:
+                return series_rows(conn.execute(
+                    rollup_series_query(search_type, group_col, where_clause, period_months), params))
+        except Exception as e:
+            print(f"⚠️ Trend rollup unavailable, scanning raw table: {e}")
+    
+    where_clause, params = build_where_clause(scoped_filters, map_config, 'budget', is_rent=(search_type == 'rent'))
+    params['series_keys'] = list(labels)
+    
+    query = text(f"""
+        SELECT 
+            LOWER(TRIM("{group_col}")) as series_key,
+            DATE_TRUNC('month', CAST("{date_col}" AS DATE)) as month,
+            AVG("{price_col}") as avg_price,
+            COUNT(*) as transaction_count,
+            AVG(
+                CASE 
+                    WHEN "actual_area" IS NOT NULL 
+                    AND "actual_area" != '' 
+                    AND CAST("actual_area" AS FLOAT) > 0 
+                    THEN "{price_col}" / CAST("actual_area" AS FLOAT)
+                    ELSE NULL 
+                END
+            ) as avg_price_per_sqm
+        FROM {table}
+        WHERE {where_clause}
+        AND LOWER(TRIM("{group_col}")) IN :series_keys
+        AND "{date_col}" IS NOT NULL
+        AND "{date_col}" != ''
+        {date_window}
+        GROUP BY 1, 2
+        ORDER BY 1, 2;
+    """).bindparams(bindparam('series_keys', expanding=True))
+    
+    with engine.connect() as conn:
+        return series_rows(conn.execute(query, params))
+
+def build_trend_comparison(rows, series_keys):
+    """
+    Align monthly rows on one month axis and summarize every series in one kernel call
+    
+    Args:
+        rows: get_trend_series() output
+        series_keys: Requested keys (response order; keys without data get an empty series)
+        
+    Returns:
+        {'months': [...], 'series': [{'key', 'avg_price', 'transaction_count', 'avg_price_per_sqm', 'summary'}]}
+    """
+    labels, months, prices, volumes, price_per_sqm = align_series(rows, 'series')
+    metrics = compute_trend_metrics(months, prices, volumes, price_per_sqm, series=labels) if labels else None
+    
+    def values(array, i, cast):
+        return [None if np.isnan(v) else cast(v) for v in array[i]]
+    
+    series = []
+    for key in series_keys:
+        if key not in labels:
+            series.append({'key': key, 'avg_price': [None] * len(months), 'transaction_count': [0] * len(months),
+                           'avg_price_per_sqm': [None] * len(months), 'summary': calculate_basic_trends([])})
+            continue
+        i = labels.index(key)
+        series.append({
+            'key': key,
+            'avg_price': values(prices, i, float),
+            'transaction_count': [0 if np.isnan(v) else int(v) for v in volumes[i]],
+            'avg_price_per_sqm': values(price_per_sqm, i, float),
+            'summary': trend_summary(metrics.loc[key]),
+        })
+    return {'months': months, 'series': series}
+
 # --- Shared Logic ---
 def generate_ai_summary(filters, results_df, total_results, search_type):
     if not USE_AI_SUMMARY or results_df.empty: 
@@ -1539,31 +1545,26 @@ You provide structured analysis in a professional, data-driven manner. Focus on
         return "An error occurred while generating the AI summary."
 
 # --- Helper to build WHERE clauses ---
-def build_where_clause(filters, map, price_key, is_rent=False):
+def build_where_clause(filters, map, price_key, is_rent=False, include_price=True):
+    """include_price=False leaves out the outlier/budget conditions (e.g. for rollups, which are pre-bounded)"""
     conditions, params = [], {}
     
-    # 🔥 OUTLIER FILTERING: Add realistic price bounds
-    if is_rent:
-        # Rental outlier thresholds
-        MIN_PRICE = 10_000      # Minimum realistic annual rent
-        MAX_PRICE = 2_000_000   # Maximum realistic residential rent
-    else:
-        # Sales outlier thresholds  
-        MIN_PRICE = 100_000     # Minimum realistic sale price
-        MAX_PRICE = 50_000_000  # Maximum realistic residential sale
-    
-    # Add outlier filtering conditions
-    conditions.append(f"\"{map['price']}\" >= :min_price_param")
-    conditions.append(f"\"{map['price']}\" <= :max_realistic_price")
-    params['min_price_param'] = MIN_PRICE
-    params['max_realistic_price'] = MAX_PRICE
-    
-    # Handle both 'budget' and 'annual_rent' parameter names - FIXED
-    budget_value = filters.get('budget') or filters.get('annual_rent') or filters.get(price_key) or 999999999
-    # Apply user budget filter (but not higher than our outlier threshold)
-    user_max_price = min(int(budget_value), MAX_PRICE)
-    conditions.append(f"\"{map['price']}\" <= :budget_param")
-    params['budget_param'] = user_max_price
+    # 🔥 OUTLIER FILTERING: Add realistic price bounds (rentals: annual rent, sales: sale price)
+    MIN_PRICE, MAX_PRICE = PRICE_BOUNDS['rent' if is_rent else 'buy']
+    
+    if include_price:
+        # Add outlier filtering conditions
+        conditions.append(f"\"{map['price']}\" >= :min_price_param")
+        conditions.append(f"\"{map['price']}\" <= :max_realistic_price")
+        params['min_price_param'] = MIN_PRICE
+        params['max_realistic_price'] = MAX_PRICE
+        
+        # Handle both 'budget' and 'annual_rent' parameter names - FIXED
+        budget_value = filters.get('budget') or filters.get('annual_rent') or filters.get(price_key) or 999999999
+        # Apply user budget filter (but not higher than our outlier threshold)
+        user_max_price = min(int(budget_value), MAX_PRICE)
+        conditions.append(f"\"{map['price']}\" <= :budget_param")
+        params['budget_param'] = user_max_price
 
     prop_type = filters.get('propertyType')
     if prop_type and 'All Types' not in prop_type:
@@ -1715,115 +1716,52 @@ def get_property_valuation():
             'error': f'Valuation failed: {str(e)}'
         }), 500
 
-def predict_price_ml(property_data: dict) -> dict:
+def predict_many(properties: list) -> list:
     """
-    Predict property price using ML model.
+    Predict prices for many properties with one model call.
+    
+    Features are written straight into a NumPy matrix (see ml_inference.py)
+    and scored by the registry's active model; a sampled fraction is also
+    scored by the shadow candidate off the request path (model_registry.py).
+    Rental-context features come from the in-memory feature store
+    (feature_store.py) unless the caller already set them.
     
     Args:
-        property_data: Dictionary containing property features
+        properties: List of dictionaries containing property features
         
     Returns:
-        dict with predicted_price and confidence score
+        List of dicts with predicted_price, confidence, method and model_version, in input order
     """
-    if not USE_ML or ml_model is None:
-        return {'predicted_price': None, 'confidence': 0.0, 'method': 'unavailable'}
+    if not model_registry.enabled:
+        return [{'predicted_price': None, 'confidence': 0.0, 'method': 'unavailable'} for _ in properties]
+    if not properties:
+        return []
     
     try:
-        # Create DataFrame from input
-        df = pd.DataFrame([property_data])
-        
-        # Feature engineering (matching training pipeline)
-        if 'instance_date' in df.columns:
-            df['instance_date'] = pd.to_datetime(df['instance_date'])
-            df['transaction_year'] = df['instance_date'].dt.year
-            df['transaction_month'] = df['instance_date'].dt.month
-            df['transaction_quarter'] = df['instance_date'].dt.quarter
-            df['days_since_2020'] = (df['instance_date'] - pd.Timestamp('2020-01-01')).dt.days
-        else:
-            # Use current date if not provided
-            df['transaction_year'] = datetime.now().year
-            df['transaction_month'] = datetime.now().month
-            df['transaction_quarter'] = (datetime.now().month - 1) // 3 + 1
-            df['days_since_2020'] = (datetime.now() - datetime(2020, 1, 1)).days
-        
-        # Price per square foot
-        if 'actual_area' in df.columns:
-            df['log_area'] = np.log1p(df['actual_area'])
-        
-        # Room features
-        if 'rooms_en' in df.columns:
-            df['room_count'] = df['rooms_en'].str.extract(r'(\d+)').astype(float)
-            df['room_density'] = df['room_count'] / (df['actual_area'] / 1000)
-            df['room_density'] = df['room_density'].fillna(0)
-        else:
-            df['room_count'] = 0
-            df['room_density'] = 0
-        
-        # Binary features
-        for col in ['is_offplan_en', 'is_free_hold_en']:
-            if col in df.columns:
-                df[col] = df[col].map({'Yes': 1, 'No': 0}).fillna(0)
-            else:
-                df[col] = 0
-        
-        # Categorical encoding using trained encoders
-        categorical_cols = [
-            'area_en', 'prop_type_en', 'group_en', 'procedure_en',
-            'rooms_en', 'parking', 'nearest_metro_en', 'nearest_mall_en', 
-            'nearest_landmark_en', 'project_en', 'usage_en', 'prop_sb_type_en'
+        properties = load_context_features(engine).enrich(properties)
+        predictions, confidences, version = model_registry.predict(properties)
+        return [
+            {'predicted_price': float(price), 'confidence': float(confidence), 'method': 'xgboost',
+             'model_version': version}
+            for price, confidence in zip(predictions, confidences)
         ]
-        
-        for col in categorical_cols:
-            if col in df.columns and col in ml_encoders:
-                df[col] = df[col].fillna('Unknown')
-                known_classes = set(ml_encoders[col].classes_)
-                df[f'{col}_encoded'] = df[col].apply(
-                    lambda x: ml_encoders[col].transform([x])[0] if x in known_classes else -1
-                )
-            elif f'{col}_encoded' not in df.columns:
-                df[f'{col}_encoded'] = -1
-        
-        # Interaction features
-        if 'area_en_encoded' in df.columns and 'prop_type_en_encoded' in df.columns:
-            df['area_proptype_interaction'] = df['area_en_encoded'] * df['prop_type_en_encoded']
-        else:
-            df['area_proptype_interaction'] = 0
-        
-        if 'actual_area' in df.columns and 'room_count' in df.columns:
-            df['area_rooms_interaction'] = df['actual_area'] * df['room_count']
-        else:
-            df['area_rooms_interaction'] = 0
-        
-        # Fill missing numeric columns
-        for col in ['total_buyer', 'total_seller', 'procedure_area']:
-            if col not in df.columns:
-                df[col] = 0
-        
-        # Add rental features (set to 0 for now, can be enhanced later)
-        for col in ['median_rent_nearby', 'rental_availability', 'rent_to_price_ratio']:
-            if col not in df.columns:
-                df[col] = 0
-        
-        # Select features in correct order
-        X = df[ml_feature_columns]
-        X = X.fillna(0)  # Handle any remaining NaN values
-        
-        # Make prediction
-        prediction = ml_model.predict(X)[0]
-        
-        # Estimate confidence based on feature completeness
-        feature_completeness = (X != 0).sum().sum() / len(ml_feature_columns)
-        confidence = min(0.95, 0.60 + (feature_completeness * 0.35))  # 60-95% range
-        
-        return {
-            'predicted_price': float(prediction),
-            'confidence': float(confidence),
-            'method': 'xgboost'
-        }
     
     except Exception as e:
         print(f"⚠️ ML prediction failed: {e}")
-        return {'predicted_price': None, 'confidence': 0.0, 'method': 'error'}
+        return [{'predicted_price': None, 'confidence': 0.0, 'method': 'error'} for _ in properties]
+
+
+def predict_price_ml(property_data: dict) -> dict:
+    """
+    Predict property price using ML model.
+    
+    Args:
+        property_data: Dictionary containing property features
+        
+    Returns:
+        dict with predicted_price and confidence score
+    """
+    return predict_many([property_data])[0]
 
 
 def classify_price_segment(price_per_sqm):
@@ -1901,6 +1839,308 @@ def classify_price_segment(price_per_sqm):
         }
 
 
+def resolve_location_premium(area, property_type, bedrooms):
+    """
+    Geospatial location premium for an area, served from the location cache when possible
+    
+    Returns:
+        tuple: (premium percentage, breakdown dict, cache status HIT/MISS/NOT_FOUND/ERROR)
+    """
+    location_premium_pct = 0
+    location_breakdown = {}
+    cache_status = 'DISABLED'
+    
+    try:
+        print(f"📍 [GEO] Checking location premium for {area}...")
+        
+        # Step 1: Check cache first
+        cache_data = get_location_cache(area, property_type, bedrooms)
+        
+        if cache_data['cache_hit']:
+            # Cache hit - use cached premium
+            location_premium_pct = cache_data['premium']
+            location_breakdown = cache_data['breakdown']
+            cache_status = 'HIT'
+            print(f"⚡ [GEO] Cache HIT: {location_premium_pct:+.1f}% premium (hits: {cache_data.get('hits', 0)})")
+        else:
+            # Cache miss - calculate premium
+            premium_data = calculate_location_premium(area)
+            
+            if premium_data:
+                location_premium_pct = premium_data['total_premium']
+                location_breakdown = {
+                    'metro': premium_data['metro_premium'],
+                    'beach': premium_data['beach_premium'],
+                    'mall': premium_data['mall_premium'],
+                    'school': premium_data['school_premium'],
+                    'business': premium_data['business_premium'],
+                    'neighborhood': premium_data['neighborhood_premium']
+                }
+                cache_status = 'MISS'
+                
+                # Store in cache for future requests
+                update_location_cache(area, property_type, bedrooms, premium_data)
+                
+                print(f"💾 [GEO] Cache MISS: Calculated {location_premium_pct:+.1f}% premium, cached for future")
+                print(f"   📊 [GEO] Breakdown: Metro:{premium_data['metro_premium']:+.1f}%, Beach:{premium_data['beach_premium']:+.1f}%, Mall:{premium_data['mall_premium']:+.1f}%")
+            else:
+                # Area not found in geospatial database
+                cache_status = 'NOT_FOUND'
+                print(f"⚠️  [GEO] Area '{area}' not in geospatial database, no premium applied")
+    except Exception as e:
+        print(f"❌ [GEO] Location premium error (non-critical): {e}")
+        # Don't fail valuation if geospatial fails
+        location_premium_pct = 0
+        location_breakdown = {}
+        cache_status = 'ERROR'
+    
+    return location_premium_pct, location_breakdown, cache_status
+
+def build_valuation_filter_conditions(bedrooms: str = None, development_status: str = None, esg_score_min: int = None, flip_score_min: int = None, arbitrage_score_min: int = None) -> str:
+    """
+    Build the optional SQL filter conditions for the comparables query
+    
+    Args:
+        bedrooms: Optional bedroom count filter (Studio, 1-6, or empty for any)
+        development_status: Optional status filter (Ready, Off Plan, or empty for any)
+        esg_score_min: Optional minimum ESG sustainability score (0-100)
+        flip_score_min: Optional minimum Flip investment score (0-100)
+        arbitrage_score_min: Optional minimum Arbitrage value score (0-100)
+    
+    Returns:
+        str: AND-prefixed conditions to splice into the WHERE clause
+    """
+    # Build SQL query with optional bedroom filter
+    bedroom_condition = ""
+    if bedrooms:
+        if bedrooms == "Studio":
+            bedroom_condition = "AND LOWER(rooms_en) LIKE '%studio%'"
+        elif bedrooms == "6":
+            bedroom_condition = "AND (rooms_en ~ '^[6-9]' OR rooms_en ~ '^[1-9][0-9]')"  # 6 or more
+        else:
+            # Match patterns like "1 B/R", "2 B/R", etc.
+            bedroom_condition = f"AND (rooms_en = '{bedrooms}' OR rooms_en LIKE '{bedrooms} %' OR rooms_en LIKE '%{bedrooms} B/R%')"
+    
+    # Build SQL query with optional development status filter
+    status_condition = ""
+    if development_status:
+        status_condition = f"AND is_offplan_en = '{development_status}'"
+    
+    # Build ESG score filter
+    esg_condition = ""
+    if esg_score_min:
+        # Find ESG column using dynamic mapping (follows existing pattern)
+        esg_col = find_column_name(SALES_COLUMNS, ['esg_score', 'sustainability_score', 'esg_rating'])
+        if esg_col:
+            esg_condition = f"AND {esg_col} >= {int(esg_score_min)}"
+            print(f"🌱 [DB] Filtering for ESG score >= {esg_score_min}")
+    
+    flip_condition = ""
+    if flip_score_min:
+        # Find Flip column using dynamic mapping (follows existing pattern)
+        flip_col = find_column_name(SALES_COLUMNS, ['flip_score', 'investment_score', 'flip_rating'])
+        if flip_col:
+            flip_condition = f"AND {flip_col} >= {int(flip_score_min)}"
+            print(f"📈 [DB] Filtering for Flip score >= {flip_score_min}")
+    
+    arbitrage_condition = ""
+    if arbitrage_score_min:
+        # Find Arbitrage column using dynamic mapping (follows existing pattern)
+        arbitrage_col = find_column_name(SALES_COLUMNS, ['arbitrage_score', 'value_score', 'arbitrage_rating'])
+        if arbitrage_col:
+            arbitrage_condition = f"AND {arbitrage_col} >= {int(arbitrage_score_min)}"
+            print(f"💰 [DB] Filtering for Arbitrage score >= {arbitrage_score_min}")
+    
+    return "\n".join(c for c in [bedroom_condition, status_condition, esg_condition, flip_condition, arbitrage_condition] if c)
+
+def build_comparables_query(filter_conditions: str = "", order_by_size: bool = True, limit: int = 500):
+    """
+    Comparable sales query: area matches first, then same type city-wide within the size window
+    
+    Args:
+        filter_conditions: Output of build_valuation_filter_conditions
+        order_by_size: Rank rows by distance to :target_size within each priority tier
+        limit: Maximum rows returned
+    
+    Binds: :area_param, :property_type_param, :size_min, :size_max (and :target_size when ordering by size)
+    """
+    return text(f"""
+    SELECT 
+        area_en as area_name_en,
+        prop_type_en as property_type_en,
+        trans_value as property_total_value,
+        actual_area,
+        instance_date,
+        project_en,
+        rooms_en,
+        is_offplan_en
+    FROM properties 
+    WHERE 
+        trans_value > 0 
+        AND actual_area IS NOT NULL 
+        AND actual_area != ''
+        AND actual_area ~ '^[0-9]+\\.?[0-9]*$'  -- Valid numeric format
+        AND CAST(actual_area AS NUMERIC) > 0 
+        AND area_en IS NOT NULL 
+        AND prop_type_en IS NOT NULL
+        AND trans_value BETWEEN 100000 AND 50000000  -- Reasonable price range
+        AND CAST(actual_area AS NUMERIC) BETWEEN 20 AND 2000  -- Reasonable area range
+        {filter_conditions}
+        AND (
+            LOWER(area_en) LIKE LOWER(:area_param)
+            OR (
+                LOWER(prop_type_en) = LOWER(:property_type_param)
+                AND CAST(actual_area AS NUMERIC) BETWEEN :size_min AND :size_max
+            )
+        )
+    ORDER BY 
+        CASE 
+            WHEN LOWER(area_en) LIKE LOWER(:area_param) 
+            AND LOWER(prop_type_en) = LOWER(:property_type_param) THEN 1
+            WHEN LOWER(area_en) LIKE LOWER(:area_param) THEN 2
+            WHEN LOWER(prop_type_en) = LOWER(:property_type_param) THEN 3
+            ELSE 4
+        END,
+        {"ABS(CAST(actual_area AS NUMERIC) - :target_size)," if order_by_size else ""}
+        instance_date DESC
+    LIMIT {int(limit)}
+    """)
+
+def fetch_neighbour_comparables(engine, area: str, property_type: str, size_min: float, size_max: float,
+                                filter_conditions: str = "", limit: int = 500):
+    """
+    Same-type comparables within the size window from the areas nearest to ``area``
+    
+    Args:
+        engine: SQLAlchemy database engine
+        area: Searched area name
+        property_type: Property type to match
+        size_min, size_max: Size window (sqm)
+        filter_conditions: Output of build_valuation_filter_conditions
+        limit: Maximum rows fetched
+    
+    Returns:
+        (cleaned comparables frame, [(area_name, distance_km), ...]); an empty
+        frame when the area is not geocoded or has no neighbours
+    """
+    area_index = load_area_index(engine)
+    neighbours = area_index.neighbours(area) if area_index is not None else []
+    if not neighbours:
+        return pd.DataFrame(), []
+    
+    query = text(f"""
+    SELECT 
+        area_en as area_name_en,
+        prop_type_en as property_type_en,
+        trans_value as property_total_value,
+        actual_area,
+        instance_date,
+        project_en,
+        rooms_en,
+        is_offplan_en
+    FROM properties 
+    WHERE 
+        LOWER(area_en) IN :neighbour_areas
+        AND LOWER(prop_type_en) = LOWER(:property_type_param)
+        AND trans_value BETWEEN 100000 AND 50000000  -- Reasonable price range
+        AND actual_area IS NOT NULL 
+        AND actual_area != ''
+        AND actual_area ~ '^[0-9]+\\.?[0-9]*$'  -- Valid numeric format
+        AND CAST(actual_area AS NUMERIC) BETWEEN :size_min AND :size_max
+        {filter_conditions}
+    ORDER BY instance_date DESC
+    LIMIT {int(limit)}
+    """).bindparams(bindparam('neighbour_areas', expanding=True))
+    try:
+        with engine.connect() as conn:
+            df = encode_frame(pd.read_sql_query(query, conn, params={
+                'neighbour_areas': [name.lower() for name, _ in neighbours],
+                'property_type_param': property_type,
+                'size_min': size_min,
+                'size_max': size_max,
+            }))
+    except Exception as e:
+        print(f"⚠️ Nearby-area comparables query failed: {e}")
+        return pd.DataFrame(), []
+    if len(df) == 0:
+        return df, neighbours
+    return clean_comparables(df), neighbours
+
+def clean_comparables(df):
+    """
+    Clean a comparables frame: numeric conversion, invalid rows, price per sqm,
+    and removal of price-per-sqm outliers outside the 15th-85th percentile
+    """
+    df = df.dropna(subset=['property_total_value', 'actual_area'])
+    
+    # Convert string columns to numeric
+    df['property_total_value'] = pd.to_numeric(df['property_total_value'], errors='coerce')
+    df['actual_area'] = pd.to_numeric(df['actual_area'], errors='coerce')
+    
+    # Remove rows with invalid numeric conversion
+    df = df.dropna(subset=['property_total_value', 'actual_area'])
+    
+    df = df[df['property_total_value'] > 0]
+    df = df[df['actual_area'] > 0]
+    
+    # Add calculated fields
+    df['price_per_sqm'] = df['property_total_value'] / df['actual_area']
+    
+    # Remove outliers based on price per sqm
+    q1 = df['price_per_sqm'].quantile(0.15)
+    q3 = df['price_per_sqm'].quantile(0.85)
+    return df[(df['price_per_sqm'] >= q1) & (df['price_per_sqm'] <= q3)]
+
+def _text_column(df, column, fallback='N/A'):
+    """Column as object values with missing entries (or a missing column) replaced by ``fallback``"""
+    if column not in df.columns:
+        return pd.Series(fallback, index=df.index, dtype=object)
+    values = df[column].astype(object)
+    return values.where(values.notna() & (values != ''), fallback)
+
+
+def rental_comparables_list(rentals):
+    """
+    Rental comparables for the valuation response, built column-wise.
+    
+    Rows without a numeric annual_amount are skipped; a missing or
+    non-numeric size is reported as 0 with rent_per_sqm 0.
+    """
+    sizes = pd.to_numeric(rentals['actual_area'], errors='coerce').fillna(0.0).astype(float)
+    rents = pd.to_numeric(rentals['annual_amount'], errors='coerce')
+    valid = rents.notna().to_numpy()
+    sizes, rents = sizes[valid], rents[valid].astype('int64')
+    rent_per_sqm = (rents / sizes.where(sizes > 0)).fillna(0).astype('int64')
+    location = _text_column(rentals, 'area_en')[valid]
+    property_type = _text_column(rentals, 'prop_type_en', None)[valid]
+    property_type = property_type.where(property_type.notna(), _text_column(rentals, 'prop_sub_type_en')[valid])
+    project = _text_column(rentals, 'project_en', None)[valid]
+    return frame_records(pd.DataFrame({
+        'project_name': project.where(project.notna(), location),
+        'location': location,
+        'size_sqm': sizes,
+        'annual_rent': rents,
+        'rent_per_sqm': rent_per_sqm,
+        'listing_date': rentals['registration_date'][valid].astype(str) if 'registration_date' in rentals.columns else '',
+        'property_type': property_type,
+    }))
+
+
+def comparables_list(comparables):
+    """Comparable sales for the valuation response, built column-wise (missing numbers -> 0)"""
+    def number(column):
+        return pd.to_numeric(comparables[column], errors='coerce').fillna(0.0).astype(float)
+    
+    return frame_records(pd.DataFrame({
+        'area_name': _text_column(comparables, 'area_name_en'),
+        'property_type': _text_column(comparables, 'property_type_en'),
+        'area_sqm': number('actual_area'),
+        'sold_price': number('property_total_value'),
+        'price_per_sqm': number('price_per_sqm'),
+        'project': _text_column(comparables, 'project_en'),
+        'transaction_date': comparables['instance_date'].astype(str),
+    }))
+
 def calculate_valuation_from_database(property_type: str, area: str, size_sqm: float, engine, bedrooms: str = None, development_status: str = None, floor_level: int = None, view_type: str = None, property_age: int = None, esg_score_min: int = None, flip_score_min: int = None, arbitrage_score_min: int = None) -> dict:
     """
     Production valuation function using the main app's database engine
@@ -1931,93 +2171,10 @@ def calculate_valuation_from_database(property_type: str, area: str, size_sqm: f
         if not engine:
             raise Exception("Database engine not available")
         
-        # Build SQL query with optional bedroom filter
-        bedroom_condition = ""
-        if bedrooms:
-            if bedrooms == "Studio":
-                bedroom_condition = "AND LOWER(rooms_en) LIKE '%studio%'"
-            elif bedrooms == "6":
-                bedroom_condition = "AND (rooms_en ~ '^[6-9]' OR rooms_en ~ '^[1-9][0-9]')"  # 6 or more
-            else:
-                # Match patterns like "1 B/R", "2 B/R", etc.
-                bedroom_condition = f"AND (rooms_en = '{bedrooms}' OR rooms_en LIKE '{bedrooms} %' OR rooms_en LIKE '%{bedrooms} B/R%')"
-        
-        # Build SQL query with optional development status filter
-        status_condition = ""
-        if development_status:
-            status_condition = f"AND is_offplan_en = '{development_status}'"
-        
-        # Build ESG score filter
-        esg_condition = ""
-        if esg_score_min:
-            # Find ESG column using dynamic mapping (follows existing pattern)
-            esg_col = find_column_name(SALES_COLUMNS, ['esg_score', 'sustainability_score', 'esg_rating'])
-            if esg_col:
-                esg_condition = f"AND {esg_col} >= {int(esg_score_min)}"
-                print(f"🌱 [DB] Filtering for ESG score >= {esg_score_min}")
-        
-        flip_condition = ""
-        if flip_score_min:
-            # Find Flip column using dynamic mapping (follows existing pattern)
-            flip_col = find_column_name(SALES_COLUMNS, ['flip_score', 'investment_score', 'flip_rating'])
-            if flip_col:
-                flip_condition = f"AND {flip_col} >= {int(flip_score_min)}"
-                print(f"📈 [DB] Filtering for Flip score >= {flip_score_min}")
-        
-        arbitrage_condition = ""
-        if arbitrage_score_min:
-            # Find Arbitrage column using dynamic mapping (follows existing pattern)
-            arbitrage_col = find_column_name(SALES_COLUMNS, ['arbitrage_score', 'value_score', 'arbitrage_rating'])
-            if arbitrage_col:
-                arbitrage_condition = f"AND {arbitrage_col} >= {int(arbitrage_score_min)}"
-                print(f"💰 [DB] Filtering for Arbitrage score >= {arbitrage_score_min}")
+        filter_conditions = build_valuation_filter_conditions(bedrooms, development_status, esg_score_min, flip_score_min, arbitrage_score_min)
         
         # Enhanced SQL query to get comprehensive comparable properties from database
-        query = text(f"""
-        SELECT 
-            area_en as area_name_en,
-            prop_type_en as property_type_en,
-            trans_value as property_total_value,
-            actual_area,
-            instance_date,
-            project_en,
-            rooms_en,
-            is_offplan_en
-        FROM properties 
-        WHERE 
-            trans_value > 0 
-            AND actual_area IS NOT NULL 
-            AND actual_area != ''
-            AND actual_area ~ '^[0-9]+\\.?[0-9]*$'  -- Valid numeric format
-            AND CAST(actual_area AS NUMERIC) > 0 
-            AND area_en IS NOT NULL 
-            AND prop_type_en IS NOT NULL
-            AND trans_value BETWEEN 100000 AND 50000000  -- Reasonable price range
-            AND CAST(actual_area AS NUMERIC) BETWEEN 20 AND 2000  -- Reasonable area range
-            {bedroom_condition}
-            {status_condition}
-            {esg_condition}
-            {flip_condition}
-            {arbitrage_condition}
-            AND (
-                LOWER(area_en) LIKE LOWER(:area_param)
-                OR (
-                    LOWER(prop_type_en) = LOWER(:property_type_param)
-                    AND CAST(actual_area AS NUMERIC) BETWEEN :size_min AND :size_max
-                )
-            )
-        ORDER BY 
-            CASE 
-                WHEN LOWER(area_en) LIKE LOWER(:area_param) 
-                AND LOWER(prop_type_en) = LOWER(:property_type_param) THEN 1
-                WHEN LOWER(area_en) LIKE LOWER(:area_param) THEN 2
-                WHEN LOWER(prop_type_en) = LOWER(:property_type_param) THEN 3
-                ELSE 4
-            END,
-            ABS(CAST(actual_area AS NUMERIC) - :target_size),
-            instance_date DESC
-        LIMIT 500
-        """)
+        query = build_comparables_query(filter_conditions)
         
         # Parameters for the query
         size_range_factor = 0.3  # ±30%
@@ -2031,7 +2188,7 @@ def calculate_valuation_from_database(property_type: str, area: str, size_sqm: f
         
         # Execute query
         with engine.connect() as conn:
-            df = pd.read_sql_query(query, conn, params=params)
+            df = encode_frame(pd.read_sql_query(query, conn, params=params))
         
         print(f"🔍 [DB] Found {len(df)} properties in database query")
         
@@ -2048,38 +2205,19 @@ def calculate_valuation_from_database(property_type: str, area: str, size_sqm: f
             raise ValueError(error_msg)
         
         # Data cleaning and preparation
-        df = df.dropna(subset=['property_total_value', 'actual_area'])
-        
-        # Convert string columns to numeric
-        df['property_total_value'] = pd.to_numeric(df['property_total_value'], errors='coerce')
-        df['actual_area'] = pd.to_numeric(df['actual_area'], errors='coerce')
-        
-        # Remove rows with invalid numeric conversion
-        df = df.dropna(subset=['property_total_value', 'actual_area'])
-        
-        df = df[df['property_total_value'] > 0]
-        df = df[df['actual_area'] > 0]
-        
-        # Add calculated fields
-        df['price_per_sqm'] = df['property_total_value'] / df['actual_area']
-        
-        # Remove outliers based on price per sqm
-        q1 = df['price_per_sqm'].quantile(0.15)
-        q3 = df['price_per_sqm'].quantile(0.85)
-        df = df[(df['price_per_sqm'] >= q1) & (df['price_per_sqm'] <= q3)]
+        df = clean_comparables(df)
         
         print(f"📊 [DB] After cleaning: {len(df)} properties remain")
         
         if len(df) == 0:
             raise ValueError("No valid comparable properties after data cleaning")
         
-        # Prioritize area + type matches
-        area_matches = df[df['area_name_en'].str.contains(area, case=False, na=False)]
-        type_matches = df[df['property_type_en'].str.lower() == property_type.lower()]
-        area_type_matches = df[
-            (df['area_name_en'].str.contains(area, case=False, na=False)) & 
-            (df['property_type_en'].str.lower() == property_type.lower())
-        ]
+        # Prioritize area + type matches (masks evaluated once per distinct value)
+        area_mask = contains_mask(df['area_name_en'], area)
+        type_mask = equals_mask(df['property_type_en'], property_type)
+        area_matches = df[area_mask]
+        type_matches = df[type_mask]
+        area_type_matches = df[area_mask & type_mask]
         
         # Size filtering for best matches
         size_range = (size_sqm * 0.7, size_sqm * 1.3)
@@ -2088,6 +2226,16 @@ def calculate_valuation_from_database(property_type: str, area: str, size_sqm: f
             (area_type_matches['actual_area'] <= size_range[1])
         ]
         
+        # Sparse area: same type and size in the nearest areas before going city-wide
+        nearby_matches = area_type_size_matches
+        if len(area_matches) < 5:
+            neighbour_matches, neighbours = fetch_neighbour_comparables(
+                engine, area, property_type, params['size_min'], params['size_max'], filter_conditions)
+            nearby_matches = pd.concat([area_type_size_matches, neighbour_matches])
+            if neighbours:
+                print(f"🧭 [DB] {len(neighbour_matches)} comparables in nearest areas: "
+                      f"{', '.join(f'{name} ({km:.1f} km)' for name, km in neighbours)}")
+        
         # Determine which dataset to use for valuation
         if len(area_type_size_matches) >= 5:
             comparables = area_type_size_matches
@@ -2101,6 +2249,10 @@ def calculate_valuation_from_database(property_type: str, area: str, size_sqm: f
             comparables = area_matches
             confidence_base = 85
             search_scope = f"area-wide ({area})"
+        elif len(nearby_matches) >= 5:
+            comparables = nearby_matches
+            confidence_base = 82
+            search_scope = f"nearby areas ({area})"
         elif len(type_matches) >= 5:
             comparables = type_matches
             confidence_base = 80
@@ -2145,8 +2297,9 @@ def calculate_valuation_from_database(property_type: str, area: str, size_sqm: f
         ml_prediction_result = None
         ml_price = None
         final_valuation_method = 'rule_based'
+        ml_enabled = model_registry.enabled  # Read per request: hot swaps reach every worker
         
-        if USE_ML and len(comparables) > 0:
+        if ml_enabled and len(comparables) > 0:
             try:
                 # Prepare property data for ML prediction using first comparable as template
                 sample_prop = comparables.iloc[0]
@@ -2196,7 +2349,7 @@ def calculate_valuation_from_database(property_type: str, area: str, size_sqm: f
                 estimated_value = rule_based_estimate
         else:
             estimated_value = rule_based_estimate
-            if not USE_ML:
+            if not ml_enabled:
                 print(f"ℹ️ [ML] Model not loaded, using rule-based only")
         
         # ================================================================
@@ -2299,25 +2452,7 @@ def calculate_valuation_from_database(property_type: str, area: str, size_sqm: f
                     median_size = filtered_rentals['actual_area'].astype(float).median()
                     
                     # Create rental comparables array for frontend display
-                    rental_comparables = []
-                    for idx, row in filtered_rentals.iterrows():
-                        try:
-                            size_sqm = float(row['actual_area']) if row['actual_area'] else 0
-                            annual_rent = int(row['annual_amount'])
-                            rent_per_sqm = int(annual_rent / size_sqm) if size_sqm > 0 else 0
-                            
-                            rental_comparables.append({
-                                'project_name': row.get('project_en') or row.get('area_en', 'N/A'),
-                                'location': row.get('area_en', 'N/A'),
-                                'size_sqm': size_sqm,
-                                'annual_rent': annual_rent,
-                                'rent_per_sqm': rent_per_sqm,
-                                'listing_date': str(row.get('registration_date', '')),
-                                'property_type': row.get('prop_type_en') or row.get('prop_sub_type_en', 'N/A')
-                            })
-                        except (ValueError, TypeError) as e:
-                            print(f"⚠️ [RENTAL] Skipping row due to conversion error: {e}")
-                            continue
+                    rental_comparables = rental_comparables_list(filtered_rentals)
                     
                     rental_data = {
                         'annual_rent': round(median_annual_rent),
@@ -2381,25 +2516,7 @@ def calculate_valuation_from_database(property_type: str, area: str, size_sqm: f
                     median_city_size = city_rental_df['actual_area'].astype(float).median()
                     
                     # Create rental comparables array for city-wide data
-                    city_rental_comparables = []
-                    for idx, row in city_rental_df.iterrows():
-                        try:
-                            size_sqm = float(row['actual_area']) if row['actual_area'] else 0
-                            annual_rent = int(row['annual_amount'])
-                            rent_per_sqm = int(annual_rent / size_sqm) if size_sqm > 0 else 0
-                            
-                            city_rental_comparables.append({
-                                'project_name': row.get('project_en') or row.get('area_en', 'N/A'),
-                                'location': row.get('area_en', 'N/A'),
-                                'size_sqm': size_sqm,
-                                'annual_rent': annual_rent,
-                                'rent_per_sqm': rent_per_sqm,
-                                'listing_date': str(row.get('registration_date', '')),
-                                'property_type': row.get('prop_type_en') or row.get('prop_sub_type_en', 'N/A')
-                            })
-                        except (ValueError, TypeError) as e:
-                            print(f"⚠️ [RENTAL] Skipping city-wide row due to conversion error: {e}")
-                            continue
+                    city_rental_comparables = rental_comparables_list(city_rental_df)
                     
                     rental_data = {
                         'annual_rent': round(median_city_rent),
@@ -2427,62 +2544,15 @@ def calculate_valuation_from_database(property_type: str, area: str, size_sqm: f
         # GEOSPATIAL LOCATION PREMIUM (NEW)
         # Added: October 6, 2025
         # ================================================================
-        location_premium_pct = 0
-        location_breakdown = {}
-        cache_status = 'DISABLED'
+        location_premium_pct, location_breakdown, cache_status = resolve_location_premium(area, property_type, bedrooms)
         
-        try:
-            print(f"📍 [GEO] Checking location premium for {area}...")
-            
-            # Step 1: Check cache first
-            cache_data = get_location_cache(area, property_type, bedrooms)
-            
-            if cache_data['cache_hit']:
-                # Cache hit - use cached premium
-                location_premium_pct = cache_data['premium']
-                location_breakdown = cache_data['breakdown']
-                cache_status = 'HIT'
-                print(f"⚡ [GEO] Cache HIT: {location_premium_pct:+.1f}% premium (hits: {cache_data.get('hits', 0)})")
-            else:
-                # Cache miss - calculate premium
-                premium_data = calculate_location_premium(area)
-                
-                if premium_data:
-                    location_premium_pct = premium_data['total_premium']
-                    location_breakdown = {
-                        'metro': premium_data['metro_premium'],
-                        'beach': premium_data['beach_premium'],
-                        'mall': premium_data['mall_premium'],
-                        'school': premium_data['school_premium'],
-                        'business': premium_data['business_premium'],
-                        'neighborhood': premium_data['neighborhood_premium']
-                    }
-                    cache_status = 'MISS'
-                    
-                    # Store in cache for future requests
-                    update_location_cache(area, property_type, bedrooms, premium_data)
-                    
-                    print(f"💾 [GEO] Cache MISS: Calculated {location_premium_pct:+.1f}% premium, cached for future")
-                    print(f"   📊 [GEO] Breakdown: Metro:{premium_data['metro_premium']:+.1f}%, Beach:{premium_data['beach_premium']:+.1f}%, Mall:{premium_data['mall_premium']:+.1f}%")
-                else:
-                    # Area not found in geospatial database
-                    cache_status = 'NOT_FOUND'
-                    print(f"⚠️  [GEO] Area '{area}' not in geospatial database, no premium applied")
-            
-            # Apply location premium to estimated value
-            if location_premium_pct != 0:
-                base_value = estimated_value
-                estimated_value = estimated_value * (1 + location_premium_pct / 100)
-                adjustment = estimated_value - base_value
-                print(f"✨ [GEO] Applied {location_premium_pct:+.1f}% location premium: AED {adjustment:+,.0f}")
-                print(f"   💰 [GEO] Base value: AED {base_value:,.0f} → Adjusted value: AED {estimated_value:,.0f}")
-            
-        except Exception as e:
-            print(f"❌ [GEO] Location premium error (non-critical): {e}")
-            # Don't fail valuation if geospatial fails
-            location_premium_pct = 0
-            location_breakdown = {}
-            cache_status = 'ERROR'
+        # Apply location premium to estimated value
+        if location_premium_pct != 0:
+            base_value = estimated_value
+            estimated_value = estimated_value * (1 + location_premium_pct / 100)
+            adjustment = estimated_value - base_value
+            print(f"✨ [GEO] Applied {location_premium_pct:+.1f}% location premium: AED {adjustment:+,.0f}")
+            print(f"   💰 [GEO] Base value: AED {base_value:,.0f} → Adjusted value: AED {estimated_value:,.0f}")
         
         # ================================================================
         # END GEOSPATIAL PREMIUM
@@ -2631,27 +2701,7 @@ def calculate_valuation_from_database(property_type: str, area: str, size_sqm: f
             margin = max(std_dev * 0.12, estimated_value * 0.08)  # At least 8% margin
         
         # Prepare comparable properties for response
-        comparable_list = []
-        for _, comp in comparables.head(10).iterrows():
-            # Safe conversion with NaN handling
-            try:
-                area_sqm = float(comp.get('actual_area', 0)) if pd.notna(comp.get('actual_area')) else 0
-                sold_price = float(comp.get('property_total_value', 0)) if pd.notna(comp.get('property_total_value')) else 0
-                price_per_sqm = float(comp.get('price_per_sqm', 0)) if pd.notna(comp.get('price_per_sqm')) else 0
-                
-                comparable_list.append({
-                    'area_name': comp.get('area_name_en', 'N/A'),
-                    'property_type': comp.get('property_type_en', 'N/A'),
-                    'area_sqm': area_sqm,
-                    'sold_price': sold_price,
-                    'price_per_sqm': price_per_sqm,
-                    'project': comp.get('project_en', 'N/A'),
-                    'transaction_date': str(comp.get('instance_date', 'N/A'))
-                })
-            except (ValueError, TypeError) as e:
-                # Skip comparables with invalid data
-                print(f"⚠️  [DB] Skipping comparable with invalid data: {e}")
-                continue
+        comparable_list = comparables_list(comparables.head(10))
         
         # Calculate price per sqm and classify segment
         price_per_sqm_value = round(estimated_value / size_sqm) if size_sqm > 0 else 0
@@ -2723,13 +2773,14 @@ def calculate_valuation_from_database(property_type: str, area: str, size_sqm: f
                     'price_variance': round(price_variance * 100, 1)
                 },
                 'ml_data': {  # PHASE 4: ML Hybrid Prediction Data
-                    'ml_enabled': USE_ML,
+                    'ml_enabled': ml_enabled,
                     'ml_price': round(ml_price) if ml_price else None,
                     'rule_based_price': round(rule_based_estimate),
                     'final_price': round(estimated_value),
                     'valuation_method': final_valuation_method,
                     'ml_confidence': round(ml_prediction_result['confidence'] * 100, 1) if ml_prediction_result else None,
-                    'ml_model': ml_prediction_result['method'] if ml_prediction_result else None
+                    'ml_model': ml_prediction_result['method'] if ml_prediction_result else None,
+                    'ml_model_version': ml_prediction_result.get('model_version') if ml_prediction_result else None
                 }
             }
         }
@@ -2748,6 +2799,655 @@ def calculate_valuation_from_database(property_type: str, area: str, size_sqm: f
             'valuation': None
         }
 
+# ================================================================
+# BATCH VALUATION (portfolio revaluation)
+# ================================================================
+MAX_BATCH_VALUATIONS = 5000
+BATCH_GROUP_ROW_LIMIT = 3000  # Comparable rows fetched per (area, type, bedrooms, status) group
+BATCH_RENTAL_ROW_LIMIT = 1000  # Rental rows fetched per (area, type)
+BATCH_TIER_SCOPES = {
+    1: "area + type + size ({area})",
+    2: "area + type ({area})",
+    3: "area-wide ({area})",
+    4: "nearby areas ({area})",
+    5: "city-wide ({property_type})",
+    6: "city-wide (mixed)",
+}
+
+
+def _validate_batch_item(item):
+    """Return an error message for an invalid batch entry, or None"""
+    if not isinstance(item, dict):
+        return 'Each property must be an object'
+    for field in ['property_type', 'area', 'size_sqm']:
+        if field not in item or not item[field]:
+            return f'Missing required field: {field}'
+    try:
+        if float(item['size_sqm']) <= 0:
+            return 'size_sqm must be positive'
+    except (TypeError, ValueError):
+        return 'size_sqm must be a number'
+    return None
+
+
+def _batch_group_key(item):
+    """Properties sharing this key share one comparables query"""
+    return (
+        str(item['area']).strip().lower(),
+        str(item['property_type']).strip().lower(),
+        item.get('bedrooms') or None,
+        item.get('development_status') or None,
+        item.get('esg_score_min') or None,
+        item.get('flip_score_min') or None,
+        item.get('arbitrage_score_min') or None,
+    )
+
+
+def _window_bounds(sorted_sizes, sizes):
+    """Start/end offsets of the ±30% size window of each size in a size-sorted array"""
+    return (np.searchsorted(sorted_sizes, sizes * 0.7, side='left'),
+            np.searchsorted(sorted_sizes, sizes * 1.3, side='right'))
+
+
+def _summarize_rentals(rentals, is_city_average):
+    """Rental summary in the shape of the single valuation's rental_data (without the comparables list)"""
+    amounts = rentals['annual_amount']
+    median_annual_rent = amounts.median()
+    median_size = rentals['actual_area'].median()
+    return {
+        'annual_rent': round(float(median_annual_rent)),
+        'count': int(len(rentals)),
+        'price_range': {
+            'low': round(float(amounts.quantile(0.25))),
+            'high': round(float(amounts.quantile(0.75)))
+        },
+        'is_city_average': is_city_average,
+        'median_size': round(float(median_size), 1),
+        'median_rent_per_sqm': round(float(median_annual_rent / median_size)) if median_size > 0 else 0
+    }
+
+
+def _fetch_batch_rentals(engine, area, property_type, size_min, size_max, city_wide=False):
+    """Rental rows for a whole group's size window, newest first"""
+    area_condition = "" if city_wide else 'LOWER("area_en") = LOWER(:area) AND'
+    rental_query = text(f"""
+        SELECT "annual_amount", "actual_area", "registration_date"
+        FROM rentals 
+        WHERE {area_condition} (
+            LOWER("prop_type_en") LIKE LOWER(:property_type)
+            OR LOWER("prop_sub_type_en") LIKE LOWER(:property_type)
+        )
+        AND "annual_amount" > 10000 
+        AND "annual_amount" < 5000000
+        AND "actual_area" IS NOT NULL
+        AND "actual_area" != ''
+        AND "actual_area" ~ '^[0-9]+\\.?[0-9]*$'
+        AND CAST("actual_area" AS NUMERIC) > 0
+        AND CAST("actual_area" AS NUMERIC) BETWEEN :size_min AND :size_max
+        ORDER BY "registration_date" DESC
+        LIMIT {BATCH_RENTAL_ROW_LIMIT}
+    """)
+    rentals = pd.read_sql(rental_query, engine, params={
+        'area': area,
+        'property_type': f'%{property_type}%',
+        'size_min': size_min,
+        'size_max': size_max
+    })
+    rentals['actual_area'] = pd.to_numeric(rentals['actual_area'], errors='coerce')
+    return rentals.dropna(subset=['actual_area'])
+
+
+def _batch_rental_data(engine, area, property_type, sizes, rental_cache):
+    """
+    Rental summary per property, with one area query (and at most one city-wide
+    query) per (area, type). Each property sees the 50 newest area rentals
+    (100 city-wide) within ±30% of its size, as in the single valuation.
+    """
+    key = (area.lower(), property_type.lower())
+    size_min, size_max = sizes.min() * 0.7, sizes.max() * 1.3
+    cached = rental_cache.get(key)
+    if cached is None or cached['size_min'] > size_min or cached['size_max'] < size_max:
+        cached = {'size_min': size_min, 'size_max': size_max, 'city': None,
+                  'area': _fetch_batch_rentals(engine, area, property_type, size_min, size_max)}
+        rental_cache[key] = cached
+    
+    summaries = {}
+    results = []
+    for size in sizes:
+        if size in summaries:
+            results.append(summaries[size])
+            continue
+        rental_data = None
+        area_rentals = cached['area']
+        in_window = area_rentals[area_rentals['actual_area'].between(size * 0.7, size * 1.3)].head(50)
+        if len(in_window) > 0:
+            # Apply outlier filtering (3× IQR method, same as sales)
+            q1 = in_window['annual_amount'].quantile(0.25)
+            q3 = in_window['annual_amount'].quantile(0.75)
+            iqr = q3 - q1
+            filtered = in_window[in_window['annual_amount'].between(q1 - 3 * iqr, q3 + 3 * iqr)]
+            if len(filtered) >= 3:
+                rental_data = _summarize_rentals(filtered, is_city_average=False)
+        
+        if rental_data is None:
+            # Fallback to city-wide average if insufficient area-specific rentals
+            if cached['city'] is None:
+                cached['city'] = _fetch_batch_rentals(engine, area, property_type, cached['size_min'], cached['size_max'], city_wide=True)
+            city_rentals = cached['city']
+            in_window = city_rentals[city_rentals['actual_area'].between(size * 0.7, size * 1.3)].head(100)
+            if len(in_window) >= 10:
+                rental_data = _summarize_rentals(in_window, is_city_average=True)
+        
+        summaries[size] = rental_data
+        results.append(rental_data)
+    return results
+
+
+def _value_batch_group(items, engine, rental_cache, project_cache):
+    """
+    Value properties that share (area, type, bedrooms, status).
+    
+    One comparables query covers the group's combined size window. Each
+    property then selects its fallback tier and comparables from size-sorted
+    arrays; statistics are computed once per distinct comparables set and the
+    estimate, confidence and floor/view/age premiums are applied as arrays.
+    """
+    first = items[0]
+    area = str(first['area']).strip()
+    property_type = str(first['property_type']).strip()
+    bedrooms = first.get('bedrooms')
+    sizes = np.array([float(item['size_sqm']) for item in items])
+    
+    filter_conditions = build_valuation_filter_conditions(
+        bedrooms, first.get('development_status'),
+        first.get('esg_score_min'), first.get('flip_score_min'), first.get('arbitrage_score_min')
+    )
+    query = build_comparables_query(filter_conditions, order_by_size=False, limit=BATCH_GROUP_ROW_LIMIT)
+    with engine.connect() as conn:
+        df = encode_frame(pd.read_sql_query(query, conn, params={
+            'area_param': f'%{area}%',
+            'property_type_param': property_type,
+            'size_min': sizes.min() * 0.7,
+            'size_max': sizes.max() * 1.3,
+        }))
+    print(f"🔍 [BATCH] {len(items)} properties, {len(df)} comparable rows for {property_type} in {area}")
+    if len(df) == 0:
+        raise ValueError(f"No comparable properties found in database for {property_type} in {area}")
+    df = clean_comparables(df).reset_index(drop=True)
+    if len(df) == 0:
+        raise ValueError("No valid comparable properties after data cleaning")
+    
+    # Sparse area: append same-type rows of the nearest areas (one query per group)
+    area_mask = contains_mask(df['area_name_en'], area)
+    nearby_mask = np.zeros(len(df), dtype=bool)
+    if area_mask.sum() < 5:
+        neighbour_rows, _ = fetch_neighbour_comparables(engine, area, property_type, sizes.min() * 0.7,
+                                                        sizes.max() * 1.3, filter_conditions, BATCH_GROUP_ROW_LIMIT)
+        if len(neighbour_rows):
+            df = pd.concat([df, neighbour_rows], ignore_index=True)
+            nearby_mask = np.arange(len(df)) >= len(nearby_mask)
+            area_mask = contains_mask(df['area_name_en'], area) & ~nearby_mask
+    
+    type_mask = equals_mask(df['property_type_en'], property_type)
+    row_sizes = df['actual_area'].to_numpy(dtype=float)
+    prices = df['property_total_value'].to_numpy(dtype=float)
+    prices_per_sqm = df['price_per_sqm'].to_numpy(dtype=float)
+    recent = (pd.to_datetime(df['instance_date'], errors='coerce') >= (datetime.now() - pd.DateOffset(years=2))).to_numpy()
+    
+    # Area + type rows and city-wide same-type rows, each sorted by size
+    area_type_pos = np.flatnonzero(area_mask & type_mask)
+    area_type_pos = area_type_pos[np.argsort(row_sizes[area_type_pos], kind='stable')]
+    city_type_pos = np.flatnonzero(type_mask & ~area_mask & ~nearby_mask)
+    city_type_pos = city_type_pos[np.argsort(row_sizes[city_type_pos], kind='stable')]
+    nearby_pos = np.flatnonzero(nearby_mask)
+    nearby_pos = nearby_pos[np.argsort(row_sizes[nearby_pos], kind='stable')]
+    area_pos = np.flatnonzero(area_mask)
+    lo, hi = _window_bounds(row_sizes[area_type_pos], sizes)
+    nearby_lo, nearby_hi = _window_bounds(row_sizes[nearby_pos], sizes)
+    city_lo, city_hi = _window_bounds(row_sizes[city_type_pos], sizes)
+    
+    # Fallback tiers, same thresholds as the single valuation
+    n_area_type = len(area_type_pos)
+    n_type = n_area_type + (city_hi - city_lo)
+    tiers = np.select(
+        [hi - lo >= 5, np.full(len(sizes), n_area_type >= 5), np.full(len(sizes), len(area_pos) >= 5),
+         (hi - lo) + (nearby_hi - nearby_lo) >= 5, n_type >= 5],
+        [1, 2, 3, 4, 5], default=6
+    )
+    original_pos = np.flatnonzero(~nearby_mask)
+    priority = np.select([area_mask & type_mask, area_mask, type_mask], [1, 2, 3], default=4)[original_pos]
+    
+    def comparables_for(i):
+        tier = tiers[i]
+        if tier == 1:
+            return (1, int(lo[i]), int(hi[i])), area_type_pos[lo[i]:hi[i]]
+        if tier == 2:
+            return (2,), area_type_pos
+        if tier == 3:
+            return (3,), area_pos
+        if tier == 4:
+            return (4, int(lo[i]), int(hi[i]), int(nearby_lo[i]), int(nearby_hi[i])), \
+                np.concatenate([area_type_pos[lo[i]:hi[i]], nearby_pos[nearby_lo[i]:nearby_hi[i]]])
+        if tier == 5:
+            return (5, int(city_lo[i]), int(city_hi[i])), np.concatenate([area_type_pos, city_type_pos[city_lo[i]:city_hi[i]]])
+        # Top 20 by match priority, then closeness in size
+        return (6, float(sizes[i])), original_pos[np.lexsort((np.abs(row_sizes[original_pos] - sizes[i]), priority))[:20]]
+    
+    # Statistics once per distinct comparables set
+    stats_by_key = {}
+    item_stats = []
+    for i in range(len(items)):
+        key, positions = comparables_for(i)
+        if key not in stats_by_key:
+            selected = prices[positions]
+            mean_price = selected.mean()
+            std_price = selected.std(ddof=1) if len(selected) > 1 else np.nan
+            stats_by_key[key] = {
+                'count': len(positions),
+                'median_price': np.median(selected),
+                'median_price_per_sqm': np.median(prices_per_sqm[positions]),
+                'std_price': std_price,
+                'price_variance': std_price / mean_price if mean_price else np.nan,
+                'recent_count': int(recent[positions].sum()),
+                'first_row': int(positions.min()),
+            }
+        item_stats.append(stats_by_key[key])
+    
+    def column(name):
+        return np.array([stats[name] for stats in item_stats], dtype=float)
+    
+    counts = column('count')
+    median_price = column('median_price')
+    median_price_per_sqm = column('median_price_per_sqm')
+    std_price = column('std_price')
+    price_variance = column('price_variance')
+    
+    # Size-based estimate blended with the median market price (70/30)
+    rule_based = 0.7 * median_price + 0.3 * (median_price_per_sqm * sizes)
+    estimated = rule_based.copy()
+    
+    # ML hybrid, weighted by model confidence
+    ml_prices = [None] * len(items)
+    valuation_methods = ['rule_based'] * len(items)
+    ml_enabled = model_registry.enabled
+    if ml_enabled:
+        ml_inputs = []
+        for i, item in enumerate(items):
+            sample_prop = df.iloc[item_stats[i]['first_row']]
+            ml_inputs.append({
+                'actual_area': sizes[i],
+                'area_en': area,
+                'prop_type_en': property_type,
+                'rooms_en': bedrooms if bedrooms else sample_prop.get('rooms_en', ''),
+                'is_offplan_en': item.get('development_status') or sample_prop.get('is_offplan_en', 'No'),
+                'is_free_hold_en': sample_prop.get('is_free_hold_en', 'Yes'),
+                'project_en': sample_prop.get('project_en', ''),
+                'group_en': sample_prop.get('group_en', ''),
+                'procedure_en': sample_prop.get('procedure_en', ''),
+                'parking': sample_prop.get('parking', ''),
+                'nearest_metro_en': sample_prop.get('nearest_metro_en', ''),
+                'nearest_mall_en': sample_prop.get('nearest_mall_en', ''),
+                'nearest_landmark_en': sample_prop.get('nearest_landmark_en', ''),
+                'usage_en': sample_prop.get('usage_en', 'Residential'),
+                'prop_sb_type_en': sample_prop.get('prop_sb_type_en', ''),
+                'procedure_area': sample_prop.get('procedure_area', sizes[i]),
+                'total_buyer': 1,
+                'total_seller': 1
+            })
+        for i, prediction in enumerate(predict_many(ml_inputs)):
+            if prediction['predicted_price']:
+                ml_weight = 0.70 * prediction['confidence']
+                ml_prices[i] = prediction['predicted_price']
+                estimated[i] = ml_weight * ml_prices[i] + (1 - ml_weight) * rule_based[i]
+                valuation_methods[i] = 'hybrid'
+    
+    # Confidence: tier base, data volume, recency and variance adjustments
+    confidence = np.array([95, 90, 85, 82, 80, 75])[tiers - 1].astype(float)
+    confidence += np.select([counts >= 20, counts >= 10], [3, 2], default=0)
+    confidence += np.where(column('recent_count') > counts * 0.7, 3, 0)
+    confidence += np.select([price_variance > 0.25, price_variance < 0.15], [-3, 2], default=0)
+    confidence = np.clip(confidence, 70, 98)
+    
+    # Premiums: location once per group, project per comparable project, floor/view/age vectorized
+    location_premium_pct, _, cache_status = resolve_location_premium(area, property_type, bedrooms)
+    project_names = [df['project_en'].iloc[stats['first_row']] if 'project_en' in df.columns else None for stats in item_stats]
+    project_premiums = []
+    for name in project_names:
+        if name is None or pd.isna(name) or not str(name).strip():
+            project_premiums.append((0.0, None))
+            continue
+        if name not in project_cache:
+            try:
+                project_data = get_project_premium(name)
+                project_cache[name] = (project_data['premium_percentage'], project_data['tier'])
+            except Exception as e:
+                print(f"❌ [BATCH PROJECT] Project premium error (non-critical): {e}")
+                project_cache[name] = (0.0, None)
+        project_premiums.append(project_cache[name])
+    project_pct = np.array([pct for pct, _ in project_premiums], dtype=float)
+    project_pct = np.where(project_pct > 0, project_pct, 0.0)
+    
+    floor_levels = [item.get('floor_level') for item in items]
+    view_types = [item.get('view_type') for item in items]
+    property_ages = [item.get('property_age') for item in items]
+    floor_pct = floor_premium_array(floor_levels, [property_type] * len(items))
+    view_by_type = {view: calculate_view_premium(view, area) for view in set(view_types) if view}
+    view_pct = np.array([view_by_type.get(view, 0.0) if view else 0.0 for view in view_types])
+    age_pct = age_premium_array(property_ages, [property_type] * len(items))
+    
+    estimated = (estimated * (1 + location_premium_pct / 100) * (1 + project_pct / 100)
+                 * (1 + floor_pct / 100) * (1 + view_pct / 100) * (1 + age_pct / 100))
+    
+    # Value range after all adjustments
+    margin = np.where(np.isnan(std_price) | (std_price == 0), estimated * 0.15,
+                      np.maximum(np.nan_to_num(std_price) * 0.12, estimated * 0.08))
+    
+    rental_data = _batch_rental_data(engine, area, property_type, sizes, rental_cache)
+    
+    results = []
+    for i in range(len(items)):
+        if np.isnan(estimated[i]) or np.isnan(margin[i]):
+            results.append({'success': False, 'error': 'Invalid valuation calculated from comparables'})
+            continue
+        price_per_sqm_value = round(float(estimated[i] / sizes[i]))
+        combined = location_premium_pct + project_pct[i] + floor_pct[i] + view_pct[i] + age_pct[i]
+        results.append({
+            'success': True,
+            'valuation': {
+                'estimated_value': round(float(estimated[i])),
+                'confidence_score': round(float(confidence[i]), 1),
+                'price_per_sqm': price_per_sqm_value,
+                'segment': classify_price_segment(price_per_sqm_value),
+                'value_range': {
+                    'low': round(float(estimated[i] - margin[i])),
+                    'high': round(float(estimated[i] + margin[i]))
+                },
+                'rental_data': rental_data[i],
+                'location_premium': {
+                    'total_premium_pct': round(float(location_premium_pct), 2),
+                    'cache_status': cache_status,
+                    'applied': location_premium_pct != 0
+                },
+                'project_premium': {
+                    'premium_pct': round(float(project_pct[i]), 2),
+                    'tier': project_premiums[i][1],
+                    'project_name': None if project_names[i] is None or pd.isna(project_names[i]) else str(project_names[i]),
+                    'applied': bool(project_pct[i] > 0)
+                },
+                'floor_premium': {'percentage': round(float(floor_pct[i]), 2), 'floor_level': floor_levels[i], 'applicable': bool(floor_pct[i] != 0)},
+                'view_premium': {'percentage': round(float(view_pct[i]), 2), 'view_type': view_types[i], 'applicable': bool(view_pct[i] != 0)},
+                'age_premium': {'percentage': round(float(age_pct[i]), 2), 'property_age': property_ages[i], 'applicable': bool(age_pct[i] != 0)},
+                'combined_premium': round(float(combined), 2),
+                'total_comparables_found': int(counts[i]),
+                'search_scope': BATCH_TIER_SCOPES[int(tiers[i])].format(area=area, property_type=property_type),
+                'market_data': {
+                    'median_price_per_sqm': round(float(median_price_per_sqm[i])),
+                    'price_variance': None if np.isnan(price_variance[i]) else round(float(price_variance[i]) * 100, 1)
+                },
+                'ml_data': {
+                    'ml_enabled': ml_enabled,
+                    'ml_price': round(ml_prices[i]) if ml_prices[i] else None,
+                    'rule_based_price': round(float(rule_based[i])),
+                    'final_price': round(float(estimated[i])),
+                    'valuation_method': valuation_methods[i]
+                }
+            }
+        })
+    return results
+
+
+def calculate_batch_valuations(properties: list, engine) -> list:
+    """
+    Value a list of properties, sharing database work across similar ones.
+    
+    Properties are grouped by (area, type, bedrooms, status, score filters);
+    each group costs one comparables query, and rental queries are shared per
+    (area, type). Results come back in input order; invalid entries and
+    groups without comparables get per-item errors.
+    
+    Args:
+        properties: List of dicts with the single valuation's fields
+                    (property_type, area, size_sqm, optional bedrooms,
+                    development_status, floor_level, view_type, property_age)
+        engine: SQLAlchemy database engine
+    
+    Returns:
+        list: One {'index', 'success', 'valuation' | 'error'} dict per input
+    """
+    results = [None] * len(properties)
+    groups = {}
+    for i, item in enumerate(properties):
+        error = _validate_batch_item(item)
+        if error:
+            results[i] = {'index': i, 'success': False, 'error': error}
+        else:
+            groups.setdefault(_batch_group_key(item), []).append(i)
+    
+    print(f"📦 [BATCH] Valuing {len(properties)} properties in {len(groups)} groups")
+    rental_cache = {}
+    project_cache = {}
+    for indices in groups.values():
+        try:
+            group_results = _value_batch_group([properties[i] for i in indices], engine, rental_cache, project_cache)
+        except Exception as e:
+            print(f"❌ [BATCH] Group valuation failed: {e}")
+            group_results = [{'success': False, 'error': str(e)} for _ in indices]
+        for i, result in zip(indices, group_results):
+            results[i] = {'index': i, **result}
+    return results
+
+
+@app.route('/api/admin/models', methods=['GET'])
+@admin_required
+def get_model_registry_status():
+    """Active/shadow model versions with shadow latency and prediction deltas"""
+    return jsonify(model_registry.status())
+
+
+@app.route('/api/admin/models/reload', methods=['POST'])
+@admin_required
+def reload_models():
+    """
+    Re-read models/registry/manifest.json and swap models in this worker.
+    
+    Other workers pick manifest changes up within MODEL_REGISTRY_CHECK_INTERVAL seconds.
+    """
+    result = model_registry.reload()
+    return jsonify(result), (200 if result['success'] else 500)
+
+
+@app.route('/api/admin/models/promote', methods=['POST'])
+@admin_required
+def promote_model():
+    """Make {"version": ...} the active model version"""
+    version = (request.get_json(silent=True) or {}).get('version')
+    if not version:
+        return jsonify({'success': False, 'error': 'version is required'}), 400
+    try:
+        result = model_registry.promote(version)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return jsonify(result), (200 if result['success'] else 500)
+
+
+@app.route('/api/property/valuation/batch', methods=['POST'])
+@login_required
+def get_property_valuation_batch():
+    """
+    Batch valuation API for portfolios
+    Accepts {"properties": [...]} with the same fields as /api/property/valuation
+    """
+    try:
+        data = request.json
+        properties = data.get('properties') if isinstance(data, dict) else None
+        if not isinstance(properties, list) or not properties:
+            return jsonify({'success': False, 'error': 'Provide a non-empty "properties" list'}), 400
+        if len(properties) > MAX_BATCH_VALUATIONS:
+            return jsonify({'success': False, 'error': f'At most {MAX_BATCH_VALUATIONS} properties per batch'}), 400
+        if not engine:
+            return jsonify({'success': False, 'error': 'Database engine not available'}), 500
+        
+        start_time = time.time()
+        results = calculate_batch_valuations(properties, engine)
+        succeeded = sum(1 for result in results if result['success'])
+        print(f"✅ [BATCH] {succeeded}/{len(results)} valued in {time.time() - start_time:.2f}s")
+        
+        return jsonify({
+            'success': True,
+            'results': results,
+            'summary': {
+                'total': len(results),
+                'succeeded': succeeded,
+                'failed': len(results) - succeeded
+            }
+        })
+    except Exception as e:
+        import traceback
+        logging.error(f"❌ [BATCH VALUATION] Exception: {str(e)}\n{traceback.format_exc()}")
+        return jsonify({'success': False, 'error': f'Batch valuation failed: {str(e)}'}), 500
+
+# Streaming portfolio upload: CSV in, CSV/NDJSON out, constant memory
+BATCH_STREAM_CHUNK_ROWS = 500
+# Upload column -> batch valuation field
+BATCH_CSV_FIELDS = {
+    'property_type': 'property_type',
+    'area': 'area',
+    'size_sqm': 'size_sqm',
+    'bedrooms': 'bedrooms',
+    'development_status': 'development_status',
+    'floor': 'floor_level',
+    'floor_level': 'floor_level',
+    'view': 'view_type',
+    'view_type': 'view_type',
+    'age': 'property_age',
+    'property_age': 'property_age',
+}
+BATCH_CSV_OUTPUT_COLUMNS = [
+    'row', 'property_type', 'area', 'size_sqm', 'success', 'estimated_value',
+    'value_low', 'value_high', 'confidence_score', 'price_per_sqm', 'search_scope',
+    'combined_premium', 'annual_rent', 'error'
+]
+
+
+def _csv_row_to_property(row):
+    """Map an uploaded CSV row to a batch valuation entry (blank cells dropped)"""
+    item = {}
+    for column, value in row.items():
+        field = BATCH_CSV_FIELDS.get((column or '').strip().lower())
+        if field and value is not None and str(value).strip() != '':
+            item[field] = str(value).strip()
+    return item
+
+
+def iter_batch_csv_chunks(text_stream, chunk_rows=BATCH_STREAM_CHUNK_ROWS):
+    """Yield lists of batch valuation entries parsed incrementally from a CSV text stream"""
+    import csv
+    chunk = []
+    for row in csv.DictReader(text_stream):
+        chunk.append(_csv_row_to_property(row))
+        if len(chunk) >= chunk_rows:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _batch_result_csv_row(row_number, item, result):
+    """Flatten one batch result into the download's CSV columns"""
+    valuation = result.get('valuation') or {}
+    rental = valuation.get('rental_data') or {}
+    return {
+        'row': row_number,
+        'property_type': item.get('property_type', '') if isinstance(item, dict) else '',
+        'area': item.get('area', '') if isinstance(item, dict) else '',
+        'size_sqm': item.get('size_sqm', '') if isinstance(item, dict) else '',
+        'success': result['success'],
+        'estimated_value': valuation.get('estimated_value', ''),
+        'value_low': valuation.get('value_range', {}).get('low', ''),
+        'value_high': valuation.get('value_range', {}).get('high', ''),
+        'confidence_score': valuation.get('confidence_score', ''),
+        'price_per_sqm': valuation.get('price_per_sqm', ''),
+        'search_scope': valuation.get('search_scope', ''),
+        'combined_premium': valuation.get('combined_premium', ''),
+        'annual_rent': rental.get('annual_rent', ''),
+        'error': result.get('error', ''),
+    }
+
+
+def stream_batch_valuations(chunks, engine, output_format='csv'):
+    """
+    Value chunks of properties and yield the encoded results as they complete.
+    
+    Only one chunk is held at a time, so memory stays flat however large the
+    upload is, and the first rows go out as soon as the first chunk is valued.
+    
+    Args:
+        chunks: Iterable of lists of batch valuation entries
+        engine: SQLAlchemy database engine
+        output_format: 'csv' or 'ndjson'
+    """
+    import io
+    import csv
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=BATCH_CSV_OUTPUT_COLUMNS)
+    if output_format == 'csv':
+        writer.writeheader()
+        yield buffer.getvalue()
+    
+    row_offset = 0
+    for chunk in chunks:
+        results = calculate_batch_valuations(chunk, engine)
+        buffer.seek(0)
+        buffer.truncate()
+        for item, result in zip(chunk, results):
+            row_number = row_offset + result.pop('index') + 1
+            if output_format == 'ndjson':
+                buffer.write(dumps_json({'row': row_number, **result}) + '\n')
+            else:
+                writer.writerow(_batch_result_csv_row(row_number, item, result))
+        row_offset += len(chunk)
+        yield buffer.getvalue()
+
+
+@app.route('/api/property/valuation/batch/csv', methods=['POST'])
+@login_required
+def stream_portfolio_valuation():
+    """
+    Streaming portfolio valuation
+    Upload a CSV (raw body or multipart field "file") with property_type, area,
+    size_sqm and optional bedrooms, floor, view, age columns; results stream
+    back as CSV (default) or NDJSON (?format=ndjson) while the upload is read.
+    """
+    import io
+    if not engine:
+        return jsonify({'success': False, 'error': 'Database engine not available'}), 500
+    output_format = request.args.get('format', 'csv').lower()
+    if output_format not in ('csv', 'ndjson'):
+        return jsonify({'success': False, 'error': 'format must be csv or ndjson'}), 400
+    
+    if 'file' in request.files:
+        # Multipart uploads are parsed before the view runs and closed when the
+        # request ends, so hand the streaming body its own spooled copy
+        import shutil
+        import tempfile
+        upload = tempfile.TemporaryFile()
+        shutil.copyfileobj(request.files['file'].stream, upload)
+        upload.seek(0)
+    else:
+        # Raw bodies are read from the socket as rows are valued
+        upload = request.stream
+    text_stream = io.TextIOWrapper(upload, encoding='utf-8-sig', newline='')
+    
+    chunks = iter_batch_csv_chunks(text_stream)
+    body = stream_batch_valuations(chunks, engine, output_format)
+    if output_format == 'ndjson':
+        return Response(stream_with_context(body), mimetype='application/x-ndjson')
+    return Response(
+        stream_with_context(body),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename=portfolio-valuation-{datetime.now():%Y%m%d-%H%M%S}.csv'}
+    )
+
 @app.route('/api/export-premium-csv', methods=['POST'])
 def export_premium_csv():
     """
@@ -2803,6 +3503,108 @@ def export_premium_csv():
         return jsonify({'error': str(e)}), 500
 
 # --- BUY TAB ENDPOINTS ---
+# --- NDJSON search streaming ---
+SEARCH_STREAM_BATCH_ROWS = 100   # Rows fetched from the server-side cursor per round trip
+SEARCH_SUMMARY_SAMPLE_ROWS = 100  # Full rows kept for the AI summary's data sample
+
+
+def _search_summary_columns(search_type):
+    """Columns the AI summary / AVM metrics read beyond the data sample"""
+    if search_type == 'buy':
+        return [SALES_MAP['price'], SALES_MAP['area_name'], SALES_MAP['name']]
+    return ['trans_value', RENTALS_MAP['price'], RENTALS_MAP['area_name']]
+
+
+def stream_search_results(engine, count_query, display_query, params, filters, search_type,
+                          batch_rows=SEARCH_STREAM_BATCH_ROWS):
+    """
+    Stream search results as NDJSON records straight from a server-side cursor.
+    
+    Records, one JSON object per line:
+        {"type": "meta", "total_results": N}
+        {"type": "row", "data": {...}}              (one per result row, as fetched)
+        {"type": "aggregates", "returned": n, ...}  (price stats over the streamed rows)
+        {"type": "summary", "summary": "..."}       (AI summary, once generated)
+        {"type": "end"}
+    
+    Rows are not materialized: only the first SEARCH_SUMMARY_SAMPLE_ROWS full
+    rows and the price/area/project columns of the rest are kept for the
+    trailing summary.
+    
+    Args:
+        engine: SQLAlchemy engine (connected on the first record, closed when the stream finishes)
+        count_query: COUNT(*) query for total_results
+        display_query: Result rows query
+        params: Bound parameters for both queries
+        filters: Search filters (passed to generate_ai_summary)
+        search_type: 'buy' or 'rent'
+        batch_rows: Rows per fetchmany() call
+    """
+    conn = None
+    try:
+        try:
+            conn = engine.connect()
+            total_results = conn.execute(count_query, params).scalar_one()
+        except Exception as e:
+            print(f"❌ {search_type.upper()} SEARCH STREAM FAILED: {e}")
+            yield dumps_json({'type': 'error', 'error': 'Search failed'}) + '\n'
+            return
+        yield dumps_json({'type': 'meta', 'total_results': total_results}) + '\n'
+        
+        summary_columns = _search_summary_columns(search_type)
+        sample_rows, summary_rows, columns = [], [], []
+        returned = 0
+        try:
+            result = conn.execution_options(stream_results=True).execute(display_query, params)
+            columns = list(result.keys())
+            kept = [c for c in summary_columns if c in columns]
+            while True:
+                batch = result.mappings().fetchmany(batch_rows)
+                if not batch:
+                    break
+                lines = []
+                for row in batch:
+                    row = dict(row)
+                    if returned < SEARCH_SUMMARY_SAMPLE_ROWS:
+                        sample_rows.append(row)
+                    else:
+                        summary_rows.append({c: row[c] for c in kept})
+                    returned += 1
+                    lines.append(dumps_json({'type': 'row', 'data': row}))
+                yield '\n'.join(lines) + '\n'
+        except Exception as e:
+            print(f"❌ {search_type.upper()} SEARCH STREAM FAILED after {returned} rows: {e}")
+            yield dumps_json({'type': 'error', 'error': 'Search failed', 'returned': returned}) + '\n'
+    finally:
+        if conn is not None:
+            conn.close()
+    
+    # Summary frame: full sample rows first (head(100) feeds the prompt), then
+    # only the columns the AVM metrics read for the remaining rows
+    results_df = pd.DataFrame(sample_rows + summary_rows, columns=columns or None)
+    price_col = 'trans_value' if search_type == 'rent' and 'trans_value' in results_df.columns else (
+        SALES_MAP['price'] if search_type == 'buy' else RENTALS_MAP['price'])
+    aggregates = {'type': 'aggregates', 'total_results': total_results, 'returned': returned}
+    if price_col in results_df.columns:
+        prices = pd.to_numeric(results_df[price_col], errors='coerce').dropna()
+        if len(prices):
+            aggregates.update({
+                'median_price': float(prices.median()),
+                'min_price': float(prices.min()),
+                'max_price': float(prices.max()),
+            })
+    yield dumps_json(aggregates) + '\n'
+    
+    ai_summary = generate_ai_summary(filters, results_df, total_results, search_type)
+    yield dumps_json({'type': 'summary', 'summary': ai_summary}) + '\n'
+    yield dumps_json({'type': 'end'}) + '\n'
+
+
+def search_stream_response(count_query, display_query, params, filters, search_type):
+    """NDJSON streaming Response for search_buy / search_rent (?format=ndjson)"""
+    body = stream_search_results(engine, count_query, display_query, params, filters, search_type)
+    return Response(stream_with_context(body), mimetype='application/x-ndjson')
+
 @app.route('/search', methods=['POST'])
 @login_required
 def search_buy():
@@ -2813,13 +3615,14 @@ def search_buy():
     count_query = text(f"SELECT COUNT(*) FROM properties WHERE {where_clause};")
     display_query = text(f"SELECT * FROM properties WHERE {where_clause} ORDER BY instance_date DESC LIMIT 500;")
     
+    if request.args.get('format') == 'ndjson':
+        return search_stream_response(count_query, display_query, params, data, 'buy')
+    
     with engine.connect() as conn:
         try:
             total_results = conn.execute(count_query, params).scalar_one()
             results_df = pd.read_sql_query(display_query, conn, params=params)
-            # Replace NaN with None for valid JSON serialization
-            results_df = results_df.replace({np.nan: None})
-            display_results_list = results_df.to_dict(orient='records')
+            display_results_list = frame_records(results_df)
         except Exception as e:
             print(f"❌ BUY SEARCH FAILED: {e}")
             total_results, results_df, display_results_list = 0, pd.DataFrame(), []
@@ -2872,12 +3675,23 @@ def get_avm_analytics():
     data = request.json
     search_type = 'buy'  # Default to buy, can be extended for rent
     
+    # Whole-market metrics from the precomputed segment sketches (built in the background)
+    sketches = load_segment_sketches(engine, search_type, SALES_MAP)
+    if sketches is not None:
+        try:
+            avm_data = avm_metrics_from_sketches(sketches, search_type, data, OUTLIER_PRICE_THRESHOLDS[search_type])
+        except Exception as e:
+            print(f"❌ AVM SKETCH METRICS FAILED: {e}")
+            avm_data = None
+        return jsonify({'avm_data': avm_data})
+    
+    # Fallback: summarize the latest 1000 matching rows
     where_clause, params = build_where_clause(data, SALES_MAP, 'budget')
     display_query = text(f"SELECT * FROM properties WHERE {where_clause} ORDER BY instance_date DESC LIMIT 1000;")
     
     with engine.connect() as conn:
         try:
-            results_df = pd.read_sql_query(display_query, conn, params=params)
+            results_df = encode_frame(pd.read_sql_query(display_query, conn, params=params))
             avm_data = calculate_avm_metrics(results_df, search_type, data)
             return jsonify({'avm_data': avm_data})
         except Exception as e:
@@ -2897,15 +3711,18 @@ def get_price_timeline():
     try:
         data = request.json
         search_type = data.get('search_type', 'buy')  # buy or rent
-        time_period = data.get('time_period', '6M')   # 3M, 6M, 1Y
+        time_period = data.get('time_period', '6M')   # 3M, 6M, 1Y, 3Y, 5Y, MAX
+        granularity = data.get('granularity', 'month')  # month or quarter (chart downsampling)
         
         print(f"🔍 TRENDS REQUEST: {search_type}, {time_period}, filters: {data}")
         
         # Pass all filter parameters to get_price_trends
         timeline_data = get_price_trends(data, search_type, time_period)
         
-        # Calculate trend summary
+        # Calculate trend summary (always on monthly points)
         trend_summary = calculate_basic_trends(timeline_data)
+        if granularity == 'quarter':
+            timeline_data = downsample_quarterly(timeline_data)
         
         print(f"🔍 TRENDS RESPONSE: {len(timeline_data)} data points, trend: {trend_summary.get('trend_direction', 'unknown')}")
         
@@ -2927,6 +3744,38 @@ def get_price_timeline():
             'status': 'error'
         })
 
+@app.route('/api/trends/compare', methods=['POST'])
+@login_required
+def compare_price_trends():
+    """
+    Aligned monthly series and trend summaries for several areas/segments
+    
+    Body: {"series": ["Dubai Marina", "JVC"], "group_by": "area", "search_type": "buy",
+           "time_period": "1Y", ...same filters as /api/trends/price-timeline}
+    """
+    if not engine:
+        return jsonify({'months': [], 'series': [], 'status': 'error', 'error': 'Database not configured'}), 503
+    
+    data = request.json or {}
+    series_keys = list(dict.fromkeys(k for k in data.get('series') or [] if k))
+    group_by = data.get('group_by', 'area')
+    search_type = data.get('search_type', 'buy')
+    if not series_keys or len(series_keys) > MAX_COMPARE_SERIES:
+        return jsonify({'status': 'error', 'error': f'Provide 1-{MAX_COMPARE_SERIES} series'}), 400
+    if group_by not in TREND_GROUP_COLUMNS:
+        return jsonify({'status': 'error', 'error': f'group_by must be one of {list(TREND_GROUP_COLUMNS)}'}), 400
+    
+    try:
+        rows = get_trend_series(data, search_type, series_keys, group_by, data.get('time_period', '6M'))
+        comparison = build_trend_comparison(rows, series_keys)
+        print(f"🔍 TRENDS COMPARE: {len(series_keys)} {group_by} series, {len(comparison['months'])} months from {len(rows)} rows")
+        return jsonify({**comparison, 'group_by': group_by, 'status': 'success'})
+    except ValueError as e:
+        return jsonify({'status': 'error', 'error': str(e)}), 400
+    except Exception as e:
+        print(f"❌ TRENDS COMPARE FAILED: {e}")
+        return jsonify({'months': [], 'series': [], 'status': 'error', 'error': str(e)}), 500
+
 # --- RENT TAB ENDPOINTS ---
 @app.route('/rent-search', methods=['POST'])
 @login_required
@@ -2941,6 +3790,9 @@ def search_rent():
     count_query = text(f"SELECT COUNT(*) FROM rentals WHERE {where_clause};")
     display_query = text(f"SELECT *, {RENTALS_MAP['price']} as trans_value FROM rentals WHERE {where_clause} ORDER BY registration_date DESC LIMIT 500;")
     
+    if request.args.get('format') == 'ndjson':
+        return search_stream_response(count_query, display_query, params, data, 'rent')
+    
     # Retry logic for database connection
     max_retries = 3
     retry_count = 0
@@ -2953,9 +3805,7 @@ def search_rent():
             try:
                 total_results = conn.execute(count_query, params).scalar_one()
                 results_df = pd.read_sql_query(display_query, conn, params=params)
-                # Replace NaN with None for valid JSON serialization
-                results_df = results_df.replace({np.nan: None})
-                display_results_list = results_df.to_dict(orient='records')
+                display_results_list = frame_records(results_df)
                 print(f"🔍 RENT RESULTS: {total_results} records found")
                 conn.close()
                 break
@@ -3066,6 +3916,17 @@ def get_rent_avm_analytics():
     data = request.json
     search_type = 'rent'
     
+    # Whole-market metrics from the precomputed segment sketches (built in the background)
+    sketches = load_segment_sketches(engine, search_type, RENTALS_MAP)
+    if sketches is not None:
+        try:
+            avm_data = avm_metrics_from_sketches(sketches, search_type, data, OUTLIER_PRICE_THRESHOLDS[search_type])
+        except Exception as e:
+            print(f"❌ RENT AVM SKETCH METRICS FAILED: {e}")
+            avm_data = None
+        return jsonify({'avm_data': avm_data})
+    
+    # Fallback: summarize the latest 1000 matching rows
     where_clause, params = build_where_clause(data, RENTALS_MAP, 'annual_rent', is_rent=True)
     display_query = text(f"SELECT *, {RENTALS_MAP['price']} as trans_value FROM rentals WHERE {where_clause} ORDER BY registration_date DESC LIMIT 1000;")
     
@@ -3076,7 +3937,7 @@ def get_rent_avm_analytics():
         try:
             conn = engine.connect()
             try:
-                results_df = pd.read_sql_query(display_query, conn, params=params)
+                results_df = encode_frame(pd.read_sql_query(display_query, conn, params=params))
                 avm_data = calculate_avm_metrics(results_df, search_type, data)
                 conn.close()
                 return jsonify({'avm_data': avm_data})
@@ -3152,57 +4013,110 @@ def get_areas(search_type):
 @app.route('/api/top-areas', methods=['POST'])
 @login_required
 def get_top_areas():
-    """Get top performing areas by transaction volume - Basic Implementation"""
-    if not engine: 
-        return jsonify({'top_areas': [], 'error': 'Database not available'})
+    """
+    Get top performing areas by transaction volume, price per sqm or growth
     
+    Served from the Redis leaderboards (leaderboards.py) when they are built;
+    otherwise ranks areas from the monthly rollup (raw table scan if it is
+    unavailable). Optional property_type / bedrooms filters rank areas within a
+    segment, and market share is relative to the same period and segment.
+    """
     data = request.json
     search_type = data.get('search_type', 'buy')  # 'buy' or 'rent'
-    time_period = data.get('time_period', '6M')  # '3M', '6M', '1Y'
+    time_period = data.get('time_period', '6M')  # '3M', '6M', '1Y', '3Y', '5Y', 'MAX'
+    metric = data.get('metric', 'volume')  # 'volume', 'price_per_sqm', 'growth'
     limit = data.get('limit', 10)  # Number of top areas to return
+    segment_filters = {
+        'propertyType': data.get('property_type') or data.get('propertyType'),
+        'bedrooms': data.get('bedrooms'),
+    }
+    if metric not in leaderboards.LEADERBOARD_METRICS:
+        return jsonify({'top_areas': [], 'error': f'Unknown metric: {metric}'}), 400
+    
+    # Leaderboard fast path: one ZREVRANGE + HMGET instead of an aggregate query
+    if REDIS_ENABLED and redis_client is not None and time_period in PERIOD_MONTHS:
+        try:
+            segment = leaderboards.segment_key(segment_filters['propertyType'], segment_filters['bedrooms'])
+            top_areas = leaderboards.top_areas(redis_client, search_type, time_period, metric, segment, int(limit))
+            if top_areas is not None:
+                print(f"⚡ TOP AREAS FROM LEADERBOARD: {len(top_areas)} areas for {search_type} ({time_period}, {metric})")
+                return jsonify({
+                    'top_areas': top_areas,
+                    'search_type': search_type,
+                    'time_period': time_period,
+                    'metric': metric,
+                    'total_areas': len(top_areas)
+                })
+        except Exception as e:
+            print(f"⚠️ Leaderboard read failed, falling back to SQL: {e}")
+    
+    if not engine: 
+        return jsonify({'top_areas': [], 'error': 'Database not available'})
+    if metric not in TOP_AREA_ORDER:
+        return jsonify({'top_areas': [], 'error': f'{metric} ranking is only available from the leaderboards'}), 503
     
     # Convert time period to months
-    period_months = {'3M': 3, '6M': 6, '1Y': 12}.get(time_period, 6)
+    period_months = TREND_PERIOD_MONTHS.get(time_period, 6)
     
     # Determine table and columns based on search type
     if search_type == 'buy':
         table = 'properties'
-        area_col = SALES_MAP['area_name']
-        price_col = SALES_MAP['price']
+        map_config = SALES_MAP
         date_col = 'instance_date'
     else:
         table = 'rentals' 
-        area_col = RENTALS_MAP['area_name']
-        price_col = RENTALS_MAP['price']
+        map_config = RENTALS_MAP
         date_col = 'registration_date'
-    
-    # Enhanced query to include price per sqm calculation
-    query = text(f"""
+    area_col = map_config['area_name']
+    price_col = map_config['price']
+    
+    segment_clause, params = build_where_clause(segment_filters, map_config, 'budget',
+                                                is_rent=(search_type == 'rent'), include_price=False)
+    params.update({'limit_param': limit, 'min_transactions': 5})
+    
+    # Raw fallback: one scan of the window (same price bounds and month-aligned start as the rollup),
+    # actual_area cast once per row
+    min_price, max_price = PRICE_BOUNDS[search_type]
+    date_window = (f"AND CAST(\"{date_col}\" AS DATE) >= {rollup_window_start(period_months)}"
+                   if period_months is not None else "")
+    raw_query = text(f"""
+        WITH windowed AS (
+            SELECT 
+                "{area_col}" as area_name,
+                "{price_col}" as price,
+                CAST(NULLIF("actual_area", '') AS FLOAT) as size
+            FROM {table}
+            WHERE "{area_col}" IS NOT NULL 
+            AND "{area_col}" != ''
+            AND "{price_col}" >= {min_price} AND "{price_col}" <= {max_price}
+            AND {segment_clause or 'TRUE'}
+            {date_window}
+        ), per_area AS (
+            SELECT 
+                area_name,
+                COUNT(*) as transaction_count,
+                AVG(price) as avg_price,
+                AVG(CASE WHEN size > 0 THEN price / size END) as avg_price_per_sqm,
+                COUNT(CASE WHEN size > 0 THEN 1 END) as valid_area_count
+            FROM windowed
+            GROUP BY area_name
+        ), ranked AS (
+            SELECT *, SUM(transaction_count) OVER () as market_total
+            FROM per_area
+        )
         SELECT 
-            "{area_col}" as area_name,
-            COUNT(*) as transaction_count,
-            AVG("{price_col}") as avg_price,
-            AVG(
-                CASE 
-                    WHEN "actual_area" IS NOT NULL 
-                    AND "actual_area" != '' 
-                    AND CAST("actual_area" AS FLOAT) > 0 
-                    THEN "{price_col}" / CAST("actual_area" AS FLOAT)
-                    ELSE NULL 
-                END
-            ) as avg_price_per_sqm,
-            ROUND(COUNT(*) * 100.0 / (SELECT COUNT(*) FROM {table} WHERE "{area_col}" IS NOT NULL), 2) as market_share_percentage,
-            COUNT(CASE WHEN "actual_area" IS NOT NULL AND "actual_area" != '' AND CAST("actual_area" AS FLOAT) > 0 THEN 1 END) as valid_area_count
-        FROM {table}
-        WHERE "{area_col}" IS NOT NULL 
-        AND "{area_col}" != ''
-        AND "{price_col}" > 0
-        AND CAST("{date_col}" AS DATE) >= NOW() - INTERVAL '{period_months} months'
-        GROUP BY "{area_col}"
-        HAVING COUNT(*) >= 5
-        ORDER BY transaction_count DESC
+            area_name,
+            transaction_count,
+            avg_price,
+            avg_price_per_sqm,
+            ROUND(transaction_count * 100.0 / market_total, 2) as market_share_percentage,
+            valid_area_count
+        FROM ranked
+        WHERE transaction_count >= :min_transactions
+        ORDER BY {TOP_AREA_ORDER[metric]}
         LIMIT :limit_param
     """)
+    use_rollup = rollup_supports_filters(segment_filters, search_type)
     
     max_retries = 3
     retry_count = 0
@@ -3211,7 +4125,8 @@ def get_top_areas():
         try:
             conn = engine.connect()
             try:
-                result = conn.execute(query, {'limit_param': limit})
+                query = rollup_top_areas_query(search_type, segment_clause, period_months, metric) if use_rollup else raw_query
+                result = conn.execute(query, params)
                 top_areas = []
                 
                 for row in result:
@@ -3226,18 +4141,24 @@ def get_top_areas():
                     })
                 
                 conn.close()
-                print(f"✅ TOP AREAS FETCHED: {len(top_areas)} areas for {search_type} ({time_period})")
+                print(f"✅ TOP AREAS FETCHED: {len(top_areas)} areas for {search_type} ({time_period}) "
+                      f"from {'rollup' if use_rollup else table}")
                 
                 return jsonify({
                     'top_areas': top_areas,
                     'search_type': search_type,
                     'time_period': time_period,
+                    'metric': metric,
                     'total_areas': len(top_areas)
                 })
                 
             except Exception as e:
                 print(f"❌ TOP AREAS QUERY FAILED (attempt {retry_count + 1}): {e}")
                 conn.close()
+                if use_rollup:
+                    # Rollup missing or not refreshed yet: scan the raw table instead
+                    use_rollup = False
+                    continue
                 retry_count += 1
         except Exception as e:
             print(f"❌ CONNECTION FAILED (attempt {retry_count + 1}): {e}")
@@ -3246,6 +4167,37 @@ def get_top_areas():
     
     return jsonify({'top_areas': [], 'error': 'Failed to fetch data'})
 
+@app.route('/api/geo/heatmap')
+@login_required
+def get_geo_heatmap():
+    """
+    Per-area map layer: median price per sqm, volume, gross yield and location premium
+    
+    Served from the precomputed area_heatmap table (area_heatmap.py) as columns
+    (area, lat, lon, median_price_sqm, transactions, gross_yield,
+    location_premium), one entry per geocoded area with sales in the period.
+    
+    Query params:
+        period: '3M', '6M', '1Y' (default), '3Y', '5Y', 'MAX'
+        property_type: Segment (default: all types)
+    """
+    period = request.args.get('period', '1Y')
+    property_type = (request.args.get('property_type') or '').strip()
+    segment = property_type if property_type and 'All Types' not in property_type else HEATMAP_ANY_SEGMENT
+    if period not in TREND_PERIOD_MONTHS:
+        return jsonify({'error': f'Unknown period: {period}'}), 400
+    
+    heatmap = load_heatmap(engine)
+    if heatmap is None:
+        return jsonify({'error': 'Heatmap not available'}), 503
+    
+    payload = heatmap.payload(period, segment)
+    if payload is None:
+        payload = {'period': period, 'segment': segment, 'count': 0, 'columns': {}}
+    response = jsonify(payload)
+    response.headers['Cache-Control'] = 'private, max-age=3600'  # Changes only when the table is refreshed
+    return response
+
 @app.route('/api/property-types/<search_type>')
 @login_required
 @cache_result(timeout=3600, key_prefix="prop_types:")  # Cache for 1 hour
@@ -3580,6 +4532,36 @@ def _calculate_liquidity_score(area: str, property_type: str, engine) -> dict:
         }
 
 
+def _median_price_sqm(area: str, property_type: str, months: int, engine):
+    """
+    Median sale price per sqm of an area/type over the last ``months`` months
+    
+    Read from the precomputed medians table (price_medians.py); the exact
+    PERCENTILE_CONT query only runs while that table is unavailable.
+    
+    Returns:
+        Median price per sqm, or None when there were no sales
+    """
+    medians = load_price_medians(engine)
+    if medians is not None:
+        return medians.median(area, property_type, months)
+    
+    value_query = text(f"""
+        SELECT PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY trans_value / CAST(procedure_area AS DOUBLE PRECISION)) as median_price_sqm
+        FROM properties
+        WHERE UPPER(area_en) = UPPER(:area)
+          AND prop_type_en = :property_type
+          AND CAST(instance_date AS TIMESTAMP) >= CURRENT_DATE - INTERVAL '{int(months)} months'
+          AND trans_value > 0
+          AND procedure_area IS NOT NULL
+          AND procedure_area ~ '^[0-9.]+$'
+    """)
+    value_result = pd.read_sql(value_query, engine, params={'area': area, 'property_type': property_type})
+    if len(value_result) > 0 and not pd.isna(value_result.iloc[0]['median_price_sqm']):
+        return float(value_result.iloc[0]['median_price_sqm'])
+    return None
+
+
 def _calculate_yield_score(area: str, property_type: str, size_sqm: float, bedrooms: str, engine) -> dict:
     """Calculate rental yield score"""
     import logging
@@ -3616,21 +4598,9 @@ def _calculate_yield_score(area: str, property_type: str, size_sqm: float, bedro
             
             # Estimate property value (simple estimation based on size)
             # Use median price per sqm from recent transactions
-            value_query = text("""
-                SELECT PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY trans_value / CAST(procedure_area AS DOUBLE PRECISION)) as median_price_sqm
-                FROM properties
-                WHERE UPPER(area_en) = UPPER(:area)
-                  AND prop_type_en = :property_type
-                  AND CAST(instance_date AS TIMESTAMP) >= CURRENT_DATE - INTERVAL '6 months'
-                  AND trans_value > 0
-                  AND procedure_area IS NOT NULL
-                  AND procedure_area ~ '^[0-9.]+$'
-            """)
-            
-            value_result = pd.read_sql(value_query, engine, params={'area': area, 'property_type': property_type})
+            median_price_sqm = _median_price_sqm(area, property_type, 6, engine)
             
-            if len(value_result) > 0 and not pd.isna(value_result.iloc[0]['median_price_sqm']):
-                median_price_sqm = value_result.iloc[0]['median_price_sqm']
+            if median_price_sqm is not None:
                 estimated_value = median_price_sqm * size_sqm
                 
                 if estimated_value > 0:
@@ -3657,21 +4627,9 @@ def _calculate_yield_score(area: str, property_type: str, size_sqm: float, bedro
                 comparables = int(fallback_result.iloc[0]['count'])
                 
                 # Estimate property value
-                value_query = text("""
-                    SELECT PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY trans_value / CAST(procedure_area AS DOUBLE PRECISION)) as median_price_sqm
-                    FROM properties
-                    WHERE UPPER(area_en) = UPPER(:area)
-                      AND prop_type_en = :property_type
-                      AND CAST(instance_date AS TIMESTAMP) >= CURRENT_DATE - INTERVAL '6 months'
-                      AND trans_value > 0
-                      AND procedure_area IS NOT NULL
-                      AND procedure_area ~ '^[0-9.]+$'
-                """)
-                
-                value_result = pd.read_sql(value_query, engine, params={'area': area, 'property_type': property_type})
+                median_price_sqm = _median_price_sqm(area, property_type, 6, engine)
                 
-                if len(value_result) > 0 and not pd.isna(value_result.iloc[0]['median_price_sqm']):
-                    median_price_sqm = value_result.iloc[0]['median_price_sqm']
+                if median_price_sqm is not None:
                     estimated_value = median_price_sqm * size_sqm
                     
                     if estimated_value > 0:
@@ -3716,21 +4674,9 @@ def _calculate_segment_score(property_type: str, area: str, size_sqm: float, bed
     
     try:
         # Get median price per sqm for this property
-        query = text("""
-            SELECT PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY trans_value / CAST(procedure_area AS DOUBLE PRECISION)) as median_price_sqm
-            FROM properties
-            WHERE UPPER(area_en) = UPPER(:area)
-              AND prop_type_en = :property_type
-              AND CAST(instance_date AS TIMESTAMP) >= CURRENT_DATE - INTERVAL '12 months'
-              AND trans_value > 0
-              AND procedure_area IS NOT NULL
-              AND procedure_area ~ '^[0-9.]+$'
-        """)
-        
-        result = pd.read_sql(query, engine, params={'area': area, 'property_type': property_type})
+        price_per_sqm = _median_price_sqm(area, property_type, 12, engine)
         
-        if len(result) > 0 and not pd.isna(result.iloc[0]['median_price_sqm']):
-            price_per_sqm = result.iloc[0]['median_price_sqm']
+        if price_per_sqm is not None:
             
             # Determine segment based on price per sqm thresholds (Dubai market)
             if price_per_sqm >= 40000:
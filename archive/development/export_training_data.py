@@ -1,14 +1,23 @@
 """
 Export training data from PostgreSQL database for ML model training.
 Extracts property transactions and prepares features for XGBoost model.
+
+By default the tables are streamed with COPY ... TO STDOUT into the chunked,
+partitioned Parquet snapshot (parquet_store.py) that train_model.py trains
+from out of core. ``--csv`` keeps the former single-query CSV export.
 """
 import os
+import sys
+import argparse
 import logging
 from typing import Optional
 import pandas as pd
 from sqlalchemy import create_engine, text
 from dotenv import load_dotenv
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+import parquet_store
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -214,8 +223,35 @@ def print_data_summary(df: pd.DataFrame, data_type: str = "Properties"):
     logger.info(f"{'='*60}\n")
 
 
+def export_parquet_snapshot(engine, snapshot_dir: str = parquet_store.PARQUET_SNAPSHOT_DIR,
+                            chunk_rows: int = parquet_store.EXPORT_CHUNK_ROWS) -> dict:
+    """
+    Stream properties and rentals into the Parquet snapshot.
+    
+    Args:
+        engine: SQLAlchemy engine
+        snapshot_dir: Root directory of the Parquet store
+        chunk_rows: Rows per written chunk
+        
+    Returns:
+        {table: exported rows} for the tables that succeeded
+    """
+    exported = {}
+    for table in parquet_store.TABLES:
+        try:
+            exported[table] = parquet_store.export_table(engine, table, snapshot_dir, chunk_rows=chunk_rows)
+        except Exception as e:
+            logger.error(f"❌ {table} export failed: {e}")
+    return exported
+
+
 def main():
     """Main execution function."""
+    parser = argparse.ArgumentParser(description='Export training data')
+    parser.add_argument('--csv', action='store_true', help='Write data/*_training.csv instead of the Parquet snapshot')
+    parser.add_argument('--chunk-rows', type=int, default=parquet_store.EXPORT_CHUNK_ROWS)
+    args = parser.parse_args()
+    
     logger.info("🚀 Starting data export process...")
     
     # Load database connection
@@ -237,6 +273,17 @@ def main():
         logger.error(f"❌ Failed to create database engine: {e}")
         return
     
+    if not args.csv:
+        exported = export_parquet_snapshot(engine, chunk_rows=args.chunk_rows)
+        logger.info("\n" + "="*60)
+        logger.info("📊 Export Complete!")
+        logger.info("="*60)
+        for table, rows in exported.items():
+            logger.info(f"✅ {table.title()}: {rows:,} records → {parquet_store.table_path(table)}")
+        logger.info("="*60)
+        logger.info("\n🎯 Next Step: run train_model.py (trains from the snapshot out of core)")
+        return
+    
     # Export properties data
     try:
         properties_df = export_properties_data(engine)
@@ -0,0 +1,219 @@
+"""
+Parallel hyperparameter search for the XGBoost price model.
+
+The engineered feature matrix is written once to an on-disk cache (raw
+float32 files + meta.json) and memory-mapped by every worker process, so
+trials share one copy through the page cache instead of re-engineering or
+pickling the data.
+
+Candidates are scored on expanding time-based holdout folds: rows are
+ordered by days_since_2020, split into n_folds + 1 equal blocks, and fold k
+trains on blocks 0..k and validates on block k + 1 - no fold validates on
+transactions older than its training data. Each fit early-stops on its
+validation fold, and after every fold only the best ``keep_fraction`` of
+candidates (mean validation MAE so far) go on to the next one (successive
+halving), so poor configurations cost one fold.
+
+Trials run in a process pool with ``threads_per_worker`` XGBoost threads
+each, keeping workers x threads within the machine's cores.
+"""
+import os
+import json
+import math
+import time
+import random
+import shutil
+import hashlib
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, Tuple
+import numpy as np
+import xgboost as xgb
+
+logger = logging.getLogger(__name__)
+
+FEATURE_CACHE_DIR = 'data/feature_cache'
+TIME_COLUMN = 'days_since_2020'
+EARLY_STOPPING_ROUNDS = 50
+MAX_BOOST_ROUNDS = 2000
+
+SEARCH_SPACE = {
+    'max_depth': [4, 6, 8, 10],
+    'learning_rate': [0.03, 0.05, 0.1],
+    'subsample': [0.6, 0.8, 1.0],
+    'colsample_bytree': [0.6, 0.8, 1.0],
+    'min_child_weight': [1, 3, 5, 10],
+    'gamma': [0.0, 0.1, 1.0],
+    'reg_alpha': [0.0, 0.1, 1.0],
+    'reg_lambda': [0.5, 1.0, 5.0],
+}
+
+_worker_data = {}  # Memory-mapped cache of this worker process
+
+
+def cache_key(source: str, feature_columns: List[str]) -> str:
+    """Cache directory name for a data source description and feature order"""
+    return hashlib.sha1(json.dumps([source, list(feature_columns)]).encode()).hexdigest()[:16]
+
+
+def write_feature_cache(chunks: Iterable[Tuple[Any, Any]], feature_columns: List[str], cache_dir: str) -> str:
+    """
+    Append (X, y) chunks to an on-disk float32 matrix.
+
+    Args:
+        chunks: Iterable of (X DataFrame/array in feature_columns order, y)
+        feature_columns: Column order of X
+        cache_dir: Output directory (replaced atomically when complete)
+
+    Returns:
+        cache_dir
+    """
+    tmp_dir = f"{cache_dir}.{os.getpid()}.tmp"
+    os.makedirs(tmp_dir, exist_ok=True)
+    rows = 0
+    with open(os.path.join(tmp_dir, 'X.f32'), 'wb') as fx, open(os.path.join(tmp_dir, 'y.f64'), 'wb') as fy:
+        for X, y in chunks:
+            fx.write(np.ascontiguousarray(X, dtype=np.float32).tobytes())
+            fy.write(np.ascontiguousarray(y, dtype=np.float64).tobytes())
+            rows += len(y)
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+        json.dump({'rows': rows, 'feature_columns': list(feature_columns)}, f)
+    if os.path.isdir(cache_dir):
+        old_dir = f"{cache_dir}.{os.getpid()}.old"
+        os.replace(cache_dir, old_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+    os.replace(tmp_dir, cache_dir)
+    return cache_dir
+
+
+def cache_exists(cache_dir: str) -> bool:
+    """True when write_feature_cache completed for cache_dir"""
+    return os.path.exists(os.path.join(cache_dir, 'meta.json'))
+
+
+def load_feature_cache(cache_dir: str) -> Tuple[np.memmap, np.memmap, List[str]]:
+    """(X, y, feature_columns) memory-mapped read-only from write_feature_cache output"""
+    with open(os.path.join(cache_dir, 'meta.json')) as f:
+        meta = json.load(f)
+    columns = meta['feature_columns']
+    X = np.memmap(os.path.join(cache_dir, 'X.f32'), dtype=np.float32, mode='r', shape=(meta['rows'], len(columns)))
+    y = np.memmap(os.path.join(cache_dir, 'y.f64'), dtype=np.float64, mode='r', shape=(meta['rows'],))
+    return X, y, columns
+
+
+def time_folds(times: np.ndarray, n_folds: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Expanding-window folds over rows ordered by time.
+
+    Returns:
+        [(train_indices, validation_indices)] with every validation block later than its training rows
+    """
+    order = np.argsort(times, kind='stable')
+    blocks = np.array_split(order, n_folds + 1)
+    return [(np.sort(np.concatenate(blocks[:k + 1])), np.sort(blocks[k + 1])) for k in range(n_folds)]
+
+
+def sample_candidates(n_trials: int, base_params: Dict[str, Any], seed: int = 42) -> List[Dict[str, Any]]:
+    """``base_params`` (restricted to SEARCH_SPACE keys) followed by distinct random configurations"""
+    rng = random.Random(seed)
+    candidates = [{key: base_params[key] for key in SEARCH_SPACE if key in base_params}]
+    seen = {json.dumps(candidates[0], sort_keys=True)}
+    attempts = 0
+    while len(candidates) < n_trials and attempts < n_trials * 20:
+        attempts += 1
+        candidate = {key: rng.choice(values) for key, values in SEARCH_SPACE.items()}
+        key = json.dumps(candidate, sort_keys=True)
+        if key not in seen:
+            seen.add(key)
+            candidates.append(candidate)
+    return candidates
+
+
+def _init_worker(cache_dir: str, n_folds: int, threads: int):
+    X, y, columns = load_feature_cache(cache_dir)
+    _worker_data.update({
+        'X': X, 'y': y, 'threads': threads,
+        'folds': time_folds(np.asarray(X[:, columns.index(TIME_COLUMN)]), n_folds),
+    })
+
+
+def _run_trial(candidate_id: int, params: Dict[str, Any], fold: int) -> Dict[str, Any]:
+    """Fit one candidate on one fold in a worker process"""
+    start = time.time()
+    X, y = _worker_data['X'], _worker_data['y']
+    train_idx, val_idx = _worker_data['folds'][fold]
+    dtrain = xgb.DMatrix(X[train_idx], label=y[train_idx], nthread=_worker_data['threads'])
+    dval = xgb.DMatrix(X[val_idx], label=y[val_idx], nthread=_worker_data['threads'])
+    booster = xgb.train(
+        {'objective': 'reg:squarederror', 'tree_method': 'hist', 'eval_metric': 'mae', 'seed': 42,
+         'nthread': _worker_data['threads'], 'verbosity': 0, **params},
+        dtrain, num_boost_round=MAX_BOOST_ROUNDS, evals=[(dval, 'val')],
+        early_stopping_rounds=EARLY_STOPPING_ROUNDS, verbose_eval=False,
+    )
+    pred = booster.predict(dval, iteration_range=(0, booster.best_iteration + 1))
+    actual = y[val_idx]
+    return {
+        'candidate': candidate_id,
+        'fold': fold,
+        'mae': float(np.mean(np.abs(actual - pred))),
+        'mape': float(np.mean(np.abs(actual - pred) / np.abs(actual)) * 100),
+        'best_iteration': int(booster.best_iteration),
+        'seconds': time.time() - start,
+    }
+
+
+def run_search(cache_dir: str, candidates: List[Dict[str, Any]], n_folds: int = 3, n_workers: int = None,
+               threads_per_worker: int = 2, keep_fraction: float = 0.5) -> List[Dict[str, Any]]:
+    """
+    Score candidates on time folds in parallel with successive halving.
+
+    Args:
+        cache_dir: write_feature_cache output
+        candidates: Parameter dicts (SEARCH_SPACE keys)
+        n_folds: Expanding time folds
+        n_workers: Worker processes (default: cores // threads_per_worker)
+        threads_per_worker: XGBoost threads per trial
+        keep_fraction: Share of candidates advancing after each fold
+
+    Returns:
+        Leaderboard sorted best first: completed candidates by mean MAE, then pruned
+        ones by folds completed and mean MAE
+    """
+    n_workers = n_workers or max(1, (os.cpu_count() or 1) // threads_per_worker)
+    results = {i: [] for i in range(len(candidates))}
+    alive = list(range(len(candidates)))
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                             initargs=(cache_dir, n_folds, threads_per_worker)) as pool:
+        for fold in range(n_folds):
+            start = time.time()
+            for result in pool.map(_run_trial, alive, [candidates[i] for i in alive], [fold] * len(alive)):
+                results[result['candidate']].append(result)
+            alive.sort(key=lambda i: np.mean([r['mae'] for r in results[i]]))
+            best = np.mean([r['mae'] for r in results[alive[0]]])
+            logger.info(f"Fold {fold + 1}/{n_folds}: {len(alive)} candidates in {time.time() - start:.0f}s, "
+                        f"best mean MAE AED {best:,.0f}")
+            if fold < n_folds - 1:
+                alive = alive[:max(1, math.ceil(len(alive) * keep_fraction))]
+
+    leaderboard = []
+    for i, trials in results.items():
+        leaderboard.append({
+            'params': candidates[i],
+            'status': 'complete' if len(trials) == n_folds else 'pruned',
+            'folds_completed': len(trials),
+            'mean_mae': float(np.mean([t['mae'] for t in trials])),
+            'mean_mape': float(np.mean([t['mape'] for t in trials])),
+            'fold_mae': [round(t['mae'], 1) for t in trials],
+            'best_iterations': [t['best_iteration'] for t in trials],
+            'seconds': round(sum(t['seconds'] for t in trials), 1),
+        })
+    leaderboard.sort(key=lambda entry: (-entry['folds_completed'], entry['mean_mae']))
+    for rank, entry in enumerate(leaderboard, 1):
+        entry['rank'] = rank
+    return leaderboard
+
+
+def best_params(leaderboard: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Winning parameters with n_estimators from its median early-stopping iteration"""
+    best = leaderboard[0]
+    return {**best['params'], 'n_estimators': int(np.median(best['best_iterations'])) + 1}
@@ -1,8 +1,18 @@
 """
 Train XGBoost model for property price prediction.
 Implements feature engineering, model training, and evaluation.
+
+Usage:
+    python archive/development/train_model.py [--search] [--trials 20] [--folds 3] [--workers N] [--threads 2]
+
+``--search`` runs the parallel hyperparameter search (hyperparameter_search.py)
+on time-ordered folds of the training data first and trains the final model
+with the winning configuration; the leaderboard is saved with the metrics.
 """
 import os
+import sys
+import json
+import argparse
 import logging
 from typing import Tuple, Dict, Any, List
 import pandas as pd
@@ -11,9 +21,17 @@ from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score, mean_absolute_percentage_error
 from sklearn.preprocessing import LabelEncoder
 import xgboost as xgb
+import pyarrow.compute as pc
 import joblib
 from datetime import datetime
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+import parquet_store
+import feature_store
+from ml_inference import CATEGORICAL_COLUMNS
+from tree_model import TreeEnsemble
+import hyperparameter_search
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -21,6 +39,100 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+FEATURE_COLUMNS = [
+    # Numeric features
+    'actual_area', 'log_area', 'procedure_area',
+    'transaction_year', 'transaction_month', 'transaction_quarter', 'days_since_2020',
+    'room_count', 'room_density',
+    'total_buyer', 'total_seller',
+    
+    # Binary features
+    'is_offplan_en', 'is_free_hold_en',
+    
+    # Encoded categorical features
+    'area_en_encoded', 'prop_type_en_encoded', 'group_en_encoded',
+    'procedure_en_encoded', 'rooms_en_encoded', 'parking_encoded',
+    'nearest_metro_en_encoded', 'nearest_mall_en_encoded',
+    'nearest_landmark_en_encoded', 'project_en_encoded',
+    'usage_en_encoded', 'prop_sb_type_en_encoded',
+    
+    # Interaction features
+    'area_proptype_interaction', 'area_rooms_interaction',
+    
+    # Rental-context features (feature_store.py)
+    'median_rent_nearby', 'rental_availability', 'rent_to_price_ratio'
+]
+
+# Outlier bounds (exclusive), applied as a Parquet scan filter in out-of-core training
+TRAINING_FILTERS = [
+    ('trans_value', '>', 100000), ('trans_value', '<', 50000000),  # 100K - 50M AED
+    ('actual_area', '>', 100), ('actual_area', '<', 30000),  # 100 - 30K sqft
+]
+TRAINING_COLUMNS = [
+    'transaction_number', 'trans_value', 'instance_date', 'actual_area', 'procedure_area',
+    'total_buyer', 'total_seller', 'is_offplan_en', 'is_free_hold_en'
+] + CATEGORICAL_COLUMNS
+CHUNK_ROWS = 50_000  # Rows per Parquet batch / XGBoost external-memory page
+SPLIT_BUCKETS = {'train': (0, 700), 'val': (700, 850), 'test': (850, 1000)}  # 70/15/15 by transaction hash
+CONTEXT_SALE_COLUMNS = ['area_en', 'prop_type_en', 'rooms_en', 'trans_value', 'instance_date']
+CONTEXT_RENT_COLUMNS = ['area_en', 'prop_type_en', 'rooms', 'annual_amount', 'registration_date']
+XGB_CACHE_DIR = 'data/xgb_cache'
+
+# XGBoost parameters optimized for real estate (defaults; --search overrides them)
+XGB_PARAMS = {
+    'max_depth': 8,
+    'learning_rate': 0.05,
+    'subsample': 0.8,
+    'colsample_bytree': 0.8,
+    'min_child_weight': 3,
+    'gamma': 0.1,
+    'reg_alpha': 0.1,
+    'reg_lambda': 1.0,
+}
+NUM_BOOST_ROUND = 500
+
+
+def _split_mask(chunk: pd.DataFrame, split: str) -> np.ndarray:
+    """Rows of ``chunk`` in ``split`` (stable transaction-number hash)"""
+    low, high = SPLIT_BUCKETS[split]
+    bucket = pd.util.hash_pandas_object(chunk['transaction_number'].astype(str), index=False) % 1000
+    return (bucket >= low).to_numpy() & (bucket < high).to_numpy()
+
+
+def _encode_categorical(values: pd.Series, encoder: LabelEncoder) -> np.ndarray:
+    """
+    Label-encode a column (missing -> 'Unknown', unseen -> -1).
+    
+    Categorical columns are mapped once per category instead of once per row.
+    """
+    lookup = {cls: code for code, cls in enumerate(encoder.classes_)}
+    unknown = lookup.get('Unknown', -1)
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        category_codes = np.array([lookup.get(str(c), -1) for c in values.cat.categories] + [unknown])
+        return category_codes[values.cat.codes.to_numpy()]  # Code -1 (missing) picks 'Unknown'
+    return values.map(lambda v: unknown if pd.isna(v) else lookup.get(str(v), -1)).to_numpy()
+
+
+class ChunkIterator(xgb.DataIter):
+    """Feeds (X, y) chunks to XGBoost; every reset() restarts the Parquet scan"""
+    
+    def __init__(self, make_chunks, cache_prefix: str):
+        self._make_chunks = make_chunks
+        self._chunks = None
+        super().__init__(cache_prefix=cache_prefix)
+    
+    def next(self, input_data) -> bool:
+        if self._chunks is None:
+            self._chunks = self._make_chunks()
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            return False
+        input_data(data=chunk[0], label=chunk[1])
+        return True
+    
+    def reset(self):
+        self._chunks = None
+
 
 class PropertyPriceModel:
     """XGBoost model for property price prediction."""
@@ -75,17 +187,11 @@ class PropertyPriceModel:
         binary_cols = ['is_offplan_en', 'is_free_hold_en']
         for col in binary_cols:
             if col in df.columns:
-                df[col] = df[col].map({'Yes': 1, 'No': 0}).fillna(0)
+                # object first: Parquet chunks hold Categoricals, where fillna(0) needs a 0 category
+                df[col] = df[col].astype(object).map({'Yes': 1, 'No': 0}).fillna(0).astype(float)
         
         # Categorical encoding
-        categorical_cols = [
-            'area_en', 'prop_type_en', 'group_en', 'procedure_en',
-            'rooms_en', 'parking', 'nearest_metro_en', 'nearest_mall_en', 
-            'nearest_landmark_en', 'project_en',
-            'usage_en', 'prop_sb_type_en'
-        ]
-        
-        for col in categorical_cols:
+        for col in CATEGORICAL_COLUMNS:
             if col in df.columns:
                 if is_training:
                     # Fit encoder on training data
@@ -93,16 +199,9 @@ class PropertyPriceModel:
                     # Handle missing values
                     df[col] = df[col].fillna('Unknown')
                     df[f'{col}_encoded'] = self.label_encoders[col].fit_transform(df[col].astype(str))
-                else:
-                    # Use fitted encoder
-                    if col in self.label_encoders:
-                        df[col] = df[col].fillna('Unknown')
-                        # Handle unseen categories
-                        known_classes = set(self.label_encoders[col].classes_)
-                        df[f'{col}_encoded'] = df[col].apply(
-                            lambda x: self.label_encoders[col].transform([x])[0] 
-                            if x in known_classes else -1
-                        )
+                elif col in self.label_encoders:
+                    # Use fitted encoder; unseen categories -> -1
+                    df[f'{col}_encoded'] = _encode_categorical(df[col], self.label_encoders[col])
         
         # Interaction features
         if 'area_en_encoded' in df.columns and 'prop_type_en_encoded' in df.columns:
@@ -128,30 +227,8 @@ class PropertyPriceModel:
         """
         logger.info("Selecting features...")
         
-        # Define feature columns
-        feature_cols = [
-            # Numeric features
-            'actual_area', 'log_area', 'procedure_area',
-            'transaction_year', 'transaction_month', 'transaction_quarter', 'days_since_2020',
-            'room_count', 'room_density',
-            'total_buyer', 'total_seller',
-            
-            # Binary features
-            'is_offplan_en', 'is_free_hold_en',
-            
-            # Encoded categorical features
-            'area_en_encoded', 'prop_type_en_encoded', 'group_en_encoded',
-            'procedure_en_encoded', 'rooms_en_encoded', 'parking_encoded',
-            'nearest_metro_en_encoded', 'nearest_mall_en_encoded',
-            'nearest_landmark_en_encoded', 'project_en_encoded',
-            'usage_en_encoded', 'prop_sb_type_en_encoded',
-            
-            # Interaction features
-            'area_proptype_interaction', 'area_rooms_interaction'
-        ]
-        
         # Filter to only available columns
-        available_features = [col for col in feature_cols if col in df.columns]
+        available_features = [col for col in FEATURE_COLUMNS if col in df.columns]
         
         # Store feature columns for later use
         self.feature_columns = available_features
@@ -168,7 +245,8 @@ class PropertyPriceModel:
         return X, y
     
     def train(self, X_train: pd.DataFrame, y_train: pd.Series, 
-              X_val: pd.DataFrame = None, y_val: pd.Series = None) -> Dict[str, Any]:
+              X_val: pd.DataFrame = None, y_val: pd.Series = None,
+              params: Dict[str, Any] = None) -> Dict[str, Any]:
         """
         Train XGBoost model.
         
@@ -177,27 +255,21 @@ class PropertyPriceModel:
             y_train: Training target
             X_val: Validation features (optional)
             y_val: Validation target (optional)
+            params: Overrides for XGB_PARAMS / n_estimators (e.g. search winner)
             
         Returns:
             Dictionary with training metrics
         """
         logger.info("Training XGBoost model...")
         
-        # XGBoost parameters optimized for real estate
         params = {
             'objective': 'reg:squarederror',
-            'max_depth': 8,
-            'learning_rate': 0.05,
-            'n_estimators': 500,
-            'subsample': 0.8,
-            'colsample_bytree': 0.8,
-            'min_child_weight': 3,
-            'gamma': 0.1,
-            'reg_alpha': 0.1,
-            'reg_lambda': 1.0,
+            **XGB_PARAMS,
+            'n_estimators': NUM_BOOST_ROUND,
             'random_state': 42,
             'n_jobs': -1,
-            'verbosity': 1
+            'verbosity': 1,
+            **(params or {})
         }
         
         # Create model
@@ -249,7 +321,21 @@ class PropertyPriceModel:
         """
         logger.info("Evaluating model on test set...")
         
-        y_pred = self.model.predict(X_test)
+        return self.evaluate_predictions(y_test, self.model.predict(X_test))
+    
+    def evaluate_predictions(self, y_test, y_pred) -> Dict[str, Any]:
+        """
+        Test-set metrics from targets and predictions.
+        
+        Args:
+            y_test: Test target
+            y_pred: Model predictions for the test rows
+            
+        Returns:
+            Dictionary with evaluation metrics
+        """
+        y_test = np.asarray(y_test, dtype=float)
+        y_pred = np.asarray(y_pred, dtype=float)
         
         # Calculate metrics
         mae = mean_absolute_error(y_test, y_pred)
@@ -301,6 +387,126 @@ class PropertyPriceModel:
         
         return metrics
     
+    def fit_encoders_streaming(self, snapshot_dir: str = parquet_store.PARQUET_SNAPSHOT_DIR):
+        """
+        Fit the label encoders from one scan of the categorical columns.
+        
+        Only the distinct values of each dictionary-encoded batch are
+        collected, so memory stays proportional to the number of categories.
+        Classes match fitting on the full filtered table.
+        
+        Args:
+            snapshot_dir: Root directory of the Parquet store
+        """
+        classes = {col: set() for col in CATEGORICAL_COLUMNS}
+        for batch in parquet_store.iter_batches('properties', columns=CATEGORICAL_COLUMNS, filters=TRAINING_FILTERS,
+                                                batch_rows=CHUNK_ROWS, snapshot_dir=snapshot_dir, to_pandas=False):
+            for col in CATEGORICAL_COLUMNS:
+                for value in pc.unique(batch.column(col)).to_pylist():
+                    classes[col].add('Unknown' if value is None else str(value))
+        for col in CATEGORICAL_COLUMNS:
+            self.label_encoders[col] = LabelEncoder().fit(sorted(classes[col]))
+        logger.info(f"✅ Fitted {len(self.label_encoders)} encoders "
+                    f"({sum(len(c) for c in classes.values()):,} categories)")
+    
+    def iter_feature_chunks(self, split: str = None, context_store=None,
+                            snapshot_dir: str = parquet_store.PARQUET_SNAPSHOT_DIR, chunk_rows: int = CHUNK_ROWS):
+        """
+        Yield (X, y) feature chunks from the Parquet snapshot.
+        
+        Args:
+            split: 'train', 'val', 'test' (stable transaction-number hash) or None for all rows
+            context_store: feature_store.ContextFeatureHistory for the rental-context features
+            snapshot_dir: Root directory of the Parquet store
+            chunk_rows: Rows per chunk
+            
+        Yields:
+            (X DataFrame in feature_columns order, y Series); missing values are 0 as at inference
+        """
+        for chunk in parquet_store.iter_batches('properties', columns=TRAINING_COLUMNS, filters=TRAINING_FILTERS,
+                                                batch_rows=chunk_rows, snapshot_dir=snapshot_dir):
+            if split is not None:
+                chunk = chunk[_split_mask(chunk, split)]
+            if chunk.empty:
+                continue
+            featured = self.engineer_features(chunk, is_training=False)
+            if context_store is not None:
+                featured = context_store.enrich_frame(featured)
+            X = featured.reindex(columns=self.feature_columns).astype(np.float32).fillna(0)
+            yield X, featured['trans_value'].astype(float)
+    
+    def predict_split(self, split: str, context_store=None,
+                      snapshot_dir: str = parquet_store.PARQUET_SNAPSHOT_DIR) -> Tuple[np.ndarray, np.ndarray]:
+        """(targets, predictions) for one split, predicted chunk by chunk"""
+        targets, predictions = [], []
+        for X, y in self.iter_feature_chunks(split, context_store, snapshot_dir):
+            targets.append(y.to_numpy())
+            predictions.append(self.model.predict(X))
+        if not targets:
+            return np.zeros(0), np.zeros(0)
+        return np.concatenate(targets), np.concatenate(predictions)
+    
+    def train_out_of_core(self, context_store=None, snapshot_dir: str = parquet_store.PARQUET_SNAPSHOT_DIR,
+                          cache_dir: str = XGB_CACHE_DIR, num_boost_round: int = NUM_BOOST_ROUND,
+                          params: Dict[str, Any] = None) -> Dict[str, Any]:
+        """
+        Train from the Parquet snapshot without loading it into memory.
+        
+        Encoders are fitted in a streaming pass; XGBoost then pulls feature
+        chunks through ChunkIterator into an external-memory matrix whose
+        pages are cached under ``cache_dir``.
+        
+        Args:
+            context_store: feature_store.ContextFeatureHistory (None: no rental-context features)
+            snapshot_dir: Root directory of the Parquet store
+            cache_dir: Directory for XGBoost's external-memory pages
+            num_boost_round: Boosting rounds (n_estimators of the in-memory path)
+            params: Overrides for XGB_PARAMS (an 'n_estimators' entry replaces num_boost_round)
+            
+        Returns:
+            Dictionary with training metrics (same keys as train())
+        """
+        logger.info("Training XGBoost model out of core...")
+        self.fit_encoders_streaming(snapshot_dir)
+        self.feature_columns = [col for col in FEATURE_COLUMNS
+                                if context_store is not None or col not in feature_store.CONTEXT_FEATURES]
+        os.makedirs(cache_dir, exist_ok=True)
+        
+        def matrix(split, ref=None):
+            iterator = ChunkIterator(lambda: self.iter_feature_chunks(split, context_store, snapshot_dir),
+                                     cache_prefix=os.path.join(cache_dir, split))
+            if hasattr(xgb, 'ExtMemQuantileDMatrix'):  # xgboost >= 3.0
+                return xgb.ExtMemQuantileDMatrix(iterator, ref=ref)
+            return xgb.DMatrix(iterator)
+        
+        dtrain = matrix('train')
+        dval = matrix('val', ref=dtrain)
+        logger.info(f"✅ External-memory matrices: {dtrain.num_row():,} train, {dval.num_row():,} validation rows")
+        
+        # Same parameters as train()
+        params = {'objective': 'reg:squarederror', 'tree_method': 'hist', **XGB_PARAMS,
+                  'seed': 42, 'verbosity': 1, **(params or {})}
+        num_boost_round = params.pop('n_estimators', num_boost_round)
+        booster = xgb.train(params, dtrain, num_boost_round=num_boost_round,
+                            evals=[(dtrain, 'train'), (dval, 'val')], verbose_eval=False)
+        
+        # Wrap in an XGBRegressor so the saved pickle matches the in-memory path
+        self.model = xgb.XGBRegressor()
+        self.model.load_model(bytearray(booster.save_raw('ubj')))
+        logger.info("✅ Training complete")
+        
+        metrics = {}
+        for split in ('train', 'val'):
+            y, y_pred = self.predict_split(split, context_store, snapshot_dir)
+            metrics.update({
+                f'{split}_mae': mean_absolute_error(y, y_pred),
+                f'{split}_rmse': np.sqrt(mean_squared_error(y, y_pred)),
+                f'{split}_r2': r2_score(y, y_pred),
+                f'{split}_mape': mean_absolute_percentage_error(y, y_pred) * 100,
+                f'{split}_size': len(y),
+            })
+        return metrics
+    
     def get_feature_importance(self, top_n: int = 20) -> pd.DataFrame:
         """
         Get feature importance from trained model.
@@ -349,6 +555,11 @@ class PropertyPriceModel:
         joblib.dump(self.model, model_path)
         logger.info(f"✅ Model saved to {model_path}")
         
+        # NumPy node-array export served by the app (ML_INFERENCE_BACKEND=numpy)
+        tree_path = os.path.splitext(model_path)[0] + '.npz'
+        TreeEnsemble.from_xgboost(self.model).save(tree_path)
+        logger.info(f"✅ Tree export saved to {tree_path}")
+        
         # Save encoders
         joblib.dump(self.label_encoders, encoders_path)
         logger.info(f"✅ Encoders saved to {encoders_path}")
@@ -386,59 +597,54 @@ class PropertyPriceModel:
         return instance
 
 
-def main():
-    """Main training pipeline."""
-    logger.info("🚀 Starting ML model training pipeline...")
+def read_training_sales(snapshot_dir: str = parquet_store.PARQUET_SNAPSHOT_DIR) -> Tuple[pd.DataFrame, np.ndarray]:
+    """
+    Training-split sales for the rental-context features, and every transaction month.
     
-    # Load data
-    data_path = "data/properties_training.csv"
-    if not os.path.exists(data_path):
-        logger.error(f"❌ Data file not found: {data_path}")
-        logger.error("Please run export_training_data.py first")
-        return
-    
-    logger.info(f"Loading data from {data_path}...")
-    df = pd.read_csv(data_path)
-    logger.info(f"✅ Loaded {len(df):,} records")
-    
-    # Remove outliers
-    logger.info("Removing outliers...")
-    initial_count = len(df)
-    df = df[
-        (df['trans_value'] > 100000) &  # Minimum 100K AED
-        (df['trans_value'] < 50000000) &  # Maximum 50M AED
-        (df['actual_area'] > 100) &  # Minimum 100 sqft
-        (df['actual_area'] < 30000)  # Maximum 30K sqft
-    ]
-    logger.info(f"✅ Removed {initial_count - len(df):,} outliers ({(initial_count - len(df))/initial_count*100:.1f}%)")
-    
-    # Initialize model
-    model = PropertyPriceModel()
-    
-    # Engineer features
-    df_featured = model.engineer_features(df, is_training=True)
-    
-    # Select features
-    X, y = model.select_features(df_featured, target_col='trans_value')
-    
-    # Split data: 70% train, 15% validation, 15% test
-    X_temp, X_test, y_temp, y_test = train_test_split(
-        X, y, test_size=0.15, random_state=42
-    )
-    X_train, X_val, y_train, y_val = train_test_split(
-        X_temp, y_temp, test_size=0.176, random_state=42  # 0.176 * 0.85 ≈ 0.15
-    )
-    
-    logger.info(f"\n{'='*60}")
-    logger.info("Dataset Split:")
-    logger.info(f"  Training:   {len(X_train):,} samples ({len(X_train)/len(X)*100:.1f}%)")
-    logger.info(f"  Validation: {len(X_val):,} samples ({len(X_val)/len(X)*100:.1f}%)")
-    logger.info(f"  Test:       {len(X_test):,} samples ({len(X_test)/len(X)*100:.1f}%)")
-    logger.info(f"{'='*60}\n")
+    Returns:
+        (train-split rows with CONTEXT_SALE_COLUMNS, month_index() values of all splits)
+    """
+    sales, months = [], []
+    for chunk in parquet_store.iter_batches('properties', columns=['transaction_number'] + CONTEXT_SALE_COLUMNS,
+                                            filters=TRAINING_FILTERS, batch_rows=CHUNK_ROWS, snapshot_dir=snapshot_dir):
+        months.append(np.unique(feature_store.month_index(chunk['instance_date'])))
+        sales.append(chunk[_split_mask(chunk, 'train')][CONTEXT_SALE_COLUMNS])
+    if not sales:
+        return pd.DataFrame(columns=CONTEXT_SALE_COLUMNS), np.zeros(0)
+    return pd.concat(sales, ignore_index=True), np.unique(np.concatenate(months))
+
+
+def load_context_history(train_sales: pd.DataFrame, months,
+                         snapshot_dir: str = parquet_store.PARQUET_SNAPSHOT_DIR):
+    """
+    Point-in-time rental-context features for training (feature_store.py).
     
-    # Train model
-    train_metrics = model.train(X_train, y_train, X_val, y_val)
+    Each transaction gets the features of its month, computed from the rentals
+    and *training* sales of the preceding TRAINING_LOOKBACK_MONTHS. The
+    exported serving store is not used: it is a single latest window whose
+    sale medians include validation and test targets.
     
+    Args:
+        train_sales: Training-split sales (CONTEXT_SALE_COLUMNS)
+        months: feature_store.month_index() values to compute
+        snapshot_dir: Root directory of the Parquet store (rentals)
+        
+    Returns:
+        feature_store.ContextFeatureHistory, or None (with a warning) without a rentals snapshot
+    """
+    if not parquet_store.snapshot_exists('rentals', snapshot_dir):
+        logger.warning("⚠️ No rentals snapshot; run scripts/export_parquet_snapshot.py for rental-context features")
+        return None
+    logger.info("Computing point-in-time rental-context features...")
+    rentals = parquet_store.read_table('rentals', columns=CONTEXT_RENT_COLUMNS, snapshot_dir=snapshot_dir)
+    context_rows = feature_store.compute_monthly_context_features(train_sales, rentals, months)
+    history = feature_store.ContextFeatureHistory(context_rows)
+    logger.info(f"✅ Rental-context features: {len(context_rows):,} segment rows over {len(history):,} months")
+    return history
+
+
+def log_train_metrics(train_metrics: Dict[str, Any]):
+    """Log the metrics returned by train() / train_out_of_core()"""
     logger.info(f"\n{'='*60}")
     logger.info("Training Metrics:")
     logger.info(f"  Train MAE:  AED {train_metrics['train_mae']:,.0f}")
@@ -451,10 +657,12 @@ def main():
         logger.info(f"  Val R²:     {train_metrics['val_r2']:.4f}")
         logger.info(f"  Val MAPE:   {train_metrics['val_mape']:.2f}%")
     logger.info(f"{'='*60}\n")
-    
-    # Evaluate on test set
-    test_metrics = model.evaluate(X_test, y_test)
-    
+
+
+def save_training_run(model: PropertyPriceModel, sizes: Dict[str, int],
+                      train_metrics: Dict[str, Any], test_metrics: Dict[str, Any],
+                      search: Dict[str, Any] = None):
+    """Save model artifacts and models/training_metrics.json (with the search leaderboard, if any), then log a summary"""
     # Feature importance
     feature_importance = model.get_feature_importance(top_n=20)
     
@@ -463,21 +671,22 @@ def main():
     
     # Save metrics
     metrics_path = "models/training_metrics.json"
-    import json
     all_metrics = {
         'training_date': datetime.now().isoformat(),
-        'dataset_size': len(df),
-        'train_size': len(X_train),
-        'val_size': len(X_val),
-        'test_size': len(X_test),
+        'dataset_size': sum(sizes.values()),
+        'train_size': sizes['train'],
+        'val_size': sizes['val'],
+        'test_size': sizes['test'],
         'train_metrics': train_metrics,
         'test_metrics': test_metrics,
         'feature_count': len(model.feature_columns),
         'top_features': feature_importance.to_dict('records')
     }
+    if search is not None:
+        all_metrics['hyperparameter_search'] = search
     
     with open(metrics_path, 'w') as f:
-        json.dump(all_metrics, f, indent=2)
+        json.dump(all_metrics, f, indent=2, default=float)
     logger.info(f"✅ Metrics saved to {metrics_path}")
     
     # Final summary
@@ -490,8 +699,173 @@ def main():
     logger.info("="*60)
     logger.info("\n🎯 Next Steps:")
     logger.info("1. Review model metrics in models/training_metrics.json")
-    logger.info("2. Integrate model into app.py")
-    logger.info("3. Test hybrid predictions with sample properties")
+    logger.info("2. Register the model: python scripts/register_model.py <version>")
+    logger.info("3. Compare the shadow deltas at /api/admin/models before promoting")
+
+
+def _source_signature(path: str) -> str:
+    """Path plus size/mtime of every file under it; changes whenever the data is re-exported"""
+    files = [path] if os.path.isfile(path) else sorted(
+        os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+    return json.dumps([path] + [(f, os.path.getsize(f), int(os.path.getmtime(f))) for f in files])
+
+
+def _training_signature(path: str, context_store=None) -> str:
+    """Training data signature: the source files plus the rental-context feature rows (or their absence)"""
+    context = context_store.signature if context_store is not None else 'no-context-features'
+    return json.dumps([_source_signature(path), context])
+
+
+def search_hyperparameters(chunks, feature_columns: List[str], source: str, args) -> Dict[str, Any]:
+    """
+    Run the parallel search over the training rows (never the test split).
+    
+    Args:
+        chunks: Callable returning an iterable of (X, y) chunks; only called on a cache miss
+        feature_columns: Column order of X
+        source: _training_signature() of the training data (part of the feature cache key)
+        args: Parsed --trials / --folds / --workers / --threads
+        
+    Returns:
+        {'folds', 'trials', 'best_params', 'leaderboard'} for training_metrics.json
+    """
+    cache_dir = os.path.join(hyperparameter_search.FEATURE_CACHE_DIR,
+                             hyperparameter_search.cache_key(source, feature_columns))
+    if hyperparameter_search.cache_exists(cache_dir):
+        logger.info(f"✅ Reusing cached feature matrix {cache_dir}")
+    else:
+        logger.info(f"Caching engineered features to {cache_dir}...")
+        hyperparameter_search.write_feature_cache(chunks(), feature_columns, cache_dir)
+    
+    candidates = hyperparameter_search.sample_candidates(args.trials, XGB_PARAMS)
+    logger.info(f"🔍 Searching {len(candidates)} configurations on {args.folds} time folds...")
+    leaderboard = hyperparameter_search.run_search(cache_dir, candidates, n_folds=args.folds,
+                                                   n_workers=args.workers, threads_per_worker=args.threads)
+    best = hyperparameter_search.best_params(leaderboard)
+    
+    logger.info(f"\n{'='*60}")
+    logger.info("Hyperparameter Leaderboard:")
+    for entry in leaderboard[:5]:
+        logger.info(f"  #{entry['rank']} MAE AED {entry['mean_mae']:,.0f} ({entry['mean_mape']:.2f}%) "
+                    f"[{entry['status']}] {entry['params']}")
+    logger.info(f"✅ Best: {best}")
+    logger.info(f"{'='*60}\n")
+    return {'folds': args.folds, 'trials': len(candidates), 'best_params': best, 'leaderboard': leaderboard}
+
+
+def train_from_snapshot(args):
+    """Out-of-core pipeline: Parquet snapshot -> chunked features -> external-memory XGBoost"""
+    logger.info(f"Streaming training data from {parquet_store.table_path('properties')}...")
+    context_store = load_context_history(*read_training_sales())
+    
+    model = PropertyPriceModel()
+    search, params = None, None
+    if args.search:
+        model.fit_encoders_streaming()
+        model.feature_columns = [col for col in FEATURE_COLUMNS
+                                 if context_store is not None or col not in feature_store.CONTEXT_FEATURES]
+        
+        def chunks():
+            for split in ('train', 'val'):
+                yield from model.iter_feature_chunks(split, context_store)
+        search = search_hyperparameters(chunks, model.feature_columns,
+                                        _training_signature(parquet_store.table_path('properties'), context_store), args)
+        params = search['best_params']
+    
+    train_metrics = model.train_out_of_core(context_store, params=params)
+    log_train_metrics(train_metrics)
+    
+    y_test, y_pred = model.predict_split('test', context_store)
+    test_metrics = model.evaluate_predictions(y_test, y_pred)
+    
+    sizes = {'train': train_metrics.pop('train_size'), 'val': train_metrics.pop('val_size'), 'test': len(y_test)}
+    save_training_run(model, sizes, train_metrics, test_metrics, search)
+
+
+def main():
+    """Main training pipeline."""
+    parser = argparse.ArgumentParser(description='Train the XGBoost price model')
+    parser.add_argument('--search', action='store_true', help='Run the hyperparameter search before training')
+    parser.add_argument('--trials', type=int, default=20, help='Configurations to try (first: current defaults)')
+    parser.add_argument('--folds', type=int, default=3, help='Expanding time-based holdout folds')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: cores / threads)')
+    parser.add_argument('--threads', type=int, default=2, help='XGBoost threads per worker')
+    args = parser.parse_args()
+    
+    logger.info("🚀 Starting ML model training pipeline...")
+    
+    # Parquet snapshot: chunked out-of-core training
+    if parquet_store.snapshot_exists('properties'):
+        train_from_snapshot(args)
+        return
+    
+    # CSV export: in-memory training
+    data_path = "data/properties_training.csv"
+    if not os.path.exists(data_path):
+        logger.error(f"❌ Data file not found: {data_path}")
+        logger.error("Please run scripts/export_parquet_snapshot.py or export_training_data.py first")
+        return
+    logger.info(f"Loading data from {data_path}...")
+    df = pd.read_csv(data_path)
+    logger.info(f"✅ Loaded {len(df):,} records")
+    
+    # Remove outliers
+    logger.info("Removing outliers...")
+    initial_count = len(df)
+    df = df[
+        (df['trans_value'] > 100000) &  # Minimum 100K AED
+        (df['trans_value'] < 50000000) &  # Maximum 50M AED
+        (df['actual_area'] > 100) &  # Minimum 100 sqft
+        (df['actual_area'] < 30000)  # Maximum 30K sqft
+    ]
+    logger.info(f"✅ Removed {initial_count - len(df):,} outliers ({(initial_count - len(df))/initial_count*100:.1f}%)")
+    
+    # Split rows: 70% train, 15% validation, 15% test
+    df = df.reset_index(drop=True)
+    temp_index, test_index = train_test_split(df.index, test_size=0.15, random_state=42)
+    train_index, val_index = train_test_split(
+        temp_index, test_size=0.176, random_state=42  # 0.176 * 0.85 ≈ 0.15
+    )
+    
+    # Point-in-time rental-context features from the training sales only
+    context_store = load_context_history(df.loc[train_index], feature_store.month_index(df['instance_date']))
+    if context_store is not None:
+        df = context_store.enrich_frame(df)
+    
+    # Initialize model
+    model = PropertyPriceModel()
+    
+    # Engineer features
+    df_featured = model.engineer_features(df, is_training=True)
+    
+    # Select features
+    X, y = model.select_features(df_featured, target_col='trans_value')
+    X_temp, X_test, y_temp, y_test = X.loc[temp_index], X.loc[test_index], y.loc[temp_index], y.loc[test_index]
+    X_train, X_val, y_train, y_val = X.loc[train_index], X.loc[val_index], y.loc[train_index], y.loc[val_index]
+    
+    logger.info(f"\n{'='*60}")
+    logger.info("Dataset Split:")
+    logger.info(f"  Training:   {len(X_train):,} samples ({len(X_train)/len(X)*100:.1f}%)")
+    logger.info(f"  Validation: {len(X_val):,} samples ({len(X_val)/len(X)*100:.1f}%)")
+    logger.info(f"  Test:       {len(X_test):,} samples ({len(X_test)/len(X)*100:.1f}%)")
+    logger.info(f"{'='*60}\n")
+    
+    # Search on the non-test rows (time folds come from days_since_2020)
+    search, params = None, None
+    if args.search:
+        search = search_hyperparameters(lambda: [(X_temp, y_temp)], list(X.columns),
+                                        _training_signature(data_path, context_store), args)
+        params = search['best_params']
+    
+    # Train model
+    train_metrics = model.train(X_train, y_train, X_val, y_val, params=params)
+    log_train_metrics(train_metrics)
+    
+    # Evaluate on test set
+    test_metrics = model.evaluate(X_test, y_test)
+    
+    save_training_run(model, {'train': len(X_train), 'val': len(X_val), 'test': len(X_test)},
+                      train_metrics, test_metrics, search)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,203 @@
+"""
+Precomputed per-area aggregates for the Dubai-wide heatmap.
+
+For every period of PERIOD_MONTHS and property-type segment ('*' for all
+types), the area_heatmap table (migrations/create_area_heatmap.sql) holds one
+row per geocoded area:
+
+    median_price_sqm   median sale price per sqm
+    transaction_count  sales in the period
+    gross_yield        median annual rent / median sale price (%)
+    location_premium   location premium total from the area's POI distances
+                       (location_premium.py, the formula valuations use)
+
+scripts/refresh_area_heatmap.py rebuilds it after each ingest (and after POI
+distance refreshes). Workers keep the table in memory with every
+(period, segment) payload already laid out as columns, so /api/geo/heatmap
+answers with a dictionary lookup and no database work at view time.
+"""
+import os
+import numpy as np
+import pandas as pd
+from sqlalchemy import text, bindparam
+
+from trend_rollups import PERIOD_MONTHS, PRICE_BOUNDS
+from location_premium import AMENITY_PREMIUMS, premium_components
+from worker_cache import WorkerCache
+
+HEATMAP_TABLE = 'area_heatmap'
+HEATMAP_TTL_SECONDS = int(os.getenv('AREA_HEATMAP_TTL', '3600'))
+HEATMAP_RETRY_SECONDS = 300  # Wait after a failed load before querying again
+ANY_SEGMENT = '*'
+HEATMAP_COLUMNS = ['period', 'segment', 'area_name', 'latitude', 'longitude', 'median_price_sqm',
+                   'transaction_count', 'gross_yield', 'location_premium']
+
+_heatmap = WorkerCache('Area heatmap', HEATMAP_TTL_SECONDS, HEATMAP_RETRY_SECONDS)
+
+
+def _window(date_column, period_months):
+    if period_months is None:
+        return ""
+    return f"AND CAST({date_column} AS DATE) >= NOW() - INTERVAL '{int(period_months)} months'"
+
+
+def sale_stats_query(period_months):
+    """Median sale price, price per sqm and count per (area, type) and per area"""
+    min_price, max_price = PRICE_BOUNDS['buy']
+    return text(f"""
+        SELECT
+            UPPER(area_en) AS area_key,
+            CASE WHEN GROUPING(prop_type_en) = 1 THEN '{ANY_SEGMENT}' ELSE prop_type_en END AS segment,
+            PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY trans_value / CAST(actual_area AS DOUBLE PRECISION)) AS median_price_sqm,
+            PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY trans_value) AS median_price,
+            COUNT(*) AS transaction_count
+        FROM properties
+        WHERE trans_value BETWEEN {min_price} AND {max_price}
+          AND area_en IS NOT NULL AND area_en != ''
+          AND prop_type_en IS NOT NULL
+          AND actual_area ~ '^[0-9]+\\.?[0-9]*$'
+          AND CAST(actual_area AS DOUBLE PRECISION) > 0
+          {_window('instance_date', period_months)}
+        GROUP BY GROUPING SETS ((UPPER(area_en), prop_type_en), (UPPER(area_en)))
+    """)
+
+
+def rent_stats_query(period_months):
+    """Median annual rent per (area, type) and per area"""
+    min_rent, max_rent = PRICE_BOUNDS['rent']
+    return text(f"""
+        SELECT
+            UPPER(area_en) AS area_key,
+            CASE WHEN GROUPING(prop_type_en) = 1 THEN '{ANY_SEGMENT}' ELSE prop_type_en END AS segment,
+            PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY annual_amount) AS median_rent
+        FROM rentals
+        WHERE annual_amount BETWEEN {min_rent} AND {max_rent}
+          AND area_en IS NOT NULL AND area_en != ''
+          AND prop_type_en IS NOT NULL
+          {_window('registration_date', period_months)}
+        GROUP BY GROUPING SETS ((UPPER(area_en), prop_type_en), (UPPER(area_en)))
+    """)
+
+
+def location_premiums(coordinates):
+    """
+    calculate_location_premium's total for every area_coordinates row in one
+    location_premium.premium_components() call.
+
+    Returns:
+        Series of capped premiums (%), rounded like the per-request value
+    """
+    def column(name):
+        if name not in coordinates.columns:
+            return np.full(len(coordinates), np.nan)
+        return pd.to_numeric(coordinates[name], errors='coerce').to_numpy(float)
+
+    premiums = premium_components({amenity: column(f'distance_to_{amenity}_km') for amenity in AMENITY_PREMIUMS},
+                                  column('neighborhood_score'))
+    return pd.Series(premiums['total_premium'].round(2), index=coordinates.index)
+
+
+def build_heatmap(period, sale_stats, rent_stats, coordinates):
+    """
+    Heatmap rows of one period: sale/rent stats joined to the geocoded areas.
+
+    Args:
+        period: Key of PERIOD_MONTHS
+        sale_stats: sale_stats_query() rows
+        rent_stats: rent_stats_query() rows
+        coordinates: area_coordinates rows (area_name, latitude, longitude, distances, neighborhood_score)
+
+    Returns:
+        DataFrame with HEATMAP_COLUMNS (areas without sales in a segment are omitted)
+    """
+    areas = coordinates.dropna(subset=['latitude', 'longitude']).assign(
+        area_key=lambda d: d['area_name'].astype(str).str.strip().str.upper(),
+        location_premium=location_premiums)
+    stats = sale_stats.merge(rent_stats, on=['area_key', 'segment'], how='left')
+    rows = areas[['area_key', 'area_name', 'latitude', 'longitude', 'location_premium']].merge(stats, on='area_key')
+    rows['gross_yield'] = (rows['median_rent'] / rows['median_price'] * 100).where(rows['median_price'] > 0)
+    rows['period'] = period
+    rows['transaction_count'] = rows['transaction_count'].astype(int)
+    return rows[HEATMAP_COLUMNS].reset_index(drop=True)
+
+
+def refresh_heatmap(engine, periods=None):
+    """
+    Recompute the heatmap for ``periods`` (default: all of PERIOD_MONTHS).
+
+    Aggregates are read first; each period's rows are then replaced in one transaction.
+
+    Returns:
+        Number of rows written
+    """
+    periods = list(periods or PERIOD_MONTHS)
+    with engine.connect() as conn:
+        coordinates = pd.read_sql_query(text("SELECT * FROM area_coordinates"), conn)
+        frames = [build_heatmap(period,
+                                pd.read_sql_query(sale_stats_query(PERIOD_MONTHS[period]), conn),
+                                pd.read_sql_query(rent_stats_query(PERIOD_MONTHS[period]), conn),
+                                coordinates)
+                  for period in periods]
+    heatmap = pd.concat(frames, ignore_index=True)
+    delete = text(f"DELETE FROM {HEATMAP_TABLE} WHERE period IN :periods").bindparams(
+        bindparam('periods', expanding=True))
+    with engine.begin() as conn:
+        conn.execute(delete, {'periods': periods})
+        heatmap.to_sql(HEATMAP_TABLE, conn, if_exists='append', index=False)
+    return len(heatmap)
+
+
+def _column(values, digits):
+    return [None if pd.isna(value) else round(float(value), digits) for value in values]
+
+
+class HeatmapStore:
+    """Columnar heatmap payloads keyed by (period, segment)"""
+
+    def __init__(self, rows):
+        self.payloads = {}
+        for (period, segment), group in rows.groupby(['period', 'segment'], sort=False):
+            group = group.sort_values('area_name')
+            self.payloads[(period, segment)] = {
+                'period': period,
+                'segment': segment,
+                'count': len(group),
+                'columns': {
+                    'area': group['area_name'].astype(str).tolist(),
+                    'lat': _column(group['latitude'], 5),
+                    'lon': _column(group['longitude'], 5),
+                    'median_price_sqm': _column(group['median_price_sqm'], 0),
+                    'transactions': group['transaction_count'].astype(int).tolist(),
+                    'gross_yield': _column(group['gross_yield'], 2),
+                    'location_premium': _column(group['location_premium'], 2),
+                },
+            }
+
+    def __len__(self):
+        return len(self.payloads)
+
+    def payload(self, period, segment=ANY_SEGMENT):
+        """Prebuilt payload, or None when the (period, segment) has not been computed"""
+        return self.payloads.get((period, segment or ANY_SEGMENT))
+
+
+def _read_heatmap(engine):
+    with engine.connect() as conn:
+        rows = pd.read_sql_query(text(f"SELECT {', '.join(HEATMAP_COLUMNS)} FROM {HEATMAP_TABLE}"), conn)
+    if rows.empty:
+        raise ValueError(f"{HEATMAP_TABLE} is empty")
+    store = HeatmapStore(rows)
+    print(f"✅ Area heatmap: {len(store):,} period/segment payloads")
+    return store
+
+
+def load_heatmap(engine, max_age=HEATMAP_TTL_SECONDS):
+    """
+    Heatmap store for this worker, re-read when older than ``max_age`` seconds.
+
+    Returns:
+        HeatmapStore, or None when the table has not been created/filled yet
+    """
+    if engine is None:
+        return _heatmap.peek()
+    return _heatmap.get(lambda: _read_heatmap(engine), max_age=max_age)
@@ -0,0 +1,100 @@
+"""
+Spatial index over area_coordinates for nearest-area comparables.
+
+When an area has too few comparable sales, valuations used to fall straight
+back to the whole city. A ball tree on (latitude, longitude) in radians with
+the haversine metric finds the k nearest neighbouring areas instead, so the
+fallback reads a handful of nearby areas whose prices are actually related.
+
+The index is small (one point per geocoded area). It is built from the
+database at startup and rebuilt every AREA_INDEX_TTL_SECONDS; queries are
+O(log n) in memory.
+"""
+import os
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import BallTree
+from sqlalchemy import text
+
+from worker_cache import WorkerCache
+
+EARTH_RADIUS_KM = 6371.0
+NEIGHBOUR_COUNT = int(os.getenv('COMPARABLES_NEIGHBOUR_AREAS', '5'))
+NEIGHBOUR_MAX_KM = float(os.getenv('COMPARABLES_NEIGHBOUR_MAX_KM', '8'))  # Beyond this an area is not "nearby"
+AREA_INDEX_TTL_SECONDS = int(os.getenv('AREA_INDEX_TTL', '86400'))  # Coordinates rarely change
+AREA_INDEX_RETRY_SECONDS = 300  # Wait after a failed build before querying again
+
+_index = WorkerCache('Area spatial index', AREA_INDEX_TTL_SECONDS, AREA_INDEX_RETRY_SECONDS)
+
+
+class AreaSpatialIndex:
+    """Ball tree of geocoded areas, queried by area name"""
+
+    def __init__(self, rows):
+        rows = rows.dropna(subset=['latitude', 'longitude'])
+        self.names = rows['area_name'].astype(str).to_numpy()
+        self.name_ids = {name.strip().lower(): i for i, name in enumerate(self.names)}
+        coordinates = np.radians(rows[['latitude', 'longitude']].to_numpy(dtype=float))
+        self.tree = BallTree(coordinates, metric='haversine') if len(coordinates) else None
+        self.coordinates = coordinates
+
+    def __len__(self):
+        return len(self.names)
+
+    def _resolve(self, area):
+        """Index of ``area``: exact (case-insensitive) name, else the first name containing it"""
+        key = str(area or '').strip().lower()
+        if not key:
+            return None
+        if key in self.name_ids:
+            return self.name_ids[key]
+        for name, i in self.name_ids.items():
+            if key in name:
+                return i
+        return None
+
+    def neighbours(self, area, k=NEIGHBOUR_COUNT, max_km=NEIGHBOUR_MAX_KM):
+        """
+        Nearest other areas to ``area``.
+
+        Args:
+            area: Area name (as searched)
+            k: Maximum number of neighbours
+            max_km: Maximum distance
+
+        Returns:
+            List of (area_name, distance_km), nearest first; empty when the
+            area is not geocoded
+        """
+        i = self._resolve(area)
+        if i is None or self.tree is None:
+            return []
+        count = min(k + 1, len(self.names))
+        distances, positions = self.tree.query(self.coordinates[i:i + 1], k=count)
+        return [
+            (self.names[j], float(d * EARTH_RADIUS_KM))
+            for d, j in zip(distances[0], positions[0])
+            if j != i and d * EARTH_RADIUS_KM <= max_km
+        ][:k]
+
+
+def _read_index(engine):
+    with engine.connect() as conn:
+        rows = pd.read_sql_query(text("SELECT area_name, latitude, longitude FROM area_coordinates"), conn)
+    index = AreaSpatialIndex(rows)
+    if not len(index):
+        raise ValueError("area_coordinates has no geocoded areas")
+    print(f"✅ Area spatial index: {len(index):,} areas")
+    return index
+
+
+def load_area_index(engine, max_age=AREA_INDEX_TTL_SECONDS):
+    """
+    Area index for this worker, rebuilt when older than ``max_age`` seconds.
+
+    Returns:
+        AreaSpatialIndex, or None when no coordinates could be loaded
+    """
+    if engine is None:
+        return _index.peek()
+    return _index.get(lambda: _read_index(engine), max_age=max_age)
@@ -0,0 +1,375 @@
+"""
+Mergeable price sketches for the AVM market metrics.
+
+Instead of pulling up to 1000 raw rows per request and summarizing them in
+pandas, the sales and rentals tables are aggregated once (per TTL) into
+log-spaced price buckets per market segment:
+
+    buy:  (area, property_type, bedrooms, status)
+    rent: (area, property_type, property_sub_type)
+
+Every bucket covers prices within a relative width of SKETCH_RELATIVE_ACCURACY
+(the DDSketch bucket scheme) and carries count, sum, sum of squares, min and
+max. Sketches of different segments merge by adding bucket stats, so AVM
+metrics for any filter combination are answered by merging the matching
+segments: quantiles to within the bucket accuracy, count/mean/std exactly
+at bucket granularity, and over the whole market rather than a row sample.
+"""
+import os
+import re
+import math
+import time
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from worker_cache import WorkerCache
+
+SKETCH_RELATIVE_ACCURACY = float(os.getenv('AVM_SKETCH_ACCURACY', '0.01'))
+SKETCH_TTL_SECONDS = int(os.getenv('AVM_SKETCH_TTL', '3600'))  # Rebuild hourly
+SKETCH_RETRY_SECONDS = 300  # Wait after a failed build before querying again
+GAMMA = (1 + SKETCH_RELATIVE_ACCURACY) / (1 - SKETCH_RELATIVE_ACCURACY)
+LOG_GAMMA = math.log(GAMMA)
+
+SEGMENT_COLUMNS = {
+    'buy': ['area', 'property_type', 'bedrooms', 'status'],
+    'rent': ['area', 'property_type', 'property_sub_type'],
+}
+BUCKET_STATS = ['count', 'sum', 'sumsq', 'min', 'max']
+
+NO_BUDGET = 999999999
+
+_sketches = WorkerCache('AVM sketches', SKETCH_TTL_SECONDS, SKETCH_RETRY_SECONDS, background=True)  # Keyed by search_type
+
+
+def bucket_index(prices):
+    """Log bucket index of each price: bucket i holds (GAMMA**(i-1), GAMMA**i]"""
+    return np.ceil(np.log(np.asarray(prices, dtype=float)) / LOG_GAMMA).astype(np.int64)
+
+
+class QuantileSketch:
+    """
+    Log-bucketed price distribution with per-bucket moments.
+
+    Arrays are sorted by bucket index; counts may be fractional after clip().
+    """
+
+    def __init__(self, counts, sums, sumsqs, mins, maxs):
+        self.counts = np.asarray(counts, dtype=float)
+        self.sums = np.asarray(sums, dtype=float)
+        self.sumsqs = np.asarray(sumsqs, dtype=float)
+        self.mins = np.asarray(mins, dtype=float)
+        self.maxs = np.asarray(maxs, dtype=float)
+
+    @classmethod
+    def from_buckets(cls, buckets):
+        """Merge bucket rows (bucket + BUCKET_STATS columns) from any number of segments"""
+        if buckets.empty:
+            return cls([], [], [], [], [])
+        merged = buckets.groupby('bucket', sort=True).agg(
+            count=('count', 'sum'), sum=('sum', 'sum'), sumsq=('sumsq', 'sum'),
+            min=('min', 'min'), max=('max', 'max'),
+        )
+        return cls(merged['count'], merged['sum'], merged['sumsq'], merged['min'], merged['max'])
+
+    @classmethod
+    def from_values(cls, prices):
+        """Sketch of raw positive prices"""
+        prices = pd.Series(prices, dtype=float).dropna()
+        prices = prices[prices > 0]
+        return cls.from_buckets(aggregate_buckets(pd.DataFrame({'price': prices}), []))
+
+    @property
+    def count(self):
+        return float(self.counts.sum())
+
+    def clip(self, low=None, high=None):
+        """
+        Sketch restricted to low <= price <= high.
+
+        Buckets straddling a bound keep the share of their count (and sums)
+        that lies inside it, assuming values spread evenly between the
+        bucket's min and max; the error is bounded by the bucket width.
+        """
+        low = -np.inf if low is None else low
+        high = np.inf if high is None else high
+        width = self.maxs - self.mins
+        with np.errstate(divide='ignore', invalid='ignore'):
+            inside = (np.minimum(self.maxs, high) - np.maximum(self.mins, low)) / width
+        share = np.where(width > 0, np.clip(np.nan_to_num(inside), 0, 1),
+                         ((self.mins >= low) & (self.maxs <= high)).astype(float))
+        keep = share > 0
+        share = share[keep]
+        return QuantileSketch(
+            self.counts[keep] * share, self.sums[keep] * share, self.sumsqs[keep] * share,
+            np.maximum(self.mins[keep], low), np.minimum(self.maxs[keep], high),
+        )
+
+    def rank(self, value):
+        """Number of prices <= value"""
+        width = self.maxs - self.mins
+        with np.errstate(divide='ignore', invalid='ignore'):
+            below = np.where(width > 0, np.clip((value - self.mins) / width, 0, 1),
+                             (self.maxs <= value).astype(float))
+        return float((self.counts * below).sum())
+
+    def quantile(self, q):
+        """Price at quantile q (linear interpolation like Series.quantile)"""
+        total = self.count
+        if total <= 0:
+            return float('nan')
+        target = q * max(total - 1, 0)
+        cumulative = np.cumsum(self.counts)
+        i = min(int(np.searchsorted(cumulative, target, side='right')), len(cumulative) - 1)
+        before = cumulative[i] - self.counts[i]
+        span = self.counts[i] - 1
+        position = (target - before) / span if span > 0 else 0.0
+        return float(self.mins[i] + (self.maxs[i] - self.mins[i]) * min(max(position, 0.0), 1.0))
+
+    def mean(self):
+        total = self.count
+        return float(self.sums.sum() / total) if total > 0 else float('nan')
+
+    def std(self):
+        """Sample standard deviation (ddof=1, like Series.std)"""
+        total = self.count
+        if total <= 1:
+            return float('nan')
+        variance = (self.sumsqs.sum() - self.sums.sum() ** 2 / total) / (total - 1)
+        return float(math.sqrt(max(variance, 0.0)))
+
+    def min(self):
+        return float(self.mins[0]) if len(self.mins) else float('nan')
+
+    def max(self):
+        return float(self.maxs[-1]) if len(self.maxs) else float('nan')
+
+
+def aggregate_buckets(df, segment_columns):
+    """
+    Bucket rows from raw prices (the pandas equivalent of sketch_query).
+
+    Args:
+        df: DataFrame with a 'price' column and the segment columns
+        segment_columns: Columns that identify a segment
+
+    Returns:
+        DataFrame of segment columns + bucket + BUCKET_STATS
+    """
+    df = df[df['price'] > 0].assign(bucket=lambda d: bucket_index(d['price']), sq=lambda d: d['price'] ** 2)
+    return df.groupby(list(segment_columns) + ['bucket'], dropna=False, observed=True).agg(
+        count=('price', 'size'), sum=('price', 'sum'), sumsq=('sq', 'sum'),
+        min=('price', 'min'), max=('price', 'max'),
+    ).reset_index()
+
+
+def sketch_query(search_type, column_map):
+    """
+    GROUP BY query producing the bucket rows for every segment.
+
+    Args:
+        search_type: 'buy' (properties) or 'rent' (rentals)
+        column_map: SALES_MAP / RENTALS_MAP column names
+    """
+    table = 'properties' if search_type == 'buy' else 'rentals'
+    price = f'CAST("{column_map["price"]}" AS DOUBLE PRECISION)'
+    sources = {
+        'area': column_map['area_name'],
+        'property_type': column_map['property_type'],
+        'bedrooms': column_map.get('bedrooms'),
+        'status': column_map.get('status'),
+        'property_sub_type': column_map.get('property_sub_type'),
+    }
+    segments = [f'"{sources[c]}" AS {c}' if sources[c] else f'NULL AS {c}' for c in SEGMENT_COLUMNS[search_type]]
+    group_by = ', '.join(str(i + 1) for i in range(len(segments) + 1))
+    return text(f"""
+        SELECT {', '.join(segments)},
+               CAST(CEIL(LN({price}) / :log_gamma) AS BIGINT) AS bucket,
+               COUNT(*) AS count,
+               SUM({price}) AS sum,
+               SUM({price} * {price}) AS sumsq,
+               MIN({price}) AS min,
+               MAX({price}) AS max
+        FROM {table}
+        WHERE "{column_map['price']}" > 0
+        GROUP BY {group_by}
+    """)
+
+
+class SegmentSketchStore:
+    """Bucket stats for every segment of one table, merged on demand"""
+
+    def __init__(self, bucket_rows, search_type):
+        columns = SEGMENT_COLUMNS[search_type]
+        self.search_type = search_type
+        bucket_rows = bucket_rows.copy()
+        for column in columns:
+            bucket_rows[column] = bucket_rows[column].astype(object).where(bucket_rows[column].notna(), None)
+        segment_ids, segments = pd.factorize(pd.MultiIndex.from_frame(bucket_rows[columns]))
+        self.segments = pd.DataFrame(list(segments), columns=columns)
+        self.buckets = bucket_rows[['bucket'] + BUCKET_STATS].assign(segment=segment_ids)
+
+    def segment_mask(self, filters):
+        """
+        Segments selected by the search filters, mirroring build_where_clause:
+        exact property type (type or sub-type for rent), bedrooms digit or
+        Studio match, exact status, case-sensitive area substring.
+        """
+        segments = self.segments
+        mask = np.ones(len(segments), dtype=bool)
+
+        def text_column(column):
+            return segments[column].astype('string')
+
+        prop_type = filters.get('propertyType')
+        if prop_type and 'All Types' not in prop_type:
+            matches = (text_column('property_type') == prop_type).fillna(False)
+            if self.search_type == 'rent':
+                matches |= (text_column('property_sub_type') == prop_type).fillna(False)
+            mask &= matches.to_numpy(dtype=bool)
+
+        prop_sub_type = filters.get('property_sub_type')
+        if self.search_type == 'rent' and prop_sub_type and 'Any' not in prop_sub_type:
+            mask &= (text_column('property_sub_type') == prop_sub_type).fillna(False).to_numpy(dtype=bool)
+
+        bedrooms = filters.get('bedrooms')
+        if self.search_type == 'buy' and bedrooms and 'Any' not in bedrooms:
+            beds = text_column('bedrooms')
+            if 'Studio' in bedrooms:
+                mask &= ((beds == 'Studio') | beds.isna()).fillna(False).to_numpy(dtype=bool)
+            else:
+                digits = re.findall(r'\d+', bedrooms)
+                if digits:
+                    mask &= beds.str.contains(digits[0], regex=False, na=False).to_numpy(dtype=bool)
+
+        status = filters.get('status')
+        if self.search_type == 'buy' and status and 'Any' not in status:
+            mask &= (text_column('status') == status).fillna(False).to_numpy(dtype=bool)
+
+        area = filters.get('area')
+        if area:
+            mask &= text_column('area').str.contains(area, regex=False, na=False).to_numpy(dtype=bool)
+        return mask
+
+    def sketch(self, segment_mask):
+        """Merged sketch of the selected segments"""
+        selected = np.flatnonzero(segment_mask)
+        return QuantileSketch.from_buckets(self.buckets[self.buckets['segment'].isin(selected)])
+
+
+def build_segment_sketches(engine, search_type, column_map):
+    """Run the aggregation query and return the resulting SegmentSketchStore (raises on failure)"""
+    start = time.time()
+    with engine.connect() as conn:
+        rows = pd.read_sql_query(sketch_query(search_type, column_map), conn, params={'log_gamma': LOG_GAMMA})
+    store = SegmentSketchStore(rows, search_type)
+    print(f"✅ AVM sketches ({search_type}): {len(store.segments):,} segments, "
+          f"{len(store.buckets):,} buckets in {time.time() - start:.1f}s")
+    return store
+
+
+def load_segment_sketches(engine, search_type, column_map, max_age=SKETCH_TTL_SECONDS):
+    """
+    Segment sketches for ``search_type``, rebuilt when older than ``max_age`` seconds.
+
+    The rebuild (a GROUP BY over the whole table) runs on a background thread;
+    requests never wait for it and get the previous store meanwhile.
+
+    Returns:
+        SegmentSketchStore, or None until the first build has finished (or
+        while builds fail)
+    """
+    if engine is None:
+        return _sketches.peek(search_type)
+    return _sketches.get(lambda: build_segment_sketches(engine, search_type, column_map),
+                         key=search_type, max_age=max_age)
+
+
+def _user_budget(filters):
+    """Budget / annual rent cap from the filters; missing or non-numeric values mean no cap"""
+    for key in ('budget', 'annual_rent'):
+        try:
+            value = float(filters.get(key) or 0)
+        except (TypeError, ValueError):
+            continue
+        if value and not math.isnan(value):
+            return value
+    return NO_BUDGET
+
+
+def avm_metrics_from_sketches(store, search_type, filters, thresholds):
+    """
+    AVM metrics in the calculate_avm_metrics shape, from merged sketches.
+
+    Statistics cover the filtered market within the realistic price bounds and
+    the user's budget (the rows the search endpoints would return); the budget
+    percentile is measured against the market without the budget cap.
+
+    Args:
+        store: SegmentSketchStore for search_type
+        search_type: 'buy' or 'rent'
+        filters: Search filters (propertyType, bedrooms, status, area, budget/annual_rent)
+        thresholds: (min_price, max_price, extreme_max) outlier bounds
+
+    Returns:
+        Metrics dict, or None when no matching prices
+    """
+    min_price, max_price, extreme_max = thresholds
+    user_budget = _user_budget(filters)
+
+    segment_mask = store.segment_mask(filters)
+    candidates = store.sketch(segment_mask).clip(high=user_budget)
+    market = store.sketch(segment_mask).clip(min_price, max_price)
+    filtered = candidates.clip(min_price, max_price)
+    total_count = filtered.count
+    if total_count < 1:
+        return None
+
+    price_stats = {
+        'median_price': filtered.quantile(0.5),
+        'mean_price': filtered.mean(),
+        'std_price': filtered.std(),
+        'min_price': filtered.min(),
+        'max_price': filtered.max(),
+        'q1_price': filtered.quantile(0.25),
+        'q3_price': filtered.quantile(0.75),
+    }
+    original_count = candidates.count
+    outlier_stats = {
+        'total_outliers': round(original_count - total_count),
+        'outlier_percentage': (original_count - total_count) / original_count * 100 if original_count > 0 else 0,
+        'low_outliers': round(original_count - candidates.clip(low=min_price).count),
+        'high_outliers': round(original_count - candidates.rank(max_price)),
+        'extreme_outliers': round(original_count - candidates.rank(extreme_max)),
+        'original_count': round(original_count),
+        'filtered_count': round(total_count),
+        'min_threshold': min_price,
+        'max_threshold': max_price,
+    }
+
+    area_analysis = None
+    if filters.get('area'):
+        area_mask = segment_mask & store.segments['area'].astype('string').str.contains(
+            filters['area'], case=False, regex=False, na=False).to_numpy(dtype=bool)
+        area_candidates = store.sketch(area_mask).clip(high=user_budget)
+        area_filtered = area_candidates.clip(min_price, max_price)
+        if area_filtered.count >= 1:
+            area_median = area_filtered.quantile(0.5)
+            area_analysis = {
+                'area_median': area_median,
+                'area_count': round(area_filtered.count),
+                'vs_market': (area_median - price_stats['median_price']) / price_stats['median_price'] * 100,
+                'area_outliers_removed': round(area_candidates.count - area_filtered.count),
+            }
+
+    return {
+        'stats': price_stats,
+        'budget_percentile': min(market.rank(user_budget) / market.count * 100, 100.0) if market.count else 100.0,
+        'affordable_count': round(filtered.rank(user_budget * 0.8)),
+        'optimal_count': round(filtered.rank(user_budget) - filtered.rank(user_budget * 0.8)),
+        'total_count': round(total_count),
+        'price_volatility': price_stats['std_price'] / price_stats['mean_price'] * 100 if price_stats['mean_price'] > 0 else 0,
+        'area_analysis': area_analysis,
+        'outlier_info': outlier_stats,
+        'source': 'sketch',
+    }
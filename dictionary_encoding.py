@@ -0,0 +1,145 @@
+"""
+Shared dictionary encoding for low-cardinality text columns.
+
+Area, property type, bedrooms, status and project names repeat across
+hundreds of thousands of rows. Frames loaded from the database or the
+snapshots convert them to pandas Categorical against one process-wide
+dictionary per column, so every frame stores small int codes that mean the
+same thing everywhere. The mask helpers evaluate a predicate once per
+distinct value and then filter rows by integer code.
+
+Dictionaries are append-only: new values extend the categories and never
+renumber existing ones, so codes already handed out stay valid.
+"""
+import threading
+import numpy as np
+import pandas as pd
+
+# Encoded columns and the dictionary they share (dataset aliases map to the
+# same dictionary as the raw table columns)
+ENCODED_COLUMNS = {
+    'area_en': 'area_en',
+    'area_name_en': 'area_en',
+    'prop_type_en': 'prop_type_en',
+    'property_type_en': 'prop_type_en',
+    'rooms_en': 'rooms_en',
+    'is_offplan_en': 'is_offplan_en',
+    'project_en': 'project_en',
+}
+
+_dictionaries = {}  # dictionary name -> CategoricalDtype
+_lock = threading.Lock()
+
+
+def get_dictionary(column):
+    """Current CategoricalDtype for ``column`` (None if nothing encoded yet)"""
+    return _dictionaries.get(ENCODED_COLUMNS.get(column, column))
+
+
+def _extend_dictionary(name, values):
+    """Append unseen ``values`` to dictionary ``name`` and return its dtype"""
+    with _lock:
+        dtype = _dictionaries.get(name)
+        known = dtype.categories if dtype is not None else pd.Index([], dtype=object)
+        values = pd.Index(values, dtype=object)
+        new = values[~values.isin(known)]
+        if dtype is None or len(new):
+            dtype = pd.CategoricalDtype(known.append(new.unique()))
+            _dictionaries[name] = dtype
+        return dtype
+
+
+def encode_column(values, column):
+    """
+    Encode one column against its shared dictionary.
+
+    Args:
+        values: Series of strings (or an existing Categorical)
+        column: Column name; selects the shared dictionary
+
+    Returns:
+        Categorical Series with the shared dtype; missing values stay missing
+    """
+    name = ENCODED_COLUMNS.get(column, column)
+    values = pd.Series(values, copy=False)
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        if values.dtype is _dictionaries.get(name):
+            return values
+        categories = values.cat.categories
+        if not categories.empty and categories.inferred_type != 'string':
+            categories = categories.astype(str)
+            values = values.cat.rename_categories(categories)
+        dtype = _extend_dictionary(name, categories)
+        # Dictionary is a superset: this only remaps codes
+        return values.cat.set_categories(dtype.categories)
+
+    strings = values.map(lambda v: None if pd.isna(v) else str(v))
+    dtype = _extend_dictionary(name, strings.dropna().unique())
+    return pd.Series(pd.Categorical(strings, dtype=dtype), index=values.index, name=values.name)
+
+
+def encode_frame(df, columns=None):
+    """
+    Encode every known low-cardinality column present in ``df``.
+
+    Args:
+        df: DataFrame to encode (modified in place and returned)
+        columns: Optional subset of column names
+
+    Returns:
+        ``df`` with encoded columns
+    """
+    for column in columns or ENCODED_COLUMNS:
+        if column in df.columns:
+            df[column] = encode_column(df[column], column)
+    return df
+
+
+def _code_mask(series, category_hits):
+    """Row mask from a boolean hit array over the series' categories"""
+    codes = series.cat.codes.to_numpy()
+    hits = np.append(np.asarray(category_hits, dtype=bool), False)  # Code -1 (missing) never matches
+    return hits[codes]
+
+
+def equals_mask(series, value, case=False):
+    """
+    Rows equal to ``value`` (case-insensitive by default).
+
+    Categorical series compare the dictionary once and select by code;
+    plain string series fall back to a row-wise comparison.
+    """
+    value = str(value)
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        categories = series.cat.categories.astype(str)
+        hits = categories.str.lower() == value.lower() if not case else categories == value
+        return _code_mask(series, hits)
+    strings = series.astype('string')
+    if not case:
+        return (strings.str.lower() == value.lower()).fillna(False).to_numpy(dtype=bool)
+    return (strings == value).fillna(False).to_numpy(dtype=bool)
+
+
+def contains_mask(series, pattern, case=False, regex=True):
+    """Rows containing ``pattern`` (same semantics as ``Series.str.contains``, missing never matches)"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        categories = pd.Series(series.cat.categories.astype(str))
+        hits = categories.str.contains(pattern, case=case, regex=regex, na=False)
+        return _code_mask(series, hits.to_numpy())
+    return series.str.contains(pattern, case=case, regex=regex, na=False).to_numpy(dtype=bool)
+
+
+def lower_codes(series):
+    """
+    Integer codes of the lowercased values, for case-insensitive group-bys.
+
+    Returns:
+        (codes, names): codes is an int array (-1 for missing), names the
+        lowercased value for each code
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        lowered = pd.Series(series.cat.categories.astype(str)).str.lower()
+        category_codes, names = pd.factorize(lowered)
+        category_codes = np.append(category_codes, -1)
+        return category_codes[series.cat.codes.to_numpy()], names
+    return pd.factorize(series.astype('string').str.lower(), use_na_sentinel=True)
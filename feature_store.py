@@ -0,0 +1,309 @@
+"""
+Rental-context feature store for the XGBoost price model.
+
+The model's median_rent_nearby, rental_availability and rent_to_price_ratio
+features used to be left at 0 at inference. They are now precomputed per
+market segment by a batch job (scripts/refresh_feature_store.py, run after
+the data ingest) into the ml_context_features table and a Parquet copy:
+
+    median_rent_nearby   median annual rent of recent rental contracts
+    rental_availability  number of recent rental contracts
+    rent_to_price_ratio  median_rent_nearby / median recent sale price
+
+Segments are (area, property type, bedrooms). A level only counts when it has
+at least MIN_RENTALS contracts, otherwise the lookup falls back to
+(area, type) and then to the whole area. Workers keep the table in memory
+(re-read every FEATURE_STORE_TTL seconds), so inference adds dictionary
+lookups but no queries.
+
+Training must not use that latest snapshot: it would give old transactions
+rents from after their sale, and its sale medians include the validation and
+test targets. compute_monthly_context_features() instead builds the same
+segment levels as of every transaction month, from the TRAINING_LOOKBACK_MONTHS
+before it and from training-split sales only; ContextFeatureHistory joins
+them per row with the same lookup fallbacks as serving.
+"""
+import os
+import re
+import hashlib
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from worker_cache import WorkerCache
+
+FEATURE_STORE_TABLE = 'ml_context_features'
+FEATURE_STORE_PATH = os.getenv('FEATURE_STORE_PATH', 'data/feature_store/context_features.parquet')
+FEATURE_STORE_TTL = int(os.getenv('FEATURE_STORE_TTL', '3600'))
+FEATURE_STORE_RETRY_SECONDS = 300  # Wait after a failed load before trying again
+CONTEXT_FEATURES = ['median_rent_nearby', 'rental_availability', 'rent_to_price_ratio']
+LOOKBACK_DAYS = 365  # Window before the latest contract/transaction in the data
+TRAINING_LOOKBACK_MONTHS = 12  # Point-in-time window before each transaction month
+MIN_RENTALS = 5  # Contracts needed before a segment level is trusted
+RENT_BOUNDS = (10_000, 5_000_000)  # Same realistic ranges as the valuation queries
+SALE_BOUNDS = (100_000, 50_000_000)
+ANY_TYPE = '*'  # Key value for "all property types"
+ANY_BEDROOMS = -1  # Key value for "all bedroom counts"
+KEY_COLUMNS = ['area', 'prop_type', 'bedrooms']
+_ROOMS_PATTERN = re.compile(r'(\d+)')
+
+_features = WorkerCache('ML context features', FEATURE_STORE_TTL, FEATURE_STORE_RETRY_SECONDS)
+
+
+def bedroom_key(rooms):
+    """Bedroom count from '2 B/R' / 'Studio' / 3, None when unknown"""
+    if rooms is None or (isinstance(rooms, float) and np.isnan(rooms)):
+        return None
+    if isinstance(rooms, (int, float, np.integer, np.floating)):
+        return int(rooms)
+    rooms = str(rooms)
+    if rooms.strip().lower().startswith('studio'):
+        return 0
+    match = _ROOMS_PATTERN.search(rooms)
+    return int(match.group(1)) if match else None
+
+
+def _text_key(value):
+    return str(value).strip().lower() if isinstance(value, str) else None
+
+
+def month_index(dates):
+    """Calendar month numbers (year * 12 + month - 1) as floats, NaN where the date is missing"""
+    dates = pd.to_datetime(pd.Series(dates), errors='coerce')
+    return (dates.dt.year * 12 + dates.dt.month - 1).to_numpy(float)
+
+
+def _segment_frame(df, rooms_column, amount_column, date_column, bounds, lookback_days):
+    """Recent rows within ``bounds`` with normalized (area, prop_type, bedrooms) keys and their month"""
+    amounts = pd.to_numeric(df[amount_column], errors='coerce')
+    keep = amounts.between(*bounds)
+    if date_column in df.columns and lookback_days:
+        dates = pd.to_datetime(df[date_column], errors='coerce')
+        keep &= dates.isna() | (dates >= dates.max() - pd.Timedelta(days=lookback_days))
+    rows = df[keep]
+    bedrooms = rows[rooms_column].astype(object).map(bedroom_key) if rooms_column in rows.columns else None
+    return pd.DataFrame({
+        'area': rows['area_en'].astype(object).map(_text_key),
+        'prop_type': rows['prop_type_en'].astype(object).map(_text_key),
+        'bedrooms': pd.array(bedrooms if bedrooms is not None else [None] * len(rows), dtype='Int64'),
+        'amount': amounts[keep].to_numpy(float),
+        'month': month_index(rows[date_column]) if date_column in rows.columns else np.full(len(rows), np.nan),
+    })
+
+
+def compute_context_features(sales, rentals, lookback_days=LOOKBACK_DAYS, min_rentals=MIN_RENTALS):
+    """
+    Context features for every segment level.
+
+    Args:
+        sales: properties rows (area_en, prop_type_en, rooms_en, trans_value, instance_date)
+        rentals: rentals rows (area_en, prop_type_en, rooms, annual_amount, registration_date)
+        lookback_days: Only contracts/transactions this recent count (None: all)
+        min_rentals: Minimum contracts for a segment row
+
+    Returns:
+        DataFrame with KEY_COLUMNS + CONTEXT_FEATURES; coarser levels use
+        ANY_TYPE / ANY_BEDROOMS in the keys they aggregate over
+    """
+    rents = _segment_frame(rentals, 'rooms', 'annual_amount', 'registration_date', RENT_BOUNDS, lookback_days)
+    sales = _segment_frame(sales, 'rooms_en', 'trans_value', 'instance_date', SALE_BOUNDS, lookback_days)
+    return _aggregate_levels(rents, sales, min_rentals)
+
+
+def compute_monthly_context_features(sales, rentals, months, lookback_months=TRAINING_LOOKBACK_MONTHS,
+                                     min_rentals=MIN_RENTALS):
+    """
+    Point-in-time context features for training, one segment table per month.
+
+    Features for month M only use contracts and sales from the ``lookback_months``
+    months before M, so no transaction sees its own month or anything later.
+
+    Args:
+        sales: Training-split properties rows only (the ratio's sale median must
+            not include validation/test targets)
+        rentals: rentals rows (area_en, prop_type_en, rooms, annual_amount, registration_date)
+        months: month_index() values to compute (NaN ignored)
+        lookback_months: Window length in months
+        min_rentals: Minimum contracts for a segment row
+
+    Returns:
+        DataFrame with 'month' + KEY_COLUMNS + CONTEXT_FEATURES
+    """
+    rents = _segment_frame(rentals, 'rooms', 'annual_amount', 'registration_date', RENT_BOUNDS, None)
+    sales = _segment_frame(sales, 'rooms_en', 'trans_value', 'instance_date', SALE_BOUNDS, None)
+    rents = rents.dropna(subset=['month']).sort_values('month', kind='stable')
+    sales = sales.dropna(subset=['month']).sort_values('month', kind='stable')
+
+    def window(rows, month):
+        start, end = np.searchsorted(rows['month'].to_numpy(), [month - lookback_months, month])
+        return rows.iloc[start:end]
+
+    frames = []
+    for month in np.unique(np.asarray(months, dtype=float)):
+        if np.isnan(month):
+            continue
+        features = _aggregate_levels(window(rents, month), window(sales, month), min_rentals)
+        frames.append(features.assign(month=int(month)))
+    if not frames:
+        return pd.DataFrame(columns=['month'] + KEY_COLUMNS + CONTEXT_FEATURES)
+    return pd.concat(frames, ignore_index=True)[['month'] + KEY_COLUMNS + CONTEXT_FEATURES]
+
+
+def _aggregate_levels(rents, sales, min_rentals):
+    """Rent median/count and rent-to-price ratio at every segment level of the given rows"""
+    levels = []
+    for keys in (KEY_COLUMNS, ['area', 'prop_type'], ['area']):
+        rent_stats = rents.groupby(keys)['amount'].agg(median_rent_nearby='median', rental_availability='size')
+        sale_median = sales.groupby(keys)['amount'].median().rename('median_price')
+        level = rent_stats.join(sale_median, how='left').reset_index()
+        if 'prop_type' not in keys:
+            level['prop_type'] = ANY_TYPE
+        if 'bedrooms' not in keys:
+            level['bedrooms'] = ANY_BEDROOMS
+        levels.append(level)
+
+    features = pd.concat(levels, ignore_index=True)
+    features = features[features['rental_availability'] >= min_rentals]
+    features['rent_to_price_ratio'] = (features['median_rent_nearby'] / features['median_price']).fillna(0.0)
+    features['bedrooms'] = features['bedrooms'].astype(int)
+    features['rental_availability'] = features['rental_availability'].astype(int)
+    return features[KEY_COLUMNS + CONTEXT_FEATURES].reset_index(drop=True)
+
+
+class ContextFeatureStore:
+    """In-memory segment -> context feature map with fallback lookups"""
+
+    def __init__(self, rows=None):
+        rows = rows if rows is not None else pd.DataFrame(columns=KEY_COLUMNS + CONTEXT_FEATURES)
+        values = rows[CONTEXT_FEATURES].to_numpy(float).tolist()
+        keys = zip(rows['area'], rows['prop_type'], rows['bedrooms'].astype(int))
+        self.features = {key: dict(zip(CONTEXT_FEATURES, row)) for key, row in zip(keys, values)}
+
+    def __len__(self):
+        return len(self.features)
+
+    def lookup(self, area, prop_type, rooms):
+        """
+        Features of the most specific segment with data.
+
+        Returns:
+            dict of CONTEXT_FEATURES, or None when the area is unknown
+        """
+        area, prop_type, bedrooms = _text_key(area), _text_key(prop_type), bedroom_key(rooms)
+        if area is None:
+            return None
+        if prop_type is not None and bedrooms is not None:
+            features = self.features.get((area, prop_type, bedrooms))
+            if features:
+                return features
+        if prop_type is not None:
+            features = self.features.get((area, prop_type, ANY_BEDROOMS))
+            if features:
+                return features
+        return self.features.get((area, ANY_TYPE, ANY_BEDROOMS))
+
+    def enrich(self, records):
+        """
+        Property dicts with context features filled in (values already set are kept).
+
+        Records without a matching segment are returned unchanged.
+        """
+        if not self.features:
+            return records
+        enriched = []
+        for record in records:
+            features = self.lookup(record.get('area_en'), record.get('prop_type_en'), record.get('rooms_en'))
+            if features:
+                record = {**features, **record}
+            enriched.append(record)
+        return enriched
+
+    def enrich_frame(self, df, rooms_column='rooms_en'):
+        """
+        Add CONTEXT_FEATURES columns to a training frame (0 where no segment matches).
+
+        Lookups run once per distinct (area, type, rooms) combination.
+        """
+        df = df.copy()
+        rooms = df[rooms_column] if rooms_column in df.columns else pd.Series(None, index=df.index, dtype=object)
+        keys = pd.DataFrame({'area_en': df['area_en'].astype(object), 'prop_type_en': df['prop_type_en'].astype(object),
+                             'rooms_en': rooms.astype(object)})
+        codes, uniques = pd.factorize(pd.MultiIndex.from_frame(keys.fillna('')))
+        looked_up = [self.lookup(*(None if value == '' else value for value in key)) or {} for key in uniques]
+        for feature in CONTEXT_FEATURES:
+            values = np.array([features.get(feature, 0.0) for features in looked_up], dtype=float)
+            df[feature] = values[codes] if len(values) else 0.0
+        return df
+
+
+class ContextFeatureHistory:
+    """Point-in-time context features for training frames: one ContextFeatureStore per month"""
+
+    def __init__(self, rows):
+        self.stores = {int(month): ContextFeatureStore(group.drop(columns='month'))
+                       for month, group in rows.groupby('month')}
+        # Content hash of the feature rows (part of training feature-cache keys)
+        row_hashes = pd.util.hash_pandas_object(rows[['month'] + KEY_COLUMNS + CONTEXT_FEATURES], index=False)
+        self.signature = hashlib.sha1(row_hashes.to_numpy().tobytes()).hexdigest()[:16]
+
+    def __len__(self):
+        return len(self.stores)
+
+    def enrich_frame(self, df, rooms_column='rooms_en', date_column='instance_date'):
+        """
+        Add CONTEXT_FEATURES columns as of each row's month (0 where no segment matches).
+
+        Rows without a date, or in a month without features, get 0 as well.
+        """
+        df = df.copy()
+        for feature in CONTEXT_FEATURES:
+            df[feature] = 0.0
+        months = month_index(df[date_column]) if date_column in df.columns else np.full(len(df), np.nan)
+        for month in np.unique(months[~np.isnan(months)]):
+            store = self.stores.get(int(month))
+            if store is None:
+                continue
+            rows = months == month
+            df.loc[rows, CONTEXT_FEATURES] = store.enrich_frame(df[rows], rooms_column)[CONTEXT_FEATURES].to_numpy()
+        return df
+
+
+def save_features(features, path=FEATURE_STORE_PATH):
+    """Write compute_context_features() output to Parquet (write + rename)"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    features.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def read_features(engine=None, path=FEATURE_STORE_PATH):
+    """Feature rows from the database table, else from the Parquet copy; None if neither exists"""
+    if engine is not None:
+        try:
+            with engine.connect() as conn:
+                return pd.read_sql_query(
+                    text(f"SELECT {', '.join(KEY_COLUMNS + CONTEXT_FEATURES)} FROM {FEATURE_STORE_TABLE}"), conn)
+        except Exception as e:
+            print(f"⚠️ Feature store table unavailable: {e}")
+    if os.path.exists(path):
+        return pd.read_parquet(path)
+    return None
+
+
+def _read_store(engine, path):
+    rows = read_features(engine, path)
+    if rows is None:
+        raise FileNotFoundError(f"no {FEATURE_STORE_TABLE} table or {path}")
+    store = ContextFeatureStore(rows)
+    print(f"✅ ML context features: {len(store):,} segments")
+    return store
+
+
+def load_context_features(engine, path=FEATURE_STORE_PATH, max_age=FEATURE_STORE_TTL):
+    """
+    Context feature store for this worker, re-read when older than ``max_age`` seconds.
+
+    Returns:
+        ContextFeatureStore (empty when no features have been computed yet)
+    """
+    return _features.get(lambda: _read_store(engine, path), max_age=max_age) or ContextFeatureStore()
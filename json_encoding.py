@@ -0,0 +1,131 @@
+"""
+Shared JSON response encoding for DataFrames and NumPy values.
+
+Endpoints return query results straight from pandas. Instead of copying each
+frame with ``replace({np.nan: None})`` and building records row by row, frames
+are converted column-wise (NaN/NaT become None in one pass per column) and
+serialized with orjson when it is installed. NumPy scalars and arrays,
+Decimal, pandas Timestamps and missing markers are handled by the encoder
+itself, so no endpoint needs per-field NaN guards before calling jsonify.
+
+Without orjson the standard library encoder is used; values are normalized to
+builtins first because it would otherwise write NaN as an invalid token.
+"""
+import json
+import math
+import datetime
+import decimal
+import numpy as np
+import pandas as pd
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # Optional: falls back to the standard library encoder
+    orjson = None
+
+ORJSON_OPTIONS = (orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+
+def _column_values(column):
+    """One DataFrame column as a list of JSON-ready builtins (missing -> None)"""
+    dtype = column.dtype
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        values = column.map(lambda v: v.isoformat(), na_action='ignore')
+    elif isinstance(dtype, pd.CategoricalDtype):
+        values = column.astype(object)
+    else:
+        values = column
+    missing = values.isna().to_numpy()
+    values = values.to_numpy(dtype=object)
+    if missing.any():
+        values = np.where(missing, None, values)
+    return values.tolist()
+
+
+def frame_records(df):
+    """
+    DataFrame as a list of record dicts, converted column by column.
+
+    Args:
+        df: DataFrame to convert (not modified)
+
+    Returns:
+        List of dicts with builtin values; NaN/NaT/NA become None and
+        datetimes become ISO 8601 strings
+    """
+    if df is None or df.empty:
+        return []
+    names = [str(name) for name in df.columns]
+    columns = [_column_values(df.iloc[:, i]) for i in range(df.shape[1])]
+    return [dict(zip(names, row)) for row in zip(*columns)]
+
+
+def default(obj):
+    """Encode values json/orjson do not handle natively"""
+    if obj is None or obj is pd.NaT or obj is pd.NA:
+        return None
+    if isinstance(obj, pd.DataFrame):
+        return frame_records(obj)
+    if isinstance(obj, (pd.Series, pd.Index)):
+        return _column_values(pd.Series(obj))
+    if isinstance(obj, np.ndarray):
+        return _to_builtin(obj.tolist())
+    if isinstance(obj, np.generic):
+        return _to_builtin(obj.item())
+    if isinstance(obj, decimal.Decimal):
+        return None if obj.is_nan() else float(obj)
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _to_builtin(obj):
+    """Recursively normalize ``obj`` for the standard library encoder"""
+    if isinstance(obj, float):
+        return None if math.isnan(obj) or math.isinf(obj) else obj
+    if isinstance(obj, (str, int, bool)) or obj is None:
+        return obj
+    if isinstance(obj, dict):
+        return {k if isinstance(k, str) else str(_to_builtin(k)): _to_builtin(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_to_builtin(v) for v in obj]
+    return _to_builtin(default(obj))
+
+
+def dumps(obj, indent=None, sort_keys=False):
+    """
+    Serialize ``obj`` to a JSON string.
+
+    Args:
+        obj: Value to encode (DataFrames, NumPy values and Decimal allowed)
+        indent: Pretty-print with 2-space indentation when truthy
+        sort_keys: Sort object keys
+
+    Returns:
+        JSON text; NaN/Infinity/NaT are written as null
+    """
+    if orjson is not None:
+        options = ORJSON_OPTIONS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        if sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=default, option=options).decode()
+    return json.dumps(_to_builtin(obj), indent=indent, sort_keys=sort_keys,
+                      ensure_ascii=False, allow_nan=False)
+
+
+class ResponseJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that routes jsonify/app.json.dumps through dumps()"""
+    sort_keys = False
+
+    def dumps(self, obj, **kwargs):
+        return dumps(obj, indent=kwargs.get('indent'), sort_keys=kwargs.get('sort_keys', self.sort_keys))
+
+    def loads(self, s, **kwargs):
+        if orjson is not None:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
@@ -0,0 +1,304 @@
+"""
+Redis sorted-set leaderboards for area rankings.
+
+For every (search type, period, segment) the monthly rollup is condensed into
+one sorted set per ranking metric plus a hash of per-area counters:
+
+    leaderboard:{search_type}:{period}:{metric}:{segment}   ZSET area -> score
+    leaderboard:{search_type}:{period}:stats:{segment}      HASH area|field -> value
+
+metric is 'volume' (transactions), 'price_per_sqm' (average) or 'growth'
+(price/sqm change between the first and last months of the period); segment
+is '{property_type}|{bedrooms}' with '*' for any. Rankings are then a
+ZREVRANGE plus one HMGET instead of a GROUP BY over the period.
+
+publish_leaderboards() rebuilds every key from the rollup after each refresh
+(scripts/refresh_trend_rollups.py), writing temporary keys and renaming them
+so readers never see a half-built board. Between rebuilds record_transactions()
+applies new transactions incrementally (counters, volume and price/sqm
+scores; growth and window expiry catch up at the next rebuild).
+"""
+import re
+import time
+import pandas as pd
+
+from trend_rollups import PERIOD_MONTHS, PRICE_BOUNDS, ROLLUPS
+
+LEADERBOARD_PREFIX = 'leaderboard'
+LEADERBOARD_METRICS = ('volume', 'price_per_sqm', 'growth')
+LEADERBOARD_TTL_SECONDS = 2 * 24 * 3600  # Boards of segments that disappear age out
+MIN_TRANSACTIONS = 5  # Same threshold as the SQL ranking
+MAX_BEDROOM_BUCKET = 5  # '5+ Bedrooms'
+ANY = '*'
+STAT_FIELDS = ('count', 'price_sum', 'sqm_sum', 'sqm_count')
+TOTAL_FIELD = '|total'
+
+_ROOMS_PATTERN = re.compile(r'(\d+)')
+
+
+def bedroom_bucket(rooms):
+    """'Studio' -> '0', '2 B/R' / '2 Bedrooms' -> '2', 6+ -> '5'; ANY when unknown"""
+    if rooms is None or (isinstance(rooms, float) and rooms != rooms):
+        return ANY
+    rooms = str(rooms).strip()
+    if not rooms or rooms.lower().startswith('any'):
+        return ANY
+    if rooms.lower().startswith('studio'):
+        return '0'
+    match = _ROOMS_PATTERN.search(rooms)
+    return str(min(int(match.group(1)), MAX_BEDROOM_BUCKET)) if match else ANY
+
+
+def _row_bedrooms(rooms):
+    """Bucket of a stored rooms_en value; NULL counts as a studio like the SQL filter"""
+    if rooms is None or (isinstance(rooms, float) and rooms != rooms) or not str(rooms).strip():
+        return '0'
+    bucket = bedroom_bucket(rooms)
+    return bucket if bucket != ANY else None
+
+
+def segment_key(property_type=None, bedrooms=None):
+    """Segment part of a leaderboard key ('Unit|2', '*|*')"""
+    property_type = str(property_type).strip() if property_type else ''
+    if not property_type or 'All Types' in property_type:
+        property_type = ANY
+    return f"{property_type}|{bedroom_bucket(bedrooms)}"
+
+
+def board_key(search_type, period, metric, segment):
+    return f"{LEADERBOARD_PREFIX}:{search_type}:{period}:{metric}:{segment}"
+
+
+def _month_index(values):
+    months = pd.to_datetime(pd.Series(values))
+    return (months.dt.year * 12 + months.dt.month - 1).to_numpy()
+
+
+def _segment_rows(rows, search_type):
+    """Rollup rows repeated under every segment they belong to (type/bedroom or ANY)"""
+    df = rows.copy()
+    df['month_index'] = _month_index(df['month'])
+    if search_type == 'buy':
+        df['bedrooms'] = df['rooms_en'].map(_row_bedrooms)
+        types = [df.assign(segment_type=df['prop_type_en']), df.assign(segment_type=ANY)]
+        frames = [frame for t in types for frame in (
+            t[t['bedrooms'].notna()].assign(segment_bedrooms=lambda f: f['bedrooms']),
+            t.assign(segment_bedrooms=ANY))]
+    else:
+        # Rental type filters match prop_type_en OR prop_sub_type_en (build_where_clause)
+        sub_types = df[df['prop_sub_type_en'].notna() & (df['prop_sub_type_en'] != df['prop_type_en'])]
+        frames = [df.assign(segment_type=df['prop_type_en']),
+                  sub_types.assign(segment_type=sub_types['prop_sub_type_en']),
+                  df.assign(segment_type=ANY)]
+        frames = [f.assign(segment_bedrooms=ANY) for f in frames]
+    segmented = pd.concat(frames, ignore_index=True)
+    segmented = segmented[segmented['segment_type'].notna() & (segmented['segment_type'] != '')]
+    segmented['segment'] = segmented['segment_type'].astype(str).str.strip() + '|' + segmented['segment_bedrooms']
+    return segmented[segmented['area_en'].notna() & (segmented['area_en'] != '')]
+
+
+def compute_leaderboards(rows, search_type, current_month=None):
+    """
+    Per-area ranking stats for every period and segment.
+
+    Args:
+        rows: Rollup rows (month, area_en, dimension columns, transaction_count,
+              price_sum, price_per_sqm_sum, price_per_sqm_count)
+        search_type: 'buy' or 'rent'
+        current_month: Month index (year * 12 + month - 1) periods end at (default: now)
+
+    Returns:
+        {(period, segment): DataFrame indexed by area with count, price_sum, sqm_sum,
+         sqm_count and growth (NaN when a period end has too few sales)}
+    """
+    if current_month is None:
+        now = time.localtime()
+        current_month = now.tm_year * 12 + now.tm_mon - 1
+    segmented = _segment_rows(rows, search_type).rename(columns={
+        'transaction_count': 'count', 'price_per_sqm_sum': 'sqm_sum', 'price_per_sqm_count': 'sqm_count'})
+    measures = ['count', 'price_sum', 'sqm_sum', 'sqm_count']
+
+    boards = {}
+    for period, months in PERIOD_MONTHS.items():
+        start = current_month - months if months is not None else segmented['month_index'].min()
+        window = segmented[segmented['month_index'] >= start]
+        if window.empty:
+            continue
+        stats = window.groupby(['segment', 'area_en'])[measures].sum()
+
+        # Growth: price/sqm in the first vs last block of the period
+        block = max(1, min(3, (current_month - start + 1) // 3))
+        first = window[window['month_index'] < start + block].groupby(['segment', 'area_en'])[['sqm_sum', 'sqm_count']].sum()
+        last = window[window['month_index'] > current_month - block].groupby(['segment', 'area_en'])[['sqm_sum', 'sqm_count']].sum()
+        first = first[first['sqm_count'] >= MIN_TRANSACTIONS]
+        last = last[last['sqm_count'] >= MIN_TRANSACTIONS]
+        first_ppsqm = first['sqm_sum'] / first['sqm_count']
+        last_ppsqm = last['sqm_sum'] / last['sqm_count']
+        stats['growth'] = ((last_ppsqm - first_ppsqm) / first_ppsqm * 100).reindex(stats.index)
+
+        for segment, frame in stats.groupby(level='segment'):
+            boards[(period, segment)] = frame.droplevel('segment')
+    return boards
+
+
+def publish_leaderboards(client, boards, search_type, ttl=LEADERBOARD_TTL_SECONDS):
+    """
+    Write computed boards to Redis, swapping each key in atomically.
+
+    Returns:
+        Number of leaderboards (sorted sets) written
+    """
+    written = 0
+    pipe = client.pipeline(transaction=False)
+    for (period, segment), stats in boards.items():
+        ranked = stats[stats['count'] >= MIN_TRANSACTIONS]
+        scores = {
+            'volume': ranked['count'],
+            'price_per_sqm': (ranked['sqm_sum'] / ranked['sqm_count'])[ranked['sqm_count'] > 0],
+            'growth': ranked['growth'].dropna(),
+        }
+        counters = {f"{area}|{field}": float(stats.at[area, field]) for area in stats.index for field in STAT_FIELDS}
+        counters[TOTAL_FIELD] = float(stats['count'].sum())
+        items = [(board_key(search_type, period, metric, segment), 'zset', {str(a): float(s) for a, s in values.items()})
+                 for metric, values in scores.items()]
+        items.append((board_key(search_type, period, 'stats', segment), 'hash', counters))
+
+        for key, kind, mapping in items:
+            if not mapping:
+                pipe.delete(key)
+                continue
+            tmp_key = f"{key}:building"
+            pipe.delete(tmp_key)
+            if kind == 'zset':
+                pipe.zadd(tmp_key, mapping)
+                written += 1
+            else:
+                pipe.hset(tmp_key, mapping=mapping)
+            pipe.expire(tmp_key, ttl)
+            pipe.rename(tmp_key, key)
+    pipe.execute()
+    return written
+
+
+def refresh_leaderboards(engine, client, search_type):
+    """Rebuild one search type's leaderboards from its monthly rollup"""
+    config = ROLLUPS[search_type]
+    columns = ', '.join(f'"{col}"' for col in config['dimensions'])
+    query = (f"SELECT month, {columns}, transaction_count, price_sum, price_per_sqm_sum, price_per_sqm_count "
+             f"FROM {config['table']}")
+    with engine.connect() as conn:
+        rows = pd.read_sql_query(query, conn)
+    return publish_leaderboards(client, compute_leaderboards(rows, search_type), search_type)
+
+
+def top_areas(client, search_type, period, metric='volume', segment='*|*', limit=10):
+    """
+    Ranked areas from Redis in the /api/top-areas format.
+
+    Returns:
+        List of area dicts (best first), or None when the board has not been built
+    """
+    key = board_key(search_type, period, metric, segment)
+    pipe = client.pipeline(transaction=False)
+    pipe.exists(key)
+    pipe.zrevrange(key, 0, limit - 1, withscores=True)
+    exists, ranked = pipe.execute()
+    if not exists:
+        return None
+
+    areas = [area for area, _ in ranked]
+    fields = [f"{area}|{field}" for area in areas for field in STAT_FIELDS] + [TOTAL_FIELD]
+    values = [float(v) if v is not None else 0.0
+              for v in client.hmget(board_key(search_type, period, 'stats', segment), fields)]
+    total = values[-1]
+
+    results = []
+    for i, (area, score) in enumerate(ranked):
+        count, price_sum, sqm_sum, sqm_count = values[i * 4:(i + 1) * 4]
+        entry = {
+            'area_name': area,
+            'transaction_count': int(count),
+            'avg_price': price_sum / count if count else 0,
+            'avg_price_per_sqm': sqm_sum / sqm_count if sqm_count else 0,
+            'market_share_percentage': round(count * 100.0 / total, 2) if total else 0,
+            'valid_area_count': int(sqm_count),
+            'ranking': i + 1
+        }
+        if metric == 'growth':
+            entry['growth_percentage'] = round(float(score), 2)
+        results.append(entry)
+    return results
+
+
+def record_transactions(client, search_type, transactions, current_month=None):
+    """
+    Apply newly ingested transactions to the existing boards.
+
+    Args:
+        client: Redis client
+        search_type: 'buy' or 'rent'
+        transactions: Dicts with area_en, prop_type_en, rooms_en (sales) or
+                      prop_sub_type_en (rentals), price, actual_area and month ('YYYY-MM')
+        current_month: Month index periods end at (default: now)
+
+    Returns:
+        Number of board updates applied (boards not built yet are skipped)
+    """
+    if current_month is None:
+        now = time.localtime()
+        current_month = now.tm_year * 12 + now.tm_mon - 1
+    if not transactions:
+        return 0
+    rows = pd.DataFrame(transactions)
+    # Same outlier bounds the rollups (and so the full rebuild) apply
+    min_price, max_price = PRICE_BOUNDS[search_type]
+    price = pd.to_numeric(rows['price'], errors='coerce')
+    rows = rows[(price >= min_price) & (price <= max_price)]
+    if rows.empty:
+        return 0
+    size = pd.to_numeric(rows.get('actual_area', pd.Series(None, index=rows.index, dtype=float)), errors='coerce')
+    rows['transaction_count'] = 1
+    rows['price_sum'] = rows['price'].astype(float)
+    rows['price_per_sqm_sum'] = (rows['price_sum'] / size).where(size > 0, 0.0)
+    rows['price_per_sqm_count'] = (size > 0).astype(int)
+    for col in ROLLUPS[search_type]['dimensions']:
+        if col not in rows:
+            rows[col] = None
+    segmented = _segment_rows(rows, search_type)
+
+    updates = []
+    for period, months in PERIOD_MONTHS.items():
+        start = current_month - months if months is not None else None
+        window = segmented if start is None else segmented[segmented['month_index'] >= start]
+        for (segment, area), row in window.groupby(['segment', 'area_en'])[
+                ['transaction_count', 'price_sum', 'price_per_sqm_sum', 'price_per_sqm_count']].sum().iterrows():
+            updates.append((period, segment, area, row))
+    if not updates:
+        return 0
+
+    stats_keys = [board_key(search_type, period, 'stats', segment) for period, segment, _, _ in updates]
+    pipe = client.pipeline(transaction=False)
+    for key in stats_keys:
+        pipe.exists(key)
+    built = pipe.execute()
+
+    pipe = client.pipeline(transaction=False)
+    applied = [u for u, exists in zip(updates, built) if exists]
+    for period, segment, area, row in applied:
+        key = board_key(search_type, period, 'stats', segment)
+        pipe.hincrbyfloat(key, f"{area}|count", float(row['transaction_count']))
+        pipe.hincrbyfloat(key, f"{area}|price_sum", float(row['price_sum']))
+        pipe.hincrbyfloat(key, f"{area}|sqm_sum", float(row['price_per_sqm_sum']))
+        pipe.hincrbyfloat(key, f"{area}|sqm_count", float(row['price_per_sqm_count']))
+        pipe.hincrbyfloat(key, TOTAL_FIELD, float(row['transaction_count']))
+    results = pipe.execute()
+
+    pipe = client.pipeline(transaction=False)
+    for i, (period, segment, area, _) in enumerate(applied):
+        count, _, sqm_sum, sqm_count, _ = (float(v) for v in results[i * 5:(i + 1) * 5])
+        if count >= MIN_TRANSACTIONS:
+            pipe.zadd(board_key(search_type, period, 'volume', segment), {area: count})
+            if sqm_count > 0:
+                pipe.zadd(board_key(search_type, period, 'price_per_sqm', segment), {area: sqm_sum / sqm_count})
+    pipe.execute()
+    return len(applied)
@@ -0,0 +1,58 @@
+"""
+Location premium formula shared by valuations and the area heatmap.
+
+calculate_location_premium (app.py) applies it to one area_coordinates row;
+area_heatmap.py applies it to every geocoded area at once. Both go through
+premium_components(), so a change to the formula reaches both.
+
+Premium Formula (based on Dubai market research):
+- Metro: 15% at 0km, scales down to 0% at 5km (3% per km)
+- Beach: 30% at 0km, scales down to 0% at 5km (6% per km)
+- Mall: 8% at 0km, scales down to 0% at 4km (2% per km)
+- School: 5% at 0km, scales down to 0% at 5km (1% per km)
+- Business: 10% at 0km, scales down to 0% at 5km (2% per km)
+- Neighborhood: (score - 3.0) * 4% → -8% to +8% range
+
+Total capped at: -20% min, +70% max
+"""
+import numpy as np
+
+AMENITY_PREMIUMS = {  # Amenity -> (premium % at 0 km, % lost per km)
+    'metro': (15, 3),
+    'beach': (30, 6),
+    'mall': (8, 2),
+    'school': (5, 1),
+    'business': (10, 2),
+}
+DEFAULT_DISTANCE_KM = 10  # Missing distance: no amenity premium
+NEIGHBORHOOD_BASELINE = 3.0  # Missing score: no neighborhood premium
+NEIGHBORHOOD_WEIGHT = 4  # % per score point above/below the baseline
+PREMIUM_CAP = (-20, 70)
+
+
+def _values(values, default):
+    values = np.asarray(values, dtype=float)
+    return np.where(np.isnan(values), default, values)
+
+
+def premium_components(distances, neighborhood):
+    """
+    Premium components (%), vectorized over areas.
+
+    Args:
+        distances: Amenity name (AMENITY_PREMIUMS key) -> distances in km
+            (None/NaN where unknown); missing amenities use DEFAULT_DISTANCE_KM
+        neighborhood: Neighborhood scores aligned with the distances (None/NaN where unknown)
+
+    Returns:
+        dict of float arrays: '<amenity>_premium' per amenity, 'neighborhood_premium'
+        and 'total_premium' (capped to PREMIUM_CAP, unrounded)
+    """
+    neighborhood = _values(neighborhood, NEIGHBORHOOD_BASELINE)
+    components = {}
+    for amenity, (at_zero, per_km) in AMENITY_PREMIUMS.items():
+        distance = _values(distances.get(amenity, np.full(len(neighborhood), np.nan)), DEFAULT_DISTANCE_KM)
+        components[f'{amenity}_premium'] = np.maximum(0, at_zero - distance * per_km)
+    components['neighborhood_premium'] = (neighborhood - NEIGHBORHOOD_BASELINE) * NEIGHBORHOOD_WEIGHT
+    components['total_premium'] = np.clip(sum(components.values()), *PREMIUM_CAP)
+    return components
@@ -0,0 +1,332 @@
+"""
+Vectorized market trend metrics over many monthly series at once.
+
+Series (one per area or segment) are aligned on a shared month axis as
+(n_series, n_months) arrays with NaN where a series has no data for a month.
+compute_trend_metrics() derives every metric of the trends panel - period
+change, QoQ, YoY, volatility, volume trend, seasonality, momentum and
+price/sqm - for all series in one pass of array operations, so a dashboard
+comparing 50 areas costs about as much as one.
+
+downsample_quarterly() merges monthly points into quarters for long-horizon
+charts.
+
+Metrics keep the positional semantics of the per-series implementation they
+replace: points are the months a series has data for, and price metrics use
+the months with a positive average price.
+"""
+import numpy as np
+import pandas as pd
+
+HISTORICAL_BASELINE_PRICE = 2500000  # Dubai market baseline for the affordability index
+ESTIMATED_AVG_SQM = 111  # Average property size (1200 sqft) when no price/sqm data exists
+
+
+def align_series(rows, series_key, months=None):
+    """
+    Pivot long-format monthly rows into aligned arrays.
+
+    Args:
+        rows: Iterable of dicts with series_key, 'month' ('YYYY-MM'), 'avg_price',
+              'transaction_count' and optionally 'avg_price_per_sqm'
+        series_key: Field naming the series (e.g. 'area')
+        months: Month axis (default: every month present, sorted)
+
+    Returns:
+        (series labels, months, avg_price, transaction_count, avg_price_per_sqm)
+    """
+    df = pd.DataFrame(list(rows), columns=[series_key, 'month', 'avg_price', 'transaction_count', 'avg_price_per_sqm'])
+    if months is None:
+        months = sorted(df['month'].dropna().unique())
+    series = list(dict.fromkeys(df[series_key]))
+    arrays = [
+        df.pivot_table(index=series_key, columns='month', values=col, aggfunc='first', dropna=False)
+          .reindex(index=series, columns=months).to_numpy(dtype=float)
+        for col in ('avg_price', 'transaction_count', 'avg_price_per_sqm')
+    ]
+    return series, list(months), *arrays
+
+
+def _compact(values, mask):
+    """Move each row's masked-in values to the front (order kept), NaN after; with per-row counts"""
+    order = np.argsort(~mask, axis=1, kind='stable')
+    return np.take_along_axis(np.where(mask, values, np.nan), order, axis=1), mask.sum(axis=1)
+
+
+def _at(values, idx):
+    """values[row, idx[row]], NaN where idx is out of range"""
+    valid = (idx >= 0) & (idx < values.shape[1])
+    picked = np.take_along_axis(values, np.clip(idx, 0, values.shape[1] - 1)[:, None], axis=1)[:, 0]
+    return np.where(valid, picked, np.nan)
+
+
+def _window_mean(values, start, stop):
+    """Mean of values[row, start[row]:stop[row]], NaN for empty windows"""
+    positions = np.arange(values.shape[1])
+    window = (positions >= start[:, None]) & (positions < stop[:, None])
+    count = window.sum(axis=1)
+    total = np.where(window, values, 0).sum(axis=1)
+    return np.divide(total, count, out=np.full(len(count), np.nan), where=count > 0)
+
+
+def _masked_std(values, count):
+    """Sample standard deviation (ddof=1) of each compacted row, 0 with fewer than 2 values"""
+    mean = _window_mean(values, np.zeros_like(count), count)
+    squares = np.where(np.isnan(values), 0, (values - mean[:, None]) ** 2).sum(axis=1)
+    return np.sqrt(np.divide(squares, count - 1, out=np.zeros(len(count)), where=count > 1))
+
+
+def _pct(new, old):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (new - old) / old * 100
+
+
+def compute_trend_metrics(months, avg_price, transaction_count, avg_price_per_sqm=None, series=None) -> pd.DataFrame:
+    """
+    Trend metrics for many aligned monthly series.
+
+    Args:
+        months: Shared month axis ('YYYY-MM', ascending)
+        avg_price: (n_series, n_months) average prices, NaN where a series has no data
+        transaction_count: (n_series, n_months) transaction counts
+        avg_price_per_sqm: (n_series, n_months) average price/sqm (optional)
+        series: Row labels (default: 0..n_series-1)
+
+    Returns:
+        DataFrame with one row per series and one column per metric; 'status' is
+        'ok', 'insufficient_data' (< 2 months) or 'insufficient_prices' (< 2 positive prices)
+    """
+    avg_price = np.atleast_2d(np.asarray(avg_price, dtype=float))
+    volumes_raw = np.atleast_2d(np.asarray(transaction_count, dtype=float))
+    sqm_raw = (np.zeros_like(avg_price) if avg_price_per_sqm is None
+               else np.atleast_2d(np.asarray(avg_price_per_sqm, dtype=float)))
+    n_series = avg_price.shape[0]
+    month_index = np.array([int(m[:4]) * 12 + int(m[5:7]) - 1 for m in months], dtype=float)
+    month_index = np.broadcast_to(month_index, avg_price.shape)
+
+    present = ~np.isnan(avg_price)
+    points, n_points = _compact(avg_price, present)
+    volumes, _ = _compact(np.nan_to_num(volumes_raw), present)
+    point_months, _ = _compact(month_index, present)
+    prices, n_prices = _compact(avg_price, present & (avg_price > 0))
+    sqm_values, n_sqm = _compact(sqm_raw, present & (np.nan_to_num(sqm_raw) > 0))
+    first_price, last_price = prices[:, 0], _at(prices, n_prices - 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        price_changes = np.diff(prices, axis=1) / prices[:, :-1] * 100
+
+    # --- Basic trend ---
+    percentage_change = _pct(last_price, first_price)
+    trend_direction = np.select([percentage_change > 5, percentage_change < -5], ['upward', 'downward'], 'stable')
+    trend_strength = np.select(
+        [percentage_change > 15, percentage_change > 5, percentage_change < -15, percentage_change < -5],
+        ['strong', 'moderate', 'strong', 'moderate'], 'stable')
+
+    # --- QoQ: last 3 vs previous 3 months (halves of the series below 6 months) ---
+    full = n_prices >= 6
+    recent = _window_mean(prices, np.where(full, n_prices - 3, n_prices - (n_prices + 1) // 2), n_prices)
+    previous = _window_mean(prices, np.where(full, n_prices - 6, 0), np.where(full, n_prices - 3, n_prices // 2))
+    has_qoq = n_prices >= 3
+    qoq_change = np.where(has_qoq, _pct(recent, previous), 0)
+    qoq_status = np.where(has_qoq, np.select([qoq_change > 0, qoq_change < 0], ['Growth', 'Decline'], 'Flat'), 'N/A')
+
+    # --- YoY: same month last year (12+ months), else last 3 vs first 3 months ---
+    year_ago = point_months == (_at(point_months, n_points - 1) - 12)[:, None]
+    year_ago &= np.nan_to_num(points) > 0
+    year_ago_price = np.where(year_ago.any(axis=1), _at(points, year_ago.argmax(axis=1)), np.nan)
+    calendar_yoy = (n_points >= 12) & ~np.isnan(year_ago_price)
+    period_yoy = (n_points < 12) & (n_prices >= 6)
+    period_change = _pct(_window_mean(prices, n_prices - 3, n_prices), _window_mean(prices, np.zeros_like(n_prices), np.minimum(n_prices, 3)))
+    yoy_change = np.select([calendar_yoy, period_yoy], [_pct(last_price, year_ago_price), period_change], 0)
+    yoy_status = np.select(
+        [calendar_yoy & (yoy_change > 0), calendar_yoy & (yoy_change < 0), calendar_yoy,
+         period_yoy & (yoy_change > 0), period_yoy & (yoy_change < 0), period_yoy],
+        ['Growth', 'Decline', 'Flat', 'Period Growth', 'Period Decline', 'Stable'], 'N/A')
+
+    # --- Volatility: std of month-over-month % changes ---
+    has_volatility = n_prices > 2
+    volatility = np.where(has_volatility, _masked_std(price_changes, n_prices - 1), 0)
+    price_std = np.where(has_volatility, _masked_std(prices, n_prices), 0)
+    volatility_index = np.select([volatility > 10, volatility > 5], ['High', 'Moderate'], 'Low')
+
+    # --- Transaction volume ---
+    first_volume = np.where(volumes[:, 0] > 0, volumes[:, 0], 1)
+    last_volume = _at(volumes, n_points - 1)
+    last_volume = np.where(last_volume > 0, last_volume, 1)
+    volume_change = _pct(last_volume, first_volume)
+    volume_trend = np.select([volume_change > 10, volume_change < -10], ['Increasing', 'Decreasing'], 'Stable')
+    volume_growth = np.diff(volumes, axis=1) / np.maximum(volumes[:, :-1], 1) * 100
+    volume_growth_rate = np.nan_to_num(_window_mean(volume_growth, np.zeros_like(n_points), n_points - 1))
+
+    # --- Seasonality: average volume per calendar month, peak vs trough ---
+    calendar = np.where(np.isnan(point_months), -1, point_months % 12).astype(int)
+    month_avg = np.full((n_series, 12), np.nan)
+    first_seen = np.full((n_series, 12), np.inf)
+    positions = np.arange(calendar.shape[1])
+    for month in range(12):
+        in_month = calendar == month
+        count = in_month.sum(axis=1)
+        month_avg[:, month] = np.divide(np.where(in_month, volumes, 0).sum(axis=1), count,
+                                        out=np.full(n_series, np.nan), where=count > 0)
+        first_seen[:, month] = np.where(in_month, positions, np.inf).min(axis=1)
+    peak_volume = np.nan_to_num(month_avg, nan=-np.inf).max(axis=1)
+    trough = np.nan_to_num(month_avg, nan=np.inf).min(axis=1)
+    # Ties resolve to the month seen first in the series, as the dict-based version did
+    peak = np.where(month_avg == peak_volume[:, None], first_seen, np.inf).argmin(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        seasonal_variation = (peak_volume - trough) / trough * 100
+    seasonal = (n_points >= 6) & ((~np.isnan(month_avg)).sum(axis=1) >= 3) & (seasonal_variation > 30)
+    seasonal_pattern = np.where(seasonal, np.char.add('Seasonal (Peak: Month ', np.char.add((peak + 1).astype(str), ')')), 'No Pattern')
+
+    # --- Averages, momentum and affordability ---
+    avg_volume = _window_mean(volumes, np.zeros_like(n_points), n_points)
+    avg_monthly_price = _window_mean(points, np.zeros_like(n_points), n_points)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        change_trend = (_at(price_changes, n_prices - 2) - price_changes[:, 0]) / (n_prices - 2)  # Mean of successive change deltas
+    price_momentum = np.where(n_prices >= 3, np.select([change_trend > 0.5, change_trend < -0.5],
+                                                       ['Accelerating', 'Decelerating'], 'Stable'), 'Stable')
+    affordability_index = avg_monthly_price / HISTORICAL_BASELINE_PRICE * 100
+
+    # --- Price per sqm (estimated from the average size when missing) ---
+    avg_price_per_sqm = np.nan_to_num(_window_mean(sqm_values, np.zeros_like(n_sqm), n_sqm))
+    estimated = (avg_price_per_sqm == 0) & (avg_monthly_price > 0)
+    avg_price_per_sqm = np.where(estimated, avg_monthly_price / ESTIMATED_AVG_SQM, avg_price_per_sqm)
+    price_per_sqm_change = np.select(
+        [n_sqm >= 2, avg_price_per_sqm > 0],
+        [_pct(_at(sqm_values, n_sqm - 1), sqm_values[:, 0]), percentage_change], 0)
+
+    status = np.select([n_points < 2, n_prices < 2], ['insufficient_data', 'insufficient_prices'], 'ok')
+    return pd.DataFrame({
+        'status': status,
+        'trend_direction': trend_direction,
+        'percentage_change': percentage_change,
+        'trend_strength': trend_strength,
+        'avg_monthly_volume': avg_volume,
+        'data_points': n_points,
+        'qoq_change': qoq_change,
+        'qoq_status': qoq_status,
+        'yoy_change': yoy_change,
+        'yoy_status': yoy_status,
+        'volatility': volatility,
+        'volatility_index': volatility_index,
+        'price_std': price_std,
+        'volume_trend': volume_trend,
+        'volume_change': volume_change,
+        'volume_growth_rate': volume_growth_rate,
+        'seasonal_pattern': seasonal_pattern,
+        'avg_monthly_price': avg_monthly_price,
+        'price_momentum': price_momentum,
+        'affordability_index': affordability_index,
+        'avg_price_per_sqm': avg_price_per_sqm,
+        'price_per_sqm_change': price_per_sqm_change,
+    }, index=series if series is not None else range(n_series))
+
+
+def trend_summary(metrics) -> dict:
+    """
+    API payload for one row of compute_trend_metrics().
+
+    Args:
+        metrics: Row (Series or dict) of the metrics frame
+
+    Returns:
+        Dictionary with the trends panel fields and a text summary
+    """
+    if metrics['status'] != 'ok':
+        return {
+            'trend_direction': 'insufficient_data',
+            'percentage_change': 0,
+            'trend_strength': 'weak',
+            'summary': ('Insufficient data for trend analysis' if metrics['status'] == 'insufficient_data'
+                        else 'Insufficient price data for analysis')
+        }
+
+    percentage_change = float(metrics['percentage_change'])
+    direction_text = {
+        'upward': f'rising by {percentage_change:.1f}%',
+        'downward': f'declining by {abs(percentage_change):.1f}%',
+        'stable': f'stable with {abs(percentage_change):.1f}% variation'
+    }.get(metrics['trend_direction'], 'unclear trend')
+
+    summary_parts = [
+        f"Market is {direction_text} over the period with {metrics['trend_strength']} momentum.",
+        f"Volatility is {metrics['volatility_index'].lower()} ({metrics['volatility']:.1f}%).",
+        f"Transaction volume is {metrics['volume_trend'].lower()}."
+    ]
+    if metrics['qoq_status'] != 'N/A':
+        summary_parts.append(f"Quarter-over-quarter: {metrics['qoq_status']} ({metrics['qoq_change']:+.1f}%).")
+    if metrics['yoy_status'] != 'N/A':
+        summary_parts.append(f"Year-over-year: {metrics['yoy_status']} ({metrics['yoy_change']:+.1f}%).")
+
+    return {
+        # Basic metrics
+        'trend_direction': str(metrics['trend_direction']),
+        'percentage_change': round(percentage_change, 2),
+        'trend_strength': str(metrics['trend_strength']),
+        'avg_monthly_volume': round(float(metrics['avg_monthly_volume'])),
+        'data_points': int(metrics['data_points']),
+        'summary': " ".join(summary_parts),
+
+        # Quarter-over-Quarter
+        'qoq_change': round(float(metrics['qoq_change']), 2),
+        'qoq_status': str(metrics['qoq_status']),
+
+        # Year-over-Year
+        'yoy_change': round(float(metrics['yoy_change']), 2),
+        'yoy_status': str(metrics['yoy_status']),
+
+        # Volatility Indicators
+        'volatility': round(float(metrics['volatility']), 2),
+        'volatility_index': str(metrics['volatility_index']),
+        'price_std': round(float(metrics['price_std']), 2),
+
+        # Transaction Trending
+        'volume_trend': str(metrics['volume_trend']),
+        'volume_change': round(float(metrics['volume_change']), 2),
+        'volume_growth_rate': round(float(metrics['volume_growth_rate']), 2),
+        'seasonal_pattern': str(metrics['seasonal_pattern']),
+
+        # Enhanced Metrics
+        'avg_monthly_price': round(float(metrics['avg_monthly_price'])),
+        'price_momentum': str(metrics['price_momentum']),
+        'affordability_index': round(float(metrics['affordability_index']), 2),
+
+        # Price per SqM Metrics
+        'avg_price_per_sqm': round(float(metrics['avg_price_per_sqm'])),
+        'price_per_sqm_change': round(float(metrics['price_per_sqm_change']), 2)
+    }
+
+
+def downsample_quarterly(trend_data):
+    """
+    Merge monthly trend points into calendar quarters for long-horizon charts.
+
+    Averages are weighted by transaction count; labels are 'YYYY-Qn'.
+
+    Args:
+        trend_data: Monthly points from get_price_trends
+
+    Returns:
+        One point per quarter with the same fields
+    """
+    if not trend_data:
+        return []
+    df = pd.DataFrame(trend_data)
+    months = pd.PeriodIndex(df['month'], freq='M')
+    df['quarter'] = [f"{p.year}-Q{p.quarter}" for p in months]
+    weight = df['transaction_count'].clip(lower=1)
+    df['price_weight'] = df['avg_price'] * weight
+    df['sqm_weight'] = np.where(df['avg_price_per_sqm'] > 0, weight, 0)
+    df['sqm_total'] = df['avg_price_per_sqm'] * df['sqm_weight']
+    df['weight'] = weight
+    grouped = df.groupby('quarter', sort=True).agg(
+        price_total=('price_weight', 'sum'), weight=('weight', 'sum'),
+        transaction_count=('transaction_count', 'sum'), min_price=('min_price', 'min'),
+        max_price=('max_price', 'max'), sqm_total=('sqm_total', 'sum'), sqm_weight=('sqm_weight', 'sum'))
+    return [{
+        'month': quarter,
+        'avg_price': float(row.price_total / row.weight),
+        'transaction_count': int(row.transaction_count),
+        'min_price': float(row.min_price),
+        'max_price': float(row.max_price),
+        'avg_price_per_sqm': float(row.sqm_total / row.sqm_weight) if row.sqm_weight else 0,
+    } for quarter, row in grouped.iterrows()]
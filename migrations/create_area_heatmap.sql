@@ -0,0 +1,37 @@
+-- =============================================================================
+-- AREA HEATMAP AGGREGATES
+-- =============================================================================
+-- Purpose: Per-area map layer (median price per sqm, sales volume, gross
+--          yield, location premium) joined to area_coordinates lat/lon, so a
+--          Dubai-wide heatmap needs no per-area queries at view time
+-- Filled By: scripts/refresh_area_heatmap.py (after each ingest and after
+--            scripts/refresh_poi_distances.py)
+-- Read By: /api/geo/heatmap via area_heatmap.load_heatmap (in-memory, columnar)
+-- Keys: period is a PERIOD_MONTHS key ('3M' ... 'MAX'); segment is a
+--       prop_type_en value or '*' for all property types
+-- =============================================================================
+
+CREATE TABLE IF NOT EXISTS area_heatmap (
+    period TEXT NOT NULL,
+    segment TEXT NOT NULL,
+    area_name TEXT NOT NULL,
+    latitude DOUBLE PRECISION NOT NULL,
+    longitude DOUBLE PRECISION NOT NULL,
+    median_price_sqm DOUBLE PRECISION,
+    transaction_count INTEGER NOT NULL,
+    gross_yield DOUBLE PRECISION,
+    location_premium DOUBLE PRECISION,
+    PRIMARY KEY (period, segment, area_name)
+);
+
+COMMENT ON TABLE area_heatmap IS
+  'Per (period, property type, geocoded area) sale/rent aggregates and location premium for the map view.';
+
+-- =============================================================================
+-- VERIFICATION QUERIES
+-- =============================================================================
+SELECT period, COUNT(DISTINCT segment) AS segments, COUNT(*) AS area_rows,
+       ROUND(AVG(gross_yield)::numeric, 2) AS avg_gross_yield
+FROM area_heatmap
+GROUP BY period
+ORDER BY period;
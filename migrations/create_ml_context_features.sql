@@ -0,0 +1,33 @@
+-- =============================================================================
+-- ML CONTEXT FEATURE STORE
+-- =============================================================================
+-- Purpose: Precomputed rental-context features for the XGBoost price model
+--          (median_rent_nearby, rental_availability, rent_to_price_ratio)
+-- Filled By: scripts/refresh_feature_store.py (run after each data ingest)
+-- Read By: feature_store.load_context_features (in-memory per worker)
+-- Keys: (area, prop_type, bedrooms) lower-cased; prop_type '*' and bedrooms -1
+--       hold the (area, type) and whole-area fallback levels
+-- =============================================================================
+
+CREATE TABLE IF NOT EXISTS ml_context_features (
+    area TEXT NOT NULL,
+    prop_type TEXT NOT NULL,
+    bedrooms INTEGER NOT NULL,
+    median_rent_nearby DOUBLE PRECISION NOT NULL,
+    rental_availability INTEGER NOT NULL,
+    rent_to_price_ratio DOUBLE PRECISION NOT NULL,
+    refreshed_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (area, prop_type, bedrooms)
+);
+
+COMMENT ON TABLE ml_context_features IS
+  'Rental-context ML features per market segment over the last 365 days of contracts. Segments need at least 5 rental contracts; lookups fall back to (area, type) and then the whole area.';
+
+-- =============================================================================
+-- VERIFICATION QUERIES
+-- =============================================================================
+SELECT
+    COUNT(*) AS segments,
+    COUNT(*) FILTER (WHERE bedrooms >= 0) AS bedroom_segments,
+    MAX(refreshed_at) AS refreshed_at
+FROM ml_context_features;
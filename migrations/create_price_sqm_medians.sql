@@ -0,0 +1,35 @@
+-- =============================================================================
+-- SALE PRICE PER SQM MEDIANS (FLIP SCORE)
+-- =============================================================================
+-- Purpose: Median trans_value / procedure_area per (area, property type) for
+--          the last 6 and 12 months, so flip-score requests read one row
+--          instead of running PERCENTILE_CONT over every matching sale
+-- Filled By: scripts/refresh_price_medians.py (after each data ingest)
+-- Read By: app._median_price_sqm via price_medians.load_price_medians
+--          (yield score: 6 months, segment score: 12 months)
+-- Keys: area_key is UPPER(area_en), matching the case-insensitive area
+--       comparison of the flip-score queries
+-- =============================================================================
+
+CREATE TABLE IF NOT EXISTS sale_price_sqm_medians (
+    area_key TEXT NOT NULL,
+    prop_type_en TEXT NOT NULL,
+    median_price_sqm_6m DOUBLE PRECISION,
+    transactions_6m INTEGER NOT NULL DEFAULT 0,
+    median_price_sqm_12m DOUBLE PRECISION,
+    transactions_12m INTEGER NOT NULL DEFAULT 0,
+    refreshed_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (area_key, prop_type_en)
+);
+
+COMMENT ON TABLE sale_price_sqm_medians IS
+  'Median sale price per sqm per (UPPER(area_en), prop_type_en) over the last 6 and 12 months.';
+
+-- =============================================================================
+-- VERIFICATION QUERIES
+-- =============================================================================
+SELECT COUNT(*) AS segments,
+       COUNT(median_price_sqm_6m) AS segments_with_6m_sales,
+       SUM(transactions_12m) AS transactions_12m,
+       MAX(refreshed_at) AS refreshed_at
+FROM sale_price_sqm_medians;
@@ -0,0 +1,60 @@
+-- =============================================================================
+-- MONTHLY MARKET TREND ROLLUPS
+-- =============================================================================
+-- Purpose: Precomputed monthly aggregates per market segment so long-horizon
+--          trends (3Y / 5Y / MAX) never scan the raw properties/rentals tables
+-- Filled By: scripts/refresh_trend_rollups.py (full rebuild, or --months N to
+--            recompute only the latest months after an ingest)
+-- Read By: app.get_price_trends for the periods in ROLLUP_PERIODS
+-- Dimensions: named like the source columns so build_where_clause filters
+--             (area LIKE, bedrooms patterns, status, type/sub-type) apply as-is
+-- Measures: sums and counts (averages are re-derived after merging segments);
+--           rows already exclude the build_where_clause outlier bounds
+-- =============================================================================
+
+CREATE TABLE IF NOT EXISTS properties_monthly_rollup (
+    month DATE NOT NULL,
+    area_en TEXT,
+    prop_type_en TEXT,
+    rooms_en TEXT,
+    is_offplan_en TEXT,
+    transaction_count INTEGER NOT NULL,
+    price_sum DOUBLE PRECISION NOT NULL,
+    price_min DOUBLE PRECISION NOT NULL,
+    price_max DOUBLE PRECISION NOT NULL,
+    price_per_sqm_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    price_per_sqm_count INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS rentals_monthly_rollup (
+    month DATE NOT NULL,
+    area_en TEXT,
+    prop_type_en TEXT,
+    prop_sub_type_en TEXT,
+    transaction_count INTEGER NOT NULL,
+    price_sum DOUBLE PRECISION NOT NULL,
+    price_min DOUBLE PRECISION NOT NULL,
+    price_max DOUBLE PRECISION NOT NULL,
+    price_per_sqm_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    price_per_sqm_count INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS idx_properties_monthly_rollup_month ON properties_monthly_rollup (month);
+CREATE INDEX IF NOT EXISTS idx_properties_monthly_rollup_area_month ON properties_monthly_rollup (area_en, month);
+CREATE INDEX IF NOT EXISTS idx_rentals_monthly_rollup_month ON rentals_monthly_rollup (month);
+CREATE INDEX IF NOT EXISTS idx_rentals_monthly_rollup_area_month ON rentals_monthly_rollup (area_en, month);
+
+COMMENT ON TABLE properties_monthly_rollup IS
+  'Monthly sales aggregates per (area, type, rooms, off-plan status); trans_value within 100K-50M AED.';
+COMMENT ON TABLE rentals_monthly_rollup IS
+  'Monthly rental aggregates per (area, type, sub-type); annual_amount within 10K-2M AED.';
+
+-- =============================================================================
+-- VERIFICATION QUERIES
+-- =============================================================================
+SELECT 'properties' AS source, COUNT(*) AS segments, SUM(transaction_count) AS transactions,
+       MIN(month) AS first_month, MAX(month) AS last_month
+FROM properties_monthly_rollup
+UNION ALL
+SELECT 'rentals', COUNT(*), SUM(transaction_count), MIN(month), MAX(month)
+FROM rentals_monthly_rollup;
@@ -0,0 +1,318 @@
+"""
+Versioned ML model registry with hot reload and shadow scoring.
+
+Layout (MODEL_REGISTRY_DIR, default models/registry):
+
+    manifest.json            {"active": "v2", "candidate": "v3", "shadow_sample_rate": 0.05,
+                              "versions": {"v2": {"created_at": ..., "metrics": {...}}, ...}}
+    v2/model.npz | model.pkl
+    v2/label_encoders.pkl
+    v2/feature_columns.pkl
+
+Without a manifest the flat models/*_v1 files are served as version "v1".
+
+Each worker holds one immutable (active, candidate, sample rate) state and
+replaces it with a single assignment, so a reload never interrupts requests
+that already picked up the previous model. Workers re-check the manifest's
+mtime at most every MODEL_REGISTRY_CHECK_INTERVAL seconds: editing the
+manifest (or promote()) reaches every gunicorn worker without a restart,
+and reload() (admin endpoint / SIGHUP) applies it to the current worker
+immediately.
+
+The candidate scores a sampled fraction of traffic on a background thread
+after the response has been computed; latencies and price deltas are kept
+in ShadowStats for the promotion decision.
+"""
+import os
+import json
+import time
+import random
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import numpy as np
+import joblib
+
+from ml_inference import compile_encoders, build_feature_matrix, feature_confidence
+from tree_model import TreeEnsemble
+
+MODEL_REGISTRY_DIR = os.getenv('MODEL_REGISTRY_DIR', 'models/registry')
+MODEL_REGISTRY_CHECK_INTERVAL = 30  # Seconds between manifest mtime checks
+MODEL_INFERENCE_BACKEND = os.getenv('ML_INFERENCE_BACKEND', 'numpy').lower()
+SHADOW_MAX_PENDING = 32  # Shadow batches queued beyond this are dropped
+SHADOW_WINDOW = 5000  # Recent per-property deltas kept for percentiles
+LEGACY_FILES = {
+    'model': 'models/xgboost_model_v1.pkl',
+    'encoders': 'models/label_encoders_v1.pkl',
+    'features': 'models/feature_columns_v1.pkl',
+}
+
+
+class ModelBundle:
+    """One model version: predictor, compiled encoders and feature order"""
+
+    def __init__(self, version, model, encoders, feature_columns):
+        self.version = version
+        self.model = model
+        self.feature_columns = list(feature_columns)
+        self.encoder_lookups = compile_encoders(encoders)
+        self.loaded_at = datetime.now().isoformat()
+
+    @classmethod
+    def load(cls, version, model_path, encoders_path, features_path, backend=MODEL_INFERENCE_BACKEND):
+        """Load a version; the NumPy export next to the pickle is preferred for backend 'numpy'"""
+        npz_path = os.path.splitext(model_path)[0] + '.npz'
+        if backend == 'numpy' and os.path.exists(npz_path):
+            model = TreeEnsemble.load(npz_path)
+        else:
+            model = joblib.load(model_path)
+        return cls(version, model, joblib.load(encoders_path), joblib.load(features_path))
+
+    def predict(self, properties):
+        """(prices, confidences) arrays for a list of property dicts"""
+        X = build_feature_matrix(properties, self.feature_columns, self.encoder_lookups)
+        return np.asarray(self.model.predict(X), dtype=float), feature_confidence(X)
+
+
+class ShadowStats:
+    """Latency and prediction deltas of the candidate against the active model"""
+
+    def __init__(self, active_version=None, candidate_version=None):
+        self.active_version = active_version
+        self.candidate_version = candidate_version
+        self.lock = threading.Lock()
+        self.batches = 0
+        self.properties = 0
+        self.errors = 0
+        self.dropped = 0
+        self.active_seconds = 0.0
+        self.candidate_seconds = 0.0
+        self.relative_deltas = deque(maxlen=SHADOW_WINDOW)  # (candidate - active) / active
+
+    def record(self, active_prices, candidate_prices, active_seconds, candidate_seconds):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            deltas = (candidate_prices - active_prices) / np.abs(active_prices)
+        with self.lock:
+            self.batches += 1
+            self.properties += len(active_prices)
+            self.active_seconds += active_seconds
+            self.candidate_seconds += candidate_seconds
+            self.relative_deltas.extend(float(d) for d in deltas[np.isfinite(deltas)])
+
+    def report(self):
+        """Summary for the admin endpoint"""
+        with self.lock:
+            deltas = np.array(self.relative_deltas, dtype=float)
+            batches = max(self.batches, 1)
+            report = {
+                'active_version': self.active_version,
+                'candidate_version': self.candidate_version,
+                'batches': self.batches,
+                'properties': self.properties,
+                'errors': self.errors,
+                'dropped': self.dropped,
+                'active_latency_ms': round(self.active_seconds / batches * 1000, 3),
+                'candidate_latency_ms': round(self.candidate_seconds / batches * 1000, 3),
+            }
+        if len(deltas):
+            absolute = np.abs(deltas) * 100
+            report.update({
+                'mean_delta_pct': round(float(deltas.mean() * 100), 2),
+                'median_abs_delta_pct': round(float(np.median(absolute)), 2),
+                'p90_abs_delta_pct': round(float(np.percentile(absolute, 90)), 2),
+                'max_abs_delta_pct': round(float(absolute.max()), 2),
+            })
+        return report
+
+
+class ModelRegistry:
+    """Active/candidate model versions for one worker, swapped atomically"""
+
+    def __init__(self, root=MODEL_REGISTRY_DIR, legacy_files=LEGACY_FILES, backend=MODEL_INFERENCE_BACKEND):
+        self.root = root
+        self.legacy_files = legacy_files
+        self.backend = backend
+        self._state = (None, None, 0.0)  # (active, candidate, shadow_sample_rate)
+        self._manifest_mtime = None
+        self._checked_at = 0.0
+        self._reload_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='shadow-scoring')
+        self._shadow_slots = threading.BoundedSemaphore(SHADOW_MAX_PENDING)
+        self.shadow_stats = ShadowStats()
+        self.last_error = None
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.root, 'manifest.json')
+
+    def read_manifest(self):
+        """Manifest dict, or None when the registry has not been set up"""
+        if not os.path.exists(self.manifest_path):
+            return None
+        with open(self.manifest_path) as f:
+            return json.load(f)
+
+    def _load_version(self, version):
+        directory = os.path.join(self.root, version)
+        return ModelBundle.load(
+            version,
+            os.path.join(directory, 'model.pkl'),
+            os.path.join(directory, 'label_encoders.pkl'),
+            os.path.join(directory, 'feature_columns.pkl'),
+            self.backend,
+        )
+
+    def reload(self):
+        """
+        Load the manifest's active and candidate versions and swap them in.
+
+        Versions already loaded are reused. On any error the current models
+        stay in place.
+
+        Returns:
+            dict with success, active and candidate versions (or error)
+        """
+        with self._reload_lock:
+            active, candidate, _ = self._state
+            try:
+                mtime = os.path.getmtime(self.manifest_path) if os.path.exists(self.manifest_path) else None
+                manifest = self.read_manifest()
+                if manifest is None:
+                    new_active = active if active is not None and active.version == 'v1' else ModelBundle.load(
+                        'v1', self.legacy_files['model'], self.legacy_files['encoders'],
+                        self.legacy_files['features'], self.backend)
+                    new_candidate, sample_rate = None, 0.0
+                else:
+                    loaded = {b.version: b for b in (active, candidate) if b is not None}
+
+                    def bundle(version):
+                        return loaded.get(version) or self._load_version(version)
+
+                    new_active = bundle(manifest['active'])
+                    candidate_version = manifest.get('candidate')
+                    new_candidate = bundle(candidate_version) if candidate_version else None
+                    sample_rate = float(manifest.get('shadow_sample_rate', 0.0)) if new_candidate else 0.0
+            except Exception as e:
+                self.last_error = str(e)
+                self._checked_at = time.time()
+                print(f"⚠️ Model registry reload failed: {e}")
+                return {'success': False, 'error': str(e), 'active': active.version if active else None}
+
+            self._state = (new_active, new_candidate, sample_rate)
+            self._manifest_mtime = mtime
+            self._checked_at = time.time()
+            self.last_error = None
+            candidate_version = new_candidate.version if new_candidate else None
+            if (self.shadow_stats.active_version, self.shadow_stats.candidate_version) != (new_active.version, candidate_version):
+                self.shadow_stats = ShadowStats(new_active.version, candidate_version)
+            print(f"✅ Model registry: active {new_active.version}"
+                  + (f", shadow {candidate_version} at {sample_rate:.0%}" if new_candidate else ""))
+            return {'success': True, 'active': new_active.version, 'candidate': candidate_version,
+                    'shadow_sample_rate': sample_rate}
+
+    def _check_manifest(self):
+        """Reload when another worker or an operator changed the manifest"""
+        now = time.time()
+        if now - self._checked_at < MODEL_REGISTRY_CHECK_INTERVAL:
+            return
+        self._checked_at = now
+        try:
+            mtime = os.path.getmtime(self.manifest_path) if os.path.exists(self.manifest_path) else None
+        except OSError:
+            return
+        if mtime != self._manifest_mtime:
+            self.reload()
+
+    @property
+    def active(self):
+        """Active ModelBundle (None if no model could be loaded)"""
+        self._check_manifest()
+        return self._state[0]
+
+    @property
+    def enabled(self):
+        """True when an active model is loaded (re-checked against the manifest, like ``active``)"""
+        return self.active is not None
+
+    def predict(self, properties):
+        """
+        Predict with the active model and queue shadow scoring of the candidate.
+
+        Returns:
+            (prices, confidences, version) - the candidate never affects results
+        """
+        self._check_manifest()
+        active, candidate, sample_rate = self._state
+        if active is None:
+            raise RuntimeError('No model loaded')
+        start = time.perf_counter()
+        prices, confidences = active.predict(properties)
+        elapsed = time.perf_counter() - start
+        if candidate is not None and random.random() < sample_rate:
+            self._submit_shadow(candidate, properties, prices, elapsed)
+        return prices, confidences, active.version
+
+    def _submit_shadow(self, candidate, properties, active_prices, active_seconds):
+        stats = self.shadow_stats
+        if not self._shadow_slots.acquire(blocking=False):
+            with stats.lock:
+                stats.dropped += 1
+            return
+
+        def score():
+            try:
+                start = time.perf_counter()
+                candidate_prices, _ = candidate.predict(properties)
+                stats.record(active_prices, candidate_prices, active_seconds, time.perf_counter() - start)
+            except Exception as e:
+                with stats.lock:
+                    stats.errors += 1
+                print(f"⚠️ Shadow scoring failed ({candidate.version}): {e}")
+            finally:
+                self._shadow_slots.release()
+
+        self._executor.submit(score)
+
+    def promote(self, version):
+        """
+        Make ``version`` active in the manifest (clearing it as candidate) and reload.
+
+        Other workers pick the change up on their next manifest check.
+        """
+        manifest = self.read_manifest()
+        if manifest is None:
+            raise ValueError('Model registry has no manifest')
+        if version != os.path.basename(version) or version.startswith('.') \
+                or not os.path.isdir(os.path.join(self.root, version)):
+            raise ValueError(f'Unknown model version: {version}')
+        manifest['active'] = version
+        if manifest.get('candidate') == version:
+            manifest['candidate'] = None
+        manifest.setdefault('versions', {}).setdefault(version, {})['promoted_at'] = datetime.now().isoformat()
+        write_manifest(self.root, manifest)
+        return self.reload()
+
+    def status(self):
+        """Versions, shadow settings and shadow statistics"""
+        active, candidate, sample_rate = self._state
+        return {
+            'registry': self.root,
+            'active': active.version if active else None,
+            'active_model': type(active.model).__name__ if active else None,
+            'candidate': candidate.version if candidate else None,
+            'shadow_sample_rate': sample_rate,
+            'loaded_at': active.loaded_at if active else None,
+            'last_error': self.last_error,
+            'shadow': self.shadow_stats.report(),
+        }
+
+
+def write_manifest(root, manifest):
+    """Atomically replace the manifest (write + rename)"""
+    os.makedirs(root, exist_ok=True)
+    path = os.path.join(root, 'manifest.json')
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
@@ -0,0 +1,332 @@
+"""
+Parquet snapshot store for the properties and rentals tables.
+
+Exports each table to a typed, compressed Parquet dataset partitioned by
+area and year (hive layout: <table>/area_en=.../year=.../part-N.parquet).
+Readers load only the columns they ask for and skip partitions and row
+groups that cannot match their filters, so offline operation and model
+training no longer re-parse the full CSV exports.
+
+On PostgreSQL the export streams ``COPY (query) TO STDOUT`` output and cuts
+it into CSV chunks at record boundaries as it arrives, so neither the server
+cursor nor the client ever materializes the full table.
+"""
+import io
+import os
+import shutil
+import time
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from sqlalchemy import text
+
+PARQUET_SNAPSHOT_DIR = os.getenv('PARQUET_SNAPSHOT_DIR', 'data/parquet')
+EXPORT_CHUNK_ROWS = 100_000
+
+# Low-cardinality text columns are stored dictionary-encoded
+_CATEGORY = pa.dictionary(pa.int32(), pa.string())
+
+TABLES = {
+    'properties': {
+        'date_column': 'instance_date',
+        'query': """
+            SELECT
+                transaction_number, area_en, prop_type_en, prop_sb_type_en, trans_value,
+                group_en, procedure_en, CAST(procedure_area AS FLOAT) AS procedure_area,
+                CAST(actual_area AS FLOAT) AS actual_area, rooms_en, parking,
+                nearest_metro_en, nearest_mall_en, nearest_landmark_en, master_project_en,
+                project_en, instance_date, is_offplan_en, usage_en, is_free_hold_en,
+                total_buyer, total_seller
+            FROM properties
+            WHERE trans_value > 0
+                AND area_en IS NOT NULL
+                AND prop_type_en IS NOT NULL
+        """,
+        'schema': pa.schema([
+            ('transaction_number', pa.string()),
+            ('prop_type_en', _CATEGORY),
+            ('prop_sb_type_en', _CATEGORY),
+            ('trans_value', pa.float64()),
+            ('group_en', _CATEGORY),
+            ('procedure_en', _CATEGORY),
+            ('procedure_area', pa.float64()),
+            ('actual_area', pa.float64()),
+            ('rooms_en', _CATEGORY),
+            ('parking', pa.string()),
+            ('nearest_metro_en', _CATEGORY),
+            ('nearest_mall_en', _CATEGORY),
+            ('nearest_landmark_en', _CATEGORY),
+            ('master_project_en', _CATEGORY),
+            ('project_en', _CATEGORY),
+            ('instance_date', pa.timestamp('ms')),
+            ('is_offplan_en', _CATEGORY),
+            ('usage_en', _CATEGORY),
+            ('is_free_hold_en', _CATEGORY),
+            ('total_buyer', pa.float64()),
+            ('total_seller', pa.float64()),
+        ]),
+    },
+    'rentals': {
+        'date_column': 'registration_date',
+        'query': """
+            SELECT
+                registration_date, start_date, end_date, version_en, area_en,
+                prop_type_en, prop_sub_type_en, annual_amount, contract_amount,
+                CAST(actual_area AS FLOAT) AS actual_area, rooms, usage_en,
+                nearest_metro_en, nearest_mall_en, nearest_landmark_en,
+                master_project_en, project_en, is_free_hold_en, parking, total_properties
+            FROM rentals
+            WHERE annual_amount > 0
+                AND area_en IS NOT NULL
+                AND prop_type_en IS NOT NULL
+        """,
+        'schema': pa.schema([
+            ('registration_date', pa.timestamp('ms')),
+            ('start_date', pa.timestamp('ms')),
+            ('end_date', pa.timestamp('ms')),
+            ('version_en', _CATEGORY),
+            ('prop_type_en', _CATEGORY),
+            ('prop_sub_type_en', _CATEGORY),
+            ('annual_amount', pa.float64()),
+            ('contract_amount', pa.float64()),
+            ('actual_area', pa.float64()),
+            ('rooms', _CATEGORY),
+            ('usage_en', _CATEGORY),
+            ('nearest_metro_en', _CATEGORY),
+            ('nearest_mall_en', _CATEGORY),
+            ('nearest_landmark_en', _CATEGORY),
+            ('master_project_en', _CATEGORY),
+            ('project_en', _CATEGORY),
+            ('is_free_hold_en', _CATEGORY),
+            ('parking', pa.string()),
+            ('total_properties', pa.float64()),
+        ]),
+    },
+}
+
+# Partition keys are encoded in the directory names, not in the files
+PARTITIONING = ds.partitioning(
+    pa.schema([('area_en', pa.string()), ('year', pa.int16())]),
+    flavor='hive',
+)
+
+
+def table_path(table, snapshot_dir=PARQUET_SNAPSHOT_DIR):
+    """Root directory of a table's Parquet dataset"""
+    return os.path.join(snapshot_dir, table)
+
+
+def snapshot_exists(table, snapshot_dir=PARQUET_SNAPSHOT_DIR):
+    """True if an exported dataset is available for ``table``"""
+    return os.path.isdir(table_path(table, snapshot_dir))
+
+
+def to_arrow(df, table):
+    """
+    Coerce a raw query chunk to the table's Arrow schema.
+
+    Args:
+        df: DataFrame as returned by the export query
+        table: 'properties' or 'rentals'
+
+    Returns:
+        pyarrow.Table with the typed columns plus area_en and year
+    """
+    spec = TABLES[table]
+    columns = {}
+    for field in spec['schema']:
+        values = df[field.name] if field.name in df.columns else pd.Series([None] * len(df), dtype=object)
+        if pa.types.is_floating(field.type):
+            values = pd.to_numeric(values, errors='coerce').astype('float64')
+            columns[field.name] = pa.array(values, type=field.type, from_pandas=True)
+        elif pa.types.is_timestamp(field.type):
+            values = pd.to_datetime(values, errors='coerce', format='mixed')
+            columns[field.name] = pa.array(values, type=pa.timestamp('ns'), from_pandas=True).cast(field.type, safe=False)
+        else:
+            values = values.map(lambda v: None if pd.isna(v) else str(v))
+            columns[field.name] = pa.array(values.astype(object), type=pa.string()).cast(field.type)
+    columns['area_en'] = pa.array(df['area_en'].astype(str).astype(object), type=pa.string())
+    dates = pd.to_datetime(df[spec['date_column']], errors='coerce', format='mixed')
+    columns['year'] = pa.array(dates.dt.year.astype('Int16'), type=pa.int16(), from_pandas=True)
+    return pa.table(columns)
+
+
+class CopyChunkWriter:
+    """
+    File-like target for ``COPY ... TO STDOUT WITH (FORMAT csv, HEADER true)``.
+
+    Buffers the incoming bytes and hands every ~``chunk_rows`` complete CSV
+    records to ``on_chunk`` as a DataFrame of strings. Chunks are cut only at
+    newlines outside quoted fields, so multi-line values stay intact.
+    """
+
+    def __init__(self, on_chunk, chunk_rows=EXPORT_CHUNK_ROWS):
+        self.on_chunk = on_chunk
+        self.chunk_rows = chunk_rows
+        self.header = None
+        self.buffer = bytearray()
+        self.lines = 0
+
+    def write(self, data):
+        data = data.encode() if isinstance(data, str) else bytes(data)
+        self.buffer += data
+        self.lines += data.count(b'\n')
+        if self.header is None:
+            end = self.buffer.find(b'\n')
+            if end < 0:
+                return len(data)
+            self.header = bytes(self.buffer[:end + 1])
+            del self.buffer[:end + 1]
+            self.lines -= 1
+        if self.lines >= self.chunk_rows:
+            self._flush(final=False)
+        return len(data)
+
+    def _flush(self, final):
+        cut = len(self.buffer) if final else self._record_boundary()
+        if cut <= 0:
+            return
+        body = bytes(self.buffer[:cut])
+        del self.buffer[:cut]
+        self.lines = self.buffer.count(b'\n')
+        self.on_chunk(pd.read_csv(io.BytesIO(self.header + body), dtype=str, keep_default_na=False, na_values=['']))
+
+    def _record_boundary(self):
+        """Offset just past the last newline that ends a record (even quote count before it)"""
+        end = len(self.buffer)
+        while True:
+            newline = self.buffer.rfind(b'\n', 0, end)
+            if newline < 0:
+                return 0
+            if self.buffer.count(b'"', 0, newline) % 2 == 0:
+                return newline + 1
+            end = newline
+
+    def close(self):
+        """Parse whatever remains after COPY finished"""
+        if self.header is not None and self.buffer.strip():
+            self._flush(final=True)
+
+
+def _copy_chunks(engine, query, chunk_rows, on_chunk):
+    """Stream COPY (query) TO STDOUT through a CopyChunkWriter (PostgreSQL)"""
+    writer = CopyChunkWriter(on_chunk, chunk_rows)
+    connection = engine.raw_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.copy_expert(f"COPY ({query.strip().rstrip(';')}) TO STDOUT WITH (FORMAT csv, HEADER true)", writer)
+        writer.close()
+    finally:
+        connection.close()
+
+
+def export_table(engine, table, snapshot_dir=PARQUET_SNAPSHOT_DIR, chunk_rows=EXPORT_CHUNK_ROWS, use_copy=None):
+    """
+    Export a database table to a partitioned Parquet dataset.
+
+    The query is streamed in chunks so the export never holds the whole table
+    in memory: via COPY TO STDOUT on PostgreSQL, a server-side cursor
+    otherwise. Output is written to a temporary directory and swapped in when
+    complete, so readers never see a half-written dataset.
+
+    Args:
+        engine: SQLAlchemy engine
+        table: 'properties' or 'rentals'
+        snapshot_dir: Root directory of the Parquet store
+        chunk_rows: Rows fetched and written per chunk
+        use_copy: Force COPY on/off (default: on for PostgreSQL)
+
+    Returns:
+        Number of rows exported
+    """
+    final_dir = table_path(table, snapshot_dir)
+    tmp_dir = f"{final_dir}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    rows = 0
+    parts = 0
+    start = time.time()
+
+    def write_chunk(chunk):
+        nonlocal rows, parts
+        if chunk.empty:
+            return
+        pq.write_to_dataset(
+            to_arrow(chunk, table),
+            root_path=tmp_dir,
+            partitioning=PARTITIONING,
+            basename_template=f"part-{parts}-{{i}}.parquet",
+            compression='zstd',
+        )
+        rows += len(chunk)
+        parts += 1
+        print(f"📦 {table}: {rows:,} rows written")
+
+    if use_copy is None:
+        use_copy = engine.dialect.name == 'postgresql'
+    if use_copy:
+        _copy_chunks(engine, TABLES[table]['query'], chunk_rows, write_chunk)
+    else:
+        with engine.connect().execution_options(stream_results=True) as conn:
+            for chunk in pd.read_sql_query(text(TABLES[table]['query']), conn, chunksize=chunk_rows):
+                write_chunk(chunk)
+
+    # Swap the new dataset in place of the old one
+    old_dir = f"{final_dir}.{os.getpid()}.old"
+    if os.path.isdir(final_dir):
+        os.replace(final_dir, old_dir)
+    os.replace(tmp_dir, final_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+    print(f"✅ Exported {rows:,} {table} rows to {final_dir} in {time.time() - start:.1f}s")
+    return rows
+
+
+def read_table(table, columns=None, filters=None, snapshot_dir=PARQUET_SNAPSHOT_DIR):
+    """
+    Read a table from the Parquet store.
+
+    Args:
+        table: 'properties' or 'rentals'
+        columns: Columns to load (None loads all, including area_en and year)
+        filters: pyarrow filter list, e.g. [('area_en', '=', 'Dubai Marina'), ('year', '>=', 2023)].
+                 Filters on area_en/year prune whole partitions; others use
+                 row-group statistics.
+
+    Returns:
+        DataFrame; dictionary-encoded columns come back as pandas Categorical
+    """
+    return pd.read_parquet(
+        table_path(table, snapshot_dir),
+        engine='pyarrow',
+        columns=columns,
+        filters=filters,
+        partitioning=PARTITIONING,
+    )
+
+
+def iter_batches(table, columns=None, filters=None, batch_rows=EXPORT_CHUNK_ROWS,
+                 snapshot_dir=PARQUET_SNAPSHOT_DIR, to_pandas=True):
+    """
+    Scan a table from the Parquet store in record batches.
+
+    Same pruning as read_table, but at most ``batch_rows`` rows are in memory
+    at a time, so callers can process tables larger than RAM.
+
+    Args:
+        table: 'properties' or 'rentals'
+        columns: Columns to load (None loads all)
+        filters: pyarrow filter list as in read_table
+        batch_rows: Maximum rows per batch
+        to_pandas: Yield DataFrames (dictionary columns as Categorical) instead of pyarrow RecordBatches
+
+    Yields:
+        One DataFrame or RecordBatch per non-empty batch
+    """
+    dataset = ds.dataset(table_path(table, snapshot_dir), format='parquet', partitioning=PARTITIONING)
+    expression = pq.filters_to_expression(filters) if filters else None
+    for batch in dataset.to_batches(columns=columns, filter=expression, batch_size=batch_rows):
+        if batch.num_rows:
+            yield batch.to_pandas() if to_pandas else batch
@@ -0,0 +1,141 @@
+"""
+Nearest point-of-interest distances for area_coordinates.
+
+The distance_to_*_km columns feed calculate_location_premium. They used to be
+typed in by hand (sql/geospatial_setup.sql), and the school and business
+distances were mostly NULL, so most areas got the formula's 10 km default.
+This module computes them for every geocoded area from a local POI file:
+
+    name,type,latitude,longitude            (CSV)
+    FeatureCollection of Point features     (GeoJSON, 'type'/'category' property)
+
+POI types are the amenities table types (metro, beach, mall, school,
+business). Distances for all areas against one POI type are a single NumPy
+haversine pass; types with many POIs go through a haversine BallTree instead
+of the full area x POI matrix. apply_distances() bulk-updates
+area_coordinates and clears the location premium cache of the updated areas,
+so the next valuation recomputes their premiums from the new distances.
+"""
+import json
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import BallTree
+from sqlalchemy import text, bindparam
+
+from area_index import EARTH_RADIUS_KM
+
+POI_TYPES = ('metro', 'beach', 'mall', 'school', 'business')
+DISTANCE_COLUMNS = {poi_type: f'distance_to_{poi_type}_km' for poi_type in POI_TYPES}
+BALLTREE_MIN_POIS = 256  # Below this the dense area x POI matrix is cheaper than building a tree
+MAX_DISTANCE_KM = 999.99  # DECIMAL(5, 2) columns
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance in kilometers, vectorized over NumPy-broadcastable inputs.
+
+    Args:
+        lat1, lon1: First point(s) in decimal degrees
+        lat2, lon2: Second point(s) in decimal degrees
+
+    Returns:
+        ndarray of distances (NaN where an input is missing)
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=float)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def nearest_distances(area_lat, area_lon, poi_lat, poi_lon, balltree_min_pois=BALLTREE_MIN_POIS):
+    """
+    Distance (km) from each area to its nearest POI.
+
+    Returns:
+        ndarray aligned with the areas (NaN for every area when there are no POIs)
+    """
+    area_lat, area_lon = np.asarray(area_lat, dtype=float), np.asarray(area_lon, dtype=float)
+    poi_lat, poi_lon = np.asarray(poi_lat, dtype=float), np.asarray(poi_lon, dtype=float)
+    if len(poi_lat) == 0 or len(area_lat) == 0:
+        return np.full(len(area_lat), np.nan)
+    if len(poi_lat) >= balltree_min_pois:
+        tree = BallTree(np.radians(np.column_stack([poi_lat, poi_lon])), metric='haversine')
+        distances, _ = tree.query(np.radians(np.column_stack([area_lat, area_lon])), k=1)
+        return distances[:, 0] * EARTH_RADIUS_KM
+    return haversine_km(area_lat[:, None], area_lon[:, None], poi_lat[None, :], poi_lon[None, :]).min(axis=1)
+
+
+def load_poi_file(path):
+    """
+    POIs from a CSV or GeoJSON file.
+
+    Returns:
+        DataFrame with name, type, latitude, longitude (types lowercased, rows
+        with an unknown type or missing coordinates dropped)
+    """
+    if path.lower().endswith(('.json', '.geojson')):
+        with open(path) as f:
+            features = json.load(f).get('features', [])
+        pois = pd.DataFrame([{
+            'name': (feature.get('properties') or {}).get('name'),
+            'type': (feature.get('properties') or {}).get('type') or (feature.get('properties') or {}).get('category'),
+            'longitude': feature['geometry']['coordinates'][0],
+            'latitude': feature['geometry']['coordinates'][1],
+        } for feature in features if (feature.get('geometry') or {}).get('type') == 'Point'],
+            columns=['name', 'type', 'latitude', 'longitude'])
+    else:
+        pois = pd.read_csv(path)
+    pois['type'] = pois['type'].astype(str).str.strip().str.lower()
+    pois['latitude'] = pd.to_numeric(pois['latitude'], errors='coerce')
+    pois['longitude'] = pd.to_numeric(pois['longitude'], errors='coerce')
+    return pois[pois['type'].isin(POI_TYPES)].dropna(subset=['latitude', 'longitude']).reset_index(drop=True)
+
+
+def compute_area_distances(areas, pois):
+    """
+    Nearest-POI distance per area for every POI type present in ``pois``.
+
+    Args:
+        areas: DataFrame with area_name, latitude, longitude
+        pois: load_poi_file() output
+
+    Returns:
+        DataFrame with area_name and one DISTANCE_COLUMNS column per POI type
+        (rounded to the column precision)
+    """
+    areas = areas.dropna(subset=['latitude', 'longitude'])
+    result = pd.DataFrame({'area_name': areas['area_name'].to_numpy()})
+    for poi_type, group in pois.groupby('type'):
+        distances = nearest_distances(areas['latitude'], areas['longitude'], group['latitude'], group['longitude'])
+        result[DISTANCE_COLUMNS[poi_type]] = np.minimum(distances, MAX_DISTANCE_KM).round(2)
+    return result
+
+
+def apply_distances(engine, distances, refresh_cache=True):
+    """
+    Bulk-update area_coordinates and clear the premium cache of those areas.
+
+    Only the distance columns present in ``distances`` are written.
+
+    Returns:
+        (areas written, location cache rows cleared)
+    """
+    columns = [column for column in DISTANCE_COLUMNS.values() if column in distances.columns]
+    if distances.empty or not columns:
+        return 0, 0
+    update = text(f"""
+        UPDATE area_coordinates
+        SET {', '.join(f'{column} = :{column}' for column in columns)}
+        WHERE area_name = :area_name
+    """)
+    rows = [{key: (None if pd.isna(value) else value) for key, value in row.items()}
+            for row in distances[['area_name'] + columns].to_dict('records')]
+    clear_cache = text("""
+        DELETE FROM property_location_cache WHERE LOWER(area_name) IN :areas
+    """).bindparams(bindparam('areas', expanding=True))
+
+    with engine.begin() as conn:
+        conn.execute(update, rows)
+        cleared = 0
+        if refresh_cache:
+            cleared = conn.execute(clear_cache, {'areas': [str(name).strip().lower() for name in distances['area_name']]}).rowcount
+    return len(rows), cleared
@@ -0,0 +1,127 @@
+"""
+Precomputed median sale price per sqm for the flip score.
+
+_calculate_yield_score (last 6 months) and _calculate_segment_score (last 12
+months) need the median trans_value / procedure_area of an (area, property
+type). Computing it per request with PERCENTILE_CONT sorts every matching
+sale, so flip-score latency grew with the area's transaction volume.
+
+The sale_price_sqm_medians table (migrations/create_price_sqm_medians.sql)
+holds both windows for every (area, type), computed in one grouped pass by
+scripts/refresh_price_medians.py after each ingest. Workers keep the table in
+memory (re-read every MEDIAN_TTL_SECONDS), so a flip score does dictionary
+lookups instead of ordered-set aggregates. Area keys are upper-cased, matching
+the UPPER(area_en) = UPPER(:area) comparison of the original queries.
+"""
+import os
+import pandas as pd
+from sqlalchemy import text
+
+from worker_cache import WorkerCache
+
+MEDIANS_TABLE = 'sale_price_sqm_medians'
+MEDIAN_WINDOWS = (6, 12)  # Months: yield score, segment score
+MEDIAN_TTL_SECONDS = int(os.getenv('PRICE_MEDIANS_TTL', '3600'))
+MEDIAN_RETRY_SECONDS = 300  # Wait after a failed load before querying again
+MEDIAN_COLUMNS = [f'median_price_sqm_{months}m' for months in MEDIAN_WINDOWS]
+
+_medians = WorkerCache('Price/sqm medians', MEDIAN_TTL_SECONDS, MEDIAN_RETRY_SECONDS)
+
+
+def refresh_sql():
+    """
+    (DELETE, INSERT ... SELECT) statements rebuilding the medians table.
+
+    One scan of the longest window; shorter windows are FILTERed aggregates.
+    Row conditions are those of the per-request flip-score queries.
+    """
+    longest = max(MEDIAN_WINDOWS)
+    price_sqm = 'trans_value / CAST(procedure_area AS DOUBLE PRECISION)'
+    windows = []
+    for months in MEDIAN_WINDOWS:
+        recent = f"CAST(instance_date AS TIMESTAMP) >= CURRENT_DATE - INTERVAL '{months} months'"
+        windows.append(f"PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY {price_sqm}) FILTER (WHERE {recent})")
+        windows.append(f"COUNT(*) FILTER (WHERE {recent})")
+    columns = ', '.join(f'{column}, transactions_{months}m' for column, months in zip(MEDIAN_COLUMNS, MEDIAN_WINDOWS))
+
+    delete = text(f"DELETE FROM {MEDIANS_TABLE}")
+    insert = text(f"""
+        INSERT INTO {MEDIANS_TABLE} (area_key, prop_type_en, {columns}, refreshed_at)
+        SELECT
+            UPPER(area_en),
+            prop_type_en,
+            {', '.join(windows)},
+            NOW()
+        FROM properties
+        WHERE CAST(instance_date AS TIMESTAMP) >= CURRENT_DATE - INTERVAL '{longest} months'
+          AND trans_value > 0
+          AND procedure_area IS NOT NULL
+          AND procedure_area ~ '^[0-9.]+$'
+          AND CAST(procedure_area AS DOUBLE PRECISION) > 0
+          AND area_en IS NOT NULL
+          AND prop_type_en IS NOT NULL
+        GROUP BY 1, 2
+    """)
+    return delete, insert
+
+
+def refresh_medians(engine):
+    """
+    Recompute every (area, type) median in a single transaction.
+
+    Returns:
+        Number of (area, type) rows written
+    """
+    delete, insert = refresh_sql()
+    with engine.begin() as conn:
+        conn.execute(delete)
+        return conn.execute(insert).rowcount
+
+
+class PriceSqmMedians:
+    """In-memory (area, type) -> median price per sqm per window"""
+
+    def __init__(self, rows):
+        self.medians = {
+            (str(area).upper(), prop_type): dict(zip(MEDIAN_WINDOWS, values))
+            for area, prop_type, *values in rows[['area_key', 'prop_type_en'] + MEDIAN_COLUMNS].itertuples(index=False)
+        }
+
+    def __len__(self):
+        return len(self.medians)
+
+    def median(self, area, property_type, months):
+        """
+        Median price per sqm of recent sales, None when the segment had no sales in the window.
+
+        Args:
+            area: Area name (any case)
+            property_type: prop_type_en value
+            months: One of MEDIAN_WINDOWS
+        """
+        value = self.medians.get((str(area).upper(), property_type), {}).get(months)
+        return None if value is None or pd.isna(value) else float(value)
+
+
+def _read_medians(engine):
+    with engine.connect() as conn:
+        rows = pd.read_sql_query(
+            text(f"SELECT area_key, prop_type_en, {', '.join(MEDIAN_COLUMNS)} FROM {MEDIANS_TABLE}"), conn)
+    if rows.empty:
+        raise ValueError(f"{MEDIANS_TABLE} is empty")
+    medians = PriceSqmMedians(rows)
+    print(f"✅ Price/sqm medians: {len(medians):,} area/type segments")
+    return medians
+
+
+def load_price_medians(engine, max_age=MEDIAN_TTL_SECONDS):
+    """
+    Median table for this worker, re-read when older than ``max_age`` seconds.
+
+    Returns:
+        PriceSqmMedians, or None when the table has not been created/filled yet
+        (callers fall back to the exact PERCENTILE_CONT query)
+    """
+    if engine is None:
+        return _medians.peek()
+    return _medians.get(lambda: _read_medians(engine), max_age=max_age)
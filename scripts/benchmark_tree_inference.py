@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark Tree Inference
+
+Purpose: Compare XGBoost and the NumPy TreeEnsemble backend on prediction
+         latency, model memory and import/load time
+Impact: Shows the per-row cost of each backend for single valuations and
+        batch groups before switching ML_INFERENCE_BACKEND
+
+Usage:
+    python scripts/benchmark_tree_inference.py [--model models/xgboost_model_v1.pkl] [--batch-sizes 1 10 100 1000]
+
+Without the trained model the benchmark trains a stand-in model with the
+production hyperparameters (500 trees, depth 8) on random features.
+"""
+import os
+import sys
+import time
+import argparse
+import logging
+import subprocess
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+NUM_FEATURES = 30
+
+
+def load_or_train(model_path):
+    """Trained model if present, else a stand-in with the production shape"""
+    import joblib
+    if os.path.exists(model_path):
+        return joblib.load(model_path)
+    import xgboost as xgb
+    logger.info("ℹ️ Trained model not found; training a 500-tree stand-in")
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(20000, NUM_FEATURES)).astype(np.float32)
+    y = 2e6 + X[:, 0] * 8e5 + X[:, 1] ** 2 * 3e5 + X[:, 2] * X[:, 3] * 1e5
+    return xgb.XGBRegressor(n_estimators=500, max_depth=8, learning_rate=0.05, n_jobs=-1).fit(X, y)
+
+
+def time_per_row(predict, X, repeats):
+    """Median seconds per row over ``repeats`` calls"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        predict(X)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings)) / len(X)
+
+
+def import_time(statement):
+    """Seconds for a fresh interpreter to run ``statement``"""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', statement], check=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark XGBoost vs NumPy tree inference')
+    parser.add_argument('--model', default='models/xgboost_model_v1.pkl')
+    parser.add_argument('--batch-sizes', nargs='+', type=int, default=[1, 10, 100, 1000])
+    parser.add_argument('--repeats', type=int, default=20)
+    args = parser.parse_args()
+
+    import tempfile
+    from tree_model import TreeEnsemble
+
+    model = load_or_train(args.model)
+    ensemble = TreeEnsemble.from_xgboost(model)
+    rng = np.random.default_rng(1)
+    X = rng.normal(size=(max(args.batch_sizes), ensemble.num_feature)).astype(np.float32)
+
+    logger.info(f"{'rows':>6} {'xgboost µs/row':>16} {'numpy µs/row':>14}")
+    for n in args.batch_sizes:
+        xgb_time = time_per_row(model.predict, X[:n], args.repeats)
+        np_time = time_per_row(ensemble.predict, X[:n], args.repeats)
+        logger.info(f"{n:>6} {xgb_time * 1e6:>16.1f} {np_time * 1e6:>14.1f}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pkl_path, npz_path = os.path.join(tmp, 'model.pkl'), os.path.join(tmp, 'model.npz')
+        import joblib
+        joblib.dump(model, pkl_path)
+        ensemble.save(npz_path)
+        node_bytes = sum(a.nbytes for a in (ensemble.feature, ensemble.threshold, ensemble.left, ensemble.right,
+                                            ensemble.default_left, ensemble.value, ensemble._children))
+        logger.info(f"Model file: pickle {os.path.getsize(pkl_path) / 1e6:.1f} MB, npz {os.path.getsize(npz_path) / 1e6:.1f} MB; "
+                    f"node arrays in memory {node_bytes / 1e6:.1f} MB")
+        logger.info(f"Cold load: joblib+xgboost {import_time(f'import joblib; joblib.load({pkl_path!r})'):.2f}s, "
+                    f"TreeEnsemble {import_time(f'from tree_model import TreeEnsemble; TreeEnsemble.load({npz_path!r})'):.2f}s")
+
+
+if __name__ == '__main__':
+    main()
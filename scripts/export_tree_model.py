@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Export Tree Model
+
+Purpose: Flatten the trained XGBoost model into NumPy node arrays
+         (models/xgboost_model_v1.npz) served by tree_model.TreeEnsemble
+Impact: Gunicorn workers predict without importing xgboost or unpickling
+        the booster; the export is checked against XGBoost before writing
+
+Usage:
+    python scripts/export_tree_model.py [--model models/xgboost_model_v1.pkl] [--output models/xgboost_model_v1.npz]
+
+Environment Variables:
+    ML_INFERENCE_BACKEND - 'numpy' (default) serves the export, 'xgboost' the pickle
+"""
+import os
+import sys
+import argparse
+import logging
+import joblib
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tree_model import TreeEnsemble
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+PARITY_ROWS = 2000
+PARITY_RTOL = 1e-4  # float32 leaf sums accumulate in a different order
+
+
+def check_parity(model, ensemble, rows=PARITY_ROWS):
+    """Compare predictions on random feature rows (with missing values); returns max error relative to the prediction scale"""
+    rng = np.random.default_rng(42)
+    X = rng.normal(scale=1000, size=(rows, ensemble.num_feature)).astype(np.float32)
+    X[rng.random(X.shape) < 0.05] = np.nan
+    expected = model.predict(X)
+    actual = ensemble.predict(X)
+    return float(np.max(np.abs(actual - expected)) / max(float(np.max(np.abs(expected))), 1.0))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export the XGBoost model to NumPy node arrays')
+    parser.add_argument('--model', default='models/xgboost_model_v1.pkl')
+    parser.add_argument('--output', default='models/xgboost_model_v1.npz')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.model):
+        logger.error(f"❌ Model not found: {args.model}")
+        sys.exit(1)
+
+    logger.info(f"🔄 Flattening {args.model}...")
+    model = joblib.load(args.model)
+    try:
+        ensemble = TreeEnsemble.from_xgboost(model)
+    except ValueError as e:
+        logger.error(f"❌ Model cannot be exported: {e}")
+        sys.exit(1)
+    logger.info(f"✅ {len(ensemble.roots)} trees, {len(ensemble.value):,} nodes, depth {ensemble.depth}")
+
+    error = check_parity(model, ensemble)
+    if error > PARITY_RTOL:
+        logger.error(f"❌ Parity check failed: max relative error {error:.2e}")
+        sys.exit(1)
+    logger.info(f"✅ Parity check passed (max relative error {error:.2e})")
+
+    ensemble.save(args.output)
+    logger.info(f"🎉 Exported to {args.output} ({os.path.getsize(args.output) / 1e6:.1f} MB)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Refresh Area Heatmap Aggregates
+
+Purpose: Rebuild area_heatmap (migrations/create_area_heatmap.sql, see
+         area_heatmap.py) for every trend period and property type
+Impact: /api/geo/heatmap serves the Dubai-wide map layer from memory with no
+        per-area database work at view time
+Schedule: Run after each data ingest and after scripts/refresh_poi_distances.py
+
+Usage:
+    python scripts/refresh_area_heatmap.py [--periods 1Y 3Y]
+
+Environment Variables:
+    DATABASE_URL - PostgreSQL connection string (required)
+"""
+import os
+import sys
+import time
+import argparse
+import logging
+from sqlalchemy import create_engine, text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import area_heatmap
+from trend_rollups import PERIOD_MONTHS
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def load_database_connection():
+    """Load and validate DATABASE_URL from environment"""
+    database_url = os.getenv('DATABASE_URL')
+    if not database_url:
+        logger.error("❌ DATABASE_URL environment variable not set")
+        sys.exit(1)
+
+    try:
+        database_url = database_url.strip()
+        if 'channel_binding=require' in database_url:
+            database_url = database_url.replace('&channel_binding=require', '')
+            database_url = database_url.replace('?channel_binding=require', '?sslmode=require')
+
+        engine = create_engine(database_url, connect_args={'connect_timeout': 30}, pool_pre_ping=True)
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        logger.info("✅ Database connection successful")
+        return engine
+    except Exception as e:
+        logger.error(f"❌ Database connection failed: {e}")
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild the area heatmap aggregates')
+    parser.add_argument('--periods', nargs='+', choices=list(PERIOD_MONTHS), default=list(PERIOD_MONTHS))
+    args = parser.parse_args()
+
+    engine = load_database_connection()
+    logger.info(f"🔄 Refreshing {area_heatmap.HEATMAP_TABLE} for {', '.join(args.periods)}...")
+    start = time.time()
+    try:
+        rows = area_heatmap.refresh_heatmap(engine, args.periods)
+    except Exception as e:
+        logger.error(f"❌ {area_heatmap.HEATMAP_TABLE} refresh failed: {e}")
+        sys.exit(1)
+    logger.info(f"✅ {area_heatmap.HEATMAP_TABLE}: {rows:,} area rows in {time.time() - start:.1f}s")
+    logger.info("🎉 Area heatmap refresh complete")
+
+
+if __name__ == '__main__':
+    main()
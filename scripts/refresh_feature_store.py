@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Refresh ML Context Feature Store
+
+Purpose: Recompute the rental-context ML features (median_rent_nearby,
+         rental_availability, rent_to_price_ratio) per (area, type, bedrooms)
+         segment into the ml_context_features table and a Parquet copy
+         (see feature_store.py)
+Impact: The price model gets real rental context at inference without
+        per-request queries; train_model.py reads the same features
+Schedule: Run after each data ingest
+
+Usage:
+    python scripts/refresh_feature_store.py [--source db|parquet] [--output data/feature_store/context_features.parquet] [--no-table]
+
+Environment Variables:
+    DATABASE_URL - PostgreSQL connection string (required unless --source parquet --no-table)
+    FEATURE_STORE_PATH - Parquet copy (default: data/feature_store/context_features.parquet)
+"""
+import os
+import sys
+import argparse
+import logging
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import parquet_store
+import feature_store
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Only the lookback window is read; bounds match feature_store.RENT_BOUNDS / SALE_BOUNDS
+SALES_QUERY = f"""
+    SELECT area_en, prop_type_en, rooms_en, trans_value, instance_date
+    FROM properties
+    WHERE trans_value BETWEEN :sale_min AND :sale_max
+        AND area_en IS NOT NULL
+        AND instance_date >= (SELECT MAX(instance_date) FROM properties) - INTERVAL '{feature_store.LOOKBACK_DAYS} days'
+"""
+RENTALS_QUERY = f"""
+    SELECT area_en, prop_type_en, rooms, annual_amount, registration_date
+    FROM rentals
+    WHERE annual_amount BETWEEN :rent_min AND :rent_max
+        AND area_en IS NOT NULL
+        AND registration_date >= (SELECT MAX(registration_date) FROM rentals) - INTERVAL '{feature_store.LOOKBACK_DAYS} days'
+"""
+
+
+def load_database_connection():
+    """Load and validate DATABASE_URL from environment"""
+    database_url = os.getenv('DATABASE_URL')
+    if not database_url:
+        logger.error("❌ DATABASE_URL environment variable not set")
+        sys.exit(1)
+
+    try:
+        database_url = database_url.strip()
+        if 'channel_binding=require' in database_url:
+            database_url = database_url.replace('&channel_binding=require', '')
+            database_url = database_url.replace('?channel_binding=require', '?sslmode=require')
+
+        engine = create_engine(database_url, connect_args={'connect_timeout': 30}, pool_pre_ping=True)
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        logger.info("✅ Database connection successful")
+        return engine
+    except Exception as e:
+        logger.error(f"❌ Database connection failed: {e}")
+        sys.exit(1)
+
+
+def load_source_frames(source, engine):
+    """(sales, rentals) frames with the columns compute_context_features needs"""
+    if source == 'parquet':
+        sales = parquet_store.read_table('properties', columns=['area_en', 'prop_type_en', 'rooms_en', 'trans_value', 'instance_date'])
+        rentals = parquet_store.read_table('rentals', columns=['area_en', 'prop_type_en', 'rooms', 'annual_amount', 'registration_date'])
+        return sales, rentals
+    params = {
+        'sale_min': feature_store.SALE_BOUNDS[0], 'sale_max': feature_store.SALE_BOUNDS[1],
+        'rent_min': feature_store.RENT_BOUNDS[0], 'rent_max': feature_store.RENT_BOUNDS[1],
+    }
+    with engine.connect() as conn:
+        sales = pd.read_sql_query(text(SALES_QUERY), conn, params=params)
+        rentals = pd.read_sql_query(text(RENTALS_QUERY), conn, params=params)
+    return sales, rentals
+
+
+def write_table(engine, features):
+    """Replace the table contents in one transaction (readers never see it half-filled)"""
+    with engine.begin() as conn:
+        conn.execute(text(f"DELETE FROM {feature_store.FEATURE_STORE_TABLE}"))
+        features.to_sql(feature_store.FEATURE_STORE_TABLE, conn, if_exists='append', index=False,
+                        method='multi', chunksize=1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Recompute the ML rental-context feature store')
+    parser.add_argument('--source', choices=['db', 'parquet'], default='db')
+    parser.add_argument('--output', default=feature_store.FEATURE_STORE_PATH)
+    parser.add_argument('--no-table', action='store_true', help='Only write the Parquet copy')
+    args = parser.parse_args()
+
+    if args.source == 'parquet' and not parquet_store.snapshot_exists('properties'):
+        logger.error("❌ No Parquet snapshot; run scripts/export_parquet_snapshot.py first")
+        sys.exit(1)
+    engine = None if args.source == 'parquet' and args.no_table else load_database_connection()
+
+    logger.info(f"🔄 Loading sales and rentals ({args.source})...")
+    sales, rentals = load_source_frames(args.source, engine)
+    logger.info(f"✅ {len(sales):,} sales, {len(rentals):,} rental contracts")
+
+    features = feature_store.compute_context_features(sales, rentals)
+    levels = (features['bedrooms'] >= 0).sum(), ((features['bedrooms'] < 0) & (features['prop_type'] != feature_store.ANY_TYPE)).sum()
+    logger.info(f"✅ {len(features):,} segments ({levels[0]:,} with bedrooms, {levels[1]:,} area+type)")
+
+    feature_store.save_features(features, args.output)
+    logger.info(f"💾 Wrote {args.output}")
+    if not args.no_table:
+        write_table(engine, features)
+        logger.info(f"💾 Replaced {feature_store.FEATURE_STORE_TABLE}")
+    logger.info("🎉 Feature store refresh complete")
+
+
+if __name__ == '__main__':
+    main()
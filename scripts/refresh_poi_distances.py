@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Refresh Area POI Distances
+
+Purpose: Compute area_coordinates.distance_to_{metro,beach,mall,school,business}_km
+         for every geocoded area from a local POI file (see poi_distances.py)
+Impact: Location premiums use measured nearest-POI distances for all areas
+        instead of hand-entered values and 10 km defaults; cached premiums
+        of the updated areas are cleared so they are recomputed
+Schedule: Run whenever the POI file or area coordinates change
+
+Usage:
+    python scripts/refresh_poi_distances.py --poi-file data/poi/dubai_poi.csv [--dry-run] [--keep-cache]
+
+Environment Variables:
+    DATABASE_URL - PostgreSQL connection string (required)
+"""
+import os
+import sys
+import time
+import argparse
+import logging
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import poi_distances
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def load_database_connection():
+    """Load and validate DATABASE_URL from environment"""
+    database_url = os.getenv('DATABASE_URL')
+    if not database_url:
+        logger.error("❌ DATABASE_URL environment variable not set")
+        sys.exit(1)
+
+    try:
+        database_url = database_url.strip()
+        if 'channel_binding=require' in database_url:
+            database_url = database_url.replace('&channel_binding=require', '')
+            database_url = database_url.replace('?channel_binding=require', '?sslmode=require')
+
+        engine = create_engine(database_url, connect_args={'connect_timeout': 30}, pool_pre_ping=True)
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        logger.info("✅ Database connection successful")
+        return engine
+    except Exception as e:
+        logger.error(f"❌ Database connection failed: {e}")
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compute nearest-POI distances for area_coordinates')
+    parser.add_argument('--poi-file', required=True, help='CSV (name,type,latitude,longitude) or GeoJSON of POIs')
+    parser.add_argument('--dry-run', action='store_true', help='Compute and log distances without writing them')
+    parser.add_argument('--keep-cache', action='store_true', help='Do not clear cached location premiums')
+    args = parser.parse_args()
+
+    try:
+        pois = poi_distances.load_poi_file(args.poi_file)
+    except Exception as e:
+        logger.error(f"❌ Could not read POI file {args.poi_file}: {e}")
+        sys.exit(1)
+    counts = pois['type'].value_counts().reindex(poi_distances.POI_TYPES, fill_value=0)
+    logger.info(f"📍 Loaded {len(pois):,} POIs: " + ', '.join(f"{t}={n:,}" for t, n in counts.items()))
+    if pois.empty:
+        logger.error("❌ No POIs with a known type and coordinates")
+        sys.exit(1)
+
+    engine = load_database_connection()
+    with engine.connect() as conn:
+        areas = pd.read_sql_query(text("SELECT area_name, latitude, longitude FROM area_coordinates"), conn)
+
+    start = time.time()
+    distances = poi_distances.compute_area_distances(areas, pois)
+    logger.info(f"✅ Distances for {len(distances):,} areas in {time.time() - start:.2f}s")
+    for column in distances.columns[1:]:
+        logger.info(f"   {column}: median {distances[column].median():.2f} km, max {distances[column].max():.2f} km")
+
+    if args.dry_run:
+        logger.info("ℹ️ Dry run, nothing written")
+        return
+    try:
+        updated, cleared = poi_distances.apply_distances(engine, distances, refresh_cache=not args.keep_cache)
+    except Exception as e:
+        logger.error(f"❌ area_coordinates update failed: {e}")
+        sys.exit(1)
+    logger.info(f"✅ Updated {updated:,} areas, cleared {cleared:,} cached location premiums")
+    logger.info("🎉 POI distance refresh complete")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Refresh Sale Price per SQM Medians
+
+Purpose: Rebuild sale_price_sqm_medians (migrations/create_price_sqm_medians.sql,
+         see price_medians.py)
+Impact: Flip-score yield and segment scores read a precomputed median per
+        (area, type) instead of running PERCENTILE_CONT per request
+Schedule: Run after each data ingest (the 6/12 month windows are relative to
+          the refresh date)
+
+Usage:
+    python scripts/refresh_price_medians.py
+
+Environment Variables:
+    DATABASE_URL - PostgreSQL connection string (required)
+"""
+import os
+import sys
+import time
+import argparse
+import logging
+from sqlalchemy import create_engine, text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import price_medians
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def load_database_connection():
+    """Load and validate DATABASE_URL from environment"""
+    database_url = os.getenv('DATABASE_URL')
+    if not database_url:
+        logger.error("❌ DATABASE_URL environment variable not set")
+        sys.exit(1)
+
+    try:
+        database_url = database_url.strip()
+        if 'channel_binding=require' in database_url:
+            database_url = database_url.replace('&channel_binding=require', '')
+            database_url = database_url.replace('?channel_binding=require', '?sslmode=require')
+
+        engine = create_engine(database_url, connect_args={'connect_timeout': 30}, pool_pre_ping=True)
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        logger.info("✅ Database connection successful")
+        return engine
+    except Exception as e:
+        logger.error(f"❌ Database connection failed: {e}")
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild the flip-score price per sqm medians')
+    parser.parse_args()
+
+    engine = load_database_connection()
+    logger.info(f"🔄 Refreshing {price_medians.MEDIANS_TABLE}...")
+    start = time.time()
+    try:
+        rows = price_medians.refresh_medians(engine)
+    except Exception as e:
+        logger.error(f"❌ {price_medians.MEDIANS_TABLE} refresh failed: {e}")
+        sys.exit(1)
+    logger.info(f"✅ {price_medians.MEDIANS_TABLE}: {rows:,} area/type segments in {time.time() - start:.1f}s")
+    logger.info("🎉 Price per sqm median refresh complete")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Refresh Monthly Market Trend Rollups
+
+Purpose: Rebuild properties_monthly_rollup / rentals_monthly_rollup
+         (migrations/create_trend_rollups.sql, see trend_rollups.py)
+Impact: 3Y, 5Y and full-history trends are answered from monthly segment
+        aggregates instead of scanning the raw tables; the Redis area
+        leaderboards (leaderboards.py) are rebuilt from the refreshed rollups
+Schedule: Run after each data ingest; --months 3 recomputes only the
+          latest months (late registrations land in recent months)
+
+Usage:
+    python scripts/refresh_trend_rollups.py [--search-types buy rent] [--months N] [--no-leaderboards]
+
+Environment Variables:
+    DATABASE_URL - PostgreSQL connection string (required)
+    REDIS_ENABLED, REDIS_HOST, REDIS_PORT - Leaderboard Redis (skipped unless enabled)
+"""
+import os
+import sys
+import time
+import argparse
+import logging
+from datetime import date
+from sqlalchemy import create_engine, text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import trend_rollups
+import leaderboards
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def load_database_connection():
+    """Load and validate DATABASE_URL from environment"""
+    database_url = os.getenv('DATABASE_URL')
+    if not database_url:
+        logger.error("❌ DATABASE_URL environment variable not set")
+        sys.exit(1)
+
+    try:
+        database_url = database_url.strip()
+        if 'channel_binding=require' in database_url:
+            database_url = database_url.replace('&channel_binding=require', '')
+            database_url = database_url.replace('?channel_binding=require', '?sslmode=require')
+
+        engine = create_engine(database_url, connect_args={'connect_timeout': 30}, pool_pre_ping=True)
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        logger.info("✅ Database connection successful")
+        return engine
+    except Exception as e:
+        logger.error(f"❌ Database connection failed: {e}")
+        sys.exit(1)
+
+
+def load_redis_client():
+    """Redis client for the leaderboards, or None when Redis is disabled or unreachable"""
+    if os.getenv('REDIS_ENABLED', 'false').lower() != 'true':
+        logger.info("ℹ️ REDIS_ENABLED is not set, skipping leaderboards")
+        return None
+    try:
+        import redis
+        client = redis.Redis(
+            host=os.getenv('REDIS_HOST', 'localhost'),
+            port=int(os.getenv('REDIS_PORT', '6379')),
+            decode_responses=True,
+            socket_connect_timeout=5
+        )
+        client.ping()
+        logger.info("✅ Redis connection successful")
+        return client
+    except Exception as e:
+        logger.warning(f"⚠️ Redis unavailable, skipping leaderboards: {e}")
+        return None
+
+
+def first_month(months_back):
+    """First day of the month ``months_back`` months before the current one"""
+    today = date.today()
+    index = today.year * 12 + today.month - 1 - months_back
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild the monthly market trend rollups')
+    parser.add_argument('--search-types', nargs='+', choices=list(trend_rollups.ROLLUPS), default=list(trend_rollups.ROLLUPS))
+    parser.add_argument('--months', type=int, default=None,
+                        help='Only recompute the current and previous N months (default: full rebuild)')
+    parser.add_argument('--no-leaderboards', action='store_true', help='Do not rebuild the Redis area leaderboards')
+    args = parser.parse_args()
+
+    engine = load_database_connection()
+    redis_client = None if args.no_leaderboards else load_redis_client()
+    since = first_month(args.months) if args.months is not None else None
+
+    for search_type in args.search_types:
+        table = trend_rollups.ROLLUPS[search_type]['table']
+        scope = f"from {since}" if since else "full history"
+        logger.info(f"🔄 Refreshing {table} ({scope})...")
+        start = time.time()
+        try:
+            rows = trend_rollups.refresh_rollup(engine, search_type, since)
+            logger.info(f"✅ {table}: {rows:,} segment-months in {time.time() - start:.1f}s")
+        except Exception as e:
+            logger.error(f"❌ {table} refresh failed: {e}")
+            sys.exit(1)
+
+        if redis_client is not None:
+            start = time.time()
+            try:
+                boards = leaderboards.refresh_leaderboards(engine, redis_client, search_type)
+                logger.info(f"✅ {search_type} leaderboards: {boards:,} boards in {time.time() - start:.1f}s")
+            except Exception as e:
+                # Readers fall back to SQL, so a failed publish is not fatal
+                logger.error(f"❌ {search_type} leaderboard rebuild failed: {e}")
+    logger.info("🎉 Trend rollup refresh complete")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Register Model Version
+
+Purpose: Copy a trained model (pickle, optional .npz export, encoders and
+         feature columns) into models/registry/<version>/ and record it in the
+         manifest as the shadow candidate, or as the active version
+Impact: Workers load the new version on their next manifest check (or
+        POST /api/admin/models/reload); the candidate is scored on a sample of
+        live traffic and compared at GET /api/admin/models before promotion
+
+Usage:
+    python scripts/register_model.py v2 [--model models/xgboost_model_v1.pkl] [--shadow-rate 0.05]
+    python scripts/register_model.py v2 --activate
+
+Environment Variables:
+    MODEL_REGISTRY_DIR - Registry directory (default: models/registry)
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+import logging
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from model_registry import MODEL_REGISTRY_DIR, write_manifest
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Add a model version to the model registry')
+    parser.add_argument('version', help='Version name, e.g. v2')
+    parser.add_argument('--model', default='models/xgboost_model_v1.pkl')
+    parser.add_argument('--encoders', default='models/label_encoders_v1.pkl')
+    parser.add_argument('--features', default='models/feature_columns_v1.pkl')
+    parser.add_argument('--metrics', default='models/training_metrics.json')
+    parser.add_argument('--registry', default=MODEL_REGISTRY_DIR)
+    parser.add_argument('--shadow-rate', type=float, default=0.05, help='Fraction of traffic scored by the candidate')
+    parser.add_argument('--activate', action='store_true', help='Serve this version immediately instead of shadowing it')
+    args = parser.parse_args()
+
+    if args.version != os.path.basename(args.version) or args.version.startswith('.'):
+        logger.error(f"❌ Invalid version name: {args.version}")
+        sys.exit(1)
+    npz_path = os.path.splitext(args.model)[0] + '.npz'
+    sources = {'model.pkl': args.model, 'model.npz': npz_path,
+               'label_encoders.pkl': args.encoders, 'feature_columns.pkl': args.features}
+    if not os.path.exists(args.model) and not os.path.exists(npz_path):
+        logger.error(f"❌ Model not found: {args.model}")
+        sys.exit(1)
+    for name in ('label_encoders.pkl', 'feature_columns.pkl'):
+        if not os.path.exists(sources[name]):
+            logger.error(f"❌ Not found: {sources[name]}")
+            sys.exit(1)
+
+    directory = os.path.join(args.registry, args.version)
+    if os.path.exists(directory):
+        logger.error(f"❌ Version {args.version} already exists in {args.registry}")
+        sys.exit(1)
+
+    # Copy into a temporary directory first so workers never see a partial version
+    tmp_directory = f"{directory}.tmp"
+    shutil.rmtree(tmp_directory, ignore_errors=True)
+    os.makedirs(tmp_directory)
+    for name, source in sources.items():
+        if os.path.exists(source):
+            shutil.copy2(source, os.path.join(tmp_directory, name))
+    os.replace(tmp_directory, directory)
+    logger.info(f"✅ Copied model files to {directory}")
+
+    manifest_path = os.path.join(args.registry, 'manifest.json')
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    else:
+        manifest = {'active': None, 'candidate': None, 'shadow_sample_rate': 0.0, 'versions': {}}
+
+    entry = {'registered_at': datetime.now().isoformat(), 'source': args.model}
+    if os.path.exists(args.metrics):
+        with open(args.metrics) as f:
+            entry['metrics'] = json.load(f)
+    manifest.setdefault('versions', {})[args.version] = entry
+
+    if args.activate or not manifest.get('active'):
+        manifest['active'] = args.version
+        logger.info(f"🚀 {args.version} is now the active version")
+    else:
+        manifest['candidate'] = args.version
+        manifest['shadow_sample_rate'] = args.shadow_rate
+        logger.info(f"👥 {args.version} shadows {manifest['active']} on {args.shadow_rate:.0%} of traffic")
+
+    write_manifest(args.registry, manifest)
+    logger.info(f"🎉 Manifest updated: {manifest_path}")
+
+
+if __name__ == '__main__':
+    main()
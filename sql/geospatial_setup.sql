@@ -27,6 +27,7 @@ CREATE INDEX idx_geocoded_at ON area_coordinates(geocoded_at);
 
 -- Step 2: Insert top 10 Dubai areas with coordinates and distances
 -- These are manually researched coordinates and distances
+-- (scripts/refresh_poi_distances.py recomputes all distance_to_*_km columns from a POI file)
 INSERT INTO area_coordinates 
 (area_name, latitude, longitude, distance_to_metro_km, distance_to_beach_km, distance_to_mall_km, neighborhood_score) 
 VALUES
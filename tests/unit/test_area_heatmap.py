@@ -0,0 +1,131 @@
+"""Unit tests for the precomputed area heatmap (area_heatmap).
+
+Tests:
+1. The vectorized location premium matches calculate_location_premium
+2. Sale/rent aggregates join to geocoded areas with a gross yield per segment
+3. Payloads are columnar and prebuilt per (period, segment)
+4. The worker store loads from area_heatmap and backs off after a failure
+5. /api/geo/heatmap serves from memory with no per-area queries
+"""
+import pytest
+import pandas as pd
+from sqlalchemy import create_engine
+from unittest.mock import MagicMock, patch
+
+# Import heatmap components
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+import area_heatmap
+from area_heatmap import location_premiums, build_heatmap, HeatmapStore, load_heatmap, HEATMAP_TABLE
+from worker_cache import WorkerCache
+import app as app_module
+
+COORDINATES = pd.DataFrame({
+    'area_name': ['Dubai Marina', 'Downtown Dubai', 'Mirdif', 'Not Geocoded'],
+    'latitude': [25.0805, 25.1972, 25.2200, None],
+    'longitude': [55.1409, 55.2744, 55.4200, None],
+    'distance_to_metro_km': [0.5, 0.1, None, None],
+    'distance_to_beach_km': [0.2, 3.5, 14.0, None],
+    'distance_to_mall_km': [0.3, 0.2, 0.8, None],
+    'distance_to_school_km': [None, 1.2, 0.6, None],
+    'distance_to_business_km': [3.0, 0.4, None, None],
+    'neighborhood_score': [4.5, 4.8, None, None],
+})
+SALE_STATS = pd.DataFrame({
+    'area_key': ['DUBAI MARINA', 'DUBAI MARINA', 'DOWNTOWN DUBAI', 'NOT GEOCODED'],
+    'segment': ['*', 'Unit', '*', '*'],
+    'median_price_sqm': [21_000.4, 21_500.0, 30_000.0, 9_000.0],
+    'median_price': [2_000_000.0, 1_900_000.0, 3_000_000.0, 800_000.0],
+    'transaction_count': [500, 450, 300, 10],
+})
+RENT_STATS = pd.DataFrame({
+    'area_key': ['DUBAI MARINA', 'DUBAI MARINA'],
+    'segment': ['*', 'Unit'],
+    'median_rent': [130_000.0, 125_000.0],
+})
+
+
+@pytest.fixture(autouse=True)
+def fresh_store(monkeypatch):
+    """Each test loads its own store."""
+    monkeypatch.setattr(area_heatmap, '_heatmap', WorkerCache('Area heatmap', area_heatmap.HEATMAP_TTL_SECONDS))
+
+
+class TestLocationPremiums:
+    """Test suite for location_premiums."""
+
+    def test_matches_per_request_formula(self):
+        premiums = location_premiums(COORDINATES.iloc[:3])
+
+        for i, row in COORDINATES.iloc[:3].iterrows():
+            result = tuple(None if pd.isna(v) else v for v in row[[
+                'distance_to_metro_km', 'distance_to_beach_km', 'distance_to_mall_km', 'distance_to_school_km',
+                'distance_to_business_km', 'neighborhood_score']])
+            engine = MagicMock()
+            engine.connect.return_value.__enter__.return_value.execute.return_value.fetchone.return_value = result
+            with patch.object(app_module, 'engine', engine):
+                expected = app_module.calculate_location_premium(row['area_name'])['total_premium']
+            assert premiums[i] == pytest.approx(expected)
+
+
+class TestBuildHeatmap:
+    """Test suite for build_heatmap / HeatmapStore."""
+
+    def test_rows_and_columnar_payload(self):
+        rows = build_heatmap('1Y', SALE_STATS, RENT_STATS, COORDINATES)
+
+        assert len(rows) == 3  # Ungeocoded area and areas without sales are left out
+        marina = rows[(rows['area_name'] == 'Dubai Marina') & (rows['segment'] == '*')].iloc[0]
+        assert marina['gross_yield'] == pytest.approx(6.5)
+        assert pd.isna(rows[rows['area_name'] == 'Downtown Dubai'].iloc[0]['gross_yield'])
+
+        store = HeatmapStore(rows)
+        payload = store.payload('1Y')
+        assert payload['count'] == 2
+        assert payload['columns']['area'] == ['Downtown Dubai', 'Dubai Marina']
+        assert payload['columns']['median_price_sqm'] == [30_000.0, 21_000.0]
+        assert payload['columns']['gross_yield'] == [None, 6.5]
+        assert store.payload('1Y', 'Unit')['columns']['transactions'] == [450]
+        assert store.payload('5Y') is None
+
+
+class TestLoadHeatmap:
+    """Test suite for the per-worker store."""
+
+    def test_missing_table_backs_off(self):
+        assert load_heatmap(create_engine('sqlite://')) is None
+        broken = MagicMock()
+        assert load_heatmap(broken) is None
+        assert not broken.connect.called
+
+
+class TestHeatmapEndpoint:
+    """Test suite for /api/geo/heatmap."""
+
+    @pytest.fixture
+    def client(self):
+        with patch.dict(app_module.app.config, {'LOGIN_DISABLED': True, 'TESTING': True}):
+            yield app_module.app.test_client()
+
+    @pytest.fixture
+    def engine(self):
+        engine = create_engine('sqlite://')
+        build_heatmap('1Y', SALE_STATS, RENT_STATS, COORDINATES).to_sql(HEATMAP_TABLE, engine, index=False)
+        return engine
+
+    def test_served_from_memory(self, client, engine):
+        with patch.object(app_module, 'engine', engine):
+            first = client.get('/api/geo/heatmap?period=1Y&property_type=Unit')
+        broken = MagicMock()
+        with patch.object(app_module, 'engine', broken):
+            second = client.get('/api/geo/heatmap?period=1Y')
+
+        assert first.json['columns']['area'] == ['Dubai Marina']
+        assert second.json['count'] == 2 and not broken.connect.called
+        assert 'max-age' in second.headers['Cache-Control']
+
+    def test_errors(self, client):
+        assert client.get('/api/geo/heatmap?period=2W').status_code == 400
+        with patch.object(app_module, 'engine', create_engine('sqlite://')):
+            assert client.get('/api/geo/heatmap').status_code == 503
@@ -0,0 +1,128 @@
+"""Unit tests for the nearest-area spatial index (area_index).
+
+Tests:
+1. Neighbours are the nearest other areas by haversine distance, within the radius
+2. The worker index loads from area_coordinates and backs off after a failure
+3. Sparse areas use nearby same-type comparables before going city-wide
+   (in-memory engine, single and batch database valuations)
+"""
+import pytest
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+from unittest.mock import MagicMock, patch
+
+# Import spatial index components
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+import area_index
+from area_index import AreaSpatialIndex, load_area_index
+from worker_cache import WorkerCache
+import valuation_engine
+import app as app_module
+
+COORDINATES = pd.DataFrame({
+    'area_name': ['Dubai Marina', 'JBR', 'Al Sufouh', 'Downtown Dubai', 'Business Bay', 'Mirdif'],
+    'latitude': [25.0805, 25.0780, 25.1100, 25.1972, 25.1850, 25.2200],
+    'longitude': [55.1409, 55.1340, 55.1700, 55.2744, 55.2650, 55.4200],
+})
+
+
+@pytest.fixture(autouse=True)
+def fresh_index(monkeypatch):
+    """Each test builds its own index."""
+    monkeypatch.setattr(area_index, '_index', WorkerCache('Area spatial index', area_index.AREA_INDEX_TTL_SECONDS))
+
+
+@pytest.fixture
+def index():
+    return AreaSpatialIndex(COORDINATES)
+
+
+class TestNeighbours:
+    """Test suite for AreaSpatialIndex.neighbours."""
+
+    def test_nearest_first_within_radius(self, index):
+        neighbours = index.neighbours('dubai marina', k=5, max_km=8)
+
+        assert [name for name, _ in neighbours] == ['JBR', 'Al Sufouh']
+        assert neighbours[0][1] == pytest.approx(app_module.calculate_haversine_distance(25.0805, 55.1409, 25.0780, 55.1340), abs=0.01)
+
+    def test_k_limit_and_partial_names(self, index):
+        assert [name for name, _ in index.neighbours('Business', k=1, max_km=50)] == ['Downtown Dubai']
+        assert index.neighbours('Unknown Area') == []
+
+
+class TestLoadAreaIndex:
+    """Test suite for the per-worker index."""
+
+    def test_loads_and_caches(self):
+        engine = create_engine('sqlite://')
+        COORDINATES.to_sql('area_coordinates', engine, index=False)
+
+        index = load_area_index(engine)
+
+        assert len(index) == 6
+        assert load_area_index(MagicMock()) is index
+
+    def test_missing_table_backs_off(self):
+        assert load_area_index(create_engine('sqlite://')) is None
+        broken = MagicMock()
+        assert load_area_index(broken) is None
+        assert not broken.connect.called
+
+
+def comparables(area, n, property_type='Unit', size=100.0, price_per_sqm=15_000):
+    sizes = np.linspace(size * 0.9, size * 1.1, n)
+    return pd.DataFrame({
+        'area_name_en': area,
+        'property_type_en': property_type,
+        'property_total_value': (sizes * np.linspace(price_per_sqm * 0.95, price_per_sqm * 1.05, n)).round(),
+        'actual_area': sizes,
+        'instance_date': pd.Timestamp('2025-06-01'),
+        'project_en': 'Tower',
+        'rooms_en': '1 B/R',
+        'is_offplan_en': 'Ready',
+        'transaction_year': 2025,
+    })
+
+
+class TestNearbyComparables:
+    """Test suite for the nearby-areas valuation tier."""
+
+    def test_in_memory_engine(self, index):
+        dataset = pd.concat([comparables('Dubai Marina', 1), comparables('JBR', 6),
+                             comparables('Mirdif', 20, price_per_sqm=8_000)], ignore_index=True)
+        with patch('valuation_engine.load_dubai_dataset', return_value=dataset), \
+                patch('valuation_engine.load_area_index', return_value=index):
+            selected, confidence = valuation_engine.find_comparable_properties(
+                {'area_name': 'Dubai Marina', 'property_type': 'Unit', 'area_sqm': 100})
+
+        assert confidence == 78
+        assert set(selected['area_name_en']) == {'JBR'}
+
+    def test_database_valuations(self, index):
+        queries = []
+
+        def fake_read_sql_query(query, conn, params=None):
+            queries.append((str(query), params))
+            if 'neighbour_areas' in params:
+                return comparables('JBR', 12)
+            return pd.concat([comparables('Dubai Marina', 2), comparables('Mirdif', 40, price_per_sqm=8_000)])
+
+        with patch.object(app_module.pd, 'read_sql_query', side_effect=fake_read_sql_query), \
+                patch.object(app_module.pd, 'read_sql', return_value=pd.DataFrame(columns=['annual_amount', 'actual_area'])), \
+                patch.object(app_module, 'load_area_index', return_value=index), \
+                patch.object(app_module, 'resolve_location_premium', return_value=(0, {}, 'DISABLED')), \
+                patch.object(app_module, 'get_project_premium', return_value={'premium_percentage': 0, 'tier': 'Standard'}), \
+                patch.object(type(app_module.model_registry), 'enabled', new=False):
+            batch = app_module.calculate_batch_valuations(
+                [{'property_type': 'Unit', 'area': 'Dubai Marina', 'size_sqm': 100}], MagicMock())
+
+        neighbour_sql, params = queries[1]
+        assert 'LOWER(area_en) IN' in neighbour_sql
+        assert params['neighbour_areas'] == ['jbr', 'al sufouh']
+        valuation = batch[0]['valuation']
+        assert valuation['search_scope'] == 'nearby areas (Dubai Marina)'
+        assert valuation['price_per_sqm'] > 12_000  # JBR prices, not Mirdif's
@@ -0,0 +1,160 @@
+"""Unit tests for the AVM segment sketches (avm_sketches).
+
+Tests:
+1. Sketch quantiles/moments within the bucket accuracy; merging is exact
+2. The SQL aggregation matches the pandas bucket aggregation
+3. Sketch-based AVM metrics agree with calculate_avm_metrics on raw rows
+4. Segment selection mirrors build_where_clause (rent type/sub-type)
+5. Non-numeric budgets mean no cap; sketch errors do not fail the endpoint
+"""
+import pytest
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+from unittest.mock import MagicMock, patch
+
+# Import sketch components
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+import avm_sketches
+from avm_sketches import (
+    QuantileSketch, SegmentSketchStore, aggregate_buckets,
+    load_segment_sketches, avm_metrics_from_sketches, SKETCH_RELATIVE_ACCURACY,
+)
+from worker_cache import WorkerCache
+import app as app_module
+from app import SALES_MAP, RENTALS_MAP, OUTLIER_PRICE_THRESHOLDS
+
+
+@pytest.fixture(autouse=True)
+def fresh_stores(monkeypatch):
+    """Each test builds its own stores."""
+    monkeypatch.setattr(avm_sketches, '_sketches',
+                        WorkerCache('AVM sketches', avm_sketches.SKETCH_TTL_SECONDS, background=True))
+
+
+@pytest.fixture
+def sales():
+    """5000 sales across areas, types, bedrooms and status (with outliers)."""
+    rng = np.random.default_rng(7)
+    n = 5000
+    df = pd.DataFrame({
+        'area': rng.choice(['Dubai Marina', 'Marina Walk', 'Business Bay', 'JVC'], size=n),
+        'property_type': rng.choice(['Unit', 'Villa'], size=n, p=[0.8, 0.2]),
+        'bedrooms': rng.choice(['Studio', '1 B/R', '2 B/R', None], size=n),
+        'status': rng.choice(['Ready', 'Off-Plan'], size=n),
+        'price': np.exp(rng.normal(14.3, 0.6, size=n)).round(),
+    })
+    df.loc[:20, 'price'] = 50_000  # Below the realistic minimum
+    return df
+
+
+class TestQuantileSketch:
+    """Test suite for QuantileSketch."""
+
+    def test_accuracy_and_merge(self, sales):
+        prices = sales['price']
+        sketch = QuantileSketch.from_values(prices)
+
+        for q in [0.1, 0.25, 0.5, 0.75, 0.9]:
+            assert sketch.quantile(q) == pytest.approx(prices.quantile(q), rel=2 * SKETCH_RELATIVE_ACCURACY)
+        assert sketch.count == len(prices)
+        assert sketch.mean() == pytest.approx(prices.mean())
+        assert sketch.std() == pytest.approx(prices.std())
+        assert (sketch.min(), sketch.max()) == (prices.min(), prices.max())
+
+        halves = aggregate_buckets(sales.assign(half=sales.index % 2), ['half'])
+        merged = QuantileSketch.from_buckets(halves)
+        np.testing.assert_allclose(merged.counts, sketch.counts)
+        np.testing.assert_allclose(merged.sums, sketch.sums)
+
+    def test_clip_and_rank(self, sales):
+        prices = sales['price']
+        sketch = QuantileSketch.from_values(prices)
+
+        clipped = sketch.clip(500_000, 2_000_000)
+
+        inside = prices[(prices >= 500_000) & (prices <= 2_000_000)]
+        assert clipped.count == pytest.approx(len(inside), rel=0.01)
+        assert clipped.quantile(0.5) == pytest.approx(inside.median(), rel=2 * SKETCH_RELATIVE_ACCURACY)
+        assert sketch.rank(1_000_000) == pytest.approx((prices <= 1_000_000).sum(), rel=0.01)
+
+
+class TestSegmentSketches:
+    """Test suite for SegmentSketchStore / avm_metrics_from_sketches."""
+
+    def test_sql_aggregation_matches_pandas(self, tmp_path, sales):
+        engine = create_engine(f"sqlite:///{tmp_path / 'sales.db'}")
+        sales.rename(columns={
+            'area': SALES_MAP['area_name'], 'property_type': SALES_MAP['property_type'],
+            'bedrooms': SALES_MAP['bedrooms'], 'status': SALES_MAP['status'], 'price': SALES_MAP['price'],
+        }).to_sql('properties', engine, index=False)
+
+        assert load_segment_sketches(engine, 'buy', SALES_MAP) is None  # Built in the background
+        avm_sketches._sketches.wait('buy')
+        store = load_segment_sketches(engine, 'buy', SALES_MAP)
+
+        expected = aggregate_buckets(sales, avm_sketches.SEGMENT_COLUMNS['buy'])
+        assert len(store.buckets) == len(expected)
+        assert store.buckets['count'].sum() == len(sales)
+        assert len(store.segments) == 4 * 2 * 4 * 2
+        assert load_segment_sketches(engine, 'buy', SALES_MAP) is store  # Cached until the TTL
+
+    def test_metrics_match_row_based(self, sales):
+        """Same filtered population -> same metrics as calculate_avm_metrics."""
+        store = SegmentSketchStore(aggregate_buckets(sales, avm_sketches.SEGMENT_COLUMNS['buy']), 'buy')
+        filters = {'propertyType': 'Unit', 'bedrooms': '2 B/R', 'area': 'Marina', 'budget': 3_000_000}
+
+        metrics = avm_metrics_from_sketches(store, 'buy', filters, OUTLIER_PRICE_THRESHOLDS['buy'])
+
+        rows = sales[(sales['property_type'] == 'Unit') & sales['bedrooms'].str.contains('2', na=False)
+                     & sales['area'].str.contains('Marina') & (sales['price'] <= 3_000_000)]
+        expected = app_module.calculate_avm_metrics(
+            rows.rename(columns={'price': SALES_MAP['price'], 'area': SALES_MAP['area_name']}), 'buy', filters)
+        for key in ['median_price', 'q1_price', 'q3_price', 'mean_price', 'std_price', 'min_price', 'max_price']:
+            assert metrics['stats'][key] == pytest.approx(expected['stats'][key], rel=2 * SKETCH_RELATIVE_ACCURACY), key
+        # Counts differ only by the share of the bucket straddling the budget
+        assert abs(metrics['total_count'] - expected['total_count']) <= 0.01 * expected['total_count']
+        assert metrics['outlier_info']['total_outliers'] == expected['outlier_info']['total_outliers'] > 0
+        assert abs(metrics['affordable_count'] - expected['affordable_count']) <= 0.01 * expected['total_count']
+        assert metrics['area_analysis']['area_count'] == metrics['total_count']
+        # Budget percentile is measured against the uncapped market
+        assert 0 < metrics['budget_percentile'] < 100
+
+    def test_rent_type_matches_sub_type(self):
+        rentals = pd.DataFrame({
+            'area': ['JVC', 'JVC', 'JVC'],
+            'property_type': ['Unit', 'Villa', 'Unit'],
+            'property_sub_type': ['Flat', 'Villa', 'Office'],
+            'price': [80_000.0, 200_000.0, 120_000.0],
+        })
+        store = SegmentSketchStore(aggregate_buckets(rentals, avm_sketches.SEGMENT_COLUMNS['rent']), 'rent')
+
+        assert store.segment_mask({'propertyType': 'Flat'}).sum() == 1
+        metrics = avm_metrics_from_sketches(store, 'rent', {'propertyType': 'Unit', 'annual_rent': 150_000},
+                                            OUTLIER_PRICE_THRESHOLDS['rent'])
+        assert metrics['total_count'] == 2
+        assert metrics['stats']['max_price'] == 120_000
+
+    def test_invalid_budget_means_no_cap(self, sales):
+        store = SegmentSketchStore(aggregate_buckets(sales, avm_sketches.SEGMENT_COLUMNS['buy']), 'buy')
+
+        uncapped = avm_metrics_from_sketches(store, 'buy', {}, OUTLIER_PRICE_THRESHOLDS['buy'])
+        for budget in ['abc', 'nan', {'max': 1}]:
+            metrics = avm_metrics_from_sketches(store, 'buy', {'budget': budget}, OUTLIER_PRICE_THRESHOLDS['buy'])
+            assert metrics['total_count'] == uncapped['total_count']
+
+
+class TestAvmEndpoint:
+    """Test suite for /api/avm-analytics on the sketch path."""
+
+    def test_sketch_error_returns_no_data(self):
+        with patch.dict(app_module.app.config, {'LOGIN_DISABLED': True, 'TESTING': True}), \
+                patch.object(app_module, 'engine', MagicMock()), \
+                patch.object(app_module, 'load_segment_sketches', return_value=MagicMock()), \
+                patch.object(app_module, 'avm_metrics_from_sketches', side_effect=ValueError('bad filters')):
+            response = app_module.app.test_client().post('/api/avm-analytics', json={'budget': 'abc'})
+
+        assert response.status_code == 200
+        assert response.json == {'avm_data': None}
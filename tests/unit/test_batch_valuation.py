@@ -0,0 +1,202 @@
+"""Unit tests for the batch valuation API (calculate_batch_valuations).
+
+Tests:
+1. Vectorized floor/age premiums match the scalar premium functions
+2. One comparables query per (area, type, bedrooms, status) group
+3. Results in input order with per-item errors
+4. Per-property size windows select the area + type + size tier
+5. One predict_many call per group for the ML hybrid
+6. Streaming CSV upload: incremental parsing, per-chunk CSV/NDJSON output
+"""
+import pytest
+import numpy as np
+import pandas as pd
+from unittest.mock import MagicMock, patch
+
+# Import app components
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+import app as app_module
+from app import (
+    calculate_batch_valuations,
+    calculate_floor_premium,
+    calculate_age_premium,
+    floor_premium_array,
+    age_premium_array,
+)
+
+
+def make_comparables(area='Dubai Marina', property_type='Unit', n=60, seed=11):
+    """Comparable rows as returned by build_comparables_query."""
+    rng = np.random.default_rng(seed)
+    sizes = rng.uniform(40, 250, size=n).round(1)
+    return pd.DataFrame({
+        'area_name_en': area,
+        'property_type_en': property_type,
+        'property_total_value': (sizes * rng.uniform(14_000, 16_000, size=n)).round(),
+        'actual_area': sizes.astype(str),
+        'instance_date': pd.Timestamp.now().normalize() - pd.to_timedelta(rng.integers(0, 900, size=n), unit='D'),
+        'project_en': 'Marina Gate',
+        'rooms_en': '2 B/R',
+        'is_offplan_en': 'Ready',
+    })
+
+
+@pytest.fixture
+def batch_env():
+    """Patch database reads and premium lookups used by the batch path."""
+    queries = []
+
+    def fake_read_sql_query(query, conn, params=None):
+        queries.append(params)
+        if 'nowhere' in params['area_param'].lower():
+            return make_comparables().iloc[:0]
+        return make_comparables(area=params['area_param'].strip('%'))
+
+    rentals = pd.DataFrame({
+        'annual_amount': np.linspace(80_000, 120_000, 40),
+        'actual_area': np.linspace(40, 250, 40).astype(str),
+        'registration_date': pd.date_range('2024-01-01', periods=40)[::-1],
+    })
+    with patch.object(app_module.pd, 'read_sql_query', side_effect=fake_read_sql_query), \
+         patch.object(app_module.pd, 'read_sql', return_value=rentals), \
+         patch.object(app_module, 'resolve_location_premium', return_value=(0, {}, 'DISABLED')), \
+         patch.object(app_module, 'get_project_premium', return_value={'premium_percentage': 0, 'tier': 'Standard'}), \
+         patch.object(type(app_module.model_registry), 'enabled', new=False):
+        yield queries
+
+
+class TestVectorizedPremiums:
+    """Vectorized premiums agree with the scalar rules."""
+
+    def test_floor_premium_array_matches_scalar(self):
+        floors = [None, 0, 1, 5, 6, 15, 16, 30, 31, 70, 200, 12]
+        types = ['Unit'] * 11 + ['Villa']
+        expected = [calculate_floor_premium(f, t) if f is not None else 0.0 for f, t in zip(floors, types)]
+        np.testing.assert_allclose(floor_premium_array(floors, types), expected)
+
+    def test_age_premium_array_matches_scalar(self):
+        ages = [0, 1, 3, 4, 10, 11, 20, 21, 30, 31, 60, 15, 45]
+        types = ['Unit'] * 11 + ['Villa', 'Villa']
+        expected = [calculate_age_premium(a, t, a == 0) for a, t in zip(ages, types)]
+        np.testing.assert_allclose(age_premium_array(ages, types), expected)
+        assert age_premium_array([None], ['Unit'])[0] == 0.0
+
+
+class TestBatchValuation:
+    """Test suite for calculate_batch_valuations."""
+
+    def test_one_query_per_group_results_in_order(self, batch_env):
+        properties = [
+            {'property_type': 'Unit', 'area': 'Dubai Marina', 'size_sqm': 100},
+            {'property_type': 'Unit', 'area': 'Business Bay', 'size_sqm': 80},
+            {'property_type': 'unit', 'area': 'dubai marina', 'size_sqm': 140, 'floor_level': 20},
+            {'property_type': 'Unit', 'area': 'Dubai Marina', 'size_sqm': 100, 'bedrooms': '2'},
+        ]
+
+        results = calculate_batch_valuations(properties, MagicMock())
+
+        assert [r['index'] for r in results] == [0, 1, 2, 3]
+        assert all(r['success'] for r in results)
+        assert len(batch_env) == 3  # Marina, Business Bay, Marina + 2 bedrooms
+        assert results[2]['valuation']['floor_premium']['percentage'] == calculate_floor_premium(20, 'Unit')
+        assert results[2]['valuation']['estimated_value'] > results[0]['valuation']['estimated_value']
+
+    def test_per_item_errors(self, batch_env):
+        properties = [
+            {'property_type': 'Unit', 'area': 'Dubai Marina'},
+            {'property_type': 'Unit', 'area': 'Nowhere', 'size_sqm': 90},
+            {'property_type': 'Unit', 'area': 'Dubai Marina', 'size_sqm': 'big'},
+            {'property_type': 'Unit', 'area': 'Dubai Marina', 'size_sqm': 90},
+        ]
+
+        results = calculate_batch_valuations(properties, MagicMock())
+
+        assert results[0] == {'index': 0, 'success': False, 'error': 'Missing required field: size_sqm'}
+        assert not results[1]['success'] and 'No comparable properties' in results[1]['error']
+        assert results[2]['error'] == 'size_sqm must be a number'
+        assert results[3]['success']
+
+    def test_size_window_tier_and_group_size_range(self, batch_env):
+        properties = [
+            {'property_type': 'Unit', 'area': 'Dubai Marina', 'size_sqm': 60},
+            {'property_type': 'Unit', 'area': 'Dubai Marina', 'size_sqm': 200},
+        ]
+
+        results = calculate_batch_valuations(properties, MagicMock())
+
+        params = batch_env[0]
+        assert params['size_min'] == pytest.approx(60 * 0.7)
+        assert params['size_max'] == pytest.approx(200 * 1.3)
+        for result in results:
+            assert result['valuation']['search_scope'].startswith('area + type + size')
+            assert result['valuation']['rental_data']['count'] >= 3
+        assert results[1]['valuation']['estimated_value'] > 2 * results[0]['valuation']['estimated_value']
+
+    def test_ml_predicted_once_per_group(self, batch_env):
+        """All properties of a group go to the model in one predict_many call."""
+        properties = [{'property_type': 'Unit', 'area': 'Dubai Marina', 'size_sqm': size} for size in (60, 90, 120)]
+
+        def fake_predict_many(inputs):
+            return [{'predicted_price': p['actual_area'] * 20_000, 'confidence': 0.9, 'method': 'xgboost'} for p in inputs]
+
+        with patch.object(type(app_module.model_registry), 'enabled', new=True), \
+             patch.object(app_module, 'predict_many', side_effect=fake_predict_many) as predict:
+            results = calculate_batch_valuations(properties, MagicMock())
+
+        assert predict.call_count == 1
+        assert [p['actual_area'] for p in predict.call_args[0][0]] == [60, 90, 120]
+        assert all(r['valuation']['ml_data']['valuation_method'] == 'hybrid' for r in results)
+
+
+class TestStreamingPortfolioValuation:
+    """Test suite for the streaming CSV upload path."""
+
+    def test_chunks_parsed_incrementally(self):
+        """Rows are yielded chunk by chunk with CSV columns mapped to API fields."""
+        import io
+        upload = io.StringIO(
+            "property_type,area,size_sqm,floor,view,age\n"
+            "Unit,Dubai Marina,100,12,Sea View,3\n"
+            "Unit,Business Bay,80,,,\n"
+            "Villa,Arabian Ranches,300,,,10\n"
+        )
+
+        chunks = app_module.iter_batch_csv_chunks(upload, chunk_rows=2)
+
+        first = next(chunks)
+        assert first[0] == {'property_type': 'Unit', 'area': 'Dubai Marina', 'size_sqm': '100',
+                            'floor_level': '12', 'view_type': 'Sea View', 'property_age': '3'}
+        assert first[1] == {'property_type': 'Unit', 'area': 'Business Bay', 'size_sqm': '80'}
+        assert [len(c) for c in chunks] == [1]
+
+    def test_stream_yields_per_chunk(self, batch_env):
+        """Each chunk's results are emitted before the next chunk is valued."""
+        import csv
+        import io
+        chunks = iter([
+            [{'property_type': 'Unit', 'area': 'Dubai Marina', 'size_sqm': '100'}],
+            [{'property_type': 'Unit', 'area': 'Dubai Marina'}, {'property_type': 'Unit', 'area': 'Dubai Marina', 'size_sqm': '90'}],
+        ])
+
+        body = app_module.stream_batch_valuations(chunks, MagicMock())
+        header = next(body)
+        first_chunk = next(body)
+        assert len(batch_env) == 1  # Second chunk not valued yet
+        rows = list(csv.DictReader(io.StringIO(header + first_chunk + ''.join(body))))
+
+        assert [r['row'] for r in rows] == ['1', '2', '3']
+        assert [r['success'] for r in rows] == ['True', 'False', 'True']
+        assert rows[1]['error'] == 'Missing required field: size_sqm'
+        assert int(rows[0]['estimated_value']) > 0
+
+    def test_stream_ndjson(self, batch_env):
+        """NDJSON mode emits one JSON object per input row."""
+        import json
+        chunks = iter([[{'property_type': 'Unit', 'area': 'Dubai Marina', 'size_sqm': '100'}]])
+
+        lines = ''.join(app_module.stream_batch_valuations(chunks, MagicMock(), 'ndjson')).splitlines()
+
+        record = json.loads(lines[0])
+        assert len(lines) == 1 and record['row'] == 1 and record['success']
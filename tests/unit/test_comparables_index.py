@@ -0,0 +1,116 @@
+"""Unit tests for the in-memory comparables index (valuation_engine).
+
+Checks that the indexed lookup returns exactly the rows the original
+DataFrame-mask implementation selected for every fallback tier:
+1. Area + type + size band
+2. Area + type
+3. Area-wide (all types)
+4. City-wide same type (with and without size band)
+"""
+import pytest
+import numpy as np
+import pandas as pd
+from unittest.mock import patch
+
+# Import valuation engine components
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+import valuation_engine
+from valuation_engine import build_comparables_index, find_comparable_properties
+
+
+def make_dataset(n=2000, seed=7):
+    """Synthetic cleaned dataset ordered most recent first."""
+    rng = np.random.default_rng(seed)
+    areas = ['Dubai Marina', 'Business Bay', 'JUMEIRAH VILLAGE CIRCLE', 'Al Barsha', 'Tiny Area']
+    types = ['Unit', 'Villa', 'Land']
+    area_col = rng.choice(areas[:-1], size=n)
+    area_col[:2] = 'Tiny Area'
+    df = pd.DataFrame({
+        'area_name_en': area_col,
+        'property_type_en': rng.choice(types, size=n, p=[0.7, 0.25, 0.05]),
+        'property_total_value': rng.uniform(300_000, 5_000_000, size=n).round(),
+        'actual_area': rng.integers(30, 600, size=n).astype(float),
+        'transaction_year': rng.integers(2020, 2026, size=n),
+    })
+    return df
+
+
+def naive_comparables(df, property_data, max_comparables=10):
+    """Reference implementation using boolean masks (pre-index behaviour)."""
+    area_name = property_data.get('area_name', '').lower()
+    area_matches = df[df['area_name_en'].str.lower() == area_name]
+    if property_data.get('property_type'):
+        type_matches = area_matches[
+            area_matches['property_type_en'].str.lower() == property_data['property_type'].lower()
+        ]
+    else:
+        type_matches = area_matches
+    target_size = property_data.get('area_sqm', 100)
+    size_range = (target_size * 0.7, target_size * 1.3)
+    size_matches = type_matches[
+        (type_matches['actual_area'] >= size_range[0]) &
+        (type_matches['actual_area'] <= size_range[1])
+    ]
+    if len(size_matches) >= 3:
+        return size_matches.head(max_comparables), 95
+    if len(type_matches) >= 3:
+        return type_matches.head(max_comparables), 88
+    if len(area_matches) >= 3:
+        return area_matches.head(max_comparables), 82
+    city_type = df[df['property_type_en'].str.lower() == property_data.get('property_type', '').lower()]
+    city_size = city_type[
+        (city_type['actual_area'] >= size_range[0]) &
+        (city_type['actual_area'] <= size_range[1])
+    ]
+    if len(city_size) >= 3:
+        return city_size.head(max_comparables), 75
+    return city_type.head(max_comparables), 70
+
+
+class TestComparablesIndex:
+    """Test suite for build_comparables_index / find_comparable_properties."""
+
+    @pytest.fixture
+    def dataset(self):
+        return make_dataset()
+
+    @pytest.mark.parametrize('property_data', [
+        {'area_name': 'Dubai Marina', 'property_type': 'Unit', 'area_sqm': 120},
+        {'area_name': 'dubai marina', 'property_type': 'unit', 'area_sqm': 120},
+        {'area_name': 'Jumeirah Village Circle', 'property_type': 'Villa', 'area_sqm': 400},
+        {'area_name': 'Business Bay', 'property_type': 'Land', 'area_sqm': 5},
+        {'area_name': 'Tiny Area', 'property_type': 'Villa', 'area_sqm': 250},
+        {'area_name': 'Unknown Area', 'property_type': 'Unit', 'area_sqm': 90},
+        {'area_name': 'Unknown Area', 'property_type': 'Unit', 'area_sqm': 5000},
+        {'area_name': 'Al Barsha', 'property_type': '', 'area_sqm': 150},
+    ])
+    def test_index_matches_mask_filtering(self, dataset, property_data):
+        """Indexed lookup selects the same rows and tier as the mask version."""
+        expected, expected_confidence = naive_comparables(dataset, property_data)
+
+        with patch('valuation_engine.load_dubai_dataset', return_value=dataset):
+            comparables, confidence = find_comparable_properties(property_data)
+
+        assert confidence == expected_confidence
+        assert list(comparables.index) == list(expected.index)
+
+    def test_index_groups_are_size_sorted(self, dataset):
+        """Every (area, type) group is a contiguous, size-sorted slice."""
+        index = build_comparables_index(dataset)
+
+        for (area_id, type_id), (start, end) in index['group_offsets'].items():
+            sizes = index['group_sizes'][start:end]
+            assert np.all(np.diff(sizes) >= 0)
+        assert sum(end - start for start, end in index['group_offsets'].values()) == len(dataset)
+
+    def test_index_rebuilt_when_dataset_changes(self, dataset):
+        """A new dataset object invalidates the cached index."""
+        first = valuation_engine.get_comparables_index(dataset)
+        assert valuation_engine.get_comparables_index(dataset) is first
+
+        refreshed = dataset.head(100)
+        second = valuation_engine.get_comparables_index(refreshed)
+        assert second is not first
+        assert second['row_count'] == 100
@@ -0,0 +1,181 @@
+"""Unit tests for the shared dataset snapshot (valuation_engine).
+
+Tests the memory-mapped snapshot that gunicorn workers share:
+1. Round-trip of numeric and dictionary-encoded string columns
+2. Read-only mapping without copying column data
+3. Atomic CURRENT pointer swap, cleanup of old snapshots (the previous one is
+   kept) and re-mapping when a version is pruned under a worker
+4. Single refresh per stale snapshot under the file lock
+5. Watermark delta refresh with per-group outlier re-trimming
+"""
+import pytest
+import numpy as np
+import pandas as pd
+from unittest.mock import MagicMock, patch
+
+# Import valuation engine components
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+import valuation_engine
+from valuation_engine import (
+    write_dataset_snapshot,
+    map_dataset_snapshot,
+    read_snapshot_pointer,
+    trim_outliers,
+    merge_dataset_delta,
+    build_dataset,
+)
+
+
+@pytest.fixture
+def dataset():
+    """Small cleaned dataset with the production column layout."""
+    return pd.DataFrame({
+        'area_name_en': ['Dubai Marina', 'Business Bay', 'Dubai Marina', None],
+        'property_type_en': ['Unit', 'Unit', 'Villa', 'Unit'],
+        'property_total_value': [1_000_000.0, 1_500_000.0, 4_000_000.0, 900_000.0],
+        'actual_area': [80.0, 95.0, 300.0, 70.0],
+        'rooms_en': ['1 B/R', '2 B/R', None, 'Studio'],
+        'instance_date': ['2025-01-03', '2024-12-30', '2024-11-02', '2024-10-01'],
+        'transaction_year': [2025, 2024, 2024, 2024],
+    })
+
+
+class TestDatasetSnapshot:
+    """Test suite for write_dataset_snapshot / map_dataset_snapshot."""
+
+    def test_snapshot_round_trip(self, dataset, tmp_path):
+        """Mapped snapshot has the same values as the source frame."""
+        manifest = write_dataset_snapshot(dataset, str(tmp_path))
+        mapped = map_dataset_snapshot(manifest, str(tmp_path))
+
+        assert list(mapped.columns) == list(dataset.columns)
+        assert mapped['area_name_en'].dtype == 'category'
+        assert mapped['area_name_en'].isna().tolist() == [False, False, False, True]
+        assert mapped['area_name_en'].astype(object).tolist()[:3] == ['Dubai Marina', 'Business Bay', 'Dubai Marina']
+        np.testing.assert_array_equal(mapped['property_total_value'], dataset['property_total_value'])
+        np.testing.assert_array_equal(mapped['transaction_year'], dataset['transaction_year'])
+
+    def test_snapshot_is_memory_mapped(self, dataset, tmp_path):
+        """Columns are backed by read-only memory maps, not private copies."""
+        manifest = write_dataset_snapshot(dataset, str(tmp_path))
+        mapped = map_dataset_snapshot(manifest, str(tmp_path))
+
+        values = mapped['actual_area'].to_numpy()
+        bases = []
+        while values is not None:
+            bases.append(values)
+            values = getattr(values, 'base', None)
+        assert any(isinstance(b, np.memmap) for b in bases)
+        assert not mapped['actual_area'].to_numpy().flags.writeable
+
+    def test_pointer_swap_removes_old_snapshots(self, dataset, tmp_path):
+        """Writing a new snapshot repoints CURRENT and prunes all but the previous version."""
+        first = write_dataset_snapshot(dataset, str(tmp_path))
+        second = write_dataset_snapshot(dataset.head(3), str(tmp_path))
+        assert os.path.exists(tmp_path / first['version'])  # Workers may still be about to map it
+
+        third = write_dataset_snapshot(dataset.head(2), str(tmp_path))
+
+        assert read_snapshot_pointer(str(tmp_path))['version'] == third['version']
+        assert not os.path.exists(tmp_path / first['version'])
+        assert map_dataset_snapshot(second, str(tmp_path))['actual_area'].tolist() == [80.0, 95.0, 300.0]
+        assert read_snapshot_pointer(str(tmp_path))['row_count'] == 2
+
+    def test_pruned_snapshot_remapped_from_pointer(self, dataset, tmp_path, monkeypatch):
+        """A version pruned between reading the pointer and mapping it is replaced by the current one."""
+        stale = write_dataset_snapshot(dataset, str(tmp_path))
+        write_dataset_snapshot(dataset, str(tmp_path))
+        live = write_dataset_snapshot(dataset.head(2), str(tmp_path))
+        pointers = iter([stale, read_snapshot_pointer(str(tmp_path))])
+        monkeypatch.setattr(valuation_engine, '_dataset_cache', {})
+        monkeypatch.setattr(valuation_engine, 'read_snapshot_pointer', lambda: next(pointers))
+        monkeypatch.setattr(valuation_engine, 'map_dataset_snapshot',
+                            lambda manifest: map_dataset_snapshot(manifest, str(tmp_path)))
+
+        df = valuation_engine.load_dubai_dataset_from_db()
+
+        assert len(df) == 2
+        assert valuation_engine._dataset_cache['current']['version'] == live['version']
+
+    def test_refresh_skipped_when_snapshot_fresh(self, dataset, tmp_path):
+        """A worker that waited on the lock reuses the snapshot another worker wrote."""
+        fresh = write_dataset_snapshot(dataset, str(tmp_path))
+
+        with patch('valuation_engine.query_dubai_dataset') as mock_query:
+            manifest = valuation_engine._refresh_dataset_snapshot(MagicMock(), str(tmp_path))
+
+        assert manifest['version'] == fresh['version']
+        mock_query.assert_not_called()
+
+
+def make_raw(n_per_group=30, date='2024-12-01'):
+    """Untrimmed rows for two (area, type) groups with one extreme price each."""
+    rows = []
+    for area in ['Dubai Marina', 'Business Bay']:
+        for i in range(n_per_group):
+            value = 1_000_000.0 + i * 10_000
+            if i == 0:
+                value = 40_000_000.0  # Outlier
+            rows.append({
+                'area_name_en': area,
+                'property_type_en': 'Unit',
+                'property_total_value': value,
+                'actual_area': 100.0,
+                'instance_date': date,
+            })
+    raw = pd.DataFrame(rows)
+    raw['price_per_sqm'] = raw['property_total_value'] / raw['actual_area']
+    return raw
+
+
+class TestDeltaRefresh:
+    """Test suite for trim_outliers / merge_dataset_delta / delta refresh."""
+
+    def test_trim_is_per_group(self):
+        """Outliers are judged against their own (area, type) group."""
+        raw = trim_outliers(make_raw())
+
+        assert not raw.loc[raw['property_total_value'] == 40_000_000.0, 'keep'].any()
+        kept = build_dataset(raw)
+        assert 'keep' not in kept.columns
+        assert set(kept['area_name_en']) == {'Dubai Marina', 'Business Bay'}
+
+    def test_small_groups_not_trimmed(self):
+        """Groups below the minimum size keep every row."""
+        raw = trim_outliers(make_raw(n_per_group=5))
+        assert raw['keep'].all()
+
+    def test_merge_replaces_watermark_day(self):
+        """Rows already held for the watermark date are replaced, not duplicated."""
+        raw = trim_outliers(make_raw(date='2024-12-01'))
+        delta = make_raw(n_per_group=2, date='2024-12-01').iloc[[0]]
+
+        merged, affected = merge_dataset_delta(raw, delta, '2024-12-01')
+
+        assert len(merged) == 1
+        assert affected == {'dubai marina|unit', 'business bay|unit'}
+
+    def test_delta_refresh_only_queries_since_watermark(self, tmp_path):
+        """A stale snapshot with raw rows is refreshed from a delta query."""
+        raw = trim_outliers(make_raw(date='2024-12-01'))
+        write_dataset_snapshot(build_dataset(raw), str(tmp_path), raw=raw, extra={
+            'watermark': '2024-12-01',
+            'full_refresh_at': valuation_engine.time.time(),
+            'created_at': 0,
+        })
+        new_rows = make_raw(n_per_group=1, date='2024-12-02')
+        new_rows['property_total_value'] = 1_100_000.0
+        new_rows['price_per_sqm'] = 11_000.0
+        # The delta is inclusive of the watermark date, so it re-reads that day too
+        delta = pd.concat([new_rows, make_raw(date='2024-12-01')], ignore_index=True)
+
+        with patch('valuation_engine.query_dubai_dataset', return_value=delta) as mock_query:
+            manifest = valuation_engine._refresh_dataset_snapshot(MagicMock(), str(tmp_path))
+
+        assert mock_query.call_args.kwargs == {'since': '2024-12-01'}
+        assert manifest['watermark'] == '2024-12-02'
+        assert manifest['row_count'] == (raw['keep'].sum() + 2)
+        mapped = map_dataset_snapshot(manifest, str(tmp_path))
+        assert mapped['instance_date'].astype(object).tolist()[:2] == ['2024-12-02', '2024-12-02']
@@ -0,0 +1,79 @@
+"""Unit tests for the shared dictionary encoding layer (dictionary_encoding).
+
+Tests:
+1. Frames share one append-only dictionary per column
+2. Dataset aliases (area_name_en) share the raw column's dictionary
+3. Existing categoricals (snapshots, Parquet) are re-coded to the shared dictionary
+4. equals_mask / contains_mask match the string operations they replace
+"""
+import pytest
+import numpy as np
+import pandas as pd
+
+# Import encoding components
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+import dictionary_encoding
+from dictionary_encoding import encode_frame, encode_column, equals_mask, contains_mask, lower_codes
+
+
+@pytest.fixture(autouse=True)
+def fresh_dictionaries(monkeypatch):
+    """Each test starts with empty dictionaries."""
+    monkeypatch.setattr(dictionary_encoding, '_dictionaries', {})
+
+
+class TestDictionaryEncoding:
+    """Test suite for encode_frame / encode_column."""
+
+    def test_codes_stable_across_frames(self):
+        """A value gets the same code in every frame; new values are appended."""
+        first = encode_frame(pd.DataFrame({'area_en': ['Dubai Marina', 'Al Barsha', None]}))
+        second = encode_frame(pd.DataFrame({'area_en': ['Business Bay', 'Dubai Marina']}))
+
+        assert first['area_en'].cat.codes.tolist() == [0, 1, -1]
+        assert second['area_en'].cat.codes.tolist() == [2, 0]
+        assert list(second['area_en'].cat.categories) == ['Dubai Marina', 'Al Barsha', 'Business Bay']
+
+    def test_alias_shares_dictionary(self):
+        """area_name_en (valuation dataset) uses the area_en dictionary."""
+        encode_frame(pd.DataFrame({'area_en': ['Dubai Marina']}))
+        dataset = encode_frame(pd.DataFrame({'area_name_en': ['Al Barsha', 'Dubai Marina'], 'other': ['x', 'y']}))
+
+        assert dataset['area_name_en'].cat.codes.tolist() == [1, 0]
+        assert not isinstance(dataset['other'].dtype, pd.CategoricalDtype)
+
+    def test_existing_categorical_recoded(self):
+        """Categoricals with their own categories are remapped, values preserved."""
+        encode_column(pd.Series(['Villa']), 'prop_type_en')
+        mapped = pd.Series(pd.Categorical(['Unit', 'Villa', 'Unit']))
+
+        encoded = encode_column(mapped, 'property_type_en')
+
+        assert encoded.astype(object).tolist() == ['Unit', 'Villa', 'Unit']
+        assert encoded.cat.codes.tolist() == [1, 0, 1]
+
+    @pytest.mark.parametrize('encoded', [True, False])
+    def test_masks_match_string_operations(self, encoded):
+        """Mask helpers agree with str.lower()== and str.contains on both representations."""
+        df = pd.DataFrame({
+            'area_en': ['Dubai Marina', 'DUBAI MARINA', 'Marina Walk', None, 'Al Barsha'],
+            'prop_type_en': ['Unit', 'unit', 'Villa', 'Unit', None],
+        })
+        expected_type = (df['prop_type_en'].str.lower() == 'unit').fillna(False).to_numpy(dtype=bool)
+        expected_area = df['area_en'].str.contains('marina', case=False, na=False).to_numpy(dtype=bool)
+        if encoded:
+            df = encode_frame(df)
+
+        np.testing.assert_array_equal(equals_mask(df['prop_type_en'], 'UNIT'), expected_type)
+        np.testing.assert_array_equal(contains_mask(df['area_en'], 'marina'), expected_area)
+
+    def test_lower_codes_case_insensitive(self):
+        """Case variants of a category share one lowercased code."""
+        series = encode_column(pd.Series(['Dubai Marina', 'DUBAI MARINA', None, 'Al Barsha']), 'area_en')
+
+        codes, names = lower_codes(series)
+
+        assert codes[0] == codes[1] and codes[2] == -1 and codes[3] != codes[0]
+        assert names[codes[3]] == 'al barsha'
@@ -0,0 +1,153 @@
+"""Unit tests for the rental-context ML feature store (feature_store.py).
+
+Tests:
+1. Segment features at (area, type, bedrooms), (area, type) and area level
+2. Lookups fall back to coarser levels when a segment is thin or unknown
+3. enrich() keeps caller values; enrich_frame() matches per-record lookups
+4. The store is loaded from the Parquet copy and cached per worker
+5. predict_many feeds store features to the model
+6. Training features are point-in-time: each month sees only the trailing
+   window before it
+"""
+import pytest
+import numpy as np
+import pandas as pd
+from unittest.mock import patch
+
+# Import feature store components
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+import feature_store
+from feature_store import (ContextFeatureStore, ContextFeatureHistory, compute_context_features,
+                           compute_monthly_context_features, month_index, save_features,
+                           load_context_features, CONTEXT_FEATURES, ANY_TYPE, ANY_BEDROOMS)
+from worker_cache import WorkerCache
+import app as app_module
+
+SALES = pd.DataFrame({
+    'area_en': ['Dubai Marina'] * 4 + ['JVC'] * 2 + ['Dubai Marina'],
+    'prop_type_en': ['Unit'] * 6 + ['Unit'],
+    'rooms_en': ['1 B/R', '1 B/R', '2 B/R', '2 B/R', 'Studio', 'Studio', '1 B/R'],
+    'trans_value': [1_000_000, 1_200_000, 2_000_000, 2_400_000, 500_000, 700_000, 900_000],
+    'instance_date': pd.to_datetime(['2025-03-01'] * 6 + ['2022-01-01']),  # Last row outside the window
+})
+RENTALS = pd.DataFrame({
+    'area_en': ['Dubai Marina'] * 7 + ['JVC'] * 5,
+    'prop_type_en': ['Unit'] * 12,
+    'rooms': ['1 B/R'] * 5 + ['2 B/R'] * 2 + ['Studio'] * 5,
+    'annual_amount': [80_000, 90_000, 85_000, 95_000, 100_000, 150_000, 160_000,
+                      40_000, 42_000, 44_000, 46_000, 48_000],
+    'registration_date': pd.to_datetime(['2025-02-01'] * 12),
+})
+
+
+@pytest.fixture
+def store():
+    return ContextFeatureStore(compute_context_features(SALES, RENTALS))
+
+
+class TestComputeContextFeatures:
+    """Test suite for compute_context_features."""
+
+    def test_segment_levels(self):
+        features = compute_context_features(SALES, RENTALS).set_index(['area', 'prop_type', 'bedrooms'])
+
+        marina_1br = features.loc[('dubai marina', 'unit', 1)]
+        assert marina_1br['median_rent_nearby'] == 90_000
+        assert marina_1br['rental_availability'] == 5
+        assert marina_1br['rent_to_price_ratio'] == pytest.approx(90_000 / 1_100_000)
+        assert ('dubai marina', 'unit', 2) not in features.index  # Only 2 contracts
+        assert features.loc[('dubai marina', 'unit', ANY_BEDROOMS), 'rental_availability'] == 7
+        assert features.loc[('jvc', ANY_TYPE, ANY_BEDROOMS), 'median_rent_nearby'] == 44_000
+
+
+class TestMonthlyContextFeatures:
+    """Test suite for compute_monthly_context_features / ContextFeatureHistory."""
+
+    def test_point_in_time(self):
+        march, april = month_index(['2025-03-10', '2025-04-10'])
+        features = compute_monthly_context_features(SALES, RENTALS, [march, april, np.nan, march])
+
+        assert sorted(features['month'].unique()) == [march, april]
+        march_1br = features[(features['month'] == march) & (features['bedrooms'] == 1)].iloc[0]
+        assert march_1br['median_rent_nearby'] == 90_000
+        assert march_1br['rent_to_price_ratio'] == 0.0  # March sales are not in March's window
+        april_1br = features[(features['month'] == april) & (features['bedrooms'] == 1)].iloc[0]
+        assert april_1br['rent_to_price_ratio'] == pytest.approx(90_000 / 1_100_000)
+
+        late = compute_monthly_context_features(SALES, RENTALS, month_index(['2026-03-01']))
+        assert late.empty  # February 2025 contracts are outside the 12-month window
+
+    def test_history_enrich_frame(self):
+        months = month_index(['2025-03-10', '2025-04-10'])
+        history = ContextFeatureHistory(compute_monthly_context_features(SALES, RENTALS, months))
+        frame = pd.DataFrame({
+            'area_en': ['Dubai Marina', 'Dubai Marina', 'Dubai Marina', 'JVC'],
+            'prop_type_en': ['Unit'] * 4,
+            'rooms_en': ['1 B/R'] * 3 + ['Studio'],
+            'instance_date': pd.to_datetime(['2025-03-20', '2025-04-02', '2024-12-01', None]),
+        }, index=[10, 11, 12, 13])
+
+        enriched = history.enrich_frame(frame)
+
+        assert list(enriched.index) == [10, 11, 12, 13]
+        assert enriched['rental_availability'].tolist() == [5, 5, 0, 0]
+        assert enriched.loc[10, 'rent_to_price_ratio'] == 0.0
+        assert enriched.loc[11, 'rent_to_price_ratio'] == pytest.approx(90_000 / 1_100_000)
+
+
+class TestContextFeatureStore:
+    """Test suite for ContextFeatureStore lookups and enrichment."""
+
+    def test_lookup_fallback(self, store):
+        assert store.lookup('DUBAI MARINA ', 'unit', '1 B/R')['rental_availability'] == 5
+        assert store.lookup('Dubai Marina', 'Unit', '2 B/R')['rental_availability'] == 7
+        assert store.lookup('Dubai Marina', 'Villa', None)['median_rent_nearby'] == 95_000
+        assert store.lookup('Unknown Area', 'Unit', '1 B/R') is None
+
+    def test_enrich(self, store):
+        records = [
+            {'area_en': 'Dubai Marina', 'prop_type_en': 'Unit', 'rooms_en': '1 B/R', 'median_rent_nearby': 1.0},
+            {'area_en': 'JVC', 'prop_type_en': 'Unit', 'rooms_en': 'Studio'},
+            {'area_en': 'Nowhere'},
+        ]
+        enriched = store.enrich(records)
+
+        assert enriched[0]['median_rent_nearby'] == 1.0 and enriched[0]['rental_availability'] == 5
+        assert enriched[1]['median_rent_nearby'] == 44_000
+        assert enriched[2] is records[2]
+
+        frame = store.enrich_frame(pd.DataFrame(records).drop(columns='median_rent_nearby'))
+        assert frame.loc[1, CONTEXT_FEATURES].tolist() == [enriched[1][f] for f in CONTEXT_FEATURES]
+        assert frame.loc[2, CONTEXT_FEATURES].tolist() == [0.0, 0.0, 0.0]
+
+    def test_load_from_parquet(self, tmp_path, monkeypatch):
+        path = str(tmp_path / 'context_features.parquet')
+        save_features(compute_context_features(SALES, RENTALS), path)
+        monkeypatch.setattr(feature_store, '_features', WorkerCache('ML context features', feature_store.FEATURE_STORE_TTL))
+
+        loaded = load_context_features(None, path=path)
+
+        assert len(loaded) == 6
+        assert load_context_features(None, path=path) is loaded
+        assert loaded.lookup('JVC', 'Unit', 'Studio')['rental_availability'] == 5
+
+
+class TestPredictManyContext:
+    """Test suite for feature store use in app.predict_many."""
+
+    def test_features_reach_model(self, store):
+        seen = []
+
+        def fake_predict(properties):
+            seen.extend(properties)
+            return np.ones(len(properties)), np.full(len(properties), 0.8), 'test'
+
+        with patch.object(app_module, 'load_context_features', return_value=store), \
+             patch.object(app_module.model_registry, 'predict', side_effect=fake_predict), \
+             patch.object(type(app_module.model_registry), 'active', new='bundle'):
+            result = app_module.predict_many([{'area_en': 'JVC', 'prop_type_en': 'Unit', 'rooms_en': 'Studio', 'actual_area': 40}])
+
+        assert result[0]['method'] == 'xgboost'
+        assert seen[0]['median_rent_nearby'] == 44_000 and seen[0]['actual_area'] == 40
@@ -0,0 +1,84 @@
+"""Unit tests for the parallel hyperparameter search (archive/development/hyperparameter_search.py).
+
+Tests:
+1. Time folds expand forward and never validate on earlier rows
+2. The feature cache round-trips chunks through a memory map
+3. A search prunes candidates after each fold and ranks the leaderboard
+"""
+import json
+import pytest
+import numpy as np
+
+# Import search components
+import sys
+import os
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'archive', 'development'))
+import hyperparameter_search
+from hyperparameter_search import (time_folds, write_feature_cache, load_feature_cache, cache_exists,
+                                   sample_candidates, run_search, best_params, TIME_COLUMN)
+
+COLUMNS = ['actual_area', TIME_COLUMN, 'room_count']
+
+
+def synthetic_chunks(n=600, chunk_rows=200, seed=3):
+    """(X, y) chunks of a price ~ area * rate problem with shuffled dates"""
+    rng = np.random.default_rng(seed)
+    for start in range(0, n, chunk_rows):
+        size = rng.uniform(300, 3000, chunk_rows)
+        days = rng.integers(0, 1500, chunk_rows)
+        rooms = rng.integers(0, 5, chunk_rows)
+        X = np.column_stack([size, days, rooms])
+        yield X, size * (1000 + days * 0.2) + rooms * 50_000
+
+
+class TestTimeFolds:
+    """Test suite for time_folds."""
+
+    def test_expanding_and_forward(self):
+        times = np.random.default_rng(0).permutation(100)
+        folds = time_folds(times, 3)
+
+        assert len(folds) == 3
+        for k, (train, val) in enumerate(folds):
+            assert times[train].max() < times[val].min()
+            assert len(train) == 25 * (k + 1) and len(val) == 25
+
+
+class TestFeatureCache:
+    """Test suite for the on-disk feature matrix."""
+
+    def test_round_trip(self, tmp_path):
+        cache_dir = str(tmp_path / 'cache')
+        chunks = list(synthetic_chunks())
+        write_feature_cache(iter(chunks), COLUMNS, cache_dir)
+
+        X, y, columns = load_feature_cache(cache_dir)
+
+        assert cache_exists(cache_dir) and columns == COLUMNS
+        assert isinstance(X, np.memmap) and X.dtype == np.float32 and X.shape == (600, 3)
+        np.testing.assert_allclose(X, np.vstack([c[0] for c in chunks]).astype(np.float32))
+        np.testing.assert_allclose(y, np.concatenate([c[1] for c in chunks]))
+
+
+class TestRunSearch:
+    """Test suite for run_search."""
+
+    def test_prunes_and_ranks(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(hyperparameter_search, 'MAX_BOOST_ROUNDS', 60)
+        monkeypatch.setattr(hyperparameter_search, 'EARLY_STOPPING_ROUNDS', 10)
+        cache_dir = write_feature_cache(synthetic_chunks(), COLUMNS, str(tmp_path / 'cache'))
+        candidates = sample_candidates(4, {'max_depth': 8, 'learning_rate': 0.05, 'n_jobs': -1})
+
+        leaderboard = run_search(cache_dir, candidates, n_folds=2, n_workers=2, threads_per_worker=1)
+
+        assert candidates[0] == {'max_depth': 8, 'learning_rate': 0.05}
+        assert len({json.dumps(c, sort_keys=True) for c in candidates}) == 4
+        assert [entry['rank'] for entry in leaderboard] == [1, 2, 3, 4]
+        assert [entry['status'] for entry in leaderboard] == ['complete', 'complete', 'pruned', 'pruned']
+        complete = leaderboard[:2]
+        assert complete[0]['mean_mae'] <= complete[1]['mean_mae']
+        assert all(len(entry['fold_mae']) == 1 for entry in leaderboard[2:])
+        best = best_params(leaderboard)
+        assert best['n_estimators'] == int(np.median(leaderboard[0]['best_iterations'])) + 1
@@ -0,0 +1,111 @@
+"""Unit tests for the shared JSON response encoder (json_encoding).
+
+Tests:
+1. frame_records converts column-wise with NaN/NaT/NA as None
+2. dumps handles NumPy scalars/arrays, Decimal and NaN without pre-cleaning
+3. jsonify goes through the app's provider
+4. Valuation comparables lists built without row loops
+"""
+import json
+import decimal
+import pytest
+import numpy as np
+import pandas as pd
+
+# Import encoding components
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+from json_encoding import frame_records, dumps
+import app as app_module
+
+
+class TestJSONEncoding:
+    """Test suite for frame_records / dumps."""
+
+    def test_frame_records_missing_values(self):
+        """Missing markers of every dtype become None; values become builtins."""
+        df = pd.DataFrame({
+            'price': [1_500_000.0, np.nan],
+            'rooms': pd.Categorical(['2 B/R', None]),
+            'date': pd.to_datetime(['2024-03-01', None]),
+            'count': np.array([3, 4], dtype=np.int64),
+            'flag': pd.array([True, pd.NA], dtype='boolean'),
+        })
+
+        records = frame_records(df)
+
+        assert records == [
+            {'price': 1_500_000.0, 'rooms': '2 B/R', 'date': '2024-03-01T00:00:00', 'count': 3, 'flag': True},
+            {'price': None, 'rooms': None, 'date': None, 'count': 4, 'flag': None},
+        ]
+        assert type(records[0]['count']) is int
+        assert df['price'].isna().sum() == 1  # Input not modified
+
+    def test_dumps_numpy_decimal_nan(self):
+        """NumPy values, Decimal and NaN/Infinity serialize to valid JSON."""
+        payload = {
+            'median': np.float64(1.5),
+            'count': np.int64(7),
+            'flags': np.array([True, False]),
+            'value': decimal.Decimal('1250000.50'),
+            'missing': float('nan'),
+            'ratio': np.float64(np.inf),
+            'when': pd.NaT,
+            'frame': pd.DataFrame({'a': [1.0, np.nan]}),
+        }
+
+        decoded = json.loads(dumps(payload))
+
+        assert decoded == {
+            'median': 1.5, 'count': 7, 'flags': [True, False], 'value': 1250000.5,
+            'missing': None, 'ratio': None, 'when': None, 'frame': [{'a': 1.0}, {'a': None}],
+        }
+
+    def test_jsonify_uses_provider(self):
+        """jsonify accepts NumPy values directly."""
+        with app_module.app.app_context():
+            response = app_module.jsonify({'stats': {'median_price': np.float64(np.nan), 'n': np.int32(2)}})
+
+        assert json.loads(response.get_data(as_text=True)) == {'stats': {'median_price': None, 'n': 2}}
+
+
+class TestComparablesLists:
+    """Column-wise comparables lists in the valuation response."""
+
+    def test_rental_comparables(self):
+        rentals = pd.DataFrame({
+            'annual_amount': [120_000, None, 90_000],
+            'actual_area': ['100', '80', ''],
+            'registration_date': pd.to_datetime(['2024-05-01', '2024-04-01', '2024-03-01']),
+            'area_en': ['Dubai Marina', 'JVC', 'JVC'],
+            'project_en': [None, 'X', 'Bloom Towers'],
+            'prop_type_en': [None, 'Unit', 'Unit'],
+            'prop_sub_type_en': ['Flat', 'Flat', 'Flat'],
+        })
+
+        result = app_module.rental_comparables_list(rentals)
+
+        assert result == [
+            {'project_name': 'Dubai Marina', 'location': 'Dubai Marina', 'size_sqm': 100.0, 'annual_rent': 120000,
+             'rent_per_sqm': 1200, 'listing_date': '2024-05-01', 'property_type': 'Flat'},
+            {'project_name': 'Bloom Towers', 'location': 'JVC', 'size_sqm': 0.0, 'annual_rent': 90000,
+             'rent_per_sqm': 0, 'listing_date': '2024-03-01', 'property_type': 'Unit'},
+        ]
+
+    def test_sales_comparables(self):
+        comparables = pd.DataFrame({
+            'area_name_en': pd.Categorical(['Dubai Marina', None]),
+            'property_type_en': ['Unit', 'Unit'],
+            'actual_area': [100.0, np.nan],
+            'property_total_value': [1_500_000.0, 900_000.0],
+            'price_per_sqm': [15_000.0, np.nan],
+            'project_en': ['Marina Gate', None],
+            'instance_date': pd.to_datetime(['2024-05-01', '2024-04-01']),
+        })
+
+        result = app_module.comparables_list(comparables)
+
+        assert result[0]['area_sqm'] == 100.0 and result[0]['project'] == 'Marina Gate'
+        assert result[1]['area_name'] == 'N/A' and result[1]['area_sqm'] == 0.0 and result[1]['price_per_sqm'] == 0.0
+        assert result[1]['transaction_date'] == '2024-04-01'
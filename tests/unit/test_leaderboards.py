@@ -0,0 +1,209 @@
+"""Unit tests for Redis area leaderboards (leaderboards.py).
+
+Tests:
+1. Rollup rows become per-period, per-segment boards (volume, price/sqm, growth)
+2. Published boards read back in the /api/top-areas format
+3. Incremental updates from new transactions (outlier prices skipped)
+4. /api/top-areas serves from the leaderboard and falls back to SQL
+"""
+import pytest
+import pandas as pd
+from unittest.mock import MagicMock, patch
+
+# Import leaderboard components
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+import leaderboards
+import app as app_module
+
+CURRENT_MONTH = 2025 * 12 + 11  # December 2025
+
+
+class FakeRedis:
+    """In-memory sorted sets and hashes (just the commands leaderboards.py uses)"""
+
+    def __init__(self):
+        self.data = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def exists(self, key):
+        return int(key in self.data)
+
+    def delete(self, key):
+        return int(self.data.pop(key, None) is not None)
+
+    def expire(self, key, seconds):
+        return int(key in self.data)
+
+    def rename(self, src, dst):
+        self.data[dst] = self.data.pop(src)
+        return True
+
+    def zadd(self, key, mapping):
+        self.data.setdefault(key, {}).update({k: float(v) for k, v in mapping.items()})
+        return len(mapping)
+
+    def zrevrange(self, key, start, end, withscores=False):
+        ranked = sorted(self.data.get(key, {}).items(), key=lambda item: (-item[1], item[0]))[start:end + 1]
+        return ranked if withscores else [member for member, _ in ranked]
+
+    def hset(self, key, mapping):
+        self.data.setdefault(key, {}).update({k: str(v) for k, v in mapping.items()})
+        return len(mapping)
+
+    def hmget(self, key, fields):
+        values = self.data.get(key, {})
+        return [values.get(field) for field in fields]
+
+    def hincrbyfloat(self, key, field, amount):
+        values = self.data.setdefault(key, {})
+        values[field] = str(float(values.get(field, 0)) + amount)
+        return float(values[field])
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client, self.calls = client, []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.calls.append((getattr(self.client, name), args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        results = [method(*args, **kwargs) for method, args, kwargs in self.calls]
+        self.calls = []
+        return results
+
+
+def rollup_row(month, area, rooms, count, price, ppsqm, prop_type='Unit'):
+    return {'month': month, 'area_en': area, 'prop_type_en': prop_type, 'rooms_en': rooms,
+            'is_offplan_en': 'Ready', 'transaction_count': count, 'price_sum': price * count,
+            'price_per_sqm_sum': ppsqm * count, 'price_per_sqm_count': count}
+
+
+ROWS = pd.DataFrame([
+    rollup_row('2025-01-01', 'Dubai Marina', '2 B/R', 10, 2_000_000, 20_000),
+    rollup_row('2025-12-01', 'Dubai Marina', '2 B/R', 10, 2_200_000, 22_000),
+    rollup_row('2025-01-01', 'JVC', 'Studio', 30, 700_000, 10_000),
+    rollup_row('2025-12-01', 'JVC', None, 30, 750_000, 12_000),
+    rollup_row('2025-11-01', 'Palm Jumeirah', '6 B/R', 3, 9_000_000, 40_000, prop_type='Villa'),
+])
+
+
+@pytest.fixture
+def redis_client():
+    client = FakeRedis()
+    boards = leaderboards.compute_leaderboards(ROWS, 'buy', current_month=CURRENT_MONTH)
+    leaderboards.publish_leaderboards(client, boards, 'buy')
+    return client
+
+
+class TestComputeLeaderboards:
+    """Test suite for compute_leaderboards."""
+
+    def test_segments_and_growth(self):
+        boards = leaderboards.compute_leaderboards(ROWS, 'buy', current_month=CURRENT_MONTH)
+
+        overall = boards[('1Y', '*|*')]
+        assert overall.loc['JVC', 'count'] == 60 and overall.loc['Palm Jumeirah', 'count'] == 3
+        assert overall.loc['JVC', 'growth'] == pytest.approx(20.0)
+        assert pd.isna(overall.loc['Palm Jumeirah', 'growth'])
+        # NULL rooms count as studios, 6 bedrooms fall into the 5+ bucket
+        assert boards[('1Y', 'Unit|0')].loc['JVC', 'count'] == 60
+        assert list(boards[('1Y', 'Villa|5')].index) == ['Palm Jumeirah']
+        # January is outside the 3-month window
+        assert boards[('3M', '*|*')].loc['Dubai Marina', 'count'] == 10
+
+    def test_segment_key(self):
+        assert leaderboards.segment_key('Unit', '2 Bedrooms') == 'Unit|2'
+        assert leaderboards.segment_key('All Types', 'Any') == '*|*'
+        assert leaderboards.segment_key(None, '5+ Bedrooms') == '*|5'
+
+
+class TestTopAreas:
+    """Test suite for reading published boards."""
+
+    def test_rankings(self, redis_client):
+        by_volume = leaderboards.top_areas(redis_client, 'buy', '1Y', 'volume', '*|*', limit=5)
+        assert [a['area_name'] for a in by_volume] == ['JVC', 'Dubai Marina']  # Palm below MIN_TRANSACTIONS
+        assert by_volume[0] == {'area_name': 'JVC', 'transaction_count': 60, 'avg_price': 725_000.0,
+                                'avg_price_per_sqm': 11_000.0, 'market_share_percentage': 72.29,
+                                'valid_area_count': 60, 'ranking': 1}
+
+        by_price = leaderboards.top_areas(redis_client, 'buy', '1Y', 'price_per_sqm', '*|*')
+        assert [a['area_name'] for a in by_price] == ['Dubai Marina', 'JVC']
+
+        growth = leaderboards.top_areas(redis_client, 'buy', '1Y', 'growth', '*|*')
+        assert growth[0]['area_name'] == 'JVC' and growth[0]['growth_percentage'] == 20.0
+
+    def test_missing_board(self, redis_client):
+        assert leaderboards.top_areas(redis_client, 'rent', '1Y', 'volume', '*|*') is None
+
+
+class TestRecordTransactions:
+    """Test suite for incremental leaderboard updates."""
+
+    def test_new_sales_update_counters_and_scores(self, redis_client):
+        sales = [{'area_en': 'Palm Jumeirah', 'prop_type_en': 'Villa', 'rooms_en': '5 B/R',
+                  'price': 10_000_000, 'actual_area': '250', 'month': '2025-12'}] * 2
+
+        applied = leaderboards.record_transactions(redis_client, 'buy', sales, current_month=CURRENT_MONTH)
+
+        assert applied > 0
+        top = leaderboards.top_areas(redis_client, 'buy', '1Y', 'volume', '*|*')
+        palm = next(a for a in top if a['area_name'] == 'Palm Jumeirah')
+        assert palm['transaction_count'] == 5
+        assert palm['avg_price'] == pytest.approx((27_000_000 + 20_000_000) / 5)
+        assert leaderboards.top_areas(redis_client, 'buy', '1Y', 'price_per_sqm', 'Villa|5')[0]['area_name'] == 'Palm Jumeirah'
+
+    def test_out_of_bounds_prices_skipped(self, redis_client):
+        before = leaderboards.top_areas(redis_client, 'buy', '1Y', 'volume', '*|*')
+        sales = [{'area_en': 'Palm Jumeirah', 'prop_type_en': 'Villa', 'rooms_en': '5 B/R',
+                  'price': 900_000_000, 'actual_area': '250', 'month': '2025-12'},
+                 {'area_en': 'Palm Jumeirah', 'prop_type_en': 'Villa', 'rooms_en': '5 B/R',
+                  'price': 5_000, 'actual_area': '250', 'month': '2025-12'}]
+
+        assert leaderboards.record_transactions(redis_client, 'buy', sales, current_month=CURRENT_MONTH) == 0
+        assert leaderboards.top_areas(redis_client, 'buy', '1Y', 'volume', '*|*') == before
+
+
+class TestTopAreasEndpoint:
+    """Test suite for the /api/top-areas leaderboard path."""
+
+    @pytest.fixture
+    def client(self):
+        with patch.dict(app_module.app.config, {'LOGIN_DISABLED': True, 'TESTING': True}):
+            yield app_module.app.test_client()
+
+    def test_served_from_leaderboard(self, client, redis_client):
+        engine = MagicMock()
+        with patch.object(app_module, 'REDIS_ENABLED', True), patch.object(app_module, 'redis_client', redis_client), \
+                patch.object(app_module, 'engine', engine):
+            response = client.post('/api/top-areas', json={'search_type': 'buy', 'time_period': '1Y',
+                                                            'metric': 'growth', 'property_type': 'Unit'})
+
+        assert not engine.connect.called
+        assert response.json['metric'] == 'growth'
+        assert response.json['top_areas'][0]['area_name'] == 'JVC'
+
+    def test_redis_down_falls_back_to_sql(self, client):
+        broken = MagicMock()
+        broken.pipeline.side_effect = ConnectionError('Redis down')
+        engine = MagicMock()
+        conn = engine.connect.return_value
+        conn.execute.return_value = [('Downtown Dubai', 40, 3_000_000, 30_000, 20.0, 40)]
+        with patch.object(app_module, 'REDIS_ENABLED', True), patch.object(app_module, 'redis_client', broken), \
+                patch.object(app_module, 'engine', engine):
+            response = client.post('/api/top-areas', json={'search_type': 'buy', 'time_period': '1Y',
+                                                            'metric': 'price_per_sqm'})
+            growth = client.post('/api/top-areas', json={'search_type': 'buy', 'time_period': '1Y',
+                                                          'metric': 'growth'})
+
+        assert 'ORDER BY avg_price_per_sqm DESC NULLS LAST' in str(conn.execute.call_args[0][0])
+        assert response.json['top_areas'][0]['area_name'] == 'Downtown Dubai'
+        assert growth.status_code == 503
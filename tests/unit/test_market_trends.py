@@ -0,0 +1,132 @@
+"""Unit tests for the vectorized trend kernel (market_trends.py).
+
+Tests:
+1. Single-series metrics (period change, QoQ, YoY, volume, seasonality)
+2. Zero-price months are skipped for price metrics but count as data points
+3. Many aligned series in one call equal one call per series
+4. calculate_basic_trends keeps its payload and insufficient-data responses
+5. Comparison series come from one grouped query and are aligned per month
+"""
+import pytest
+import numpy as np
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+# Import trend components
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+from market_trends import compute_trend_metrics, trend_summary, align_series
+import app as app_module
+
+
+def monthly(prices, volumes=None, start_year=2024, start_month=1, sqm=None):
+    """trend_data points for consecutive months"""
+    points = []
+    for i, price in enumerate(prices):
+        month = start_month - 1 + i
+        points.append({
+            'month': f"{start_year + month // 12}-{month % 12 + 1:02d}",
+            'avg_price': price,
+            'transaction_count': volumes[i] if volumes else 10,
+            'avg_price_per_sqm': sqm[i] if sqm else 0,
+        })
+    return points
+
+
+def metrics_for(points):
+    return trend_summary(compute_trend_metrics(
+        [p['month'] for p in points], [[p['avg_price'] for p in points]],
+        [[p['transaction_count'] for p in points]], [[p['avg_price_per_sqm'] for p in points]]).iloc[0])
+
+
+class TestTrendMetrics:
+    """Test suite for compute_trend_metrics."""
+
+    def test_single_series(self):
+        prices = [100, 102, 104, 106, 108, 110, 112, 114, 116, 118, 120, 122, 130]
+        volumes = [10, 10, 10, 10, 10, 30, 10, 10, 10, 10, 10, 10, 20]
+        result = metrics_for(monthly(prices, volumes))
+
+        assert result['percentage_change'] == 30.0
+        assert result['trend_direction'] == 'upward' and result['trend_strength'] == 'strong'
+        assert result['qoq_change'] == pytest.approx(round((124 - 116) / 116 * 100, 2))
+        assert result['yoy_status'] == 'Growth' and result['yoy_change'] == 30.0  # Jan 2025 vs Jan 2024
+        assert result['volume_change'] == 100.0 and result['volume_trend'] == 'Increasing'
+        assert result['seasonal_pattern'] == 'Seasonal (Peak: Month 6)'
+        assert result['data_points'] == 13
+
+    def test_zero_prices_skipped(self):
+        result = metrics_for(monthly([100, 0, 120, 0, 90], sqm=[0, 0, 10, 12, 0]))
+
+        assert result['percentage_change'] == -10.0  # 90 vs 100, zeros ignored
+        assert result['volatility'] == pytest.approx(round(np.std([20, -25], ddof=1), 2))
+        assert result['avg_monthly_price'] == round(310 / 5)
+        assert result['price_per_sqm_change'] == 20.0
+
+    def test_batch_matches_single_calls(self):
+        rng = np.random.default_rng(5)
+        series = {
+            'Dubai Marina': monthly(list(rng.uniform(1e6, 2e6, 14)), list(rng.integers(1, 40, 14))),
+            'JVC': monthly(list(rng.uniform(5e5, 9e5, 7)), list(rng.integers(1, 40, 7)), start_month=4),
+            'Palm Jumeirah': monthly([0, 0, 5e6]),
+        }
+        rows = [dict(point, area=area) for area, points in series.items() for point in points]
+        labels, months, prices, volumes, sqm = align_series(rows, 'area')
+
+        batch = compute_trend_metrics(months, prices, volumes, sqm, series=labels)
+
+        assert list(batch.index) == list(series) and prices.shape == (3, 14)
+        for area, points in series.items():
+            assert trend_summary(batch.loc[area]) == metrics_for(points)
+        assert batch.loc['Palm Jumeirah', 'status'] == 'insufficient_prices'
+
+
+class TestCalculateBasicTrends:
+    """Test suite for the app.calculate_basic_trends wrapper."""
+
+    def test_payload(self):
+        result = app_module.calculate_basic_trends(monthly([100, 104, 103, 108, 110, 115, 117]))
+
+        assert result == metrics_for(monthly([100, 104, 103, 108, 110, 115, 117]))
+        assert result['yoy_status'] == 'Period Growth'
+        assert result['summary'].startswith('Market is rising by 17.0%')
+
+    def test_insufficient_data(self):
+        assert app_module.calculate_basic_trends(monthly([100]))['summary'] == 'Insufficient data for trend analysis'
+        assert app_module.calculate_basic_trends(monthly([0, 100]))['summary'] == 'Insufficient price data for analysis'
+
+
+class TestTrendComparison:
+    """Test suite for get_trend_series / build_trend_comparison."""
+
+    def test_single_grouped_query(self):
+        engine = MagicMock()
+        conn = engine.connect.return_value.__enter__.return_value
+        conn.execute.return_value = [
+            ('dubai marina', datetime(2025, 1, 1), 1_500_000, 12, 15_000),
+            ('dubai marina', datetime(2025, 3, 1), 1_650_000, 9, 16_000),
+            ('jvc', datetime(2025, 2, 1), 800_000, 20, None),
+            ('jvc', datetime(2025, 3, 1), 840_000, 25, 9_000),
+        ]
+        sales_map = {'price': 'trans_value', 'area_name': 'area_en', 'property_type': 'prop_type_en',
+                     'bedrooms': 'rooms_en', 'status': 'is_offplan_en'}
+
+        with patch.object(app_module, 'engine', engine), patch.object(app_module, 'SALES_MAP', sales_map):
+            rows = app_module.get_trend_series({'area': 'Marina', 'budget': 5_000_000}, 'buy',
+                                               ['Dubai Marina', 'JVC', 'Palm Jumeirah'], time_period='1Y')
+
+        assert conn.execute.call_count == 1
+        statement, params = conn.execute.call_args[0]
+        assert 'GROUP BY 1, 2' in str(statement) and 'LIKE :area' not in str(statement)
+        assert params['series_keys'] == ['dubai marina', 'jvc', 'palm jumeirah']
+        assert rows[0]['series'] == 'Dubai Marina' and rows[2]['avg_price_per_sqm'] == 0
+
+        comparison = app_module.build_trend_comparison(rows, ['Dubai Marina', 'JVC', 'Palm Jumeirah'])
+
+        assert comparison['months'] == ['2025-01', '2025-02', '2025-03']
+        marina, jvc, palm = comparison['series']
+        assert marina['avg_price'] == [1_500_000, None, 1_650_000]
+        assert jvc['transaction_count'] == [0, 20, 25]
+        assert marina['summary']['percentage_change'] == 10.0 and jvc['summary']['percentage_change'] == 5.0
+        assert palm['summary']['trend_direction'] == 'insufficient_data'
@@ -0,0 +1,127 @@
+"""Unit tests for the vectorized ML inference path (ml_inference, predict_many).
+
+Tests:
+1. Compiled encoder lookups match LabelEncoder.transform
+2. Feature matrix matches the previous one-row DataFrame pipeline
+3. predict_many equals per-property predictions with one model call
+"""
+import pytest
+import numpy as np
+import pandas as pd
+import joblib
+from datetime import datetime
+from unittest.mock import patch
+
+# Import inference components
+import sys
+import os
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+sys.path.insert(0, ROOT)
+from ml_inference import compile_encoders, build_feature_matrix, CATEGORICAL_COLUMNS
+from model_registry import ModelRegistry, ModelBundle
+import app as app_module
+
+ENCODERS = joblib.load(os.path.join(ROOT, 'models', 'label_encoders_v1.pkl'))
+FEATURE_COLUMNS = joblib.load(os.path.join(ROOT, 'models', 'feature_columns_v1.pkl'))
+NOW = datetime(2025, 5, 17)
+
+
+def legacy_features(record):
+    """Feature row as built by the former DataFrame/LabelEncoder pipeline."""
+    df = pd.DataFrame([record])
+    if 'instance_date' in df.columns:
+        df['instance_date'] = pd.to_datetime(df['instance_date'])
+        df['transaction_year'] = df['instance_date'].dt.year
+        df['transaction_month'] = df['instance_date'].dt.month
+        df['transaction_quarter'] = df['instance_date'].dt.quarter
+        df['days_since_2020'] = (df['instance_date'] - pd.Timestamp('2020-01-01')).dt.days
+    else:
+        df['transaction_year'] = NOW.year
+        df['transaction_month'] = NOW.month
+        df['transaction_quarter'] = (NOW.month - 1) // 3 + 1
+        df['days_since_2020'] = (NOW - datetime(2020, 1, 1)).days
+    df['log_area'] = np.log1p(df['actual_area'])
+    if 'rooms_en' in df.columns:
+        df['room_count'] = df['rooms_en'].str.extract(r'(\d+)').astype(float)
+        df['room_density'] = (df['room_count'] / (df['actual_area'] / 1000)).fillna(0)
+    else:
+        df['room_count'] = 0
+        df['room_density'] = 0
+    for col in ['is_offplan_en', 'is_free_hold_en']:
+        df[col] = df[col].map({'Yes': 1, 'No': 0}).fillna(0) if col in df.columns else 0
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].fillna('Unknown')
+            known = set(ENCODERS[col].classes_)
+            df[f'{col}_encoded'] = df[col].apply(lambda x: ENCODERS[col].transform([x])[0] if x in known else -1)
+        else:
+            df[f'{col}_encoded'] = -1
+    df['area_proptype_interaction'] = df['area_en_encoded'] * df['prop_type_en_encoded']
+    df['area_rooms_interaction'] = df['actual_area'] * df['room_count']
+    for col in ['total_buyer', 'total_seller', 'procedure_area', 'median_rent_nearby',
+                'rental_availability', 'rent_to_price_ratio']:
+        if col not in df.columns:
+            df[col] = 0
+    return df[FEATURE_COLUMNS].fillna(0).to_numpy(dtype=float)[0]
+
+
+RECORDS = [
+    {'actual_area': 120.0, 'area_en': ENCODERS['area_en'].classes_[5], 'prop_type_en': ENCODERS['prop_type_en'].classes_[1],
+     'rooms_en': '2 B/R', 'is_offplan_en': 'Yes', 'is_free_hold_en': 'No', 'project_en': 'Not A Project',
+     'parking': None, 'usage_en': ENCODERS['usage_en'].classes_[0], 'procedure_area': 118.5,
+     'total_buyer': 1, 'total_seller': 1},
+    {'actual_area': 85.0, 'area_en': 'Unknown Area', 'rooms_en': 'Studio', 'instance_date': '2023-08-09'},
+    {'actual_area': 300.0, 'prop_type_en': ENCODERS['prop_type_en'].classes_[2]},
+]
+
+
+class TestFeatureMatrix:
+    """Test suite for compile_encoders / build_feature_matrix."""
+
+    def test_lookups_match_label_encoders(self):
+        lookups = compile_encoders(ENCODERS)
+        for col, encoder in ENCODERS.items():
+            sample = list(encoder.classes_[:5])
+            assert [lookups[col][c] for c in sample] == list(encoder.transform(sample))
+
+    def test_matches_legacy_pipeline(self):
+        X = build_feature_matrix(RECORDS, FEATURE_COLUMNS, compile_encoders(ENCODERS), now=NOW)
+
+        assert X.shape == (3, len(FEATURE_COLUMNS)) and X.dtype == np.float32
+        for row, record in zip(X, RECORDS):
+            np.testing.assert_allclose(row, legacy_features(record), rtol=1e-6)
+
+
+class TestPredictMany:
+    """Test suite for app.predict_many."""
+
+    def test_batch_equals_single_predictions(self):
+        import xgboost as xgb
+        rng = np.random.default_rng(0)
+        X_train = rng.normal(size=(200, len(FEATURE_COLUMNS)))
+        model = xgb.XGBRegressor(n_estimators=20, max_depth=3).fit(X_train, X_train[:, 0] * 1e6 + 2e6)
+        calls = []
+        original_predict = model.predict
+
+        def counting_predict(X):
+            calls.append(len(X))
+            return original_predict(X)
+
+        registry = ModelRegistry(root=os.path.join(ROOT, 'models', 'no-registry'))
+        registry._state = (ModelBundle('test', model, ENCODERS, FEATURE_COLUMNS), None, 0.0)
+        with patch.object(app_module, 'model_registry', registry), \
+             patch.object(model, 'predict', side_effect=counting_predict):
+            batch = app_module.predict_many(RECORDS)
+            calls.clear()
+            singles = [app_module.predict_price_ml(record) for record in RECORDS]
+
+        assert [r['method'] for r in batch] == ['xgboost'] * 3
+        assert {r['model_version'] for r in batch} == {'test'}
+        assert [r['predicted_price'] for r in batch] == pytest.approx([r['predicted_price'] for r in singles])
+        assert [r['confidence'] for r in batch] == [r['confidence'] for r in singles]
+        assert 0.60 <= batch[0]['confidence'] <= 0.95
+        assert calls == [1, 1, 1]
+
+    def test_unavailable_without_model(self):
+        with patch.object(type(app_module.model_registry), 'enabled', new=False):
+            assert app_module.predict_many([{}, {}]) == [{'predicted_price': None, 'confidence': 0.0, 'method': 'unavailable'}] * 2
@@ -0,0 +1,166 @@
+"""Unit tests for the versioned model registry (model_registry.py).
+
+Tests:
+1. Legacy flat models/*_v1 files are served as "v1" without a manifest
+2. Manifest versions load, and a failed reload keeps the current models
+3. promote() rewrites the manifest and swaps the active version
+4. Shadow scoring records deltas without changing the served predictions
+5. Workers pick up manifest changes made elsewhere, including a first model
+   on a worker that booted without one
+6. /api/admin/models endpoints are limited to ADMIN_EMAILS
+"""
+import pytest
+import numpy as np
+import joblib
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+from concurrent.futures import wait
+
+# Import registry components
+import sys
+import os
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+sys.path.insert(0, ROOT)
+import model_registry
+from model_registry import ModelRegistry, write_manifest
+from tree_model import TreeEnsemble
+import app as app_module
+
+ENCODERS_PATH = os.path.join(ROOT, 'models', 'label_encoders_v1.pkl')
+FEATURES_PATH = os.path.join(ROOT, 'models', 'feature_columns_v1.pkl')
+FEATURE_COLUMNS = joblib.load(FEATURES_PATH)
+RECORDS = [{'actual_area': 80.0 + 10 * i, 'rooms_en': f'{i % 3 + 1} B/R'} for i in range(10)]
+
+
+def constant_model(value):
+    """Single-leaf ensemble predicting ``value`` for every row"""
+    return TreeEnsemble([0], [0], [0], [0], [True], [value], [0], 0.0, 0, len(FEATURE_COLUMNS))
+
+
+def add_version(root, version, value):
+    """Registry version directory with a NumPy model and the shipped encoders"""
+    directory = os.path.join(root, version)
+    os.makedirs(directory)
+    constant_model(value).save(os.path.join(directory, 'model.npz'))
+    joblib.dump(joblib.load(ENCODERS_PATH), os.path.join(directory, 'label_encoders.pkl'))
+    joblib.dump(FEATURE_COLUMNS, os.path.join(directory, 'feature_columns.pkl'))
+
+
+@pytest.fixture
+def registry_root(tmp_path):
+    root = str(tmp_path / 'registry')
+    add_version(root, 'v2', 1_000_000)
+    add_version(root, 'v3', 1_100_000)
+    write_manifest(root, {'active': 'v2', 'candidate': None, 'versions': {'v2': {}, 'v3': {}}})
+    return root
+
+
+class TestRegistryLoading:
+    """Test suite for ModelRegistry.reload."""
+
+    def test_legacy_files_without_manifest(self, tmp_path):
+        model_path = str(tmp_path / 'xgboost_model_v1.pkl')
+        constant_model(500_000).save(str(tmp_path / 'xgboost_model_v1.npz'))
+        registry = ModelRegistry(root=str(tmp_path / 'registry'),
+                                 legacy_files={'model': model_path, 'encoders': ENCODERS_PATH, 'features': FEATURES_PATH},
+                                 backend='numpy')
+
+        assert registry.reload()['active'] == 'v1'
+        prices, confidences, version = registry.predict(RECORDS[:2])
+        assert version == 'v1'
+        assert prices.tolist() == [500_000, 500_000]
+        assert ((confidences >= 0.60) & (confidences <= 0.95)).all()
+
+    def test_failed_reload_keeps_models(self, registry_root):
+        registry = ModelRegistry(root=registry_root, backend='numpy')
+        assert registry.reload() == {'success': True, 'active': 'v2', 'candidate': None, 'shadow_sample_rate': 0.0}
+
+        write_manifest(registry_root, {'active': 'v9'})
+        result = registry.reload()
+
+        assert result['success'] is False and result['active'] == 'v2'
+        assert registry.active.version == 'v2'
+        assert registry.status()['last_error']
+
+    def test_promote(self, registry_root):
+        registry = ModelRegistry(root=registry_root, backend='numpy')
+        registry.reload()
+
+        assert registry.promote('v3')['active'] == 'v3'
+        assert registry.read_manifest()['active'] == 'v3'
+        assert 'promoted_at' in registry.read_manifest()['versions']['v3']
+        assert registry.predict(RECORDS)[0][0] == 1_100_000
+        with pytest.raises(ValueError):
+            registry.promote('../v2')
+
+
+class TestShadowScoring:
+    """Test suite for shadow scoring and manifest polling."""
+
+    def test_shadow_deltas_recorded(self, registry_root, monkeypatch):
+        write_manifest(registry_root, {'active': 'v2', 'candidate': 'v3', 'shadow_sample_rate': 1.0})
+        registry = ModelRegistry(root=registry_root, backend='numpy')
+        registry.reload()
+        futures = []
+        submit = registry._executor.submit
+        monkeypatch.setattr(registry._executor, 'submit', lambda fn: futures.append(submit(fn)))
+
+        prices, _, version = registry.predict(RECORDS)
+        wait(futures)
+        report = registry.status()['shadow']
+
+        assert version == 'v2' and (prices == 1_000_000).all()
+        assert report['candidate_version'] == 'v3'
+        assert report['batches'] == 1 and report['properties'] == len(RECORDS)
+        assert report['mean_delta_pct'] == pytest.approx(10.0)
+        assert report['p90_abs_delta_pct'] == pytest.approx(10.0)
+
+    def test_manifest_change_picked_up(self, registry_root, monkeypatch):
+        registry = ModelRegistry(root=registry_root, backend='numpy')
+        registry.reload()
+        manifest = registry.read_manifest()
+        manifest['active'] = 'v3'
+        write_manifest(registry_root, manifest)
+        os.utime(registry.manifest_path, (time.time() + 5, time.time() + 5))
+
+        assert registry.active.version == 'v2'  # Within the check interval
+        monkeypatch.setattr(model_registry, 'MODEL_REGISTRY_CHECK_INTERVAL', 0)
+        assert registry.active.version == 'v3'
+
+    def test_enabled_after_first_model(self, tmp_path, monkeypatch):
+        root = str(tmp_path / 'registry')
+        missing = str(tmp_path / 'missing.pkl')
+        registry = ModelRegistry(root=root, legacy_files={'model': missing, 'encoders': missing, 'features': missing},
+                                 backend='numpy')
+        registry.reload()
+        assert not registry.enabled
+
+        add_version(root, 'v2', 1_000_000)
+        write_manifest(root, {'active': 'v2'})
+        monkeypatch.setattr(model_registry, 'MODEL_REGISTRY_CHECK_INTERVAL', 0)
+
+        assert registry.enabled
+
+
+class TestAdminEndpoints:
+    """Test suite for the /api/admin/models access check."""
+
+    @pytest.fixture
+    def client(self):
+        with patch.dict(app_module.app.config, {'LOGIN_DISABLED': True, 'TESTING': True}):
+            yield app_module.app.test_client()
+
+    def test_admin_allow_list(self, client):
+        user = SimpleNamespace(email='Ops@Retyn.ai', is_authenticated=True)
+        with patch.object(app_module, 'current_user', user), \
+                patch.object(app_module, 'ADMIN_EMAILS', {'ops@retyn.ai'}), \
+                patch.object(app_module.model_registry, 'status', return_value={'active': 'v2'}):
+            assert client.get('/api/admin/models').json == {'active': 'v2'}
+
+        with patch.object(app_module, 'current_user', user), \
+                patch.object(app_module, 'ADMIN_EMAILS', set()), \
+                patch.object(app_module.model_registry, 'reload') as reload:
+            assert client.post('/api/admin/models/reload').status_code == 403
+            assert client.post('/api/admin/models/promote', json={'version': 'v3'}).status_code == 403
+        assert not reload.called
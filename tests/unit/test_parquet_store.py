@@ -0,0 +1,116 @@
+"""Unit tests for the Parquet snapshot store (parquet_store).
+
+Exports a small SQLite properties table and checks:
+1. Area/year hive partitioning with typed columns
+2. Column selection and partition pruning on read
+3. Valuation engine offline fallback from the Parquet export
+4. COPY output is cut into CSV chunks at record boundaries
+5. Batched scans return the same rows as read_table
+"""
+import pytest
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+
+# Import components
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+import parquet_store
+import valuation_engine
+
+
+@pytest.fixture
+def snapshot_dir(tmp_path):
+    """Parquet export of a small properties table."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'properties.db'}")
+    n = 60
+    rng = np.random.default_rng(3)
+    df = pd.DataFrame({column: None for column in parquet_store.TABLES['properties']['schema'].names}, index=range(n))
+    df = df.assign(**{
+        'transaction_number': [f"T{i}" for i in range(n)],
+        'area_en': ['Dubai Marina', 'Al Barsha/South'] * (n // 2),
+        'prop_type_en': 'Unit',
+        'trans_value': rng.uniform(500_000, 3_000_000, size=n).round(),
+        'procedure_area': '100',
+        'actual_area': rng.integers(40, 300, size=n).astype(str),
+        'rooms_en': ['1 B/R', '2 B/R', None] * (n // 3),
+        'instance_date': [f"{2022 + i % 3}-0{1 + i % 9}-15" for i in range(n)],
+        'is_offplan_en': 'Ready',
+        'project_en': 'Marina Gate',
+    })
+    df.to_sql('properties', engine, index=False)
+
+    out = tmp_path / 'parquet'
+    assert parquet_store.export_table(engine, 'properties', str(out), chunk_rows=25) == n
+    return str(out)
+
+
+class TestParquetStore:
+    """Test suite for export_table / read_table."""
+
+    def test_export_is_partitioned_and_typed(self, snapshot_dir):
+        """One directory per area, one per year below it; typed columns."""
+        root = parquet_store.table_path('properties', snapshot_dir)
+        assert sorted(os.listdir(root)) == ['area_en=Al%20Barsha%2FSouth', 'area_en=Dubai%20Marina']
+        assert sorted(os.listdir(os.path.join(root, 'area_en=Dubai%20Marina'))) == ['year=2022', 'year=2023', 'year=2024']
+
+        df = parquet_store.read_table('properties', snapshot_dir=snapshot_dir)
+        assert df['actual_area'].dtype == np.float64
+        assert df['rooms_en'].dtype == 'category'
+        assert pd.api.types.is_datetime64_any_dtype(df['instance_date'])
+        assert len(df) == 60
+
+    def test_read_prunes_columns_and_partitions(self, snapshot_dir):
+        """Only requested columns and matching partitions are returned."""
+        df = parquet_store.read_table(
+            'properties',
+            columns=['area_en', 'year', 'trans_value'],
+            filters=[('area_en', '=', 'Al Barsha/South'), ('year', '>=', 2023)],
+            snapshot_dir=snapshot_dir,
+        )
+        assert list(df.columns) == ['area_en', 'year', 'trans_value']
+        assert set(df['area_en']) == {'Al Barsha/South'}
+        assert df['year'].min() >= 2023
+
+    def test_valuation_fallback_reads_parquet(self, snapshot_dir):
+        """Offline valuation dataset has the database loader's columns, newest first."""
+        df = valuation_engine.load_dubai_dataset_from_parquet(snapshot_dir)
+
+        for column in ['area_name_en', 'property_type_en', 'property_total_value',
+                       'actual_area', 'price_per_sqm', 'transaction_year']:
+            assert column in df.columns
+        assert df['instance_date'].is_monotonic_decreasing
+        assert valuation_engine.load_dubai_dataset_from_parquet(snapshot_dir) is df
+
+
+class TestCopyExport:
+    """Test suite for the COPY TO STDOUT chunk writer and batched reads."""
+
+    def test_copy_writer_splits_at_record_boundaries(self):
+        """Quoted newlines and writes split mid-record never break a row."""
+        rows = [f'T{i},"Marina ""Gate""\nTower {i}",{i * 1000}' for i in range(25)]
+        data = ('transaction_number,project_en,trans_value\n' + '\n'.join(rows) + '\n').encode()
+        chunks = []
+        writer = parquet_store.CopyChunkWriter(chunks.append, chunk_rows=7)
+        for start in range(0, len(data), 13):
+            writer.write(data[start:start + 13])
+        writer.close()
+
+        df = pd.concat(chunks, ignore_index=True)
+        assert len(chunks) > 1
+        assert df['transaction_number'].tolist() == [f'T{i}' for i in range(25)]
+        assert df.loc[3, 'project_en'] == 'Marina "Gate"\nTower 3'
+        assert df['trans_value'].astype(int).tolist() == [i * 1000 for i in range(25)]
+
+    def test_iter_batches_matches_read_table(self, snapshot_dir):
+        """Batches cover the filtered table with at most batch_rows rows each."""
+        filters = [('trans_value', '>', 1_000_000)]
+        batches = list(parquet_store.iter_batches('properties', columns=['transaction_number', 'rooms_en'],
+                                                  filters=filters, batch_rows=8, snapshot_dir=snapshot_dir))
+        expected = parquet_store.read_table('properties', columns=['transaction_number'], filters=filters,
+                                            snapshot_dir=snapshot_dir)
+
+        assert max(len(batch) for batch in batches) <= 8
+        assert sorted(pd.concat(batches)['transaction_number']) == sorted(expected['transaction_number'])
+        assert batches[0]['rooms_en'].dtype == 'category'
@@ -0,0 +1,111 @@
+"""Unit tests for the POI distance pipeline (poi_distances).
+
+Tests:
+1. Vectorized haversine matches the scalar calculate_haversine_distance
+2. BallTree and dense nearest-POI distances agree
+3. CSV and GeoJSON POI files load with unknown types dropped
+4. Bulk update of area_coordinates clears the updated areas' premium cache
+"""
+import json
+import pytest
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+# Import POI distance components
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+from poi_distances import (
+    haversine_km, nearest_distances, load_poi_file, compute_area_distances, apply_distances,
+)
+import app as app_module
+
+AREAS = pd.DataFrame({
+    'area_name': ['Dubai Marina', 'Downtown Dubai', 'Mirdif'],
+    'latitude': [25.0805, 25.1972, 25.2200],
+    'longitude': [55.1409, 55.2744, 55.4200],
+})
+POIS = pd.DataFrame({
+    'name': ['Dubai Marina Metro', 'Burj Khalifa Metro', 'Dubai Mall', 'JBR Beach'],
+    'type': ['metro', 'metro', 'mall', 'beach'],
+    'latitude': [25.0850, 25.1972, 25.1975, 25.0781],
+    'longitude': [55.1450, 55.2789, 55.2796, 55.1372],
+})
+
+
+class TestHaversine:
+    """Test suite for haversine_km / nearest_distances."""
+
+    def test_matches_scalar_formula(self):
+        expected = app_module.calculate_haversine_distance(25.0805, 55.1409, 25.0850, 55.1450)
+
+        assert haversine_km(25.0805, 55.1409, 25.0850, 55.1450) == pytest.approx(expected, abs=0.005)
+        assert np.isnan(haversine_km([np.nan], [55.0], [25.0], [55.0])[0])
+
+    def test_balltree_matches_dense(self):
+        rng = np.random.default_rng(3)
+        area_lat, area_lon = rng.uniform(24.9, 25.3, 200), rng.uniform(55.0, 55.5, 200)
+        poi_lat, poi_lon = rng.uniform(24.9, 25.3, 500), rng.uniform(55.0, 55.5, 500)
+
+        dense = nearest_distances(area_lat, area_lon, poi_lat, poi_lon, balltree_min_pois=10_000)
+        tree = nearest_distances(area_lat, area_lon, poi_lat, poi_lon, balltree_min_pois=1)
+
+        np.testing.assert_allclose(tree, dense, rtol=1e-9)
+        assert np.isnan(nearest_distances(area_lat, area_lon, [], [])).all()
+
+
+class TestLoadPoiFile:
+    """Test suite for load_poi_file."""
+
+    def test_csv_and_geojson(self, tmp_path):
+        csv_path = tmp_path / 'poi.csv'
+        pd.concat([POIS, pd.DataFrame([{'name': 'Hospital', 'type': 'hospital', 'latitude': 25.1, 'longitude': 55.2}])]) \
+            .to_csv(csv_path, index=False)
+        geojson_path = tmp_path / 'poi.geojson'
+        geojson_path.write_text(json.dumps({'type': 'FeatureCollection', 'features': [
+            {'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': [55.1637, 25.0975]},
+             'properties': {'name': 'Dubai Internet City', 'category': 'Business'}},
+            {'type': 'Feature', 'geometry': {'type': 'LineString', 'coordinates': [[55.1, 25.1], [55.2, 25.2]]},
+             'properties': {'name': 'Road', 'type': 'metro'}},
+        ]}))
+
+        assert list(load_poi_file(str(csv_path))['type']) == ['metro', 'metro', 'mall', 'beach']
+        business = load_poi_file(str(geojson_path))
+        assert business.to_dict('records') == [
+            {'name': 'Dubai Internet City', 'type': 'business', 'latitude': 25.0975, 'longitude': 55.1637}]
+
+
+class TestApplyDistances:
+    """Test suite for compute_area_distances / apply_distances."""
+
+    @pytest.fixture
+    def engine(self):
+        engine = create_engine('sqlite://')
+        with engine.begin() as conn:
+            conn.execute(text("""CREATE TABLE area_coordinates (area_name TEXT, latitude REAL, longitude REAL,
+                distance_to_metro_km REAL, distance_to_beach_km REAL, distance_to_mall_km REAL,
+                distance_to_school_km REAL, distance_to_business_km REAL)"""))
+            conn.execute(text("CREATE TABLE property_location_cache (area_name TEXT, property_type TEXT)"))
+            conn.execute(text("INSERT INTO area_coordinates (area_name, latitude, longitude, distance_to_school_km) "
+                              "VALUES ('Dubai Marina', 25.0805, 55.1409, 1.5), ('Downtown Dubai', 25.1972, 55.2744, NULL), "
+                              "('Mirdif', 25.22, 55.42, NULL)"))
+            conn.execute(text("INSERT INTO property_location_cache VALUES ('dubai marina', 'Unit'), ('palm jumeirah', 'Unit')"))
+        return engine
+
+    def test_bulk_update_and_cache_refresh(self, engine):
+        distances = compute_area_distances(AREAS, POIS)
+
+        assert list(distances.columns) == ['area_name', 'distance_to_beach_km', 'distance_to_mall_km', 'distance_to_metro_km']
+        updated, cleared = apply_distances(engine, distances)
+
+        assert (updated, cleared) == (3, 1)
+        with engine.connect() as conn:
+            rows = conn.execute(text("SELECT area_name, distance_to_metro_km, distance_to_mall_km, distance_to_school_km "
+                                     "FROM area_coordinates ORDER BY area_name")).fetchall()
+            cached = conn.execute(text("SELECT area_name FROM property_location_cache")).fetchall()
+        downtown, marina, mirdif = rows
+        assert downtown[1] == 0.45 and downtown[2] == 0.52
+        assert marina[3] == 1.5  # School distance untouched (no school POIs)
+        assert mirdif[1] > 10
+        assert cached == [('palm jumeirah',)]
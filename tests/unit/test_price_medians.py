@@ -0,0 +1,115 @@
+"""Unit tests for the precomputed flip-score price/sqm medians (price_medians).
+
+Tests:
+1. Median lookups are case-insensitive on area and None without sales
+2. The worker store loads from the table and backs off after a failure
+3. The refresh is one grouped pass with FILTERed windows
+4. Flip-score yield/segment scores read the store; the exact query is the fallback
+"""
+import pytest
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+from unittest.mock import MagicMock, patch
+
+# Import median components
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+import price_medians
+from price_medians import PriceSqmMedians, load_price_medians, refresh_sql, MEDIANS_TABLE
+from worker_cache import WorkerCache
+import app as app_module
+
+ROWS = pd.DataFrame({
+    'area_key': ['DUBAI MARINA', 'JVC'],
+    'prop_type_en': ['Unit', 'Unit'],
+    'median_price_sqm_6m': [21_000.0, np.nan],
+    'median_price_sqm_12m': [20_000.0, 9_000.0],
+})
+
+
+@pytest.fixture(autouse=True)
+def fresh_store(monkeypatch):
+    """Each test loads its own store."""
+    monkeypatch.setattr(price_medians, '_medians', WorkerCache('Price/sqm medians', price_medians.MEDIAN_TTL_SECONDS))
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine('sqlite://')
+    ROWS.to_sql(MEDIANS_TABLE, engine, index=False)
+    return engine
+
+
+class TestPriceSqmMedians:
+    """Test suite for PriceSqmMedians lookups."""
+
+    def test_lookup(self):
+        medians = PriceSqmMedians(ROWS)
+
+        assert medians.median('Dubai Marina', 'Unit', 6) == 21_000.0
+        assert medians.median('jvc', 'Unit', 12) == 9_000.0
+        assert medians.median('JVC', 'Unit', 6) is None
+        assert medians.median('JVC', 'Villa', 12) is None
+
+
+class TestLoadPriceMedians:
+    """Test suite for the per-worker store."""
+
+    def test_loads_and_caches(self, engine):
+        store = load_price_medians(engine)
+
+        assert len(store) == 2
+        assert load_price_medians(MagicMock()) is store  # Cached, no query
+
+    def test_missing_table_backs_off(self):
+        engine = create_engine('sqlite://')
+
+        assert load_price_medians(engine) is None
+        broken = MagicMock()
+        assert load_price_medians(broken) is None
+        assert not broken.connect.called
+
+
+class TestRefreshSql:
+    """Test suite for the median refresh statements."""
+
+    def test_single_grouped_pass(self):
+        delete, insert = refresh_sql()
+        sql = str(insert)
+
+        assert str(delete).strip() == f'DELETE FROM {MEDIANS_TABLE}'
+        assert sql.count('PERCENTILE_CONT') == 2 and sql.count('FILTER') == 4
+        assert "INTERVAL '12 months'" in sql.split('FROM properties')[1]
+        assert 'GROUP BY 1, 2' in sql
+
+
+class TestFlipScores:
+    """Test suite for the flip-score median lookups."""
+
+    def test_segment_score_reads_store(self, engine):
+        load_price_medians(engine)
+        with patch.object(app_module.pd, 'read_sql') as read_sql:
+            result = app_module._calculate_segment_score('Unit', 'dubai marina', 80, '1 B/R', MagicMock())
+
+        assert not read_sql.called
+        assert result == {'score': 60, 'details': 'Market segment: Luxury'}
+
+    def test_yield_score_uses_6_month_median(self, engine):
+        load_price_medians(engine)
+        rentals = pd.DataFrame({'annual_amount': [150_000, 160_000, 170_000], 'actual_area': [90, 100, 110]})
+        with patch.object(app_module.pd, 'read_sql', return_value=rentals) as read_sql:
+            result = app_module._calculate_yield_score('Dubai Marina', 'Unit', 100, '1 B/R', MagicMock())
+
+        assert read_sql.call_count == 1  # Rentals only
+        assert result['details'] == f'Rental yield: {160_000 / (21_000 * 100) * 100:.1f}%'
+
+    def test_exact_query_fallback(self, monkeypatch):
+        monkeypatch.setattr(app_module, 'load_price_medians', lambda engine: None)
+        with patch.object(app_module.pd, 'read_sql', return_value=pd.DataFrame({'median_price_sqm': [9_000.0]})) as read_sql:
+            result = app_module._calculate_segment_score('Unit', 'JVC', 80, '1 B/R', MagicMock())
+
+        assert 'PERCENTILE_CONT' in str(read_sql.call_args[0][0])
+        assert "INTERVAL '12 months'" in str(read_sql.call_args[0][0])
+        assert result['details'] == 'Market segment: Mid-Tier'
@@ -0,0 +1,106 @@
+"""Unit tests for NDJSON search streaming (stream_search_results).
+
+Streams a small SQLite properties table and checks:
+1. meta, row, aggregates, summary, end records in order
+2. Rows are emitted per cursor batch, before the summary is generated
+3. The summary frame keeps full sample rows plus the AVM columns
+4. The connection is opened inside the stream and a failed connect is an error record
+"""
+import json
+import pytest
+import numpy as np
+import pandas as pd
+from unittest.mock import MagicMock, patch
+from sqlalchemy import create_engine, text
+
+# Import app components
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+import app as app_module
+from app import stream_search_results, SALES_MAP
+
+
+@pytest.fixture
+def properties_engine():
+    """SQLite engine with 150 properties rows (one NULL price)."""
+    engine = create_engine('sqlite://')
+    df = pd.DataFrame({
+        SALES_MAP['price']: np.arange(150, dtype=float) * 10_000 + 500_000,
+        SALES_MAP['area_name']: ['Dubai Marina', 'Business Bay', 'JVC'] * 50,
+        SALES_MAP['name']: 'Marina Gate',
+        'instance_date': pd.date_range('2024-01-01', periods=150).strftime('%Y-%m-%d'),
+        'rooms_en': '2 B/R',
+    })
+    df.loc[0, SALES_MAP['price']] = np.nan
+    with engine.begin() as conn:
+        df.to_sql('properties', conn, index=False)
+    return engine
+
+
+def run_stream(engine, batch_rows=40):
+    """Stream the whole table and return (chunks, summary_frames)."""
+    frames = []
+
+    def fake_summary(filters, results_df, total_results, search_type):
+        frames.append(results_df)
+        return 'summary text'
+
+    with patch.object(app_module, 'generate_ai_summary', side_effect=fake_summary):
+        body = stream_search_results(
+            engine,
+            text("SELECT COUNT(*) FROM properties WHERE 1=1;"),
+            text("SELECT * FROM properties WHERE 1=1 ORDER BY instance_date DESC LIMIT 500;"),
+            {}, {'area': 'Marina'}, 'buy', batch_rows=batch_rows,
+        )
+        chunks = []
+        for chunk in body:
+            chunks.append((chunk, len(frames)))
+    return chunks, frames
+
+
+class TestSearchStream:
+    """Test suite for stream_search_results."""
+
+    def test_record_sequence(self, properties_engine):
+        """Records arrive as meta, rows, aggregates, summary, end."""
+        chunks, _ = run_stream(properties_engine)
+        records = [json.loads(line) for chunk, _ in chunks for line in chunk.splitlines()]
+
+        assert records[0] == {'type': 'meta', 'total_results': 150}
+        rows = [r for r in records if r['type'] == 'row']
+        assert len(rows) == 150
+        assert rows[0]['data']['instance_date'] > rows[-1]['data']['instance_date']
+        assert rows[-1]['data'][SALES_MAP['price']] is None  # NaN -> null
+        assert [r['type'] for r in records[-3:]] == ['aggregates', 'summary', 'end']
+        assert records[-3]['returned'] == 150
+        assert records[-3]['min_price'] == 510_000
+        assert records[-2]['summary'] == 'summary text'
+
+    def test_rows_streamed_per_batch(self, properties_engine):
+        """Each cursor batch is its own chunk, yielded before the summary runs."""
+        chunks, _ = run_stream(properties_engine, batch_rows=40)
+        row_chunks = [(chunk, summaries) for chunk, summaries in chunks
+                      if json.loads(chunk.splitlines()[0])['type'] == 'row']
+
+        assert [len(chunk.splitlines()) for chunk, _ in row_chunks] == [40, 40, 40, 30]
+        assert all(summaries == 0 for _, summaries in row_chunks)
+
+    def test_summary_frame_is_bounded(self, properties_engine):
+        """Sample rows keep every column; later rows keep only the AVM columns."""
+        _, frames = run_stream(properties_engine)
+        df = frames[0]
+
+        assert len(df) == 150
+        assert df['rooms_en'].notna().sum() == app_module.SEARCH_SUMMARY_SAMPLE_ROWS
+        assert df[SALES_MAP['area_name']].notna().all()
+        assert df[SALES_MAP['price']].notna().sum() == 149
+
+    def test_connects_inside_stream(self):
+        """No connection is held until the stream runs; a failed connect yields an error record."""
+        engine = MagicMock()
+        engine.connect.side_effect = RuntimeError('pool exhausted')
+        body = stream_search_results(engine, text("SELECT 1;"), text("SELECT 1;"), {}, {}, 'buy')
+
+        assert not engine.connect.called
+        assert [json.loads(line) for line in body] == [{'type': 'error', 'error': 'Search failed'}]
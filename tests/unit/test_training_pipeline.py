@@ -0,0 +1,144 @@
+"""Unit tests for out-of-core model training (archive/development/train_model.py).
+
+Trains on a small Parquet snapshot exported from SQLite and checks:
+1. Streaming encoder fit equals fitting on the whole filtered table
+2. Chunked features equal the in-memory feature pipeline
+3. Training through the external-memory iterator yields a usable model
+4. Rental-context features are built from training-split sales only
+5. The search feature-cache key changes with the rental-context features
+6. Categorical Yes/NULL binary columns from Parquet chunks encode as 1/0
+"""
+import pytest
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+
+# Import training components
+import sys
+import os
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'archive', 'development'))
+import parquet_store
+import feature_store
+import train_model
+from tree_model import TreeEnsemble
+
+
+@pytest.fixture(scope='module')
+def snapshot_dir(tmp_path_factory):
+    """Parquet export of 1,200 synthetic sales (some outliers)."""
+    tmp_path = tmp_path_factory.mktemp('training')
+    engine = create_engine(f"sqlite:///{tmp_path / 'properties.db'}")
+    n = 1200
+    rng = np.random.default_rng(7)
+    size = rng.uniform(300, 3000, size=n)
+    df = pd.DataFrame({column: None for column in parquet_store.TABLES['properties']['schema'].names}, index=range(n))
+    df = df.assign(**{
+        'transaction_number': [f"T{i}" for i in range(n)],
+        'area_en': rng.choice(['Dubai Marina', 'JVC', 'Downtown Dubai'], size=n),
+        'prop_type_en': rng.choice(['Unit', 'Villa'], size=n),
+        'trans_value': (size * rng.uniform(900, 1500, size=n)).round(),
+        'actual_area': size,
+        'procedure_area': size,
+        'rooms_en': rng.choice(['Studio', '1 B/R', '2 B/R', None], size=n),
+        'project_en': rng.choice(['Marina Gate', 'Bloom Towers', None], size=n),
+        'instance_date': [f"{2022 + i % 3}-0{1 + i % 9}-15" for i in range(n)],
+        'is_offplan_en': rng.choice(['Yes', 'No'], size=n),
+        'is_free_hold_en': 'Yes',
+        'total_buyer': 1,
+        'total_seller': 1,
+    })
+    df.loc[:9, 'trans_value'] = 60_000_000  # Outliers excluded by TRAINING_FILTERS
+    df.to_sql('properties', engine, index=False)
+    out = str(tmp_path / 'parquet')
+    parquet_store.export_table(engine, 'properties', out, chunk_rows=300)
+    return out
+
+
+def in_memory_frame(snapshot_dir):
+    """Filtered table as the CSV path sees it (plain strings)."""
+    df = parquet_store.read_table('properties', filters=train_model.TRAINING_FILTERS, snapshot_dir=snapshot_dir)
+    return df.astype({col: object for col in df.select_dtypes('category').columns})
+
+
+class TestOutOfCoreTraining:
+    """Test suite for the chunked training pipeline."""
+
+    def test_streaming_encoders_match_full_fit(self, snapshot_dir):
+        streamed = train_model.PropertyPriceModel()
+        streamed.fit_encoders_streaming(snapshot_dir)
+        full = train_model.PropertyPriceModel()
+        full.engineer_features(in_memory_frame(snapshot_dir), is_training=True)
+
+        for col in ['area_en', 'rooms_en', 'project_en']:
+            assert list(streamed.label_encoders[col].classes_) == list(full.label_encoders[col].classes_)
+
+    def test_chunked_features_match_in_memory(self, snapshot_dir):
+        model = train_model.PropertyPriceModel()
+        full_df = in_memory_frame(snapshot_dir)
+        expected = model.engineer_features(full_df, is_training=True)
+        model.feature_columns = [c for c in train_model.FEATURE_COLUMNS if c in expected.columns]
+
+        chunks = list(model.iter_feature_chunks(snapshot_dir=snapshot_dir, chunk_rows=250))
+        X = pd.concat([chunk[0] for chunk in chunks], ignore_index=True)
+
+        # Both scans read the dataset in the same fragment order
+        assert len(chunks) > 1 and len(X) == len(full_df)
+        expected = expected[model.feature_columns].fillna(0).to_numpy(dtype=np.float32)
+        np.testing.assert_allclose(X.to_numpy(), expected, rtol=1e-6)
+
+    def test_external_memory_training(self, snapshot_dir, tmp_path):
+        model = train_model.PropertyPriceModel()
+        metrics = model.train_out_of_core(snapshot_dir=snapshot_dir, cache_dir=str(tmp_path / 'cache'), num_boost_round=40)
+        y_test, y_pred = model.predict_split('test', snapshot_dir=snapshot_dir)
+
+        assert metrics['train_size'] + metrics['val_size'] + len(y_test) == 1190
+        assert metrics['val_r2'] > 0.5
+        assert model.evaluate_predictions(y_test, y_pred)['r2'] > 0.5
+        X, _ = next(model.iter_feature_chunks('test', snapshot_dir=snapshot_dir))
+        np.testing.assert_allclose(TreeEnsemble.from_xgboost(model.model).predict(X.to_numpy()),
+                                   model.model.predict(X), rtol=1e-4)
+
+    def test_context_sales_from_train_split(self, snapshot_dir):
+        sales, months = train_model.read_training_sales(snapshot_dir)
+        full_df = in_memory_frame(snapshot_dir)
+        train_rows = full_df[train_model._split_mask(full_df, 'train')]
+
+        assert sorted(sales['trans_value']) == sorted(train_rows['trans_value'])
+        assert list(sales.columns) == train_model.CONTEXT_SALE_COLUMNS
+        assert set(months) == set(feature_store.month_index(full_df['instance_date']))
+        assert train_model.load_context_history(sales, months, snapshot_dir) is None  # No rentals snapshot
+
+    def test_signature_tracks_context_features(self, snapshot_dir):
+        sales, months = train_model.read_training_sales(snapshot_dir)
+        rentals = pd.DataFrame({'area_en': 'JVC', 'prop_type_en': 'Unit', 'rooms': 'Studio',
+                                'annual_amount': [40_000, 42_000, 44_000, 46_000, 48_000],
+                                'registration_date': pd.Timestamp('2022-06-01')})
+        history = feature_store.ContextFeatureHistory(
+            feature_store.compute_monthly_context_features(sales, rentals, months))
+        repriced = feature_store.ContextFeatureHistory(
+            feature_store.compute_monthly_context_features(sales, rentals.assign(annual_amount=60_000), months))
+        path = parquet_store.table_path('properties', snapshot_dir)
+
+        signatures = {train_model._training_signature(path, store) for store in (None, history, repriced)}
+        assert len(signatures) == 3
+        assert train_model._training_signature(path, history) == train_model._training_signature(path, history)
+
+    def test_binary_columns_with_nulls(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'properties.db'}")
+        df = pd.DataFrame({column: None for column in parquet_store.TABLES['properties']['schema'].names}, index=range(6))
+        df = df.assign(transaction_number=[f"T{i}" for i in range(6)], area_en='JVC', prop_type_en='Unit',
+                       trans_value=1_000_000, actual_area=800.0, instance_date='2024-05-01',
+                       is_free_hold_en=['Yes', None, 'Yes', None, 'Yes', None])
+        df.to_sql('properties', engine, index=False)
+        out = str(tmp_path / 'parquet')
+        parquet_store.export_table(engine, 'properties', out)
+        model = train_model.PropertyPriceModel()
+        model.fit_encoders_streaming(out)
+        model.feature_columns = ['is_offplan_en', 'is_free_hold_en']
+
+        X, _ = next(model.iter_feature_chunks(snapshot_dir=out))
+
+        assert X['is_free_hold_en'].tolist() == [1, 0, 1, 0, 1, 0]
+        assert X['is_offplan_en'].tolist() == [0] * 6
@@ -0,0 +1,68 @@
+"""Unit tests for the NumPy tree-ensemble backend (tree_model).
+
+Tests:
+1. Predictions match XGBoost (including missing values and early stopping)
+2. save/load round trip without xgboost objects
+3. Unsupported models are rejected at export
+"""
+import pytest
+import numpy as np
+import xgboost as xgb
+
+# Import tree model components
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+from tree_model import TreeEnsemble
+
+
+@pytest.fixture(scope='module')
+def training_data():
+    """Price-like target over 30 features, 5% missing values."""
+    rng = np.random.default_rng(5)
+    X = rng.normal(size=(2000, 30)).astype(np.float32)
+    y = np.maximum(2e6 + X[:, 0] * 8e5 + X[:, 1] ** 2 * 3e5 + X[:, 2] * X[:, 3] * 1e5, 1e5)
+    X[rng.random(X.shape) < 0.05] = np.nan
+    return X, y
+
+
+class TestTreeEnsemble:
+    """Test suite for TreeEnsemble."""
+
+    @pytest.mark.parametrize('objective', ['reg:squarederror', 'reg:gamma'])
+    def test_parity_with_xgboost(self, training_data, objective):
+        X, y = training_data
+        model = xgb.XGBRegressor(n_estimators=120, max_depth=6, learning_rate=0.1, objective=objective).fit(X, y)
+
+        ensemble = TreeEnsemble.from_xgboost(model)
+
+        np.testing.assert_allclose(ensemble.predict(X), model.predict(X), rtol=1e-5, atol=1.0)
+        np.testing.assert_allclose(ensemble.predict(X[0]), model.predict(X[:1]), rtol=1e-5, atol=1.0)
+
+    def test_early_stopping_uses_best_iteration(self, training_data):
+        X, y = training_data
+        model = xgb.XGBRegressor(n_estimators=300, max_depth=4, learning_rate=0.3, early_stopping_rounds=5)
+        model.fit(X[:1500], y[:1500], eval_set=[(X[1500:], y[1500:])], verbose=False)
+
+        ensemble = TreeEnsemble.from_xgboost(model)
+
+        assert len(ensemble.roots) == model.best_iteration + 1
+        np.testing.assert_allclose(ensemble.predict(X), model.predict(X), rtol=1e-5, atol=1.0)
+
+    def test_save_load_round_trip(self, training_data, tmp_path):
+        X, y = training_data
+        model = xgb.XGBRegressor(n_estimators=20, max_depth=3).fit(X, y)
+        path = tmp_path / 'model.npz'
+
+        TreeEnsemble.from_xgboost(model).save(path)
+        loaded = TreeEnsemble.load(path)
+
+        np.testing.assert_allclose(loaded.predict(X), model.predict(X), rtol=1e-5, atol=1.0)
+        with pytest.raises(ValueError):
+            loaded.predict(X[:, :10])
+
+    def test_rejects_unsupported_models(self, training_data):
+        X, y = training_data
+        classifier = xgb.XGBClassifier(n_estimators=5).fit(X, y > 2e6)
+        with pytest.raises(ValueError, match='objective'):
+            TreeEnsemble.from_xgboost(classifier)
@@ -0,0 +1,182 @@
+"""Unit tests for long-horizon trends from monthly rollups (trend_rollups.py).
+
+Tests:
+1. 3Y/5Y/MAX trends read the rollup; short periods and budget caps scan raw rows
+2. A missing rollup falls back to the raw query
+3. Rollup refresh statements (full and incremental)
+4. Quarterly downsampling weights averages by transaction count
+5. /api/top-areas ranks from the rollup with a same-window market share,
+   and the raw fallback starts at the same month boundary
+6. Area comparison series read the rollup for long periods
+"""
+import pytest
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+# Import rollup components
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+from trend_rollups import refresh_sql, window_start, ROLLUPS
+from market_trends import downsample_quarterly
+import app as app_module
+
+SALES_MAP = {'price': 'trans_value', 'area_name': 'area_en', 'property_type': 'prop_type_en',
+             'bedrooms': 'rooms_en', 'status': 'is_offplan_en'}
+ROWS = [(datetime(2023, 1, 1), 1_000_000, 10, 500_000, 2_000_000, 12_000),
+        (datetime(2023, 2, 1), 1_100_000, 12, 600_000, 2_100_000, 12_500)]
+
+
+@pytest.fixture
+def engine():
+    engine = MagicMock()
+    conn = engine.connect.return_value.__enter__.return_value
+    conn.execute.return_value = ROWS
+    with patch.object(app_module, 'engine', engine), patch.object(app_module, 'SALES_MAP', SALES_MAP):
+        yield engine
+
+
+def executed_sql(engine):
+    conn = engine.connect.return_value.__enter__.return_value
+    return [str(call[0][0]) for call in conn.execute.call_args_list]
+
+
+class TestRollupRouting:
+    """Test suite for get_price_trends period routing."""
+
+    def test_long_periods_use_rollup(self, engine):
+        trend_data = app_module.get_price_trends({'area': 'Marina', 'budget': 999999999}, 'buy', '5Y')
+
+        sql = executed_sql(engine)
+        assert len(sql) == 1 and 'properties_monthly_rollup' in sql[0]
+        assert "INTERVAL '60 months'" in sql[0] and '"area_en" LIKE :area' in sql[0]
+        assert 'trans_value' not in sql[0]
+        assert trend_data[1] == {'month': '2023-02', 'avg_price': 1_100_000.0, 'transaction_count': 12,
+                                 'min_price': 600_000.0, 'max_price': 2_100_000.0, 'avg_price_per_sqm': 12_500.0}
+
+    def test_full_history_has_no_window(self, engine):
+        app_module.get_price_trends({}, 'buy', 'MAX')
+
+        assert 'INTERVAL' not in executed_sql(engine)[0]
+
+    def test_short_period_and_budget_scan_raw(self, engine):
+        app_module.get_price_trends({}, 'buy', '1Y')
+        app_module.get_price_trends({'budget': 2_000_000}, 'buy', '3Y')
+
+        sql = executed_sql(engine)
+        assert all('FROM properties\n' in statement for statement in sql)
+        assert "INTERVAL '36 months'" in sql[1]
+        assert window_start(12) in sql[0]  # Raw windows start at the rollup's month boundary
+
+    def test_missing_rollup_falls_back(self, engine):
+        conn = engine.connect.return_value.__enter__.return_value
+        conn.execute.side_effect = [Exception('relation "properties_monthly_rollup" does not exist'), ROWS]
+
+        trend_data = app_module.get_price_trends({}, 'buy', '3Y')
+
+        assert len(trend_data) == 2 and 'FROM properties\n' in executed_sql(engine)[1]
+
+
+class TestRefreshSql:
+    """Test suite for rollup refresh statements."""
+
+    def test_full_and_incremental(self):
+        delete, insert = refresh_sql('rent')
+        assert str(delete).strip() == 'DELETE FROM rentals_monthly_rollup'
+        assert 'GROUP BY 1, 2, 3, 4' in str(insert) and ':since' not in str(insert)
+
+        delete, insert = refresh_sql('buy', since='2025-01-01')
+        assert 'WHERE month >= :since' in str(delete)
+        assert 'CAST("instance_date" AS DATE) >= :since' in str(insert)
+        assert all(f'"{col}"' in str(insert) for col in ROLLUPS['buy']['dimensions'])
+
+
+class TestDownsampleQuarterly:
+    """Test suite for downsample_quarterly."""
+
+    def test_weighted_quarters(self):
+        points = [
+            {'month': '2024-01', 'avg_price': 100, 'transaction_count': 1, 'min_price': 90, 'max_price': 110, 'avg_price_per_sqm': 10},
+            {'month': '2024-03', 'avg_price': 200, 'transaction_count': 3, 'min_price': 80, 'max_price': 300, 'avg_price_per_sqm': 0},
+            {'month': '2024-04', 'avg_price': 150, 'transaction_count': 2, 'min_price': 140, 'max_price': 160, 'avg_price_per_sqm': 15},
+        ]
+
+        quarters = downsample_quarterly(points)
+
+        assert [q['month'] for q in quarters] == ['2024-Q1', '2024-Q2']
+        assert quarters[0]['avg_price'] == 175.0 and quarters[0]['transaction_count'] == 4
+        assert quarters[0]['min_price'] == 80 and quarters[0]['max_price'] == 300
+        assert quarters[0]['avg_price_per_sqm'] == 10.0
+        assert downsample_quarterly([]) == []
+
+
+class TestTopAreas:
+    """Test suite for /api/top-areas."""
+
+    @pytest.fixture
+    def client(self):
+        with patch.dict(app_module.app.config, {'LOGIN_DISABLED': True, 'TESTING': True}):
+            yield app_module.app.test_client()
+
+    def test_segment_ranking_from_rollup(self, engine, client):
+        conn = engine.connect.return_value
+        conn.execute.return_value = [('Dubai Marina', 120, 1_800_000, 19_000, 42.5, 118)]
+
+        response = client.post('/api/top-areas', json={'search_type': 'buy', 'time_period': '1Y',
+                                                        'property_type': 'Unit', 'bedrooms': '2 B/R'})
+
+        statement, params = conn.execute.call_args[0]
+        assert 'properties_monthly_rollup' in str(statement) and 'SUM(transaction_count) OVER ()' in str(statement)
+        assert 'SELECT COUNT(*) FROM' not in str(statement)
+        assert params['prop_type'] == 'Unit' and params['min_transactions'] == 5
+        assert response.json['top_areas'][0] == {
+            'area_name': 'Dubai Marina', 'transaction_count': 120, 'avg_price': 1_800_000.0,
+            'avg_price_per_sqm': 19_000.0, 'market_share_percentage': 42.5, 'valid_area_count': 118, 'ranking': 1}
+
+    def test_falls_back_to_raw_scan(self, engine, client):
+        conn = engine.connect.return_value
+        conn.execute.side_effect = [Exception('relation does not exist'), [('JVC', 50, 900_000, None, 12.0, 0)]]
+
+        response = client.post('/api/top-areas', json={'search_type': 'buy', 'time_period': 'MAX'})
+
+        statement = str(conn.execute.call_args[0][0])
+        assert 'FROM properties' in statement and 'INTERVAL' not in statement
+        assert 'OVER ()' in statement
+        assert response.json['top_areas'][0]['area_name'] == 'JVC'
+
+    def test_fallback_window_matches_rollup(self, engine, client):
+        conn = engine.connect.return_value
+        conn.execute.side_effect = [Exception('relation does not exist'), []]
+
+        client.post('/api/top-areas', json={'search_type': 'buy', 'time_period': '3M'})
+
+        rollup_sql, raw_sql = (str(call[0][0]) for call in conn.execute.call_args_list)
+        assert f"month >= {window_start(3)}" in rollup_sql
+        assert f'CAST("instance_date" AS DATE) >= {window_start(3)}' in raw_sql
+
+
+class TestTrendSeries:
+    """Test suite for get_trend_series period routing."""
+
+    def test_long_periods_use_rollup(self, engine):
+        conn = engine.connect.return_value.__enter__.return_value
+        conn.execute.return_value = [('jvc', datetime(2023, 1, 1), 900_000, 20, 10_000)]
+
+        rows = app_module.get_trend_series({'area': 'Marina', 'propertyType': 'Unit'}, 'buy', ['JVC'], time_period='5Y')
+
+        statement, params = conn.execute.call_args[0]
+        assert 'properties_monthly_rollup' in str(statement) and f"month >= {window_start(60)}" in str(statement)
+        assert 'LIKE :area' not in str(statement) and params['series_keys'] == ['jvc']
+        assert rows == [{'series': 'JVC', 'month': '2023-01', 'avg_price': 900_000.0, 'transaction_count': 20,
+                         'avg_price_per_sqm': 10_000.0}]
+
+    def test_short_period_and_budget_scan_raw(self, engine):
+        conn = engine.connect.return_value.__enter__.return_value
+        conn.execute.return_value = []
+
+        app_module.get_trend_series({}, 'buy', ['JVC'], time_period='1Y')
+        app_module.get_trend_series({'budget': 2_000_000}, 'buy', ['JVC'], time_period='3Y')
+
+        sql = executed_sql(engine)
+        assert all('FROM properties\n' in statement for statement in sql)
+        assert window_start(12) in sql[0] and window_start(36) in sql[1]
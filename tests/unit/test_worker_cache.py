@@ -0,0 +1,72 @@
+"""Unit tests for the per-worker TTL cache (worker_cache).
+
+Tests:
+1. Values are cached until the TTL, then rebuilt
+2. A failed build keeps the previous value and backs off
+3. Keyed background builds never block the caller
+4. The database stores serve the cached value without an engine
+"""
+import time
+import threading
+import pytest
+from unittest.mock import MagicMock
+
+# Import cache components
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+from worker_cache import WorkerCache
+import price_medians
+
+
+class TestWorkerCache:
+    """Test suite for WorkerCache."""
+
+    def test_ttl(self):
+        cache = WorkerCache('test', ttl=3600)
+        build = MagicMock(side_effect=['first', 'second'])
+
+        assert cache.get(build) == 'first'
+        assert cache.get(build) == 'first'
+        assert cache.get(build, max_age=0) == 'second'
+        assert build.call_count == 2
+
+    def test_failure_backs_off_and_keeps_value(self):
+        cache = WorkerCache('test', ttl=3600)
+        build = MagicMock(side_effect=['first', RuntimeError('table missing'), 'second'])
+        assert cache.get(build) == 'first'
+
+        assert cache.get(build, max_age=0) == 'first'  # Failed rebuild: previous value
+        assert cache.get(build, max_age=0) == 'first'  # Within the backoff: no query
+        assert build.call_count == 2
+
+    def test_background_build_per_key(self):
+        cache = WorkerCache('test', ttl=3600, background=True)
+        release = threading.Event()
+
+        def slow_build():
+            release.wait(5)
+            return 'built'
+
+        started = time.time()
+        assert cache.get(slow_build, key='buy') is None
+        assert cache.get(slow_build, key='buy') is None  # One build per key at a time
+        assert time.time() - started < 1
+        release.set()
+        cache.wait('buy')
+
+        assert cache.get(slow_build, key='buy') == 'built'
+        assert cache.peek('rent') is None
+
+
+class TestStoresWithoutEngine:
+    """Test suite for the engine guard of the database stores."""
+
+    def test_no_engine_no_query(self, monkeypatch):
+        cache = WorkerCache('Price/sqm medians', price_medians.MEDIAN_TTL_SECONDS)
+        monkeypatch.setattr(price_medians, '_medians', cache)
+
+        assert price_medians.load_price_medians(None) is None
+        medians = object()
+        cache.get(lambda: medians)
+        assert price_medians.load_price_medians(None, max_age=0) is medians
@@ -0,0 +1,153 @@
+"""
+NumPy evaluator for exported XGBoost tree ensembles.
+
+The trained XGBRegressor is flattened once (scripts/export_tree_model.py)
+into a handful of node arrays - split feature, threshold, child indices,
+missing-value direction and leaf value - stored as a compressed .npz next to
+the pickle. Workers load those arrays instead of unpickling the booster, so
+xgboost is never imported at serving time and the model costs a few MB per
+worker. Prediction walks every tree for every row at once: one gather per
+tree level, then a sum of the leaf values.
+
+Only gbtree models with numerical splits are supported (what
+train_model.py produces); export raises ValueError for anything else.
+"""
+import json
+import numpy as np
+
+# Objectives whose prediction is the raw margin vs exp(margin)
+IDENTITY_OBJECTIVES = {'reg:squarederror', 'reg:squaredlogerror', 'reg:pseudohubererror',
+                       'reg:absoluteerror', 'reg:quantileerror'}
+LOG_LINK_OBJECTIVES = {'reg:gamma', 'reg:tweedie', 'count:poisson'}
+
+
+class TreeEnsemble:
+    """Flattened tree ensemble: node arrays shared by all trees, one root per tree"""
+
+    def __init__(self, feature, threshold, left, right, default_left, value, roots,
+                 base_margin, depth, num_feature, link='identity'):
+        self.feature = np.asarray(feature, dtype=np.int32)
+        self.threshold = np.asarray(threshold, dtype=np.float32)
+        self.left = np.asarray(left, dtype=np.int32)
+        self.right = np.asarray(right, dtype=np.int32)
+        self.default_left = np.asarray(default_left, dtype=bool)
+        self.value = np.asarray(value, dtype=np.float32)
+        self.roots = np.asarray(roots, dtype=np.int32)
+        self.base_margin = float(base_margin)
+        self.depth = int(depth)
+        self.num_feature = int(num_feature)
+        self.link = link
+        # Interleaved (right, left) children: child = _children[2 * node + go_left]
+        self._children = np.stack([self.right, self.left], axis=1).ravel()
+
+    @classmethod
+    def from_xgboost(cls, model):
+        """
+        Flatten a trained XGBRegressor or Booster.
+
+        Trees past ``best_iteration`` (early stopping) are dropped, matching
+        XGBRegressor.predict.
+        """
+        booster = model.get_booster() if hasattr(model, 'get_booster') else model
+        learner = json.loads(booster.save_raw('json'))['learner']
+        objective = learner['objective']['name']
+        if learner['gradient_booster']['name'] != 'gbtree':
+            raise ValueError(f"Unsupported booster: {learner['gradient_booster']['name']}")
+        if objective in IDENTITY_OBJECTIVES:
+            link = 'identity'
+        elif objective in LOG_LINK_OBJECTIVES:
+            link = 'exp'
+        else:
+            raise ValueError(f"Unsupported objective: {objective}")
+        params = learner['learner_model_param']
+        if int(params.get('num_target', 1)) != 1 or int(params.get('num_class', 0)) > 1:
+            raise ValueError("Only single-output regression models are supported")
+        base_score = float(str(params['base_score']).strip('[]'))
+        base_margin = np.log(base_score) if link == 'exp' else base_score
+
+        gbtree = learner['gradient_booster']['model']
+        trees = gbtree['trees']
+        best_iteration = getattr(model, 'best_iteration', None) if hasattr(model, 'get_booster') else None
+        if best_iteration is not None:
+            trees = trees[:gbtree['iteration_indptr'][best_iteration + 1]]
+
+        feature, threshold, left, right, default_left, value, roots = [], [], [], [], [], [], []
+        depth, offset = 0, 0
+        for tree in trees:
+            if any(tree['split_type']) or tree.get('categories'):
+                raise ValueError("Categorical splits are not supported")
+            lefts = np.asarray(tree['left_children'], dtype=np.int64)
+            rights = np.asarray(tree['right_children'], dtype=np.int64)
+            conditions = np.asarray(tree['split_conditions'], dtype=np.float32)
+            leaf = lefts == -1
+            ids = np.arange(len(lefts))
+            # Leaves point at themselves, so extra traversal steps are no-ops
+            left.append(np.where(leaf, ids, lefts) + offset)
+            right.append(np.where(leaf, ids, rights) + offset)
+            feature.append(np.where(leaf, 0, tree['split_indices']))
+            threshold.append(np.where(leaf, 0, conditions))
+            value.append(np.where(leaf, conditions, 0))
+            default_left.append(np.asarray(tree['default_left'], dtype=bool))
+            roots.append(offset)
+            depth = max(depth, _tree_depth(lefts, rights))
+            offset += len(lefts)
+
+        def concat(parts, dtype):
+            return np.concatenate(parts).astype(dtype) if parts else np.zeros(0, dtype=dtype)
+
+        return cls(concat(feature, np.int32), concat(threshold, np.float32), concat(left, np.int32),
+                   concat(right, np.int32), concat(default_left, bool), concat(value, np.float32),
+                   roots, base_margin, depth, int(params['num_feature']), link)
+
+    def save(self, path):
+        """Write the node arrays to a compressed .npz file"""
+        np.savez_compressed(
+            path, feature=self.feature, threshold=self.threshold, left=self.left, right=self.right,
+            default_left=self.default_left, value=self.value, roots=self.roots,
+            meta=np.array(json.dumps({'base_margin': self.base_margin, 'depth': self.depth,
+                                      'num_feature': self.num_feature, 'link': self.link})),
+        )
+
+    @classmethod
+    def load(cls, path):
+        """Load an ensemble written by save()"""
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            return cls(data['feature'], data['threshold'], data['left'], data['right'],
+                       data['default_left'], data['value'], data['roots'], **meta)
+
+    def predict(self, X):
+        """
+        Predict for a 2-D feature matrix (same contract as XGBRegressor.predict).
+
+        Missing values (NaN) follow each split's default direction.
+        """
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[None, :]
+        if X.shape[1] != self.num_feature:
+            raise ValueError(f"Expected {self.num_feature} features, got {X.shape[1]}")
+        values = np.ascontiguousarray(X).ravel()
+        has_missing = np.isnan(values).any()
+        row_offsets = (np.arange(len(X)) * X.shape[1])[:, None]
+        node = np.broadcast_to(self.roots, (len(X), len(self.roots)))
+        for _ in range(self.depth):
+            x = values.take(row_offsets + self.feature.take(node))
+            go_left = x < self.threshold.take(node)  # False for NaN
+            if has_missing:
+                go_left |= np.isnan(x) & self.default_left.take(node)
+            node = self._children.take(2 * node + go_left)
+        margin = self.value.take(node).sum(axis=1, dtype=np.float64) + self.base_margin
+        if self.link == 'exp':
+            margin = np.exp(margin)
+        return margin.astype(np.float32)
+
+
+def _tree_depth(lefts, rights):
+    """Number of splits on the longest root-to-leaf path"""
+    depth, level = 0, [0]
+    while True:
+        level = [child for node in level if lefts[node] != -1 for child in (lefts[node], rights[node])]
+        if not level:
+            return depth
+        depth += 1
@@ -0,0 +1,224 @@
+"""
+Monthly market rollups for long-horizon price trends.
+
+properties_monthly_rollup / rentals_monthly_rollup (migrations/
+create_trend_rollups.sql) hold one row per (month, segment) with
+transaction counts, price sums/min/max and price-per-sqm sums. Trend queries
+for 3Y, 5Y and full history sum these rows instead of scanning the raw
+tables, so their cost depends on months x segments rather than transactions.
+/api/top-areas ranks areas from the same rows, with the market share taken
+over the same window and segment filters.
+
+Period windows cover whole calendar months (window_start): the rollup cannot
+split a month, so the raw-table fallbacks start at the same month boundary
+and both paths count the same transactions.
+
+The dimension columns keep the source column names, which lets the app apply
+build_where_clause (without its price conditions) to the rollup directly.
+Rows are limited to PRICE_BOUNDS, the same outlier bounds build_where_clause
+applies to raw queries.
+"""
+from sqlalchemy import bindparam, text
+
+# Outlier bounds shared with app.build_where_clause
+PRICE_BOUNDS = {
+    'buy': (100_000, 50_000_000),   # Realistic residential sale price
+    'rent': (10_000, 2_000_000),    # Realistic residential annual rent
+}
+
+ROLLUPS = {
+    'buy': {
+        'table': 'properties_monthly_rollup',
+        'source': 'properties',
+        'date': 'instance_date',
+        'price': 'trans_value',
+        'dimensions': ['area_en', 'prop_type_en', 'rooms_en', 'is_offplan_en'],
+    },
+    'rent': {
+        'table': 'rentals_monthly_rollup',
+        'source': 'rentals',
+        'date': 'registration_date',
+        'price': 'annual_amount',
+        'dimensions': ['area_en', 'prop_type_en', 'prop_sub_type_en'],
+    },
+}
+PERIOD_MONTHS = {'3M': 3, '6M': 6, '1Y': 12, '3Y': 36, '5Y': 60, 'MAX': None}  # None: full history
+ROLLUP_PERIODS = {'3Y', '5Y', 'MAX'}  # Periods answered from the rollups
+TOP_AREA_ORDER = {  # SQL ranking per leaderboard metric ('growth' is only kept in Redis)
+    'volume': 'transaction_count DESC',
+    'price_per_sqm': 'avg_price_per_sqm DESC NULLS LAST',
+}
+
+
+def refresh_sql(search_type, since=None):
+    """
+    (DELETE, INSERT ... SELECT) statements rebuilding a rollup.
+
+    Args:
+        search_type: 'buy' or 'rent'
+        since: First month (date) to recompute; None rebuilds all history
+
+    Returns:
+        Tuple of two sqlalchemy text() statements (bind :min_price, :max_price, :since)
+    """
+    config = ROLLUPS[search_type]
+    date_col, price_col = f'"{config["date"]}"', f'"{config["price"]}"'
+    dimensions = ', '.join(f'"{col}"' for col in config['dimensions'])
+    since_delete = "WHERE month >= :since" if since is not None else ""
+    since_insert = f"AND CAST({date_col} AS DATE) >= :since" if since is not None else ""
+    group_positions = ', '.join(str(i) for i in range(1, len(config['dimensions']) + 2))
+    sqm_valid = """"actual_area" IS NOT NULL AND "actual_area" != '' AND CAST("actual_area" AS FLOAT) > 0"""
+
+    delete = text(f"DELETE FROM {config['table']} {since_delete}")
+    insert = text(f"""
+        INSERT INTO {config['table']} (month, {dimensions}, transaction_count, price_sum, price_min, price_max,
+                                       price_per_sqm_sum, price_per_sqm_count)
+        SELECT
+            DATE_TRUNC('month', CAST({date_col} AS DATE))::date AS month,
+            {dimensions},
+            COUNT(*),
+            SUM({price_col}),
+            MIN({price_col}),
+            MAX({price_col}),
+            COALESCE(SUM(CASE WHEN {sqm_valid} THEN {price_col} / CAST("actual_area" AS FLOAT) END), 0),
+            COUNT(CASE WHEN {sqm_valid} THEN 1 END)
+        FROM {config['source']}
+        WHERE {price_col} >= :min_price AND {price_col} <= :max_price
+            AND {date_col} IS NOT NULL
+            AND {date_col} != ''
+            {since_insert}
+        GROUP BY {group_positions}
+    """)
+    return delete, insert
+
+
+def refresh_rollup(engine, search_type, since=None):
+    """
+    Rebuild (or recompute from ``since``) one rollup in a single transaction.
+
+    Returns:
+        Number of segment-month rows written
+    """
+    min_price, max_price = PRICE_BOUNDS[search_type]
+    params = {'min_price': min_price, 'max_price': max_price, 'since': since}
+    delete, insert = refresh_sql(search_type, since)
+    with engine.begin() as conn:
+        conn.execute(delete, params)
+        return conn.execute(insert, params).rowcount
+
+
+def window_start(period_months):
+    """
+    SQL start of a ``period_months`` window: the first day of the month N months ago.
+
+    A "3M" window on 2025-06-18 starts at 2025-03-01, so it holds the partial
+    current month plus three whole months on both the rollup and raw paths.
+    """
+    return f"DATE_TRUNC('month', NOW() - INTERVAL '{int(period_months)} months')"
+
+
+def trend_query(search_type, where_clause, period_months):
+    """
+    Monthly trend points from a rollup, same columns as the raw trend query.
+
+    Args:
+        search_type: 'buy' or 'rent'
+        where_clause: Dimension conditions (build_where_clause without price conditions)
+        period_months: Months back from now (None: full history)
+    """
+    window = f"AND month >= {window_start(period_months)}" if period_months is not None else ""
+    return text(f"""
+        SELECT
+            month,
+            SUM(price_sum) / SUM(transaction_count) as avg_price,
+            SUM(transaction_count) as transaction_count,
+            MIN(price_min) as min_price,
+            MAX(price_max) as max_price,
+            SUM(price_per_sqm_sum) / NULLIF(SUM(price_per_sqm_count), 0) as avg_price_per_sqm
+        FROM {ROLLUPS[search_type]['table']}
+        WHERE {where_clause or 'TRUE'}
+        {window}
+        GROUP BY month
+        ORDER BY month;
+    """)
+
+
+def series_query(search_type, group_col, where_clause, period_months):
+    """
+    Monthly points per value of one rollup dimension, same columns as the raw
+    comparison query in get_trend_series.
+
+    Args:
+        search_type: 'buy' or 'rent'
+        group_col: Rollup dimension the series are keyed by (e.g. area_en)
+        where_clause: Dimension conditions (build_where_clause without price conditions)
+        period_months: Months back from now (None: full history)
+
+    Returns:
+        text() selecting series_key, month, avg_price, transaction_count,
+        avg_price_per_sqm (binds the expanding :series_keys)
+    """
+    window = f"AND month >= {window_start(period_months)}" if period_months is not None else ""
+    return text(f"""
+        SELECT
+            LOWER(TRIM("{group_col}")) as series_key,
+            month,
+            SUM(price_sum) / SUM(transaction_count) as avg_price,
+            SUM(transaction_count) as transaction_count,
+            SUM(price_per_sqm_sum) / NULLIF(SUM(price_per_sqm_count), 0) as avg_price_per_sqm
+        FROM {ROLLUPS[search_type]['table']}
+        WHERE {where_clause or 'TRUE'}
+        AND LOWER(TRIM("{group_col}")) IN :series_keys
+        {window}
+        GROUP BY 1, 2
+        ORDER BY 1, 2;
+    """).bindparams(bindparam('series_keys', expanding=True))
+
+
+def top_areas_query(search_type, where_clause, period_months, metric='volume'):
+    """
+    Areas ranked by transaction count (or another TOP_AREA_ORDER metric) from a
+    rollup, with the market share denominator taken over the same window and
+    segment filters.
+
+    Args:
+        search_type: 'buy' or 'rent'
+        where_clause: Dimension conditions (build_where_clause without price conditions)
+        period_months: Months back from now (None: full history)
+        metric: Key of TOP_AREA_ORDER
+
+    Returns:
+        text() selecting area_name, transaction_count, avg_price, avg_price_per_sqm,
+        market_share_percentage, valid_area_count (binds :limit_param, :min_transactions)
+    """
+    window = f"AND month >= {window_start(period_months)}" if period_months is not None else ""
+    return text(f"""
+        WITH per_area AS (
+            SELECT
+                "area_en" as area_name,
+                SUM(transaction_count) as transaction_count,
+                SUM(price_sum) as price_sum,
+                SUM(price_per_sqm_sum) as price_per_sqm_sum,
+                SUM(price_per_sqm_count) as valid_area_count
+            FROM {ROLLUPS[search_type]['table']}
+            WHERE "area_en" IS NOT NULL
+            AND "area_en" != ''
+            AND {where_clause or 'TRUE'}
+            {window}
+            GROUP BY "area_en"
+        ), ranked AS (
+            SELECT *, SUM(transaction_count) OVER () as market_total
+            FROM per_area
+        )
+        SELECT
+            area_name,
+            transaction_count,
+            price_sum / transaction_count as avg_price,
+            price_per_sqm_sum / NULLIF(valid_area_count, 0) as avg_price_per_sqm,
+            ROUND(transaction_count * 100.0 / market_total, 2) as market_share_percentage,
+            valid_area_count
+        FROM ranked
+        WHERE transaction_count >= :min_transactions
+        ORDER BY {TOP_AREA_ORDER[metric]}
+        LIMIT :limit_param
+    """)
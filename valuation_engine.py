@@ -6,12 +6,41 @@ import pandas as pd
 import numpy as np
 from datetime import datetime
 import os
+import json
+import time
+import fcntl
+import shutil
 from sqlalchemy import create_engine, text
+from dictionary_encoding import encode_frame, lower_codes
+from json_encoding import frame_records
+from area_index import load_area_index
 
 # Database connection (same as main app)
 DATABASE_URL = os.getenv('DATABASE_URL')
 _engine = None
 _dataset_cache = {}
+_offline_cache = {}  # Parquet fallback dataset, keyed by export version
+
+# Shared snapshot settings (one materialized dataset for all workers)
+SNAPSHOT_DIR = os.getenv('VALUATION_SNAPSHOT_DIR', 'data/valuation_snapshot')
+SNAPSHOT_MAX_AGE_SECONDS = int(os.getenv('VALUATION_SNAPSHOT_MAX_AGE', '3600'))  # Refresh hourly
+SNAPSHOT_CHECK_INTERVAL_SECONDS = 30  # How often a worker re-reads the CURRENT pointer
+SNAPSHOT_KEEP_VERSIONS = 2  # Current + previous: workers may still be mapping the version CURRENT just left
+DATASET_FULL_REFRESH_SECONDS = int(os.getenv('VALUATION_FULL_REFRESH_AGE', '86400'))  # Full rescan daily, deltas in between
+OUTLIER_MIN_GROUP_ROWS = 20  # Smaller (area, type) groups are not quantile-trimmed
+_comparables_index = None  # (dataset, index) built by get_comparables_index
+
+# Parquet export columns read by the offline loader, mapped to dataset names
+PARQUET_COLUMNS = {
+    'area_en': 'area_name_en',
+    'prop_type_en': 'property_type_en',
+    'trans_value': 'property_total_value',
+    'actual_area': 'actual_area',
+    'rooms_en': 'rooms_en',
+    'instance_date': 'instance_date',
+    'is_offplan_en': 'is_offplan_en',
+    'project_en': 'project_en',
+}
 
 def get_database_engine():
     """Get database engine using same configuration as main app"""
@@ -40,67 +69,362 @@ def get_database_engine():
             return None
     return _engine
 
-def load_dubai_dataset_from_db():
-    """Load Dubai property data from production database"""
-    global _dataset_cache
+def query_dubai_dataset(engine, since=None):
+    """
+    Scan the properties table and return cleaned, untrimmed rows.
+
+    Args:
+        engine: SQLAlchemy engine
+        since: Optional instance_date watermark; only rows on or after it are read
+    """
+    # SQL query to get sales data from properties table
+    query = f"""
+    SELECT 
+        area_en as area_name_en,
+        prop_type_en as property_type_en,
+        trans_value as property_total_value,
+        actual_area,
+        rooms_en,
+        instance_date,
+        is_offplan_en,
+        project_en
+    FROM properties 
+    WHERE 
+        trans_value > 0 
+        AND actual_area > 0 
+        AND area_en IS NOT NULL 
+        AND prop_type_en IS NOT NULL
+        AND trans_value BETWEEN 100000 AND 50000000  -- Reasonable price range
+        AND actual_area BETWEEN 20 AND 2000  -- Reasonable area range
+        {"AND instance_date >= :watermark" if since is not None else ""}
+    ORDER BY instance_date DESC
+    """
+    
+    with engine.connect() as conn:
+        df = pd.read_sql_query(text(query), conn, params={'watermark': since} if since is not None else None)
+    
+    return _clean_dataset(df)
+
+def _clean_dataset(df):
+    """Drop unusable rows and add the calculated fields every loader provides"""
+    df = df.dropna(subset=['property_total_value', 'actual_area'])
+    df = df[df['property_total_value'] > 0]
+    df = df[df['actual_area'] > 0]
+    
+    # Add calculated fields
+    df['price_per_sqm'] = df['property_total_value'] / df['actual_area']
+    df['transaction_year'] = pd.to_datetime(df['instance_date'], errors='coerce').dt.year
     
-    # Use cache key based on current hour to refresh periodically
-    cache_key = f"properties_{datetime.now().hour}"
+    return encode_frame(df.reset_index(drop=True))
+
+def _outlier_group_keys(df):
+    """Case-insensitive (area, type) key used for outlier trimming"""
+    return (df['area_name_en'].astype('string').str.lower() + '|' +
+            df['property_type_en'].astype('string').str.lower())
+
+def trim_outliers(raw, groups=None):
+    """
+    Flag price-per-sqm outliers within each (area, type) group.
+
+    Rows outside the group's 10th-90th percentile band get ``keep=False``.
+    Groups smaller than OUTLIER_MIN_GROUP_ROWS are kept whole. When
+    ``groups`` is given, only those group keys are recomputed and every
+    other row keeps its previous flag.
+    """
+    raw = raw.copy()
+    keys = _outlier_group_keys(raw)
+    if groups is None or 'keep' not in raw.columns:
+        affected = np.ones(len(raw), dtype=bool)
+        keep = np.ones(len(raw), dtype=bool)
+    else:
+        affected = keys.isin(groups).to_numpy()
+        keep = raw['keep'].to_numpy(dtype=bool).copy()
+    
+    if affected.any():
+        price_per_sqm = raw['price_per_sqm'][affected]
+        grouped = price_per_sqm.groupby(keys[affected])
+        low = grouped.transform(lambda s: s.quantile(0.1))
+        high = grouped.transform(lambda s: s.quantile(0.9))
+        small = grouped.transform('size') < OUTLIER_MIN_GROUP_ROWS
+        keep[affected] = (((price_per_sqm >= low) & (price_per_sqm <= high)) | small).to_numpy()
     
-    if cache_key not in _dataset_cache:
+    raw['keep'] = keep
+    return raw
+
+def merge_dataset_delta(raw, delta, watermark):
+    """
+    Fold rows read since ``watermark`` into the raw dataset.
+
+    The delta query is inclusive, so rows already held for the watermark
+    date are replaced by the delta's copy of that date. Returns the merged
+    frame (newest first) and the set of group keys whose trimming must be
+    recomputed.
+    """
+    on_watermark = (raw['instance_date'].astype('string') == str(watermark)).to_numpy()
+    affected = set(_outlier_group_keys(delta).dropna()) | set(_outlier_group_keys(raw[on_watermark]).dropna())
+    retained = raw[~on_watermark]
+    merged = pd.concat(
+        [delta, retained.astype({col: object for col in retained.columns if retained[col].dtype == 'category'})],
+        ignore_index=True,
+    )
+    return merged, affected
+
+def build_dataset(raw):
+    """Valuation dataset served to workers: the raw rows that survived trimming"""
+    return raw[raw['keep']].drop(columns='keep').reset_index(drop=True)
+
+def dataset_watermark(raw):
+    """Latest instance_date held, used as the next delta watermark"""
+    dates = raw['instance_date'].dropna()
+    return str(dates.astype('string').max()) if len(dates) else None
+
+# --- Shared dataset snapshot ---
+# The cleaned dataset is materialized once into a directory of .npy columns
+# (strings dictionary-encoded) that every gunicorn worker maps read-only.
+# CURRENT names the live snapshot and is swapped atomically with os.replace.
+# The untrimmed rows are stored alongside (raw/) so the next refresh can
+# apply a watermark delta instead of re-reading the whole table.
+
+def _snapshot_pointer_path(snapshot_dir):
+    return os.path.join(snapshot_dir, 'CURRENT')
+
+def read_snapshot_pointer(snapshot_dir=SNAPSHOT_DIR):
+    """Return the manifest of the live snapshot, or None if there is none"""
+    try:
+        with open(_snapshot_pointer_path(snapshot_dir)) as f:
+            version = f.read().strip()
+        with open(os.path.join(snapshot_dir, version, 'manifest.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_columns(df, directory):
+    """Write each column of ``df`` as an .npy file and return the column manifest"""
+    os.makedirs(directory, exist_ok=True)
+    columns = []
+    for name in df.columns:
+        series = df[name]
+        file_name = f"{len(columns):03d}.npy"
+        if pd.api.types.is_numeric_dtype(series.dtype) or pd.api.types.is_datetime64_dtype(series.dtype):
+            if pd.api.types.is_extension_array_dtype(series.dtype):
+                values = series.to_numpy(dtype=np.float64, na_value=np.nan)  # Nullable ints/floats
+            else:
+                values = series.to_numpy()
+            np.save(os.path.join(directory, file_name), values, allow_pickle=False)
+            columns.append({'name': name, 'kind': 'array', 'file': file_name})
+        else:
+            categorical = pd.Categorical(series.map(lambda v: None if pd.isna(v) else str(v)))
+            np.save(os.path.join(directory, file_name), categorical.codes, allow_pickle=False)
+            columns.append({
+                'name': name,
+                'kind': 'categorical',
+                'file': file_name,
+                'categories': [str(c) for c in categorical.categories],
+            })
+    return columns
+
+def write_dataset_snapshot(df, snapshot_dir=SNAPSHOT_DIR, extra=None, raw=None):
+    """
+    Materialize ``df`` as a memory-mappable snapshot and make it current.
+
+    Numeric and datetime columns are stored as plain .npy arrays; everything
+    else is dictionary-encoded (codes .npy + categories in the manifest).
+    ``raw`` optionally stores the untrimmed rows for delta refreshes.
+    Returns the manifest of the new snapshot.
+    """
+    os.makedirs(snapshot_dir, exist_ok=True)
+    version = f"snapshot-{datetime.now().strftime('%Y%m%d%H%M%S%f')}-{os.getpid()}"
+    tmp_dir = os.path.join(snapshot_dir, f".{version}.tmp")
+    
+    manifest = {
+        'version': version,
+        'created_at': time.time(),
+        'row_count': len(df),
+        'columns': _write_columns(df, tmp_dir),
+    }
+    if raw is not None:
+        manifest['raw_columns'] = _write_columns(raw, os.path.join(tmp_dir, 'raw'))
+    manifest.update(extra or {})
+    with open(os.path.join(tmp_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_dir, os.path.join(snapshot_dir, version))
+    
+    # Atomic pointer swap: readers see either the old or the new version
+    pointer_tmp = f"{_snapshot_pointer_path(snapshot_dir)}.{os.getpid()}.tmp"
+    with open(pointer_tmp, 'w') as f:
+        f.write(version)
+    os.replace(pointer_tmp, _snapshot_pointer_path(snapshot_dir))
+    
+    # Prune versions older than the previous one. The previous version stays:
+    # a worker may have read the old pointer and not mapped its files yet
+    # (workers that already mapped a version keep their pages either way).
+    versions = sorted(entry for entry in os.listdir(snapshot_dir) if entry.startswith('snapshot-'))
+    for entry in versions[:-SNAPSHOT_KEEP_VERSIONS]:
+        if entry != version:
+            shutil.rmtree(os.path.join(snapshot_dir, entry), ignore_errors=True)
+    
+    print(f"💾 Wrote dataset snapshot {version} ({len(df):,} rows)")
+    return manifest
+
+def map_dataset_snapshot(manifest, snapshot_dir=SNAPSHOT_DIR, raw=False):
+    """Map a snapshot (or its raw rows) read-only into a DataFrame without copying column data"""
+    base = os.path.join(snapshot_dir, manifest['version'])
+    if raw:
+        base = os.path.join(base, 'raw')
+    data = {}
+    for column in manifest['raw_columns' if raw else 'columns']:
+        values = np.load(os.path.join(base, column['file']), mmap_mode='r')
+        if column['kind'] == 'categorical':
+            dtype = pd.CategoricalDtype(column['categories'])
+            values = pd.Series(pd.Categorical.from_codes(values, dtype=dtype, validate=False), copy=False)
+        data[column['name']] = values
+    return pd.DataFrame(data, copy=False)
+
+def _rebuild_raw_dataset(engine, manifest, snapshot_dir=SNAPSHOT_DIR):
+    """
+    Produce the next raw dataset: a watermark delta on top of the current
+    snapshot when possible, a full table scan otherwise.
+
+    Returns (raw, extra manifest fields).
+    """
+    now = time.time()
+    if (manifest and manifest.get('raw_columns') and manifest.get('watermark')
+            and now - manifest.get('full_refresh_at', 0) < DATASET_FULL_REFRESH_SECONDS):
+        previous = map_dataset_snapshot(manifest, snapshot_dir, raw=True)
+        delta = query_dubai_dataset(engine, since=manifest['watermark'])
+        raw, affected = merge_dataset_delta(previous, delta, manifest['watermark'])
+        raw = trim_outliers(raw, groups=affected)
+        print(f"🔄 Delta refresh: {len(delta):,} rows since {manifest['watermark']}, {len(affected)} groups re-trimmed")
+        full_refresh_at = manifest['full_refresh_at']
+    else:
+        raw = trim_outliers(query_dubai_dataset(engine))
+        full_refresh_at = now
+    return raw, {'watermark': dataset_watermark(raw), 'full_refresh_at': full_refresh_at}
+
+def _refresh_dataset_snapshot(engine, snapshot_dir=SNAPSHOT_DIR):
+    """
+    Refresh the snapshot from the database under an exclusive file lock.
+
+    Workers that lose the race block on the lock and then find a fresh
+    snapshot, so one refresh costs one database query regardless of the
+    number of workers.
+    """
+    os.makedirs(snapshot_dir, exist_ok=True)
+    with open(os.path.join(snapshot_dir, '.lock'), 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            manifest = read_snapshot_pointer(snapshot_dir)
+            if manifest and time.time() - manifest['created_at'] < SNAPSHOT_MAX_AGE_SECONDS:
+                return manifest
+            raw, extra = _rebuild_raw_dataset(engine, manifest, snapshot_dir)
+            return write_dataset_snapshot(build_dataset(raw), snapshot_dir, extra=extra, raw=raw)
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def evict_dataset_cache():
+    """Drop this worker's mapped dataset and comparables index"""
+    global _dataset_cache, _comparables_index
+    _dataset_cache = {}
+    _comparables_index = None
+
+def _set_current_dataset(current):
+    """Install ``current`` as the only cached dataset, evicting whatever it replaces"""
+    global _dataset_cache
+    if _dataset_cache.get('current') is not current:
+        evict_dataset_cache()
+    _dataset_cache = {'current': current}
+    return current['df']
+
+def load_dubai_dataset_from_db():
+    """Load Dubai property data from the shared snapshot, refreshing it from the database when stale"""
+    now = time.time()
+    current = _dataset_cache.get('current')
+    if current and now - current['checked_at'] < SNAPSHOT_CHECK_INTERVAL_SECONDS:
+        return current['df']
+    
+    manifest = read_snapshot_pointer()
+    if manifest is None or now - manifest['created_at'] >= SNAPSHOT_MAX_AGE_SECONDS:
         engine = get_database_engine()
         if engine is None:
-            raise Exception("Database connection not available")
-        
-        # SQL query to get sales data from properties table
-        query = """
-        SELECT 
-            area_en as area_name_en,
-            prop_type_en as property_type_en,
-            trans_value as property_total_value,
-            actual_area,
-            rooms_en,
-            instance_date,
-            is_offplan_en,
-            project_en
-        FROM properties 
-        WHERE 
-            trans_value > 0 
-            AND actual_area > 0 
-            AND area_en IS NOT NULL 
-            AND prop_type_en IS NOT NULL
-            AND trans_value BETWEEN 100000 AND 50000000  -- Reasonable price range
-            AND actual_area BETWEEN 20 AND 2000  -- Reasonable area range
-        ORDER BY instance_date DESC
-        """
-        
+            if manifest is None:
+                raise Exception("Database connection not available")
+        else:
+            try:
+                manifest = _refresh_dataset_snapshot(engine)
+            except OSError as e:
+                # Snapshot directory not writable: keep a private in-process copy
+                print(f"⚠️ Dataset snapshot unavailable ({e}), loading in-process")
+                if current is None or now - current['loaded_at'] >= SNAPSHOT_MAX_AGE_SECONDS:
+                    df = build_dataset(trim_outliers(query_dubai_dataset(engine)))
+                    current = {'version': None, 'df': df, 'loaded_at': now}
+                    print(f"✅ Loaded {len(df):,} property records from database")
+                current['checked_at'] = now
+                return _set_current_dataset(current)
+            except Exception as e:
+                print(f"❌ Database query failed: {e}")
+                if manifest is None:
+                    # Fallback to the offline exports if database fails
+                    return load_dubai_dataset_offline()
+    
+    if current is None or current['version'] != manifest['version']:
+        # Swap to the new snapshot; the previous mapping is released with it
         try:
-            with engine.connect() as conn:
-                df = pd.read_sql_query(text(query), conn)
-                
-            # Data cleaning and preparation
-            df = df.dropna(subset=['property_total_value', 'actual_area'])
-            df = df[df['property_total_value'] > 0]
-            df = df[df['actual_area'] > 0]
-            
-            # Add calculated fields
-            df['price_per_sqm'] = df['property_total_value'] / df['actual_area']
-            df['transaction_year'] = pd.to_datetime(df['instance_date'], errors='coerce').dt.year
-            
-            # Remove outliers (properties with price per sqm outside reasonable range)
-            q1 = df['price_per_sqm'].quantile(0.1)
-            q3 = df['price_per_sqm'].quantile(0.9)
-            df = df[(df['price_per_sqm'] >= q1) & (df['price_per_sqm'] <= q3)]
-            
-            _dataset_cache[cache_key] = df
-            print(f"✅ Loaded {len(df):,} property records from database")
-            
-        except Exception as e:
-            print(f"❌ Database query failed: {e}")
-            # Fallback to CSV if database fails
-            return load_dubai_dataset_from_csv()
+            df = map_dataset_snapshot(manifest)
+        except OSError as e:
+            # Pruned after we read the pointer (two refreshes since): map what CURRENT names now
+            print(f"⚠️ Snapshot {manifest['version']} unavailable ({e}), re-reading the pointer")
+            manifest = read_snapshot_pointer()
+            if manifest is None:
+                raise
+            df = map_dataset_snapshot(manifest)
+        current = {
+            'version': manifest['version'],
+            'df': df,
+            'loaded_at': now,
+        }
+        print(f"✅ Mapped {manifest['row_count']:,} property records from snapshot {manifest['version']}")
+    current['checked_at'] = now
+    return _set_current_dataset(current)
+
+def load_dubai_dataset_from_parquet(snapshot_dir=None):
+    """
+    Fallback: Load Dubai dataset from the Parquet export (see parquet_store).
+
+    Only the valuation columns are read, and the price/size bounds of the
+    database query are pushed down to the Parquet row groups.
+    """
+    import parquet_store
+    snapshot_dir = snapshot_dir or parquet_store.PARQUET_SNAPSHOT_DIR
+    if not parquet_store.snapshot_exists('properties', snapshot_dir):
+        raise FileNotFoundError(f"No Parquet snapshot in {snapshot_dir}")
+    
+    # Re-read only when a new export has been swapped in
+    version = (snapshot_dir, os.path.getmtime(parquet_store.table_path('properties', snapshot_dir)))
+    if _offline_cache.get('version') == version:
+        return _offline_cache['df']
     
-    return _dataset_cache[cache_key]
+    df = parquet_store.read_table(
+        'properties',
+        columns=list(PARQUET_COLUMNS),
+        filters=[
+            ('trans_value', '>=', 100000), ('trans_value', '<=', 50000000),
+            ('actual_area', '>=', 20), ('actual_area', '<=', 2000),
+        ],
+        snapshot_dir=snapshot_dir,
+    ).rename(columns=PARQUET_COLUMNS)
+    df = df.sort_values('instance_date', ascending=False, kind='stable')
+    df = build_dataset(trim_outliers(_clean_dataset(df)))
+    _offline_cache.update(version=version, df=df)
+    print(f"⚠️ Using Parquet fallback with {len(df)} records")
+    return df
+
+def load_dubai_dataset_offline():
+    """Fallback chain when the database is unavailable: Parquet export, then CSV"""
+    try:
+        return load_dubai_dataset_from_parquet()
+    except Exception as e:
+        print(f"Parquet load failed: {e}")
+        return load_dubai_dataset_from_csv()
 
 def load_dubai_dataset_from_csv():
     """Fallback: Load Dubai dataset from CSV file"""
@@ -111,35 +435,141 @@ def load_dubai_dataset_from_csv():
         df = df[df['property_total_value'] > 0]
         df = df[df['actual_area'] > 0]
         print(f"⚠️ Using CSV fallback with {len(df)} records")
-        return df
+        return encode_frame(df)
     else:
         raise FileNotFoundError(f"No dataset available - neither database nor CSV found")
 
 def load_dubai_dataset():
-    """Main function to load Dubai dataset - tries database first, then CSV"""
+    """Main function to load Dubai dataset - tries database first, then the Parquet/CSV exports"""
     try:
         return load_dubai_dataset_from_db()
     except Exception as e:
         print(f"Database load failed: {e}")
-        return load_dubai_dataset_from_csv()
+        return load_dubai_dataset_offline()
+
+def build_comparables_index(df):
+    """
+    Build an in-memory comparables index over the cleaned dataset.
+
+    Rows are grouped by (area_id, type_id) into contiguous NumPy arrays sorted
+    by size, so the ±30% size band is a pair of searchsorted calls. The same
+    structure serves the area-wide and city-wide (same type) fallback tiers.
+    Positions refer to rows of ``df``; sorting them restores the dataset's
+    original (most recent first) order.
+    """
+    # Dictionary-encoded columns are keyed from their categories, not per row
+    area_codes, area_names = lower_codes(df['area_name_en'])
+    type_codes, type_names = lower_codes(df['property_type_en'])
+    sizes = pd.to_numeric(df['actual_area'], errors='coerce').to_numpy(dtype=np.float64)
+
+    valid = (area_codes >= 0) & (type_codes >= 0) & ~np.isnan(sizes)
+    positions = np.flatnonzero(valid)
+    area_codes = area_codes[valid]
+    type_codes = type_codes[valid]
+    sizes = sizes[valid]
+
+    def _segments(order, *key_arrays):
+        # Offsets of each distinct key inside the reordered arrays
+        keys = [k[order] for k in key_arrays]
+        if len(order) == 0:
+            return {}
+        change = np.zeros(len(order), dtype=bool)
+        change[0] = True
+        for k in keys:
+            change[1:] |= k[1:] != k[:-1]
+        starts = np.flatnonzero(change)
+        ends = np.append(starts[1:], len(order))
+        return {
+            tuple(int(k[start]) for k in keys) if len(keys) > 1 else int(keys[0][start]): (int(start), int(end))
+            for start, end in zip(starts, ends)
+        }
+
+    # (area, type) groups sorted by size; lexsort is stable so equal sizes keep row order
+    group_order = np.lexsort((sizes, type_codes, area_codes))
+    # City-wide type groups sorted by size
+    type_order = np.lexsort((sizes, type_codes))
+    # Area groups in original row order (all property types)
+    area_order = np.argsort(area_codes, kind='stable')
+
+    return {
+        'row_count': len(df),
+        'area_ids': {name: i for i, name in enumerate(area_names)},
+        'type_ids': {name: i for i, name in enumerate(type_names)},
+        'group_sizes': sizes[group_order],
+        'group_positions': positions[group_order],
+        'group_offsets': _segments(group_order, area_codes, type_codes),
+        'type_sizes': sizes[type_order],
+        'type_positions': positions[type_order],
+        'type_offsets': _segments(type_order, type_codes),
+        'area_positions': positions[area_order],
+        'area_offsets': _segments(area_order, area_codes),
+    }
+
+def get_comparables_index(df):
+    """Return the comparables index for ``df``, rebuilding it when the dataset changes"""
+    global _comparables_index
+    if _comparables_index is None or _comparables_index[0] is not df:
+        _comparables_index = (df, build_comparables_index(df))
+    return _comparables_index[1]
+
+def _size_band(sizes, positions, offsets, size_range):
+    """Slice a size-sorted segment to the rows inside ``size_range`` (inclusive)"""
+    if offsets is None:
+        return positions[:0]
+    start, end = offsets
+    segment = sizes[start:end]
+    lo = np.searchsorted(segment, size_range[0], side='left')
+    hi = np.searchsorted(segment, size_range[1], side='right')
+    return positions[start + lo:start + hi]
+
+def _segment(positions, offsets):
+    """All row positions of a segment"""
+    if offsets is None:
+        return positions[:0]
+    start, end = offsets
+    return positions[start:end]
+
+def _take(df, positions, limit=None):
+    """Rows at ``positions`` in original dataset order, optionally truncated"""
+    positions = np.sort(positions)
+    if limit is not None:
+        positions = positions[:limit]
+    return df.iloc[positions]
+
+def _nearby_size_band(index, area_name, type_id, size_range):
+    """Rows of ``type_id`` inside ``size_range`` from the areas nearest to ``area_name``"""
+    area_index = load_area_index(get_database_engine())
+    if area_index is None:
+        return np.array([], dtype=np.int64)
+    bands = [
+        _size_band(index['group_sizes'], index['group_positions'],
+                   index['group_offsets'].get((index['area_ids'].get(name.lower()), type_id)), size_range)
+        for name, _ in area_index.neighbours(area_name)
+    ]
+    return np.concatenate(bands) if bands else np.array([], dtype=np.int64)
 
 def find_comparable_properties(property_data, max_comparables=10):
     """Find comparable properties using enhanced statistical filtering"""
     df = load_dubai_dataset()
+    index = get_comparables_index(df)
     
     print(f"🔍 Searching in dataset of {len(df):,} properties")
     
-    # Start with area filtering (case-insensitive)
+    # Resolve area and type ids (case-insensitive)
     area_name = property_data.get('area_name', '').lower()
-    area_matches = df[df['area_name_en'].str.lower() == area_name]
+    property_type = (property_data.get('property_type') or '').lower()
+    area_id = index['area_ids'].get(area_name)
+    type_id = index['type_ids'].get(property_type)
+    
+    area_offsets = index['area_offsets'].get(area_id)
+    area_matches = _segment(index['area_positions'], area_offsets)
     
     print(f"🏢 Found {len(area_matches)} properties in '{property_data.get('area_name', '')}'")
     
     # Filter by property type
+    group_offsets = index['group_offsets'].get((area_id, type_id))
     if property_data.get('property_type'):
-        type_matches = area_matches[
-            area_matches['property_type_en'].str.lower() == property_data['property_type'].lower()
-        ]
+        type_matches = _segment(index['group_positions'], group_offsets)
         print(f"🏠 Found {len(type_matches)} {property_data['property_type']} properties in area")
     else:
         type_matches = area_matches
@@ -147,48 +577,60 @@ def find_comparable_properties(property_data, max_comparables=10):
     # Size filtering (±30% range)
     target_size = property_data.get('area_sqm', 100)
     size_range = (target_size * 0.7, target_size * 1.3)
-    size_matches = type_matches[
-        (type_matches['actual_area'] >= size_range[0]) & 
-        (type_matches['actual_area'] <= size_range[1])
-    ]
+    if property_data.get('property_type'):
+        size_matches = _size_band(index['group_sizes'], index['group_positions'], group_offsets, size_range)
+    else:
+        # No type given: band every type group of the area
+        size_matches = np.concatenate([
+            _size_band(index['group_sizes'], index['group_positions'], offsets, size_range)
+            for (group_area, _), offsets in index['group_offsets'].items()
+            if group_area == area_id
+        ] or [area_matches[:0]])
     
     print(f"📐 Found {len(size_matches)} properties in size range {size_range[0]:.0f}-{size_range[1]:.0f} sqm")
     
+    # Sparse area: look at the nearest areas before going city-wide
+    nearby_matches = size_matches
+    if len(area_matches) < 3:
+        nearby_matches = _nearby_size_band(index, property_data.get('area_name', ''), type_id, size_range)
+    
     # If we have enough area+type+size matches, use them
     if len(size_matches) >= 3:
-        comparables = size_matches.head(max_comparables)
+        comparables = _take(df, size_matches, max_comparables)
         confidence_base = 95
         search_scope = f"area-specific ({property_data.get('area_name', '')})"
     
     # Otherwise, expand to area+type (ignore size restriction)
     elif len(type_matches) >= 3:
-        comparables = type_matches.head(max_comparables)
+        comparables = _take(df, type_matches, max_comparables)
         confidence_base = 88
         search_scope = f"area-wide ({property_data.get('area_name', '')})"
     
     # Otherwise, expand to area-wide (all property types)
     elif len(area_matches) >= 3:
-        comparables = area_matches.head(max_comparables)
+        comparables = _take(df, area_matches, max_comparables)
         confidence_base = 82
         search_scope = f"area-wide (all types)"
     
+    # Otherwise, same type and size in the nearest areas
+    elif len(nearby_matches) >= 3:
+        comparables = _take(df, nearby_matches, max_comparables)
+        confidence_base = 78
+        search_scope = "nearby areas (same type & size)"
+    
     # Last resort: city-wide search for same property type
     else:
-        city_type_matches = df[
-            df['property_type_en'].str.lower() == property_data.get('property_type', '').lower()
-        ]
+        type_offsets = index['type_offsets'].get(type_id)
+        city_type_matches = _segment(index['type_positions'], type_offsets)
         # Apply size filtering for city-wide search
-        city_size_matches = city_type_matches[
-            (city_type_matches['actual_area'] >= size_range[0]) & 
-            (city_type_matches['actual_area'] <= size_range[1])
-        ]
+        city_size_matches = _size_band(index['type_sizes'], index['type_positions'], type_offsets, size_range)
         
         if len(city_size_matches) >= 3:
-            comparables = city_size_matches.head(max_comparables)
+            comparables = _take(df, city_size_matches, max_comparables)
             confidence_base = 75
             search_scope = "city-wide (same type & size)"
         else:
-            comparables = city_type_matches.head(max_comparables)
+            comparables = _take(df, city_type_matches, max_comparables)
             confidence_base = 70
             search_scope = "city-wide (same type)"
     
@@ -275,16 +717,15 @@ def calculate_valuation(property_type: str, area: str, size_sqm: float) -> dict:
         margin = std_dev * 0.15  # ±15% based on standard deviation
         
         # Prepare comparable properties for response
-        comparable_list = []
-        for _, comp in comparables.head(5).iterrows():  # Top 5 for response
-            comparable_list.append({
-                'area_name': comp.get('area_name_en', 'N/A'),
-                'property_type': comp.get('property_type_en', 'N/A'),
-                'area_sqm': float(comp.get('actual_area', 0)),
-                'sold_price': float(comp.get('property_total_value', 0)),
-                'price_per_sqm': float(comp.get('property_total_value', 0) / comp.get('actual_area', 1)),
-                'transaction_year': int(comp.get('transaction_year', 2024)) if pd.notna(comp.get('transaction_year')) else 2024
-            })
+        top = comparables.head(5)  # Top 5 for response
+        comparable_list = frame_records(pd.DataFrame({
+            'area_name': top['area_name_en'].astype(object),
+            'property_type': top['property_type_en'].astype(object),
+            'area_sqm': top['actual_area'].astype(float),
+            'sold_price': top['property_total_value'].astype(float),
+            'price_per_sqm': (top['property_total_value'] / top['actual_area']).astype(float),
+            'transaction_year': top['transaction_year'].fillna(2024).astype(int) if 'transaction_year' in top.columns else 2024,
+        }))
         
         result = {
             'success': True,
@@ -299,7 +740,7 @@ def calculate_valuation(property_type: str, area: str, size_sqm: float) -> dict:
                 'comparables': comparable_list,
                 'total_comparables_found': len(comparables),
                 'valuation_date': datetime.now().isoformat(),
-                'data_source': f"Database ({len(load_dubai_dataset()):,} properties)"
+                'data_source': f"Database ({get_comparables_index(load_dubai_dataset())['row_count']:,} properties)"
             }
         }
         
@@ -0,0 +1,104 @@
+"""
+Per-worker cache for values built from the database.
+
+Each gunicorn worker keeps one copy of a precomputed table (price medians,
+area index, heatmap payloads, ...) and rebuilds it when it is older than a
+TTL. A failed build is not retried for ``retry_seconds``, so a missing table
+costs one query per backoff window instead of one per request, and the last
+good value keeps being served meanwhile.
+
+Builds run under a lock (one build per worker at a time), or on a background
+thread when the build is too slow for the request path.
+"""
+import time
+import threading
+
+RETRY_SECONDS = 300  # Wait after a failed build before trying again
+
+
+class WorkerCache:
+    """TTL cache with a failure backoff, optionally keyed (e.g. per search_type)"""
+
+    def __init__(self, name, ttl, retry_seconds=RETRY_SECONDS, background=False):
+        """
+        Args:
+            name: Label for the "unavailable" warning
+            ttl: Seconds before a value is rebuilt
+            retry_seconds: Seconds to wait after a failed build
+            background: Build on a daemon thread; get() never waits and returns
+                the previous value (or None) until the build finishes
+        """
+        self.name = name
+        self.ttl = ttl
+        self.retry_seconds = retry_seconds
+        self.background = background
+        self._values = {}  # key -> (value, built_at)
+        self._failed_at = {}  # key -> time of the last failed build
+        self._builds = {}  # key -> running build thread (background mode)
+        self._lock = threading.Lock()
+
+    def peek(self, key=None):
+        """Current value for ``key`` (possibly stale), or None"""
+        value, _ = self._values.get(key, (None, 0.0))
+        return value
+
+    def get(self, build, key=None, max_age=None):
+        """
+        Value for ``key``, rebuilt with ``build()`` when older than ``max_age``
+        (default: the cache TTL).
+
+        Args:
+            build: Callable returning the new value; raises when unavailable
+            key: Cache key (None for single-value caches)
+            max_age: Seconds before the value is rebuilt
+
+        Returns:
+            The cached value, or None when no build has succeeded yet
+        """
+        max_age = self.ttl if max_age is None else max_age
+        value, built_at = self._values.get(key, (None, 0.0))
+        if value is not None and time.time() - built_at < max_age:
+            return value
+        if time.time() - self._failed_at.get(key, 0.0) < self.retry_seconds:
+            return value
+        if self.background:
+            with self._lock:
+                if key not in self._builds:
+                    thread = threading.Thread(target=self._background_build, args=(build, key), daemon=True)
+                    self._builds[key] = thread
+                    thread.start()
+            return value  # Stale value (or None) until the build completes
+        with self._lock:
+            value, built_at = self._values.get(key, (None, 0.0))
+            if value is not None and time.time() - built_at < max_age:
+                return value
+            return self._build(build, key)
+
+    def wait(self, key=None):
+        """Block until a running background build for ``key`` has finished"""
+        thread = self._builds.get(key)
+        if thread is not None:
+            thread.join()
+
+    def clear(self):
+        """Drop all values and failure timestamps"""
+        with self._lock:
+            self._values.clear()
+            self._failed_at.clear()
+
+    def _build(self, build, key):
+        try:
+            value = build()
+        except Exception as e:
+            print(f"⚠️ {self.name} unavailable{'' if key is None else f' ({key})'}: {e}")
+            self._failed_at[key] = time.time()
+            return self.peek(key)
+        self._values[key] = (value, time.time())
+        return value
+
+    def _background_build(self, build, key):
+        try:
+            self._build(build, key)
+        finally:
+            with self._lock:
+                self._builds.pop(key, None)